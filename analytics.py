@@ -0,0 +1,271 @@
+"""
+Аналитика воронки лидов: счетчики событий и оценка уникальных пользователей.
+
+События (ответы files/join/engagement/start, сообщения в личку, переходы из группы в
+личку) считаются в памяти по ключу (час, чат, событие). Уникальные пользователи
+оцениваются HyperLogLog-скетчем фиксированного размера, поэтому память не зависит от
+количества событий. Закрытые часы периодически выгружаются на диск в JSONL-файлы по
+дням и удаляются из памяти; запросы объединяют диск и память.
+"""
+
+import asyncio
+import base64
+import json
+import logging
+import math
+import os
+import time
+from collections import defaultdict
+
+logger = logging.getLogger(__name__)
+
+EVENT_FILES = "files"
+EVENT_JOIN = "join"
+EVENT_ENGAGEMENT = "engagement"
+EVENT_START = "start"
+EVENT_DM = "dm"
+EVENT_CONVERTED = "converted"
+
+EVENT_LABELS = {
+    EVENT_FILES: "📁 Файлы",
+    EVENT_JOIN: "💎 Вступление",
+    EVENT_ENGAGEMENT: "🔥 Взаимодействие",
+    EVENT_START: "🤖 Старт",
+    EVENT_DM: "✉️ Написали в личку",
+    EVENT_CONVERTED: "🎯 Из группы в личку",
+}
+
+# Чаты сверх лимита в одном часе учитываются под этим идентификатором
+OTHER_CHATS = 0
+
+_MASK64 = (1 << 64) - 1
+
+
+def _mix64(value):
+    """splitmix64: быстрый 64-битный хэш целого числа"""
+    value = (value + 0x9E3779B97F4A7C15) & _MASK64
+    value = ((value ^ (value >> 30)) * 0xBF58476D1CE4E5B9) & _MASK64
+    value = ((value ^ (value >> 27)) * 0x94D049BB133111EB) & _MASK64
+    return value ^ (value >> 31)
+
+
+class HyperLogLog:
+    """HyperLogLog-скетч: 2^precision байт, стандартная ошибка 1.04/sqrt(2^precision)"""
+
+    __slots__ = ("precision", "registers")
+
+    def __init__(self, precision=10, registers=None):
+        self.precision = precision
+        self.registers = registers if registers is not None else bytearray(1 << precision)
+
+    def add(self, user_id):
+        hashed = _mix64(user_id)
+        index = hashed >> (64 - self.precision)
+        rest = (hashed << self.precision) & _MASK64
+        rank = 64 - rest.bit_length() + 1 if rest else 64 - self.precision + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def merge(self, other):
+        registers = self.registers
+        for index, rank in enumerate(other.registers):
+            if rank > registers[index]:
+                registers[index] = rank
+
+    def estimate(self):
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / sum(2.0 ** -rank for rank in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * m and zeros:
+            # Коррекция для малых значений (linear counting)
+            estimate = m * math.log(m / zeros)
+        return int(round(estimate))
+
+    def to_base64(self):
+        return base64.b64encode(bytes(self.registers)).decode("ascii")
+
+    @classmethod
+    def from_base64(cls, data, precision=10):
+        return cls(precision, bytearray(base64.b64decode(data)))
+
+
+class _Bucket:
+    __slots__ = ("count", "sketch")
+
+    def __init__(self, precision):
+        self.count = 0
+        self.sketch = HyperLogLog(precision)
+
+
+class FunnelAnalytics:
+    """Счетчики воронки по (час, чат, событие) с выгрузкой закрытых часов на диск"""
+
+    MEMORY_HOURS = 48
+
+    def __init__(self, directory=None, rollup_interval=60.0, precision=10, max_chats_per_hour=200):
+        self.directory = directory
+        self.rollup_interval = rollup_interval
+        self.precision = precision
+        self.max_chats_per_hour = max_chats_per_hour
+        self._buckets = {}
+        self._chats_by_hour = defaultdict(set)
+        self._rollup_task = None
+        self.events = 0
+
+    # --- жизненный цикл -------------------------------------------------------------
+
+    async def start(self):
+        if self.directory:
+            os.makedirs(self.directory, exist_ok=True)
+        self._rollup_task = asyncio.create_task(self._rollup_loop())
+
+    async def stop(self):
+        if self._rollup_task:
+            self._rollup_task.cancel()
+            try:
+                await self._rollup_task
+            except asyncio.CancelledError:
+                pass
+            self._rollup_task = None
+        # При остановке выгружаем и текущий час: дубли ключей на диске сливаются при чтении
+        await self.rollup(everything=True)
+
+    async def _rollup_loop(self):
+        while True:
+            await asyncio.sleep(self.rollup_interval)
+            try:
+                await self.rollup()
+            except Exception as e:
+                logger.error(f"❌ Ошибка выгрузки аналитики: {e}")
+
+    # --- запись событий ------------------------------------------------------------
+
+    def record(self, event, chat_id, user_id, now=None):
+        """Учитывает событие воронки; O(1) по времени и памяти"""
+        hour = int((now or time.time()) // 3600)
+        chats = self._chats_by_hour[hour]
+        if chat_id not in chats:
+            if len(chats) >= self.max_chats_per_hour:
+                chat_id = OTHER_CHATS
+            chats.add(chat_id)
+
+        key = (hour, chat_id, event)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = _Bucket(self.precision)
+        bucket.count += 1
+        bucket.sketch.add(user_id)
+        self.events += 1
+
+    @property
+    def buckets_in_memory(self):
+        return len(self._buckets)
+
+    # --- выгрузка на диск -------------------------------------------------------------
+
+    async def rollup(self, everything=False, now=None):
+        """Выгружает закрытые часы (или все, если everything) на диск.
+
+        Без каталога для выгрузки в памяти остаются только последние MEMORY_HOURS часов.
+        """
+        current_hour = int((now or time.time()) // 3600)
+        if self.directory:
+            keys = [key for key in self._buckets if everything or key[0] < current_hour]
+        else:
+            keys = [key for key in self._buckets if key[0] <= current_hour - self.MEMORY_HOURS]
+        if not keys:
+            return 0
+
+        records = []
+        for key in keys:
+            hour, chat_id, event = key
+            bucket = self._buckets.pop(key)
+            self._chats_by_hour.pop(hour, None)
+            records.append({
+                "hour": hour, "chat_id": chat_id, "event": event,
+                "count": bucket.count, "hll": bucket.sketch.to_base64(),
+            })
+
+        if self.directory:
+            await asyncio.get_running_loop().run_in_executor(None, self._append_records, records)
+        return len(records)
+
+    def _day_path(self, hour):
+        day = time.strftime("%Y-%m-%d", time.gmtime(hour * 3600))
+        return os.path.join(self.directory, f"funnel-{day}.jsonl")
+
+    def _append_records(self, records):
+        by_path = defaultdict(list)
+        for record in records:
+            by_path[self._day_path(record["hour"])].append(record)
+        for path, items in by_path.items():
+            with open(path, "a", encoding="utf-8") as f:
+                for record in items:
+                    f.write(json.dumps(record) + "\n")
+
+    def _read_rollups(self, first_hour, last_hour):
+        if not self.directory:
+            return
+        paths = sorted({self._day_path(hour) for hour in range(first_hour, last_hour + 1, 24)}
+                       | {self._day_path(last_hour)})
+        for path in paths:
+            if not os.path.exists(path):
+                continue
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    record = json.loads(line)
+                    if first_hour <= record["hour"] <= last_hour:
+                        yield record
+
+    # --- запросы --------------------------------------------------------------------
+
+    @staticmethod
+    def _hour_range(hours, now):
+        last_hour = int((now or time.time()) // 3600)
+        return last_hour - hours + 1, last_hour
+
+    def _add(self, totals, event, count, sketch):
+        total = totals.get(event)
+        if total is None:
+            total = totals[event] = [0, HyperLogLog(self.precision)]
+        total[0] += count
+        total[1].merge(sketch)
+
+    def _load_rollups(self, first_hour, last_hour, chat_id):
+        """Агрегаты из файлов выгрузки (можно вызывать в отдельном потоке)"""
+        totals = {}
+        for record in self._read_rollups(first_hour, last_hour):
+            if chat_id is None or record["chat_id"] == chat_id:
+                self._add(totals, record["event"], record["count"],
+                          HyperLogLog.from_base64(record["hll"], self.precision))
+        return totals
+
+    def _merge_memory(self, totals, first_hour, last_hour, chat_id):
+        for (hour, bucket_chat, event), bucket in self._buckets.items():
+            if first_hour <= hour <= last_hour and (chat_id is None or bucket_chat == chat_id):
+                self._add(totals, event, bucket.count, bucket.sketch)
+        return {event: (count, sketch.estimate()) for event, (count, sketch) in totals.items()}
+
+    def query(self, hours=24, chat_id=None, now=None):
+        """Сводка за последние hours часов: {событие: (событий, уникальных пользователей)}"""
+        first_hour, last_hour = self._hour_range(hours, now)
+        totals = self._load_rollups(first_hour, last_hour, chat_id)
+        return self._merge_memory(totals, first_hour, last_hour, chat_id)
+
+    async def query_async(self, hours=24, chat_id=None, now=None):
+        """То же, что query, но чтение файлов выгрузки идет вне event loop"""
+        first_hour, last_hour = self._hour_range(hours, now)
+        totals = await asyncio.get_running_loop().run_in_executor(
+            None, self._load_rollups, first_hour, last_hour, chat_id)
+        return self._merge_memory(totals, first_hour, last_hour, chat_id)
+
+    async def format_summary(self, hours=24, chat_id=None):
+        """Текст сводки для админ-команды"""
+        summary = await self.query_async(hours, chat_id)
+        scope = f" в чате {chat_id}" if chat_id is not None else ""
+        lines = [f"📈 Воронка за {hours} ч{scope}:"]
+        for event, label in EVENT_LABELS.items():
+            count, users = summary.get(event, (0, 0))
+            lines.append(f"{label}: {count} событий, ~{users} пользователей")
+        return "\n".join(lines)
@@ -0,0 +1,116 @@
+"""
+Автоудаление ответов бота в группах.
+
+Длинные ответы (MAIN_INFO, FILES) засоряют чат, поэтому каждый ответ бота в группе
+ставится в колесо таймеров и удаляется через ttl секунд. Отложенные удаления хранятся
+в StateStore (пространство имен autodelete: "чат:сообщение" -> срок) и после
+перезапуска возвращаются в колесо; истекшие за время простоя удаляются на первом тике.
+Истекшие сообщения уходят пачками deleteMessages, по вызову на чат.
+"""
+
+import asyncio
+import logging
+import time
+
+from telegram.error import TelegramError
+
+from config import Config
+from timer_wheel import TimerWheel
+from topic_guard import MAX_DELETE_BATCH, delete_messages
+
+logger = logging.getLogger(__name__)
+
+NS_AUTODELETE = "autodelete"
+
+
+class ReplyJanitor:
+    """Удаляет ответы бота в группах через ttl секунд"""
+
+    def __init__(self, ttl, store=None, tick=1.0, clock=time.time):
+        self.ttl = ttl
+        self.store = store
+        self.tick = tick
+        self.clock = clock
+        self.wheel = TimerWheel(tick, now=clock())
+        # Bot приложения; BuddahBaseBot задает его при сборке Application
+        self.bot = None
+        self._task = None
+        self.stats = {"scheduled": 0, "restored": 0, "deleted": 0, "api_calls": 0, "failed": 0}
+
+    @classmethod
+    def from_config(cls, store=None):
+        return cls(Config.GROUP_REPLY_TTL_SECONDS, store, tick=Config.GROUP_REPLY_TTL_TICK)
+
+    # --- жизненный цикл -------------------------------------------------------------
+
+    async def start(self):
+        """Возвращает в колесо удаления, сохраненные до перезапуска, и запускает тики"""
+        self.restore()
+        self._task = asyncio.create_task(self._tick_loop())
+
+    async def stop(self):
+        # Неистекшие удаления остаются в хранилище до следующего запуска
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _tick_loop(self):
+        while True:
+            await asyncio.sleep(self.tick)
+            await self.run_once()
+
+    def restore(self):
+        if not self.store:
+            return 0
+        restored = 0
+        for key, deadline in list(self.store.items(NS_AUTODELETE)):
+            chat_id, message_id = key.rsplit(":", 1)
+            self.wheel.insert(deadline, (int(chat_id), int(message_id)))
+            restored += 1
+        self.stats["restored"] += restored
+        if restored:
+            logger.info(f"🗑 Восстановлено отложенных удалений: {restored}")
+        return restored
+
+    # --- планирование ---------------------------------------------------------------
+
+    @property
+    def pending(self):
+        return len(self.wheel)
+
+    def schedule(self, chat_id, message_id, ttl=None):
+        """Ставит сообщение чата на удаление через ttl секунд (по умолчанию self.ttl)"""
+        deadline = self.clock() + (self.ttl if ttl is None else ttl)
+        self.wheel.insert(deadline, (chat_id, message_id))
+        if self.store:
+            self.store.set(NS_AUTODELETE, f"{chat_id}:{message_id}", deadline)
+        self.stats["scheduled"] += 1
+
+    def expire(self, now=None):
+        """Снимает истекшие удаления с колеса: {chat_id: [message_id, ...]}"""
+        batches = {}
+        for chat_id, message_id in self.wheel.advance(self.clock() if now is None else now):
+            batches.setdefault(chat_id, []).append(message_id)
+            if self.store:
+                self.store.delete(NS_AUTODELETE, f"{chat_id}:{message_id}")
+        return batches
+
+    async def run_once(self, now=None):
+        """Удаляет истекшие сообщения пачками deleteMessages"""
+        if self.bot is None:
+            return
+        for chat_id, message_ids in self.expire(now).items():
+            for start in range(0, len(message_ids), MAX_DELETE_BATCH):
+                await self._delete(chat_id, message_ids[start:start + MAX_DELETE_BATCH])
+
+    async def _delete(self, chat_id, message_ids):
+        try:
+            self.stats["api_calls"] += await delete_messages(self.bot, chat_id, message_ids)
+            self.stats["deleted"] += len(message_ids)
+        except TelegramError as e:
+            self.stats["failed"] += len(message_ids)
+            logger.warning(f"⚠️ Не удалось удалить {len(message_ids)} ответов бота в {chat_id}: {e}")
@@ -0,0 +1,249 @@
+"""
+Ограничение нагрузки и отбрасывание малоценной работы при наплыве апдейтов.
+
+LoadShedder - обработчик апдейтов PTB (Application.builder().concurrent_updates()):
+одновременно выполняется не больше max_concurrent_updates апдейтов, остальные ждут
+своей очереди. Когда очередь ожидания растет, сначала отбрасываются болтовня в группах
+(на нее бот и так не отвечает) и ответы на вовлекающие слова, затем повторные ответы
+о вступлении тем, кто их уже получал, и при полной очереди - прочая работа в группах.
+Личные чаты, кнопки и команды бота (critical) не ждут в общей очереди: у них свой предел
+одновременности critical_concurrency, а сверх max_critical_backlog в работе отбрасываются
+и они, иначе флуд в личку или выдуманными "/командами" не ограничивался бы ничем.
+
+PTB забирает апдейты из update_queue сразу, по задаче на апдейт: очередь не заполняется
+и getUpdates не притормаживается. Работу ограничивает только отбрасывание здесь.
+
+С serialize_chats апдейты одного чата выполняются по одному в порядке приема (очередь
+на замке чата), разные чаты - параллельно; так работают процессы sharding.py.
+
+Здесь же начинается и заканчивается трасса апдейта (tracing.py), если он попал в выборку.
+"""
+
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+from handlers import COMMANDS
+from matcher import INTENT_ENGAGEMENT, INTENT_JOIN
+from runtime import NS_LEAD
+from tracing import current_trace
+
+logger = logging.getLogger(__name__)
+
+# Уровни ценности работы (от самой ценной к самой дешевой для отбрасывания)
+TIER_CRITICAL = "critical"
+TIER_NORMAL = "normal"
+TIER_REPEAT_JOIN = "repeat_join"
+TIER_ENGAGEMENT = "engagement"
+TIER_CHATTER = "chatter"
+
+
+class LoadShedder(BaseUpdateProcessor):
+    """Ограниченная очередь апдейтов с отбрасыванием по уровню ценности.
+
+    backlog - принятые и еще не обработанные апдейты (ждут очереди или выполняются)
+    плюс апдейты в application.update_queue. Уровень отбрасывается, когда backlog
+    достигает его порога.
+    """
+
+    def __init__(self, runtime, max_concurrent_updates=8, max_backlog=200,
+                 shed_engagement_at=50, shed_repeat_join_at=100, critical_concurrency=32,
+                 max_critical_backlog=500, commands=None, serialize_chats=False):
+        # Application.process_update PTB (@final) держит свой семафор вокруг
+        # do_process_update. Его предел - все апдейты, которые можно принять в обе
+        # очереди: ждут они в учтенном backlog здесь, а не незаметно в семафоре PTB;
+        # одновременность работы задают семафоры уровней ниже
+        super().__init__(max_backlog + max_critical_backlog)
+        self.runtime = runtime
+        # Только зарегистрированные команды: "/xyz" в группе - обычный текст
+        self.commands = frozenset(COMMANDS if commands is None else commands)
+        self.max_critical_backlog = max_critical_backlog
+        self._normal_semaphore = asyncio.BoundedSemaphore(max_concurrent_updates)
+        self._critical_semaphore = asyncio.BoundedSemaphore(critical_concurrency)
+        self._critical = 0
+        self.limits = {
+            TIER_CHATTER: shed_engagement_at,
+            TIER_ENGAGEMENT: shed_engagement_at,
+            TIER_REPEAT_JOIN: shed_repeat_join_at,
+            TIER_NORMAL: max_backlog,
+        }
+        self.serialize_chats = serialize_chats
+        # chat_id -> [замок чата, апдейтов чата в работе]
+        self._chats = {}
+        self.update_queue = None
+        self._admitted = 0
+        # Апдейты, прошедшие обработчик: выполненные или отброшенные
+        self.handled = 0
+
+    @property
+    def backlog(self):
+        queued = self.update_queue.qsize() if self.update_queue is not None else 0
+        return self._admitted + queued
+
+    def classify(self, update):
+        """Уровень ценности апдейта; дешево, без обращений к сети"""
+        if not isinstance(update, Update):
+            return TIER_NORMAL
+        if update.callback_query:
+            # Нажатие кнопки пользователь ждет так же, как ответа в личке
+            return TIER_CRITICAL
+        message = update.message
+        if message is None or message.chat is None:
+            return TIER_NORMAL
+        if message.chat.type == "private":
+            return TIER_CRITICAL
+        if message.new_chat_members and self.runtime.verifier:
+            # При наплыве вошедших их ограничение важнее всего остального в группе
+            return TIER_CRITICAL
+        if not message.text:
+            return TIER_NORMAL
+        if self._command(message.text) in self.commands:
+            return TIER_CRITICAL
+
+        text = message.text.lower()
+        intent = self.runtime.precomputed.classify(text)
+        if intent == INTENT_JOIN:
+            return TIER_REPEAT_JOIN if self._got_join_reply(message) else TIER_NORMAL
+        if intent == INTENT_ENGAGEMENT:
+            return TIER_ENGAGEMENT
+        if intent is None and not any(mention in text for mention in self.runtime.mentions):
+            # Болтовня без триггеров: бот на нее не отвечает
+            reply = message.reply_to_message
+            if not (reply and reply.from_user and reply.from_user.is_bot):
+                return TIER_CHATTER
+        return TIER_NORMAL
+
+    @staticmethod
+    def _command(text):
+        """Имя команды из "/start@bot аргументы" или None"""
+        if not text.startswith("/"):
+            return None
+        return text.split(maxsplit=1)[0][1:].split("@", 1)[0].lower()
+
+    def _got_join_reply(self, message):
+        store = self.runtime.store
+        if not store or not message.from_user:
+            return False
+        lead = store.get(NS_LEAD, str(message.from_user.id))
+        return bool(lead and lead["intents"].get(INTENT_JOIN))
+
+    async def do_process_update(self, update, coroutine):
+        # Сохраненный offset не обгоняет апдейты, которые еще выполняются (catchup.py)
+        update_id = update.update_id if isinstance(update, Update) else None
+        if update_id is None:
+            await self._traced(update, coroutine)
+            return
+        self.runtime.begin_update(update_id)
+        try:
+            await self._traced(update, coroutine)
+        finally:
+            self.runtime.finish_update(update_id)
+
+    async def _traced(self, update, coroutine):
+        tracer = self.runtime.tracer
+        if tracer is None:
+            await self._process(update, coroutine)
+            return
+        # Время постановки в очередь забираем у каждого апдейта, даже не из выборки
+        arrived = self.update_queue.arrival(update) if hasattr(self.update_queue, "arrival") else None
+        trace = tracer.begin(update, arrived)
+        if trace is None:
+            await self._process(update, coroutine)
+            return
+        tier = shed = None
+        try:
+            tier, shed = await self._process(update, coroutine)
+        finally:
+            tracer.end(trace, tier=tier, shed=shed)
+
+    async def _process(self, update, coroutine):
+        """Отбрасывает или выполняет апдейт; возвращает (уровень, отброшен ли)"""
+        metrics = self.runtime.metrics
+        tier = self.classify(update)
+        if tier == TIER_CRITICAL:
+            shed = self._critical >= self.max_critical_backlog
+        else:
+            limit = self.limits.get(tier)
+            shed = limit is not None and self.backlog >= limit
+        if shed:
+            # Корутина обработки так и не запускалась: закрываем без предупреждений
+            coroutine.close()
+            # Модерация дешевая и проверяет и отброшенные сообщения: при рейде спам
+            # и сообщения вне темы все равно нужно удалить
+            if update.message and (self.runtime.spam or self.runtime.topics):
+                self.runtime.moderate(update.get_bot(), update.message)
+            metrics.shed[tier] = metrics.shed.get(tier, 0) + 1
+            if metrics.shed[tier] == 1:
+                logger.warning(f"⚠️ Перегрузка: очередь {self.backlog}, отбрасываем уровень {tier}")
+            self.handled += 1
+            return tier, True
+
+        self._admitted += 1
+        metrics.backlog = self.backlog
+        metrics.backlog_peak = max(metrics.backlog_peak, metrics.backlog)
+        try:
+            async with self._chat_turn(update):
+                if tier == TIER_CRITICAL:
+                    self._critical += 1
+                    try:
+                        async with self._critical_semaphore:
+                            await self._run(coroutine)
+                    finally:
+                        self._critical -= 1
+                else:
+                    async with self._normal_semaphore:
+                        await self._run(coroutine)
+        finally:
+            self._admitted -= 1
+            self.handled += 1
+            metrics.backlog = self.backlog
+        return tier, False
+
+    @asynccontextmanager
+    async def _chat_turn(self, update):
+        """Очередь апдейтов чата: следующий начинается после завершения предыдущего.
+
+        Замок берется до мест в общих очередях: ждущий своей очереди чата их не занимает.
+        """
+        chat_id = self._chat_id(update) if self.serialize_chats else None
+        if chat_id is None:
+            yield
+            return
+        entry = self._chats.get(chat_id)
+        if entry is None:
+            entry = self._chats[chat_id] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                yield
+        finally:
+            entry[1] -= 1
+            if not entry[1]:
+                del self._chats[chat_id]
+
+    @staticmethod
+    def _chat_id(update):
+        """Чат апдейта, как у ключа шардирования: иначе пользователь (inline-запросы)"""
+        if not isinstance(update, Update):
+            return None
+        if update.effective_chat:
+            return update.effective_chat.id
+        return update.effective_user.id if update.effective_user else None
+
+    @staticmethod
+    async def _run(coroutine):
+        trace = current_trace()
+        if trace is not None:
+            # Конец ожидания в очереди: дальше PTB подбирает обработчики
+            trace.dispatched = time.perf_counter()
+        await coroutine
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк ограничения нагрузки: всплеск группового трафика в N раз и задержка ответов
+в личку.
+
+Сравниваются последовательная обработка апдейтов (как без LoadShedder), параллельная
+обработка без отбрасывания и LoadShedder с порогами из config.py. Время реальное,
+FakeTelegramAPI отвечает с задержкой сети.
+
+Запуск: python bench_backpressure.py [апдейтов/с до всплеска] [кратность всплеска]
+"""
+
+import asyncio
+import logging
+import sys
+
+from config import Config
+from fake_api import FakeTelegramAPI
+from persistence import StateStore
+from replay import ReplayHarness, build_spike_timeline, percentile
+from runtime import BotRuntime
+
+SETTINGS = ("UPDATE_CONCURRENCY", "SHED_ENGAGEMENT_AT", "SHED_REPEAT_JOIN_AT", "MAX_BACKLOG")
+UNLIMITED = 10 ** 9
+
+
+async def run_scenario(timeline, spike_at, settings):
+    saved = {name: getattr(Config, name) for name in SETTINGS}
+    for name, value in zip(SETTINGS, settings):
+        setattr(Config, name, value)
+    api = FakeTelegramAPI(latency=0.05)
+    runtime = BotRuntime(store=StateStore())
+    try:
+        async with ReplayHarness(api=api, runtime=runtime) as harness:
+            started = asyncio.get_running_loop().time()
+            await harness.feed(timeline, queued=True)
+            seconds = asyncio.get_running_loop().time() - started
+    finally:
+        for name, value in saved.items():
+            setattr(Config, name, value)
+
+    spike = sorted((api.first_sent[data["message"]["chat"]["id"]] - started - at) * 1000
+                   for at, data in timeline
+                   if at >= spike_at and "message" in data and data["message"]["chat"]["type"] == "private")
+    return {
+        "seconds": seconds,
+        "backlog_peak": runtime.metrics.backlog_peak,
+        "shed": sum(runtime.metrics.shed.values()),
+        "sent": api.count("sendMessage"),
+        "p50": percentile(spike, 0.50),
+        "p99": percentile(spike, 0.99),
+    }
+
+
+async def run(rate, factor):
+    logging.disable(logging.WARNING)
+    timeline = build_spike_timeline(phases=((1.0, rate), (2.0, rate * factor)))
+    print(f"🌊 {rate} апдейтов/с, затем всплеск x{factor} на 2 с ({len(timeline)} апдейтов), "
+          f"API отвечает за 50 мс")
+    print("=" * 78)
+    scenarios = [
+        ("последовательно", (1, UNLIMITED, UNLIMITED, UNLIMITED)),
+        ("параллельно без отбрасывания", (Config.UPDATE_CONCURRENCY, UNLIMITED, UNLIMITED, UNLIMITED)),
+        ("LoadShedder", (Config.UPDATE_CONCURRENCY, Config.SHED_ENGAGEMENT_AT,
+                         Config.SHED_REPEAT_JOIN_AT, Config.MAX_BACKLOG)),
+    ]
+    for name, settings in scenarios:
+        stats = await run_scenario(timeline, 1.0, settings)
+        print(f"{name:30} очередь до {stats['backlog_peak']:5}, отброшено {stats['shed']:5}, "
+              f"ответов {stats['sent']:5}, личка p50/p99 {stats['p50']:8.1f} / {stats['p99']:8.1f} мс, "
+              f"{stats['seconds']:.1f} с")
+
+
+def main():
+    rate = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    factor = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    asyncio.run(run(rate, factor))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк inline-поиска по каталогу: время построения индекса и задержка запроса
+на каждое нажатие клавиши.
+
+Каждый префикс набираемых запросов ищется с пустым кэшем результатов, как новый
+inline-запрос; отдельно замеряется листание страниц через next_offset.
+
+Запуск: python bench_catalog.py [записей в каталоге] [раунды]
+"""
+
+import sys
+import time
+
+from catalog import CatalogIndex
+from replay import build_catalog, percentile
+
+TYPED_QUERIES = [
+    "промпт для видео", "шаблоны презентаций", "нейросеть для фото", "гайд по midjourney",
+    "копирайтинг реклама", "python код", "инструкция veo", "слово1234 слово77",
+]
+
+
+def keystrokes(query):
+    return [query[:length] for length in range(1, len(query) + 1)]
+
+
+def bench_build(catalog, rounds):
+    best = float("inf")
+    index = None
+    for _ in range(rounds):
+        started = time.perf_counter()
+        index = CatalogIndex.from_dicts(catalog)
+        best = min(best, time.perf_counter() - started)
+    return index, best
+
+
+def bench_keystrokes(index, rounds):
+    latencies = []
+    for _ in range(rounds):
+        for query in TYPED_QUERIES:
+            for prefix in keystrokes(query):
+                index._cache.clear()
+                started = time.perf_counter()
+                index.search(prefix)
+                latencies.append(time.perf_counter() - started)
+    latencies.sort()
+    return latencies
+
+
+def bench_pages(index, rounds, pages=5):
+    latencies = []
+    for _ in range(rounds):
+        for query in TYPED_QUERIES:
+            index._cache.clear()
+            for page in range(pages):
+                started = time.perf_counter()
+                index.search(query, offset=page * 20)
+                latencies.append(time.perf_counter() - started)
+    latencies.sort()
+    return latencies
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    rounds = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+
+    catalog = build_catalog(count)
+    index, build_seconds = bench_build(catalog, 3)
+    print(f"📚 Каталог: {count} записей, {len(index.postings)} терминов")
+    print("=" * 60)
+    print(f"{'построение индекса':30} {build_seconds * 1000:10.1f} мс")
+
+    for name, latencies in [("нажатие клавиши (без кэша)", bench_keystrokes(index, rounds)),
+                            ("листание страниц", bench_pages(index, rounds))]:
+        print(f"{name:30} p50 {percentile(latencies, 0.50) * 1000:.3f} мс  "
+              f"p99 {percentile(latencies, 0.99) * 1000:.3f} мс  "
+              f"max {latencies[-1] * 1000:.3f} мс  ({len(latencies)} запросов)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
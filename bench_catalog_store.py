@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк хранения записей каталога: dict строк в памяти против файла через mmap.
+
+Каждый вариант запускается в отдельном процессе, чтобы RSS не смешивался:
+замеряется рост RSS и анонимной (приватной для процесса) памяти после загрузки и после
+случайных обращений, а также задержка поиска записи по id и по номеру.
+
+Запуск: python bench_catalog_store.py [записей] [обращений]
+"""
+
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+from replay import build_catalog
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+
+def memory_kb():
+    """(RSS, анонимная память) процесса в КБ из /proc/self/smaps_rollup.
+
+    Анонимная память - куча процесса, ее нельзя разделить с другими процессами;
+    страницы mmap файла учитываются в RSS, но не в ней.
+    """
+    values = {}
+    with open("/proc/self/smaps_rollup", "r") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 2 and parts[1].isdigit():
+                values[parts[0].rstrip(":")] = int(parts[1])
+    return values.get("Rss", 0), values.get("Anonymous", 0)
+
+
+def child(kind, json_path, store_path, lookups):
+    """Загружает каталог выбранным способом и печатает замеры одной строкой JSON"""
+    rss_before, private_before = memory_kb()
+    started = time.perf_counter()
+    if kind == "dict":
+        with open(json_path, "r", encoding="utf-8") as f:
+            items = json.load(f)
+        by_id = {item["id"]: item for item in items}
+        by_position = items
+        get_by_id, get_by_position = by_id.get, by_position.__getitem__
+    else:
+        from catalog_store import CatalogStore
+        store = CatalogStore(store_path)
+        get_by_id, get_by_position = store.get, store.__getitem__
+        by_position = store
+    load_seconds = time.perf_counter() - started
+    rss_loaded, private_loaded = memory_kb()
+
+    rng = random.Random(1)
+    count = len(by_position)
+    ids = [f"item{rng.randrange(count)}" for _ in range(lookups)]
+    positions = [rng.randrange(count) for _ in range(lookups)]
+
+    started = time.perf_counter()
+    for entry_id in ids:
+        get_by_id(entry_id)
+    by_id_ns = (time.perf_counter() - started) / lookups * 1e9
+
+    started = time.perf_counter()
+    for position in positions:
+        get_by_position(position)
+    by_position_ns = (time.perf_counter() - started) / lookups * 1e9
+    rss_used, private_used = memory_kb()
+
+    print(json.dumps({
+        "load_ms": load_seconds * 1000,
+        "rss_loaded_mb": (rss_loaded - rss_before) / 1024,
+        "private_loaded_mb": (private_loaded - private_before) / 1024,
+        "rss_used_mb": (rss_used - rss_before) / 1024,
+        "private_used_mb": (private_used - private_before) / 1024,
+        "by_id_ns": by_id_ns,
+        "by_position_ns": by_position_ns,
+    }))
+
+
+def run_child(kind, json_path, store_path, lookups):
+    result = subprocess.run(
+        [sys.executable, __file__, "--child", kind, json_path, store_path, str(lookups)],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    from catalog_store import CatalogStore
+
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    lookups = int(sys.argv[2]) if len(sys.argv) > 2 else 20000
+
+    catalog = build_catalog(count)
+    for item in catalog:
+        # Текст записи - сам промпт, он заметно длиннее описания
+        item["text"] = " ".join([item["title"], item["description"]] * 4)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        json_path = os.path.join(tmp, "catalog.json")
+        store_path = os.path.join(tmp, "catalog.bin")
+        with open(json_path, "w", encoding="utf-8") as f:
+            json.dump(catalog, f, ensure_ascii=False)
+        started = time.perf_counter()
+        CatalogStore.build(store_path, catalog)
+        build_ms = (time.perf_counter() - started) * 1000
+
+        print(f"📚 {count} записей: JSON {os.path.getsize(json_path) / 2**20:.1f} МБ, "
+              f"файл каталога {os.path.getsize(store_path) / 2**20:.1f} МБ "
+              f"(сборка {build_ms:.0f} мс)")
+        print("=" * 78)
+        print(f"{'':10} {'':>10} {'после загрузки':>21} {'после обращений':>21}")
+        print(f"{'вариант':10} {'загрузка':>10} {'RSS':>10} {'куча':>10} "
+              f"{'RSS':>10} {'куча':>10} {'по id':>9} {'по номеру':>10}")
+        for kind, name in [("dict", "dict"), ("mmap", "mmap")]:
+            stats = run_child(kind, json_path, store_path, lookups)
+            print(f"{name:10} {stats['load_ms']:8.0f}мс {stats['rss_loaded_mb']:8.1f}МБ "
+                  f"{stats['private_loaded_mb']:8.1f}МБ {stats['rss_used_mb']:8.1f}МБ "
+                  f"{stats['private_used_mb']:8.1f}МБ "
+                  f"{stats['by_id_ns'] / 1000:7.2f}мкс {stats['by_position_ns'] / 1000:8.2f}мкс")
+        print("\nСтраницы mmap, прочитанные при обращениях, входят в RSS, но это страничный кэш\n"
+              "файла: он общий для всех процессов бота, а куча процесса почти не растет.")
+    return 0
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "--child":
+        child(sys.argv[2], sys.argv[3], sys.argv[4], int(sys.argv[5]))
+        sys.exit(0)
+    sys.exit(main())
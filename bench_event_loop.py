@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк пропускной способности обработчиков на asyncio и uvloop.
+
+Прогоняет один и тот же корпус через ReplayHarness на обоих event loop
+и печатает updates/sec. Запуск: python bench_event_loop.py [кол-во апдейтов] [раунды]
+"""
+
+import asyncio
+import logging
+import sys
+
+from replay import ReplayHarness, build_corpus
+from startup import install_event_loop_policy
+
+
+async def replay_once(corpus):
+    async with ReplayHarness() as harness:
+        return await harness.replay(corpus)
+
+
+def run_on_loop(loop_name, corpus, rounds):
+    """Возвращает лучший результат из нескольких раундов на указанном event loop"""
+    if loop_name == "uvloop":
+        if install_event_loop_policy(True) != "uvloop":
+            return None
+    else:
+        asyncio.set_event_loop_policy(None)
+
+    try:
+        results = [asyncio.run(replay_once(corpus)) for _ in range(rounds)]
+    finally:
+        asyncio.set_event_loop_policy(None)
+    return max(results, key=lambda stats: stats["updates_per_sec"])
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    rounds = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+
+    # Логи обработчиков в бенчмарке только мешают замерам
+    logging.disable(logging.INFO)
+
+    corpus = build_corpus(count)
+    print(f"🏁 Реплей {count} апдейтов, лучший из {rounds} раундов")
+    print("=" * 50)
+
+    baseline = None
+    for loop_name in ("asyncio", "uvloop"):
+        stats = run_on_loop(loop_name, corpus, rounds)
+        if stats is None:
+            print(f"{loop_name:8} - пропущено (пакет не установлен)")
+            continue
+        line = (f"{loop_name:8} {stats['updates_per_sec']:10.0f} upd/s "
+                f"{stats['seconds'] * 1000:8.1f} ms  api calls: {stats['api_calls']}")
+        if baseline:
+            line += f"  (x{stats['updates_per_sec'] / baseline:.2f})"
+        else:
+            baseline = stats["updates_per_sec"]
+        print(line)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
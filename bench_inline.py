@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк отсечения устаревших inline-запросов: сколько вызовов answerInlineQuery
+экономится, пока пользователи печатают запрос по букве.
+
+Сравниваются ответ на каждое нажатие и "отвечать только свежему"
+с паузами debounce. Время реальное: пользователи печатают с заданным интервалом.
+
+Запуск: python bench_inline.py [пользователей] [интервал между нажатиями, с]
+"""
+
+import asyncio
+import logging
+import sys
+
+from catalog import CatalogIndex
+from debounce import InlineDebouncer
+from persistence import StateStore
+from replay import ReplayHarness, build_catalog, build_typing_timeline
+from runtime import BotRuntime
+
+
+async def run_scenario(timeline, catalog, inline):
+    runtime = BotRuntime(store=StateStore(), catalog=catalog, inline=inline)
+    async with ReplayHarness(runtime=runtime) as harness:
+        await harness.feed(timeline)
+        return harness.api.count("answerInlineQuery")
+
+
+async def run(users, interval):
+    logging.disable(logging.INFO)
+    catalog = CatalogIndex.from_dicts(build_catalog(10000))
+    timeline = build_typing_timeline(users, interval=interval)
+
+    print(f"⌨️ {users} пользователей печатают по {len(timeline) // users} символов, "
+          f"~{interval * 1000:.0f} мс между нажатиями ({len(timeline)} запросов)")
+    print("=" * 60)
+    scenarios = [
+        ("ответ на каждое нажатие", None),
+        ("debounce 50 мс", 0.05),
+        ("debounce 100 мс", 0.1),
+        ("debounce 250 мс", 0.25),
+    ]
+    baseline = None
+    for name, delay in scenarios:
+        inline = InlineDebouncer(delay) if delay is not None else None
+        calls = await run_scenario(timeline, catalog, inline)
+        baseline = baseline or calls
+        print(f"{name:28} {calls:6} answerInlineQuery  (-{1 - calls / baseline:.0%})")
+
+
+def main():
+    users = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    interval = float(sys.argv[2]) if len(sys.argv) > 2 else 0.12
+    asyncio.run(run(users, interval))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
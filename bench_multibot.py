@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк хостинга ботов: N ботов в одном процессе (multibot.BotHost) против N
+процессов по одному боту. Каждый бот опрашивает свой FakeTelegramAPI (getUpdates с
+long polling) и обрабатывает одинаковый корпус апдейтов.
+
+Для каждого варианта суммируются пиковая память процессов (ru_maxrss) и процессорное
+время (user + sys, включая импорты и запуск), а также CPU простоя за несколько секунд
+после обработки корпуса.
+
+Запуск: python bench_multibot.py [число ботов] [апдейтов на бота] [простой, сек]
+"""
+
+import asyncio
+import json
+import logging
+import os
+import resource
+import subprocess
+import sys
+import time
+
+from fake_api import FAKE_BOT_USER, FakeTelegramAPI
+
+
+class LongPollingAPI(FakeTelegramAPI):
+    """Эмулятор с настоящим ожиданием long polling: пустой getUpdates ждет апдейтов
+    до timeout секунд, а не отвечает каждые 10 мс"""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.arrived = asyncio.Event()
+
+    def add_updates(self, updates):
+        super().add_updates(updates)
+        self.arrived.set()
+
+    async def _get_updates(self, params):
+        offset = int(params.get("offset") or 0)
+        while self.updates and self.updates[0]["update_id"] < offset:
+            self.updates.popleft()
+        if not self.updates:
+            self.arrived.clear()
+            try:
+                await asyncio.wait_for(self.arrived.wait(), float(params.get("timeout") or 0))
+            except asyncio.TimeoutError:
+                return []
+        return await super()._get_updates(params)
+
+
+def cpu_seconds():
+    times = os.times()
+    return times.user + times.system
+
+
+async def run_worker(bots, updates):
+    # Импорт здесь: родительский процесс бенчмарка не загружает бота
+    from multibot import BotDefinition, BotHost
+    from replay import UpdateFactory, build_corpus
+
+    logging.disable(logging.WARNING)
+    apis = {f"bot{i}": LongPollingAPI(bot_user=dict(FAKE_BOT_USER, id=2000 + i, username=f"bench{i}_bot"))
+            for i in range(bots)}
+    definitions = [BotDefinition(name, f"{2000 + i}:BENCH") for i, name in enumerate(apis)]
+    host = BotHost(definitions, request_factory=lambda definition: (apis[definition.name], apis[definition.name]))
+
+    started = time.perf_counter()
+    await host.start()
+    startup = time.perf_counter() - started
+
+    cpu_before = cpu_seconds()
+    started = time.perf_counter()
+    for api in apis.values():
+        api.add_updates(build_corpus(updates, factory=UpdateFactory()))
+    runtimes = list(host.runtimes.values())
+    while sum(runtime.metrics.updates_total for runtime in runtimes) < bots * updates:
+        await asyncio.sleep(0.01)
+    processing = time.perf_counter() - started
+    processing_cpu = cpu_seconds() - cpu_before
+    return host, {"startup": startup, "processing": processing, "processing_cpu": processing_cpu}
+
+
+async def worker(bots, updates, idle):
+    host, result = await run_worker(bots, updates)
+    cpu_before = cpu_seconds()
+    await asyncio.sleep(idle)
+    result["idle_cpu"] = cpu_seconds() - cpu_before
+    result["cpu"] = cpu_seconds()
+    # ru_maxrss в Linux - в килобайтах
+    result["rss_mb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    await host.stop()
+    return result
+
+
+def spawn(bots, updates, idle):
+    return subprocess.Popen([sys.executable, __file__, "--worker", str(bots), str(updates), str(idle)],
+                            stdout=subprocess.PIPE, text=True)
+
+
+def collect(processes):
+    results = []
+    for process in processes:
+        output, _ = process.communicate()
+        if process.returncode != 0:
+            raise RuntimeError(f"Воркер завершился с кодом {process.returncode}")
+        results.append(json.loads(output.strip().splitlines()[-1]))
+    return results
+
+
+def report(name, results, wall):
+    rss = sum(result["rss_mb"] for result in results)
+    cpu = sum(result["cpu"] for result in results)
+    processing_cpu = sum(result["processing_cpu"] for result in results)
+    idle_cpu = sum(result["idle_cpu"] for result in results)
+    print(f"{name:18} память {rss:7.1f} МБ, CPU всего {cpu:5.2f} с (обработка {processing_cpu:5.2f} с, "
+          f"простой {idle_cpu * 1000:4.0f} мс), время {wall:5.1f} с")
+    return rss, cpu
+
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == "--worker":
+        bots, updates, idle = int(sys.argv[2]), int(sys.argv[3]), float(sys.argv[4])
+        print(json.dumps(asyncio.run(worker(bots, updates, idle))))
+        return 0
+
+    bots = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    updates = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+    idle = float(sys.argv[3]) if len(sys.argv) > 3 else 3.0
+    print(f"🤖 {bots} ботов, {updates} апдейтов на бота, простой {idle:.0f} с")
+    print("=" * 60)
+
+    started = time.perf_counter()
+    shared = collect([spawn(bots, updates, idle)])
+    shared_rss, shared_cpu = report("один процесс", shared, time.perf_counter() - started)
+
+    started = time.perf_counter()
+    separate = collect([spawn(1, updates, idle) for _ in range(bots)])
+    separate_rss, separate_cpu = report(f"{bots} процессов", separate, time.perf_counter() - started)
+
+    print(f"💾 Память: в {separate_rss / shared_rss:.1f} раза меньше в одном процессе, "
+          f"CPU: в {separate_cpu / shared_cpu:.1f} раза меньше")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк хранилища состояния: скорость записи и задержка обработчиков.
+
+1. Сырые записи: сколько set() в секунду принимает буфер и сколько строк в секунду
+   уходит в SQLite пакетным сбросом.
+2. Реплей: p50/p99 задержки обработки апдейта без хранилища, с хранилищем в памяти
+   и с SQLite при частом фоновом сбросе.
+
+Запуск: python bench_persistence.py [кол-во записей] [кол-во апдейтов]
+"""
+
+import asyncio
+import logging
+import os
+import sys
+import tempfile
+import time
+
+from persistence import StateStore
+from replay import ReplayHarness, build_corpus
+from runtime import BotRuntime
+
+
+async def bench_raw_writes(path, count):
+    store = await StateStore(path, flush_interval=3600, max_pending=count + 1).open()
+    started = time.perf_counter()
+    for i in range(count):
+        store.set("lead", i, {"last_seen": i, "intents": {"join": 1}})
+    buffered = time.perf_counter() - started
+
+    started = time.perf_counter()
+    rows = await store.flush()
+    flushed = time.perf_counter() - started
+    await store.close()
+    return count / buffered, rows / flushed
+
+
+async def bench_replay(corpus, runtime):
+    async with ReplayHarness(runtime=runtime) as harness:
+        stats = await harness.replay(corpus)
+    return stats, runtime.store.stats if runtime.store else None
+
+
+async def run(writes, updates):
+    logging.disable(logging.INFO)
+    corpus = build_corpus(updates)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        buffered_rate, flush_rate = await bench_raw_writes(os.path.join(tmp, "raw.db"), writes)
+        print(f"📝 {writes} записей")
+        print("=" * 60)
+        print(f"{'set() в буфер':30} {buffered_rate:12.0f} записей/с")
+        print(f"{'пакетный сброс в SQLite':30} {flush_rate:12.0f} строк/с")
+
+        scenarios = [
+            ("без хранилища", BotRuntime()),
+            ("хранилище в памяти", BotRuntime(store=StateStore())),
+            ("SQLite, сброс каждые 50 мс",
+             BotRuntime(store=StateStore(os.path.join(tmp, "bot.db"), flush_interval=0.05))),
+        ]
+        print(f"\n🤖 Реплей {updates} апдейтов")
+        print("=" * 60)
+        for name, runtime in scenarios:
+            stats, store_stats = await bench_replay(corpus, runtime)
+            line = (f"{name:30} {stats['updates_per_sec']:8.0f} upd/s  "
+                    f"p50 {stats['p50_ms']:.3f} ms  p99 {stats['p99_ms']:.3f} ms")
+            if store_stats and store_stats["flushes"]:
+                line += f"  ({store_stats['flushes']} сбросов, {store_stats['rows_flushed']} строк)"
+            print(line)
+
+
+def main():
+    writes = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    updates = int(sys.argv[2]) if len(sys.argv) > 2 else 5000
+    asyncio.run(run(writes, updates))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк шардирования вебхуков: пропускная способность (апдейтов/с) при 1, 2, 4...
+процессах-обработчиках. Отдельный процесс-клиент отправляет корпус апдейтов во фронт
+по HTTP (несколько keep-alive соединений, как Telegram), процессы-обработчики
+отвечают через FakeTelegramAPI с задержкой сети.
+
+Пропускная способность считается от первого принятого вебхука до момента, когда
+все процессы обработали все апдейты. Рост с числом процессов ограничен числом ядер:
+на машине с одним ядром процессы делят его. Поэтому дополнительно замеряется CPU на
+апдейт во фронте и в процессах-обработчиках и выводится потолок для N ядер: фронт
+упирается в свое ядро, обработчики масштабируются по ядрам.
+
+Запуск: python bench_sharding.py [процессы через запятую] [апдейтов] [задержка API, сек]
+"""
+
+import asyncio
+import json
+import logging
+import os
+import random
+import sys
+import time
+
+from fake_api import FAKE_BOT_TOKEN, FakeTelegramAPI
+from replay import UpdateFactory, build_corpus
+from sharding import ShardRouter, WebhookReceiver, run_worker
+
+CONNECTIONS = 8
+GROUPS = 200
+
+
+def cpu_seconds():
+    times = os.times()
+    return times.user + times.system
+
+
+def build_requests(count, seed=11):
+    """Корпус HTTP-запросов вебхука: личные чаты и GROUPS групп"""
+    rng = random.Random(seed)
+    requests = []
+    for update in build_corpus(count, factory=UpdateFactory(), users=2000):
+        message = update.get("message")
+        if message and message["chat"]["type"] != "private":
+            message["chat"]["id"] = -1000000000000 - rng.randrange(GROUPS)
+        body = json.dumps(update).encode("utf-8")
+        requests.append(b"POST /webhook HTTP/1.1\r\nHost: localhost\r\nContent-Type: application/json\r\n"
+                        b"Content-Length: %d\r\n\r\n%s" % (len(body), body))
+    return requests
+
+
+async def client(port, count):
+    """Процесс-клиент: CONNECTIONS соединений, запросы подряд без ожидания ответов"""
+    requests = build_requests(count)
+
+    async def connection(share):
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        writer.write(b"".join(share))
+        await writer.drain()
+        ok = 0
+        for _ in share:
+            ok += (await reader.readuntil(b"\r\n\r\n")).startswith(b"HTTP/1.1 200")
+        writer.close()
+        return ok
+
+    shares = [requests[i::CONNECTIONS] for i in range(CONNECTIONS)]
+    return sum(await asyncio.gather(*(connection(share) for share in shares)))
+
+
+async def worker(latency, index, socket_path):
+    logging.disable(logging.WARNING)
+    await run_worker(index, socket_path, request=FakeTelegramAPI(latency=latency), token=FAKE_BOT_TOKEN)
+
+
+async def run_scenario(workers, count, latency):
+    router = ShardRouter(workers, command=[sys.executable, os.path.abspath(__file__), "--worker", str(latency)])
+    receiver = WebhookReceiver(router)
+    try:
+        await router.start()
+        await receiver.start("127.0.0.1", 0)
+        cpu_before = cpu_seconds()
+        process = await asyncio.create_subprocess_exec(
+            sys.executable, os.path.abspath(__file__), "--client", str(receiver.port), str(count))
+        await process.wait()
+        stats = await router.stats()
+        elapsed = asyncio.get_running_loop().time() - receiver.first_request_at
+        front_cpu = cpu_seconds() - cpu_before
+    finally:
+        await receiver.stop()
+        await router.stop()
+    handled = sum(item["handled"] for item in stats)
+    assert handled == count, f"обработано {handled} из {count}"
+    worker_cpu = sum(item["cpu"] for item in stats)
+    return {"rate": count / elapsed, "shares": [item["received"] for item in stats],
+            "front_us": front_cpu / count * 1e6, "worker_us": worker_cpu / count * 1e6}
+
+
+async def run_all(worker_counts, count, latency):
+    # Процессы-обработчики бенчмарка не пишут состояние и аналитику на диск
+    os.environ.update(STATE_DB_PATH="", ANALYTICS_DIR="")
+    baseline = None
+    for workers in worker_counts:
+        result = await run_scenario(workers, count, latency)
+        rate = result["rate"]
+        baseline = baseline or rate / workers
+        print(f"{workers:2} процесс(ов): {rate:7.0f} апдейтов/с, ускорение {rate / baseline:4.2f}x "
+              f"(эффективность {rate / baseline / workers:4.0%}), апдейтов по процессам {result['shares']}")
+        # Потолок на отдельных ядрах: фронт - одно ядро, обработчики - по ядру на процесс
+        ceiling = min(1e6 / result["front_us"], workers * 1e6 / result["worker_us"])
+        print(f"   CPU на апдейт: фронт {result['front_us']:.0f} мкс, обработчики {result['worker_us']:.0f} мкс; "
+              f"потолок при {workers} ядрах под обработчики ~{ceiling:.0f} апдейтов/с")
+
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == "--worker":
+        asyncio.run(worker(float(sys.argv[2]), int(sys.argv[3]), sys.argv[4]))
+        return 0
+    if len(sys.argv) > 1 and sys.argv[1] == "--client":
+        asyncio.run(client(int(sys.argv[2]), int(sys.argv[3])))
+        return 0
+
+    worker_counts = [int(value) for value in sys.argv[1].split(",")] if len(sys.argv) > 1 else [1, 2, 4]
+    count = int(sys.argv[2]) if len(sys.argv) > 2 else 20000
+    latency = float(sys.argv[3]) if len(sys.argv) > 3 else 0.02
+    logging.disable(logging.WARNING)
+    print(f"🧩 {count} апдейтов, задержка API {latency * 1000:.0f} мс, ядер: {os.cpu_count()}")
+    print("=" * 60)
+    started = time.perf_counter()
+    asyncio.run(run_all(worker_counts, count, latency))
+    print(f"⏱ Всего {time.perf_counter() - started:.1f} с")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
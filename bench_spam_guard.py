@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк антиспама на реплее смешанного трафика группы: обычные сообщения, волны
+рекламы с вариациями текста и флудеры.
+
+Проверка SpamGuard.check на размеченном трафике (точность, полнота, время на
+сообщение, память) и прогон того же трафика через обработчики бота с антиспамом и без.
+
+Запуск: python bench_spam_guard.py [секунд трафика] [сообщений в секунду]
+"""
+
+import asyncio
+import logging
+import sys
+import time
+import tracemalloc
+
+from persistence import StateStore
+from replay import ReplayHarness, build_spam_timeline
+from runtime import BotRuntime
+from spam_guard import SpamGuard
+
+
+def run_detection(timeline):
+    guard = SpamGuard()
+    caught = false_positives = spam_total = 0
+    started = time.perf_counter()
+    for at, data, is_spam in timeline:
+        message = data["message"]
+        verdict = guard.check(message["chat"]["id"], message["from"]["id"], message["text"], now=at)
+        spam_total += is_spam
+        caught += bool(verdict) and is_spam
+        false_positives += bool(verdict) and not is_spam
+    seconds = time.perf_counter() - started
+
+    tracemalloc.start()
+    traced = SpamGuard()
+    for at, data, _ in timeline:
+        message = data["message"]
+        traced.check(message["chat"]["id"], message["from"]["id"], message["text"], now=at)
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return {
+        "us_per_message": seconds / len(timeline) * 1e6,
+        "caught": caught,
+        "spam": spam_total,
+        "false_positives": false_positives,
+        "flagged": caught + false_positives,
+        "memory_kb": memory / 1024,
+    }
+
+
+async def run_replay(timeline, spam):
+    runtime = BotRuntime(store=StateStore(), spam=SpamGuard(actions_per_second=0) if spam else None)
+    corpus = [data for _, data, _ in timeline]
+    async with ReplayHarness(runtime=runtime) as harness:
+        stats = await harness.replay(corpus)
+        if runtime.spam:
+            await runtime.spam.actions.join()
+        stats["deleted"] = harness.api.count("deleteMessage")
+        stats["restricted"] = harness.api.count("restrictChatMember")
+        stats["replies"] = harness.api.count("sendMessage")
+    return stats
+
+
+async def run(seconds, rate):
+    logging.disable(logging.INFO)
+    timeline = build_spam_timeline(seconds=seconds, rate=rate)
+    spam = sum(is_spam for _, _, is_spam in timeline)
+    print(f"📼 {len(timeline)} сообщений группы за {seconds} с, из них спам {spam}")
+    print("=" * 60)
+
+    detection = run_detection(timeline)
+    precision = detection["caught"] / detection["flagged"] if detection["flagged"] else 1.0
+    print(f"🔍 SpamGuard.check: {detection['us_per_message']:.1f} мкс на сообщение, "
+          f"память {detection['memory_kb']:.0f} КБ")
+    print(f"   поймано {detection['caught']}/{detection['spam']} ({detection['caught'] / spam:.0%}), "
+          f"точность {precision:.1%}, ложных срабатываний {detection['false_positives']}")
+
+    for name, enabled in (("без антиспама", False), ("с антиспамом", True)):
+        stats = await run_replay(timeline, enabled)
+        print(f"🤖 {name:14} p50 {stats['p50_ms']:.2f} мс, p99 {stats['p99_ms']:.2f} мс, "
+              f"ответов {stats['replies']}, удалено {stats['deleted']}, ограничено {stats['restricted']}")
+
+
+def main():
+    seconds = int(sys.argv[1]) if len(sys.argv) > 1 else 600
+    rate = float(sys.argv[2]) if len(sys.argv) > 2 else 5.0
+    asyncio.run(run(seconds, rate))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк холодного старта: `python -X importtime` по точкам входа и время подготовки
+матчеров/шаблонов с кэшем и без него.
+
+Запуск: python bench_startup.py
+"""
+
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).parent
+
+# (название, код импорта). "до" - прежний жадный импорт, "после" - текущий путь
+IMPORT_SCENARIOS = [
+    ("bot (точка входа)", "import bot"),
+    ("manage_bot до: с psutil", "import psutil, manage_bot"),
+    ("manage_bot после: ленивый psutil", "import manage_bot"),
+]
+
+
+def importtime(code, repeats=3):
+    """Минимальное суммарное время импорта и топ модулей верхнего уровня, в микросекундах"""
+    best_total, best_top = None, None
+    for _ in range(repeats):
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", code],
+            cwd=ROOT, capture_output=True, text=True,
+        )
+        top = {}
+        for line in result.stderr.splitlines():
+            if not line.startswith("import time:") or "cumulative" in line:
+                continue
+            _, cumulative, name = line[len("import time:"):].split("|")
+            # Модули верхнего уровня записаны без отступа
+            if not name.startswith("  "):
+                top[name.strip()] = int(cumulative)
+        total = sum(top.values())
+        if best_total is None or total < best_total:
+            best_total, best_top = total, top
+    return best_total, best_top
+
+
+def precompute_timings(rounds=200):
+    """Время сборки матчеров и шаблонов: без кэша и из файла кэша"""
+    from matcher import Precomputed, load_precomputed
+
+    started = time.perf_counter()
+    for _ in range(rounds):
+        Precomputed.build()
+    build_ms = (time.perf_counter() - started) / rounds * 1000
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "startup_cache.json")
+        load_precomputed(path)
+        started = time.perf_counter()
+        for _ in range(rounds):
+            load_precomputed(path)
+        cached_ms = (time.perf_counter() - started) / rounds * 1000
+    return build_ms, cached_ms
+
+
+def main():
+    print("🧊 Холодный старт: python -X importtime")
+    print("=" * 60)
+    for name, code in IMPORT_SCENARIOS:
+        total, top = importtime(code)
+        print(f"{name:36} {total / 1000:8.1f} ms")
+        for module, cumulative in sorted(top.items(), key=lambda item: -item[1])[:4]:
+            print(f"   {module:33} {cumulative / 1000:8.1f} ms")
+
+    build_ms, cached_ms = precompute_timings()
+    print("\n🧩 Матчеры и шаблоны")
+    print("=" * 60)
+    print(f"{'сборка с нуля':36} {build_ms:8.3f} ms")
+    print(f"{'загрузка из кэша':36} {cached_ms:8.3f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк колеса таймеров для автоудаления ответов: вставка и истечение N отложенных
+удалений на фальшивых часах в сравнении с кучей (heapq), а также планирование через
+ReplyJanitor с записью в StateStore.
+
+Запуск: python bench_timer_wheel.py [число таймеров] [TTL, сек]
+"""
+
+import asyncio
+import heapq
+import logging
+import random
+import sys
+import time
+import tracemalloc
+
+from autodelete import ReplyJanitor
+from persistence import StateStore
+from timer_wheel import TimerWheel
+
+START = 1_700_000_000.0
+
+
+class HeapTimers:
+    """Базовая реализация: куча (срок, порядковый номер, элемент)"""
+
+    def __init__(self):
+        self._heap = []
+        self._seq = 0
+
+    def insert(self, deadline, item):
+        self._seq += 1
+        heapq.heappush(self._heap, (deadline, self._seq, item))
+
+    def advance(self, now):
+        expired = []
+        while self._heap and self._heap[0][0] <= now:
+            expired.append(heapq.heappop(self._heap)[2])
+        return expired
+
+
+def run_timers(timers, deadlines, step=1.0):
+    started = time.perf_counter()
+    for i, deadline in enumerate(deadlines):
+        timers.insert(deadline, i)
+    insert_seconds = time.perf_counter() - started
+
+    horizon = max(deadlines) + step
+    now = START
+    expired = 0
+    started = time.perf_counter()
+    while now < horizon:
+        now += step
+        expired += len(timers.advance(now))
+    expire_seconds = time.perf_counter() - started
+    assert expired == len(deadlines)
+    return insert_seconds, expire_seconds
+
+
+def measure_memory(factory, deadlines):
+    tracemalloc.start()
+    timers = factory()
+    for i, deadline in enumerate(deadlines):
+        timers.insert(deadline, i)
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return memory
+
+
+async def run_janitor(count, ttl):
+    clock = [START]
+    store = StateStore()
+    janitor = ReplyJanitor(ttl, store=store, clock=lambda: clock[0])
+    started = time.perf_counter()
+    for i in range(count):
+        clock[0] = START + i * 0.01
+        janitor.schedule(-1000 - i % 50, i)
+    schedule_seconds = time.perf_counter() - started
+    started = time.perf_counter()
+    batches = janitor.expire(START + count * 0.01 + ttl)
+    expire_seconds = time.perf_counter() - started
+    return schedule_seconds, expire_seconds, sum(len(ids) for ids in batches.values())
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 300000
+    ttl = float(sys.argv[2]) if len(sys.argv) > 2 else 3600
+    logging.disable(logging.INFO)
+
+    rng = random.Random(8)
+    # Ответы приходят в течение часа, TTL с разбросом +-10%
+    deadlines = [START + rng.uniform(0, 3600) + ttl * rng.uniform(0.9, 1.1) for _ in range(count)]
+    print(f"⏲ {count} отложенных удалений, TTL {ttl:.0f} с, тик 1 с")
+    print("=" * 60)
+
+    for name, factory in (("колесо", lambda: TimerWheel(now=START)), ("heapq", HeapTimers)):
+        insert_seconds, expire_seconds = run_timers(factory(), deadlines)
+        memory = measure_memory(factory, deadlines)
+        print(f"{name:7} вставка {insert_seconds / count * 1e9:6.0f} нс ({count / insert_seconds / 1e6:.2f} млн/с), "
+              f"истечение {count / expire_seconds / 1e6:.2f} млн/с, память {memory / 1024 / 1024:.1f} МБ")
+
+    schedule_seconds, expire_seconds, expired = asyncio.run(run_janitor(count, ttl))
+    print(f"🗑 ReplyJanitor: schedule {count / schedule_seconds / 1000:.0f} тыс/с (с записью в StateStore), "
+          f"expire {expired / expire_seconds / 1000:.0f} тыс/с")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
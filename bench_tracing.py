@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк накладных расходов трассировки.
+
+1. Спан без трассы (выборка выключена) против пустого контекст-менеджера.
+2. CPU на апдейт через update_queue и LoadShedder: без трассировщика, с выборкой 0,
+   1% и 100%. FakeTelegramAPI отвечает без задержки, чтобы разница была видна в CPU.
+
+Запуск: python bench_tracing.py [апдейтов] [повторов]
+"""
+
+import asyncio
+import contextlib
+import logging
+import os
+import sys
+import tempfile
+import time
+import timeit
+
+from fake_api import FakeTelegramAPI
+from persistence import StateStore
+from replay import ReplayHarness, UpdateFactory, build_corpus
+from runtime import BotRuntime
+from tracing import Tracer, span
+
+SAMPLE_RATES = (None, 0.0, 0.01, 1.0)
+
+
+def bench_span(number=1000000):
+    """Наносекунды на спан без трассы и на пустой контекст-менеджер"""
+    null = contextlib.nullcontext()
+
+    def bare():
+        with null:
+            pass
+
+    def traced():
+        with span("match"):
+            pass
+
+    bare_ns = min(timeit.repeat(bare, number=number, repeat=3)) / number * 1e9
+    span_ns = min(timeit.repeat(traced, number=number, repeat=3)) / number * 1e9
+    return bare_ns, span_ns
+
+
+async def run_scenario(corpus, sample_rate, directory):
+    tracer = None
+    if sample_rate is not None:
+        tracer = Tracer(sample_rate=sample_rate, path=os.path.join(directory, f"trace-{sample_rate}.json"))
+    runtime = BotRuntime(store=StateStore(), tracer=tracer)
+    async with ReplayHarness(api=FakeTelegramAPI(), runtime=runtime) as harness:
+        timeline = [(0.0, data) for data in corpus]
+        started = time.process_time()
+        await harness.feed(timeline, queued=True)
+        cpu = time.process_time() - started
+    spans = tracer.stats["spans"] if tracer else 0
+    return cpu / len(corpus) * 1e6, spans
+
+
+async def run(count, repeats):
+    with tempfile.TemporaryDirectory() as directory:
+        # Прогрев: первый прогон заметно медленнее остальных (импорты, кэши PTB)
+        await run_scenario(build_corpus(count, factory=UpdateFactory()), None, directory)
+        results = {}
+        for _ in range(repeats):
+            for sample_rate in SAMPLE_RATES:
+                corpus = build_corpus(count, factory=UpdateFactory())
+                cpu_us, spans = await run_scenario(corpus, sample_rate, directory)
+                best = results.get(sample_rate)
+                if best is None or cpu_us < best[0]:
+                    results[sample_rate] = (cpu_us, spans)
+    baseline = results[None][0]
+    for sample_rate in SAMPLE_RATES:
+        cpu_us, spans = results[sample_rate]
+        name = "без трассировщика" if sample_rate is None else f"выборка {sample_rate:.0%}"
+        print(f"{name:20} {cpu_us:7.1f} мкс CPU на апдейт ({cpu_us / baseline - 1:+6.1%}), спанов {spans}")
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+    logging.disable(logging.WARNING)
+
+    bare_ns, span_ns = bench_span()
+    print(f"🔎 Спан без трассы: {span_ns:.0f} нс (пустой with: {bare_ns:.0f} нс)")
+    print("=" * 60)
+    print(f"📨 {count} апдейтов через update_queue, лучший из {repeats} прогонов")
+    asyncio.run(run(count, repeats))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк allowed_updates: сколько трафика getUpdates и CPU на разбор экономит
+минимальный набор типов апдейтов.
+
+Смешанный корпус: обычный трафик бота (build_corpus) плюс правки сообщений, посты
+каналов и смены статуса бота в чатах, которые Telegram присылает без allowed_updates.
+Для всех типов и для allowed_updates(application) бота считаются:
+
+1. Байты ответов getUpdates (пачки по 100, как у PTB).
+2. CPU на разбор ответа: json.loads и Update.de_json каждого апдейта.
+3. CPU на разбор и обработку в Application (process_update) на FakeTelegramAPI.
+
+Запуск: python bench_updates.py [апдейтов] [повторов]
+"""
+
+import asyncio
+import json
+import logging
+import random
+import sys
+import time
+
+from telegram import Update
+
+from fake_api import DEFAULT_ALLOWED_UPDATES, FakeTelegramAPI
+from persistence import StateStore
+from replay import ReplayHarness, UpdateFactory, build_corpus
+from runtime import BotRuntime
+from update_types import allowed_updates
+
+BATCH = 100
+
+# Доля лишних для бота типов в общем потоке
+EXTRA_MIX = {"edit": 0.12, "channel_post": 0.08, "my_chat_member": 0.01}
+
+
+def build_mixed_corpus(count, seed=11):
+    """build_corpus с правками сообщений, постами каналов и my_chat_member"""
+    rng = random.Random(seed)
+    factory = UpdateFactory()
+    base = build_corpus(count, factory=factory)
+    messages = [data for data in base if "message" in data and "text" in data["message"]]
+    corpus = []
+    for data in base:
+        corpus.append(data)
+        roll = rng.random()
+        if roll < EXTRA_MIX["edit"] and messages:
+            original = rng.choice(messages)
+            corpus.append(factory.edited_message(original, original["message"]["text"] + " (ред.)"))
+        elif roll < EXTRA_MIX["edit"] + EXTRA_MIX["channel_post"]:
+            corpus.append(factory.channel_post("Новый урок: промпты для видео " * rng.randint(1, 8)))
+        elif roll < sum(EXTRA_MIX.values()):
+            corpus.append(factory.my_chat_member(rng.choice(["member", "left"])))
+    return corpus[:count]
+
+
+def responses(corpus, allowed):
+    """Тела ответов getUpdates для апдейтов нужных типов"""
+    updates = [data for data in corpus if allowed.intersection(data)]
+    bodies = [json.dumps({"ok": True, "result": updates[i:i + BATCH]}, ensure_ascii=False).encode()
+              for i in range(0, len(updates), BATCH)]
+    return bodies, len(updates)
+
+
+def decode(bodies, bot):
+    """CPU на json.loads и Update.de_json всех ответов"""
+    started = time.process_time()
+    for body in bodies:
+        for data in json.loads(body)["result"]:
+            Update.de_json(data, bot)
+    return time.process_time() - started
+
+
+async def dispatch(corpus, allowed):
+    """CPU на разбор и обработку апдейтов нужных типов в Application"""
+    updates = [data for data in corpus if allowed.intersection(data)]
+    runtime = BotRuntime(store=StateStore())
+    async with ReplayHarness(api=FakeTelegramAPI(), runtime=runtime) as harness:
+        started = time.process_time()
+        await harness.feed([(0.0, data) for data in updates], queued=True)
+        return time.process_time() - started
+
+
+async def run(count, repeats):
+    corpus = build_mixed_corpus(count)
+    async with ReplayHarness(api=FakeTelegramAPI()) as harness:
+        bot = harness.application.bot
+        minimal = set(allowed_updates(harness.application))
+    scenarios = (("все типы", set(DEFAULT_ALLOWED_UPDATES)), ("allowed_updates", minimal))
+    print(f"allowed_updates: {sorted(minimal)}")
+    print(f"корпус: {len(corpus)} апдейтов\n")
+
+    results = {}
+    # Прогрев: первый прогон заметно медленнее остальных (импорты, кэши PTB)
+    await dispatch(corpus[:500], minimal)
+    for name, allowed in scenarios:
+        bodies, delivered = responses(corpus, allowed)
+        decode_cpu = min(decode(bodies, bot) for _ in range(repeats))
+        dispatch_cpu = min([await dispatch(corpus, allowed) for _ in range(repeats)])
+        results[name] = (sum(map(len, bodies)), delivered, decode_cpu, dispatch_cpu)
+
+    baseline = results["все типы"]
+    for name, (size, delivered, decode_cpu, dispatch_cpu) in results.items():
+        print(f"{name:16} апдейтов {delivered:6}, getUpdates {size / 1024:8.0f} КБ ({size / baseline[0] - 1:+6.1%}), "
+              f"разбор {decode_cpu * 1000:6.0f} мс ({decode_cpu / baseline[2] - 1:+6.1%}), "
+              f"обработка {dispatch_cpu * 1000:6.0f} мс ({dispatch_cpu / baseline[3] - 1:+6.1%})")
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+    logging.disable(logging.WARNING)
+    asyncio.run(run(count, repeats))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
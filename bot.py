@@ -6,18 +6,39 @@ Telegram бот для группы Buddah Base
 
 import logging
 import asyncio
+
+from startup import StartupProfiler, install_event_loop_policy
+
+# Замер времени импортов для отчета о холодном старте
+startup_profiler = StartupProfiler()
+for _module in ("telegram", "telegram.ext", "config", "handlers"):
+    startup_profiler.import_module(_module)
+
 from telegram import Update
+from telegram.request import HTTPXRequest
 from telegram.ext import (
     Application, 
+    CallbackQueryHandler,
     CommandHandler, 
     MessageHandler, 
     InlineQueryHandler,
+    TypeHandler,
     filters,
     ContextTypes
 )
 
+from backpressure import LoadShedder
 from config import Config
-from handlers import BotHandlers
+from handlers import COMMANDS, BotHandlers
+from health import HealthCheck, PollingTracker, start_health_server
+from matcher import load_precomputed, set_precomputed
+from metrics import OutboundTracker
+from runtime import BotRuntime, timed
+from update_types import allowed_updates, declare_message_types
+from verification import VERIFY_CALLBACK
+
+# Модули необязательных функций (предохранитель, трассировка, профилировщик,
+# каталог, догоняние) импортируются там, где функция включена
 
 # Настройка логирования
 logging.basicConfig(
@@ -31,42 +52,150 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 class BuddahBaseBot:
-    def __init__(self):
+    def __init__(self, token=None, request=None, runtime=None, get_updates_request=None, ordered=False):
+        self.token = token or Config.TELEGRAM_BOT_TOKEN
+        # Подменяемый транспорт Bot API (например, FakeTelegramAPI в тестах или общий
+        # пул соединений ботов multibot.py); getUpdates - через тот же, если не задан свой
+        self.request = request
+        self.get_updates_request = get_updates_request or request
+        self.runtime = runtime
+        # Апдейты одного чата - по одному в порядке приема (процессы sharding.py)
+        self.ordered = ordered
         self.application = None
+        # Исход каждого getUpdates для /readyz и сервер проверок здоровья
+        self.polling = None
+        self.health = None
         
     async def initialize(self):
         """Инициализация бота"""
-        if not Config.TELEGRAM_BOT_TOKEN:
+        if not self.token:
             raise ValueError("TELEGRAM_BOT_TOKEN не найден в переменных окружения")
         
+        self.runtime = self.runtime or BotRuntime.from_config()
+        
         # Создаем приложение
-        self.application = Application.builder().token(Config.TELEGRAM_BOT_TOKEN).build()
+        with startup_profiler.phase("сборка Application"):
+            builder = Application.builder().token(self.token)
+            request = self.request
+            if self.runtime.breakers:
+                from breaker import BreakerRequest
+                # Предохранитель: размыкание цепи, адаптивный таймаут и повторы; пул по умолчанию как в PTB
+                request = BreakerRequest(request or HTTPXRequest(connection_pool_size=256), self.runtime.breakers)
+            if request:
+                builder = builder.request(request)
+            # Long polling на одном соединении, как по умолчанию в PTB, но с учетом исхода
+            self.polling = PollingTracker(self.get_updates_request or HTTPXRequest(connection_pool_size=1))
+            builder = builder.get_updates_request(self.polling)
+            # Учет исходящих запросов к Bot API для /stats
+            builder = builder.rate_limiter(OutboundTracker(self.runtime.metrics))
+            # Ограничение нагрузки: PTB забирает апдейты из update_queue сразу (по задаче на
+            # апдейт), поэтому очередь не заполняется и getUpdates не ждет - работу
+            # ограничивает LoadShedder, отбрасывая малоценное при росте backlog
+            shedder = LoadShedder(self.runtime,
+                                  max_concurrent_updates=Config.UPDATE_CONCURRENCY,
+                                  critical_concurrency=Config.CRITICAL_CONCURRENCY,
+                                  max_critical_backlog=Config.MAX_CRITICAL_BACKLOG,
+                                  max_backlog=Config.MAX_BACKLOG,
+                                  shed_engagement_at=Config.SHED_ENGAGEMENT_AT,
+                                  shed_repeat_join_at=Config.SHED_REPEAT_JOIN_AT,
+                                  serialize_chats=self.ordered)
+            builder = builder.concurrent_updates(shedder)
+            # С трассировкой очередь запоминает время постановки апдейта (спан enqueue)
+            queue_class = asyncio.Queue
+            if self.runtime.tracer:
+                from tracing import ArrivalQueue
+                queue_class = ArrivalQueue
+            builder = builder.update_queue(queue_class(maxsize=Config.UPDATE_QUEUE_SIZE))
+            self.application = builder.build()
+            shedder.update_queue = self.application.update_queue
+        
+        # Состояние бота доступно обработчикам через context.bot_data
+        self.application.bot_data["runtime"] = self.runtime
+        if self.runtime.janitor:
+            # Удаления, восстановленные после перезапуска, выполняются ботом приложения
+            self.runtime.janitor.bot = self.application.bot
+        if self.runtime.verifier:
+            # Истекшие за время простоя проверки исключаются ботом приложения
+            self.runtime.verifier.bot = self.application.bot
+        if self.runtime.broadcaster:
+            # Прерванные остановкой рассылки продолжаются при запуске
+            self.runtime.broadcaster.bot = self.application.bot
+        
+        if not self.runtime.has_own_precomputed:
+            with startup_profiler.phase("кэш матчеров и шаблонов"):
+                set_precomputed(load_precomputed(Config.STARTUP_CACHE_PATH))
+        
+        if self.runtime.catalog is None:
+            with startup_profiler.phase("индекс каталога"):
+                from catalog import load_catalog
+                self.runtime.catalog = load_catalog(Config.CATALOG_PATH, Config.CATALOG_STORE_PATH or None)
+        
+        with startup_profiler.phase("регистрация обработчиков"):
+            self.register_handlers(self.application)
+        
+        logger.info("Бот инициализирован успешно")
+
+    @staticmethod
+    def register_handlers(application):
+        """Регистрирует все обработчики бота в приложении"""
+        # Обработчики оборачиваются в timed: задержки попадают в метрики /stats
+        runtime = application.bot_data.get("runtime")
+        handle_edits = bool(runtime and runtime.handle_edits)
+        # Команды и сообщения - только новые: правки и посты каналов не запрашиваются
+        # у Telegram. Типы сообщений составных фильтров ниже объявляются явно - по ним
+        # считается allowed_updates
+        new_messages = filters.UpdateType.MESSAGE
+        edited_messages = filters.UpdateType.EDITED_MESSAGE
+        declare_message_types(application, new_messages, *([edited_messages] if handle_edits else []))
         
         # Добавляем обработчики команд
-        self.application.add_handler(CommandHandler("start", BotHandlers.start_command))
-        self.application.add_handler(CommandHandler("help", BotHandlers.help_command))
-        self.application.add_handler(CommandHandler("info", BotHandlers.info_command))
+        for command, callback in COMMANDS.items():
+            application.add_handler(CommandHandler(command, timed(callback), filters=new_messages))
+        
+        # Модерация (темы форума, антиспам) проверяет каждое сообщение группы раньше
+        # остальных обработчиков; с обработкой правок - и исправленные сообщения
+        moderated = filters.UpdateType.MESSAGES if handle_edits else new_messages
+        application.add_handler(
+            MessageHandler(moderated & filters.ChatType.GROUPS & ~filters.StatusUpdate.ALL,
+                           timed(BotHandlers.guard_group_message)),
+            group=-1
+        )
         
         # Обработчик новых участников
-        self.application.add_handler(
-            MessageHandler(filters.StatusUpdate.NEW_CHAT_MEMBERS, BotHandlers.handle_new_member)
+        application.add_handler(
+            MessageHandler(new_messages & filters.StatusUpdate.NEW_CHAT_MEMBERS,
+                           timed(BotHandlers.handle_new_member))
+        )
+        
+        # Кнопка "Я не бот" под сообщением проверки новых участников
+        application.add_handler(
+            CallbackQueryHandler(timed(BotHandlers.verify_callback), pattern=f"^{VERIFY_CALLBACK}$")
         )
         
-        # Обработчик inline-запросов (для вызова бота в группах)
-        self.application.add_handler(InlineQueryHandler(BotHandlers.handle_inline_query))
+        # Обработчик inline-запросов (для вызова бота в группах); выполняется без блокировки,
+        # чтобы свежее нажатие клавиши могло вытеснить еще не отвеченный запрос
+        application.add_handler(InlineQueryHandler(timed(BotHandlers.handle_inline_query), block=False))
         
         # Обработчик обычных сообщений (группы и приватные чаты)
-        self.application.add_handler(
+        application.add_handler(
             MessageHandler(
-                filters.TEXT & ~filters.COMMAND, 
-                BotHandlers.handle_message
+                new_messages & filters.TEXT & ~filters.COMMAND, 
+                timed(BotHandlers.handle_message)
             )
         )
         
-        # Обработчик ошибок
-        self.application.add_error_handler(BotHandlers.error_handler)
+        # Исправленные сообщения: тот же матчер, без повтора ответа на исходное
+        if handle_edits:
+            application.add_handler(
+                MessageHandler(edited_messages & filters.TEXT & ~filters.COMMAND,
+                               timed(BotHandlers.handle_edited_message))
+            )
         
-        logger.info("Бот инициализирован успешно")
+        # Учет последнего обработанного update_id (после всех остальных групп)
+        application.add_handler(TypeHandler(Update, BotHandlers.track_update), group=100)
+        
+        # Обработчик ошибок
+        application.add_error_handler(BotHandlers.error_handler)
     
     async def start(self):
         """Запуск бота"""
@@ -75,22 +204,57 @@ class BuddahBaseBot:
         logger.info("🚀 Запускаем Buddah Base бота...")
         logger.info(f"📱 Admin contact: @{Config.ADMIN_CONTACT}")
         
+        # Теплый старт: загружаем сохраненное состояние до начала приема апдейтов
+        with startup_profiler.phase("загрузка состояния"):
+            await self.runtime.start()
+        
         # Запускаем бота
-        await self.application.initialize()
+        with startup_profiler.phase("первый getMe (application.initialize)"):
+            await self.application.initialize()
         await self.application.start()
-        await self.application.updater.start_polling(drop_pending_updates=True)
+        await self.start_polling()
+        if self.runtime.profiler:
+            from profiling import install_signal_handler
+            install_signal_handler(self.runtime.profiler)
+        self.health = await start_health_server({"bot": self.health_check()})
         
         logger.info("✅ Бот успешно запущен и готов к работе!")
+        logger.info(startup_profiler.report())
         
         # Ожидание завершения
         await asyncio.Event().wait()
     
+    async def start_polling(self):
+        """Запускает polling только нужных типов апдейтов.
+
+        С RESUME_UPDATES (runtime.catchup) продолжает с сохраненного update_id: апдейты,
+        пришедшие за время простоя, разбираются в режиме догоняния; без него накопленное
+        отбрасывается.
+        """
+        allowed = allowed_updates(self.application)
+        resume = self.runtime.catchup is not None
+        if resume:
+            from catchup import confirm_offset
+            saved = self.runtime.last_update_id
+            offset = await confirm_offset(self.application.bot, saved, allowed)
+            if offset != saved:
+                self.runtime.reset_offset(offset)
+        await self.application.updater.start_polling(allowed_updates=allowed, drop_pending_updates=not resume)
+
+    def health_check(self):
+        """Проверки живости и готовности бота для /healthz и /readyz"""
+        return HealthCheck.from_config(self.runtime, self.polling)
+
     async def stop(self):
         """Остановка бота"""
+        if self.health:
+            await self.health.stop()
         if self.application:
             await self.application.updater.stop()
             await self.application.stop()
             await self.application.shutdown()
+        if self.runtime:
+            await self.runtime.stop()
         logger.info("🛑 Бот остановлен")
 
 async def main():
@@ -107,6 +271,8 @@ async def main():
         await bot.stop()
 
 if __name__ == "__main__":
+    loop_name = install_event_loop_policy(Config.USE_UVLOOP)
+    logger.info(f"🔁 Event loop: {loop_name}")
     try:
         asyncio.run(main())
     except KeyboardInterrupt:
@@ -0,0 +1,242 @@
+"""
+Предохранитель исходящих вызовов Bot API: размыкание цепи, адаптивные таймауты и
+повторы с джиттером.
+
+Когда Telegram тормозит или отвечает 5xx, каждый reply_text без предохранителя ждет
+полный таймаут, а обработчики и их корутины копятся. BreakerRequest - прослойка
+транспорта Bot API (как SharedRequest в multibot.py), состояние которой хранит
+CircuitBreakers в runtime. Для каждого метода Bot API отдельно:
+
+- цепь размыкается после failures ошибок подряд (5xx, таймаут, обрыв соединения) и
+  reset_timeout секунд отвечает сразу CircuitOpen, не обращаясь к API. Затем один
+  пробный вызов: успех замыкает цепь, ошибка снова размыкает. 4xx и 429 - ответы
+  работающего API, они цепь не размыкают;
+- таймаут чтения выводится из наблюдаемой задержки (сглаженное среднее плюс четыре
+  отклонения, как RTO в TCP) в пределах [min_timeout, max_timeout] и удваивается после
+  каждого таймаута. Явно заданный вызывающим таймаут и загрузки файлов не трогаются;
+- идемпотентные методы (get*, удаления, ограничения участников) повторяются до retries
+  раз с экспоненциальной паузой и полным джиттером. Отправки не повторяются: повтор
+  после таймаута может продублировать сообщение.
+
+Таймаут ожидания свободного соединения в пуле PTB (Pool timeout) - местная перегрузка:
+запрос не ушел в Telegram, поэтому он не считается ошибкой метода и цепь не размыкает.
+
+getUpdates идет через свой транспорт (health.PollingTracker) и у Updater свои повторы.
+"""
+
+import asyncio
+import logging
+import random
+import time
+
+import httpx
+from telegram.error import NetworkError, TimedOut
+from telegram.request import BaseRequest
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# Повтор этих методов не меняет результат
+IDEMPOTENT_METHODS = frozenset({
+    "getMe", "getChat", "getChatMember", "getChatAdministrators", "getChatMemberCount", "getFile",
+    "getMyCommands", "getWebhookInfo", "setMyCommands", "deleteWebhook", "deleteMessage",
+    "deleteMessages", "restrictChatMember", "banChatMember", "unbanChatMember",
+})
+
+
+def is_pool_timeout(error):
+    """TimedOut из-за занятого пула соединений HTTPXRequest: запрос не отправлялся"""
+    return isinstance(error, TimedOut) and isinstance(error.__cause__, httpx.PoolTimeout)
+
+
+class CircuitOpen(NetworkError):
+    """Цепь метода разомкнута: вызов отклонен без обращения к Bot API"""
+
+    def __init__(self, method, retry_in):
+        super().__init__(f"Circuit open for {method}, retry in {retry_in:.1f}s")
+        self.method = method
+        self.retry_in = retry_in
+
+
+class MethodCircuit:
+    """Состояние цепи и оценка задержки одного метода Bot API"""
+
+    def __init__(self, method, failures, reset_timeout, min_timeout, max_timeout):
+        self.method = method
+        self.threshold = failures
+        self.reset_timeout = reset_timeout
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probing = False
+        # Сглаженная задержка и ее отклонение, сек; None - замеров еще не было
+        self.srtt = None
+        self.rttvar = 0.0
+        self.backoff = 1
+        self.trips = 0
+        self.rejected = 0
+
+    def timeout(self):
+        """Таймаут чтения для следующего вызова"""
+        if self.srtt is None:
+            return self.max_timeout
+        base = max(self.min_timeout, self.srtt + 4 * self.rttvar)
+        return min(self.max_timeout, base * self.backoff)
+
+    def retry_in(self, now=None):
+        return max(0.0, self.opened_at + self.reset_timeout - (now or time.monotonic()))
+
+    def acquire(self):
+        """Пропускает вызов или бросает CircuitOpen; в полуоткрытой цепи - один пробный"""
+        if self.state == CLOSED:
+            return
+        now = time.monotonic()
+        if self.state == OPEN and self.retry_in(now) == 0:
+            self.state = HALF_OPEN
+        if self.state == HALF_OPEN and not self.probing:
+            self.probing = True
+            return
+        self.rejected += 1
+        raise CircuitOpen(self.method, self.retry_in(now))
+
+    def success(self, seconds):
+        if self.srtt is None:
+            self.srtt, self.rttvar = seconds, seconds / 2
+        else:
+            self.rttvar = 0.75 * self.rttvar + 0.25 * abs(self.srtt - seconds)
+            self.srtt = 0.875 * self.srtt + 0.125 * seconds
+        self.backoff = 1
+        self.failures = 0
+        self.probing = False
+        if self.state != CLOSED:
+            logger.info(f"🔌 Цепь {self.method} снова замкнута")
+        self.state = CLOSED
+
+    def failure(self, timed_out=False):
+        if timed_out:
+            self.backoff = min(self.backoff * 2, 64)
+        self.failures += 1
+        self.probing = False
+        if self.state == HALF_OPEN or self.failures >= self.threshold:
+            if self.state != OPEN:
+                self.trips += 1
+                logger.warning(f"🔌 Цепь {self.method} разомкнута на {self.reset_timeout:.0f} с "
+                               f"после {self.failures} ошибок подряд")
+            self.state = OPEN
+            self.opened_at = time.monotonic()
+
+    def abandon(self):
+        """Пробный вызов отменен вызывающим: следующий вызов станет пробным"""
+        self.probing = False
+
+
+class CircuitBreakers:
+    """Цепи методов Bot API одного бота и счетчики для /stats и /readyz"""
+
+    def __init__(self, failures=5, reset_timeout=10.0, retries=2, min_timeout=1.0, max_timeout=5.0,
+                 retry_base=0.2, retry_cap=2.0):
+        self.failures = failures
+        self.reset_timeout = reset_timeout
+        self.retries = retries
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self.retry_base = retry_base
+        self.retry_cap = retry_cap
+        self.circuits = {}
+        self.retried = 0
+
+    @classmethod
+    def from_config(cls):
+        return cls(failures=Config.API_BREAKER_FAILURES, reset_timeout=Config.API_BREAKER_RESET_SECONDS,
+                   retries=Config.API_RETRIES, min_timeout=Config.API_MIN_TIMEOUT,
+                   max_timeout=Config.API_MAX_TIMEOUT)
+
+    def circuit(self, method):
+        circuit = self.circuits.get(method)
+        if circuit is None:
+            circuit = self.circuits[method] = MethodCircuit(
+                method, self.failures, self.reset_timeout, self.min_timeout, self.max_timeout)
+        return circuit
+
+    def retry_delay(self, attempt):
+        """Пауза перед повтором: экспонента с полным джиттером"""
+        return random.uniform(0, min(self.retry_cap, self.retry_base * 2 ** attempt))
+
+    def open_methods(self):
+        return sorted(method for method, circuit in self.circuits.items() if circuit.state != CLOSED)
+
+    @property
+    def rejected(self):
+        return sum(circuit.rejected for circuit in self.circuits.values())
+
+    @property
+    def trips(self):
+        return sum(circuit.trips for circuit in self.circuits.values())
+
+    def format(self):
+        opened = self.open_methods()
+        state = ", ".join(f"{method} (еще {self.circuits[method].retry_in():.0f} с)" for method in opened)
+        return (f"🔌 Предохранитель Bot API: разомкнуто {len(opened)}{': ' + state if state else ''}, "
+                f"срабатываний {self.trips}, быстрых отказов {self.rejected}, повторов {self.retried}")
+
+
+class BreakerRequest(BaseRequest):
+    """Транспорт Bot API с предохранителем, адаптивным таймаутом и повторами"""
+
+    def __init__(self, request, breakers):
+        self._request = request
+        self.breakers = breakers
+
+    @property
+    def read_timeout(self):
+        return self._request.read_timeout
+
+    async def initialize(self):
+        await self._request.initialize()
+
+    async def shutdown(self):
+        await self._request.shutdown()
+
+    async def do_request(self, url, method, request_data=None, read_timeout=BaseRequest.DEFAULT_NONE,
+                         **kwargs):
+        endpoint = url.rsplit("/", 1)[-1]
+        circuit = self.breakers.circuit(endpoint)
+        adaptive = read_timeout is BaseRequest.DEFAULT_NONE and not (request_data and request_data.contains_files)
+        attempts = 1 + (self.breakers.retries if endpoint in IDEMPOTENT_METHODS else 0)
+        for attempt in range(attempts):
+            last = attempt == attempts - 1
+            circuit.acquire()
+            started = time.monotonic()
+            try:
+                code, payload = await self._request.do_request(
+                    url, method, request_data, read_timeout=circuit.timeout() if adaptive else read_timeout,
+                    **kwargs)
+            except asyncio.CancelledError:
+                circuit.abandon()
+                raise
+            except Exception as e:
+                if is_pool_timeout(e):
+                    # Пул занят нашими же запросами - API здесь ни при чем; пробный
+                    # вызов не состоялся, следующий станет пробным
+                    circuit.abandon()
+                    raise
+                # Любое исключение транспорта PTB превратит в NetworkError
+                circuit.failure(timed_out=isinstance(e, TimedOut))
+                if last or circuit.state == OPEN:
+                    raise
+            else:
+                if code < 500:
+                    circuit.success(time.monotonic() - started)
+                    return code, payload
+                circuit.failure()
+                if last or circuit.state == OPEN:
+                    return code, payload
+            self.breakers.retried += 1
+            await asyncio.sleep(self.breakers.retry_delay(attempt))
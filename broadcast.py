@@ -0,0 +1,244 @@
+"""
+Рассылка объявлений всем, кто писал боту в личку.
+
+Подписчики - пользователи личных чатов (пространство имен subscriber в StateStore).
+Рассылка - задание в пространстве имен broadcast: текст, курсор (последний chat_id, до
+которого все обработано) и счетчики. Получатели обходятся по возрастанию chat_id,
+поэтому после перезапуска задание продолжается с курсора: повторно могут уйти не
+больше checkpoint_every сообщений последней незаписанной пачки.
+
+Скорость ограничена глобально (rate сообщений в секунду, ниже лимита Telegram ~30/с):
+график отправок общий для всех заданий, второе задание делит скорость с первым и
+ждет его паузы. Отправки в пределах пачки идут параллельно (до concurrency запросов
+в полете). 429 (RetryAfter) приостанавливает все рассылки на retry_after секунд, 403 (бот
+заблокирован, аккаунт удален) убирает пользователя из подписчиков.
+
+Повторно отправляется только то, что точно не дошло: после 429, разомкнутой цепи
+(CircuitOpen) и сетевой ошибки рассылка встает на паузу (retry_after, время до
+пробного вызова цепи или outage_pause), а получатель возвращается в пачку - курсор
+не сдвигается, пока пачка не отправлена. Таймаут (TimedOut) не повторяется:
+сообщение могло дойти, и повтор дал бы дубль; такой получатель считается ошибкой.
+"""
+
+import asyncio
+import bisect
+import logging
+import time
+
+from telegram.error import BadRequest, Forbidden, NetworkError, RetryAfter, TelegramError, TimedOut
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+NS_SUBSCRIBER = "subscriber"
+NS_BROADCAST = "broadcast"
+
+STATUS_RUNNING = "running"
+STATUS_DONE = "done"
+
+
+class Broadcaster:
+    """Подписчики и возобновляемые рассылки с ограничением скорости"""
+
+    def __init__(self, store, rate=25.0, concurrency=8, checkpoint_every=500, outage_pause=5.0,
+                 clock=time.time):
+        self.store = store
+        self.rate = rate
+        self.concurrency = concurrency
+        self.checkpoint_every = checkpoint_every
+        self.outage_pause = outage_pause
+        self.clock = clock
+        # Bot приложения; BuddahBaseBot задает его при сборке Application
+        self.bot = None
+        self._tasks = {}
+        self._next_send = 0.0
+
+    @classmethod
+    def from_config(cls, store):
+        return cls(store, rate=Config.BROADCAST_RATE, concurrency=Config.BROADCAST_CONCURRENCY)
+
+    # --- жизненный цикл -------------------------------------------------------------
+
+    async def start(self):
+        """Продолжает рассылки, прерванные остановкой бота"""
+        if self.bot is None:
+            return
+        for job in self.jobs():
+            if job["status"] == STATUS_RUNNING:
+                logger.info(f"📣 Продолжаем рассылку {job['id']}: {job['done']}/{job['total']}")
+                self.launch(job)
+
+    async def stop(self):
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._tasks.clear()
+
+    # --- подписчики -----------------------------------------------------------------
+
+    @property
+    def subscribers(self):
+        return self.store.count(NS_SUBSCRIBER)
+
+    def subscribe(self, chat_id):
+        if self.store.get(NS_SUBSCRIBER, str(chat_id)) is None:
+            self.store.set(NS_SUBSCRIBER, chat_id, self.clock())
+
+    def unsubscribe(self, chat_id):
+        self.store.delete(NS_SUBSCRIBER, chat_id)
+
+    # --- задания --------------------------------------------------------------------
+
+    def jobs(self):
+        return sorted((job for _, job in self.store.items(NS_BROADCAST)), key=lambda job: job["created_at"])
+
+    def latest(self):
+        jobs = self.jobs()
+        return jobs[-1] if jobs else None
+
+    @property
+    def active(self):
+        return [job_id for job_id, task in self._tasks.items() if not task.done()]
+
+    def create(self, text):
+        """Новое задание на рассылку текста всем текущим подписчикам"""
+        now = self.clock()
+        job = {
+            "id": f"{int(now * 1000)}",
+            "text": text,
+            "status": STATUS_RUNNING,
+            "cursor": None,
+            "total": self.subscribers,
+            "done": 0,
+            "sent": 0,
+            "blocked": 0,
+            "failed": 0,
+            "retries": 0,
+            "requeued": 0,
+            "created_at": now,
+            "elapsed": 0.0,
+        }
+        self._checkpoint(job)
+        return job
+
+    def launch(self, job):
+        """Запускает задание в фоне; возвращает задачу asyncio"""
+        task = asyncio.get_running_loop().create_task(self.run(job))
+        self._tasks[job["id"]] = task
+        return task
+
+    def _checkpoint(self, job):
+        self.store.set(NS_BROADCAST, job["id"], dict(job))
+
+    def _recipients(self, cursor):
+        chat_ids = sorted(int(chat_id) for chat_id, _ in self.store.items(NS_SUBSCRIBER))
+        start = bisect.bisect_right(chat_ids, cursor) if cursor is not None else 0
+        return chat_ids[start:]
+
+    async def run(self, job):
+        """Отправляет задание пачками по checkpoint_every с записью курсора после каждой"""
+        loop = asyncio.get_running_loop()
+        recipients = self._recipients(job["cursor"])
+        # Задания, созданные до появления счетчика
+        job.setdefault("requeued", 0)
+        # Подписчики, пришедшие после создания задания, тоже получают рассылку
+        job["total"] = max(job["total"], job["done"] + len(recipients))
+        semaphore = asyncio.Semaphore(self.concurrency)
+        started = loop.time() - job["elapsed"]
+        for start in range(0, len(recipients), self.checkpoint_every):
+            chunk = recipients[start:start + self.checkpoint_every]
+            pending = chunk
+            while pending:
+                tasks = []
+                for chat_id in pending:
+                    await self._pace(loop)
+                    await semaphore.acquire()
+                    tasks.append(loop.create_task(self._send(job, chat_id, semaphore)))
+                # Не дошедшие из-за 429 и сбоев Bot API отправляются снова после паузы
+                requeue = await asyncio.gather(*tasks)
+                pending = [chat_id for chat_id, again in zip(pending, requeue) if again]
+            job["cursor"] = chunk[-1]
+            job["done"] += len(chunk)
+            job["elapsed"] = loop.time() - started
+            self._checkpoint(job)
+        job["status"] = STATUS_DONE
+        job["elapsed"] = loop.time() - started
+        self._checkpoint(job)
+        logger.info(f"📣 {format_progress(job)}")
+        return job
+
+    async def _pace(self, loop):
+        # Маркерное ведро: следующая отправка не раньше 1/rate после предыдущей
+        # (любого задания - _next_send общий и при запуске задания не сбрасывается).
+        # Спим, только если опередили график больше чем на 5 мс, чтобы не будить цикл
+        # событий на каждое сообщение при большой скорости
+        now = loop.time()
+        self._next_send = max(self._next_send, now - 0.005)
+        ahead = self._next_send - now
+        if ahead > 0.005:
+            await asyncio.sleep(ahead)
+        self._next_send += 1 / self.rate
+
+    async def _send(self, job, chat_id, semaphore):
+        """Отправляет сообщение получателю; True - отправить снова после паузы"""
+        loop = asyncio.get_running_loop()
+        try:
+            await self.bot.send_message(chat_id=chat_id, text=job["text"])
+            job["sent"] += 1
+            return False
+        except RetryAfter as e:
+            # Лимит Telegram общий для бота: сдвигаем график всех рассылок
+            job["retries"] += 1
+            self._pause(loop, e.retry_after)
+            return True
+        except (Forbidden, BadRequest) as e:
+            # Бот заблокирован, аккаунт удален или чат не найден - отписываем;
+            # остальные 400 (например, слишком длинный текст) - ошибка задания
+            if isinstance(e, BadRequest) and "chat not found" not in e.message.lower():
+                job["failed"] += 1
+                logger.warning(f"⚠️ Рассылка: не удалось отправить {chat_id}: {e}")
+                return False
+            job["blocked"] += 1
+            self.unsubscribe(chat_id)
+            logger.debug(f"Рассылка: {chat_id} удален из подписчиков: {e}")
+            return False
+        except TimedOut as e:
+            # Запрос мог дойти до Telegram: повтор рискует дублем
+            job["failed"] += 1
+            logger.warning(f"⚠️ Рассылка: нет ответа для {chat_id}, сообщение не повторяется: {e}")
+            return False
+        except NetworkError as e:
+            # Bot API недоступен (или цепь разомкнута - у CircuitOpen есть retry_in, время
+            # до пробного вызова): сообщение не ушло, ждем восстановления
+            job["requeued"] += 1
+            self._pause(loop, getattr(e, "retry_in", self.outage_pause))
+            logger.debug(f"Рассылка: пауза, {chat_id} отправится позже: {e}")
+            return True
+        except TelegramError as e:
+            job["failed"] += 1
+            logger.warning(f"⚠️ Рассылка: не удалось отправить {chat_id}: {e}")
+            return False
+        finally:
+            semaphore.release()
+
+    def _pause(self, loop, seconds):
+        """Сдвигает общий график рассылок: следующая отправка не раньше чем через seconds"""
+        self._next_send = max(self._next_send, loop.time() + seconds)
+
+
+def format_progress(job):
+    """Прогресс рассылки: счетчики, скорость и оценка оставшегося времени"""
+    rate = job["done"] / job["elapsed"] if job["elapsed"] > 0 else 0.0
+    remaining = job["total"] - job["done"]
+    if job["status"] == STATUS_DONE:
+        tail = f"завершена за {job['elapsed']:.0f} с"
+    elif rate > 0:
+        tail = f"осталось ~{remaining / rate:.0f} с"
+    else:
+        tail = "оценка времени после первой пачки"
+    return (f"Рассылка {job['id']}: {job['done']}/{job['total']} (отправлено {job['sent']}, "
+            f"заблокировали {job['blocked']}, ошибок {job['failed']}, 429: {job['retries']}, "
+            f"после сбоев: {job.get('requeued', 0)}), "
+            f"{rate:.1f} сообщ/с, {tail}")
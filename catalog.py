@@ -0,0 +1,213 @@
+"""
+Полнотекстовый поиск по каталогу промптов и материалов для inline-режима.
+
+Каталог - JSON-файл со списком записей:
+
+    [{"id": "p1", "title": "...", "description": "...", "text": "...", "tags": ["..."]}]
+
+Индекс строится один раз при запуске: обратный индекс термин -> постинги с заранее
+посчитанным весом BM25, отсортированные по убыванию веса. Последнее слово запроса
+считается недописанным и раскрывается в термины с таким префиксом (поиск по мере
+набора). Ранжированные списки кэшируются, поэтому листание страниц через
+next_offset не пересчитывает запрос.
+
+Сами записи могут храниться не в памяти, а в файле через mmap (см. catalog_store):
+индексу нужен только доступ к записи по номеру.
+"""
+
+import heapq
+import json
+import logging
+import math
+import os
+import re
+from bisect import bisect_left
+from collections import Counter, OrderedDict
+
+logger = logging.getLogger(__name__)
+
+_TOKEN_RE = re.compile(r"\w+")
+
+
+def tokenize(text):
+    """Слова в нижнем регистре, ё приравнивается к е"""
+    return _TOKEN_RE.findall(text.lower().replace("ё", "е"))
+
+
+class CatalogEntry:
+    __slots__ = ("id", "title", "description", "text", "tags")
+
+    def __init__(self, id, title, description="", text="", tags=()):
+        self.id = str(id)
+        self.title = title
+        self.description = description
+        self.text = text or description or title
+        self.tags = list(tags)
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data["id"], data["title"], data.get("description", ""),
+                   data.get("text", ""), data.get("tags", ()))
+
+    def searchable_text(self):
+        return " ".join([self.title, self.description, " ".join(self.tags)])
+
+
+class CatalogIndex:
+    """Обратный индекс с ранжированием BM25 и раскрытием префиксов"""
+
+    K1 = 1.2
+    B = 0.75
+    # Заголовок весит больше описания
+    TITLE_BOOST = 2
+    # Сколько терминов берется при раскрытии короткого префикса (самые частые)
+    MAX_EXPANSIONS = 8
+    # Сколько лучших постингов термина участвует в запросе из нескольких терминов
+    # (постинги упорядочены по весу, хвост почти не влияет на первые страницы)
+    MAX_POSTINGS = 256
+    PREFIX_POSTINGS = 96
+    # Вес совпадения по префиксу относительно точного совпадения слова
+    PREFIX_WEIGHT = 0.8
+    # Префиксы до этой длины раскрываются при построении индекса
+    SHORT_PREFIX = 2
+    CACHE_SIZE = 512
+
+    def __init__(self, entries):
+        # Список записей или CatalogStore с декодированием записи по номеру
+        self.entries = entries if hasattr(entries, "__getitem__") else list(entries)
+        self.postings = {}
+        self.vocabulary = []
+        self._expansions = {}
+        self._cache = OrderedDict()
+        self._build()
+
+    def _build(self):
+        documents = []
+        for entry in self.entries:
+            terms = Counter(tokenize(entry.searchable_text()))
+            for term in tokenize(entry.title):
+                terms[term] += self.TITLE_BOOST - 1
+            documents.append(terms)
+
+        total = len(documents)
+        average_length = sum(sum(terms.values()) for terms in documents) / total if total else 0.0
+        postings = {}
+        for doc, terms in enumerate(documents):
+            norm = self.K1 * (1 - self.B + self.B * sum(terms.values()) / (average_length or 1))
+            for term, frequency in terms.items():
+                postings.setdefault(term, []).append((doc, frequency * (self.K1 + 1) / (frequency + norm)))
+
+        for term, items in postings.items():
+            idf = math.log(1 + (total - len(items) + 0.5) / (len(items) + 0.5))
+            items = [(doc, weight * idf) for doc, weight in items]
+            items.sort(key=lambda item: -item[1])
+            postings[term] = items
+        self.postings = postings
+        self.vocabulary = sorted(postings)
+
+        # Короткие префиксы раскрываются заранее: у них самые широкие диапазоны словаря
+        by_prefix = {}
+        for term in self.vocabulary:
+            for length in range(1, min(len(term), self.SHORT_PREFIX) + 1):
+                by_prefix.setdefault(term[:length], []).append(term)
+        self._expansions = {
+            prefix: self._most_frequent(terms) for prefix, terms in by_prefix.items()
+        }
+
+    def _most_frequent(self, terms):
+        if len(terms) <= self.MAX_EXPANSIONS:
+            return terms
+        return heapq.nlargest(self.MAX_EXPANSIONS, terms, key=lambda term: len(self.postings[term]))
+
+    @classmethod
+    def from_dicts(cls, items):
+        return cls(CatalogEntry.from_dict(item) for item in items)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def _expand(self, prefix):
+        """Термины словаря с данным префиксом; для коротких префиксов - самые частые"""
+        expansions = self._expansions.get(prefix)
+        if expansions is not None:
+            return expansions
+        start = bisect_left(self.vocabulary, prefix)
+        end = bisect_left(self.vocabulary, prefix + "\U0010ffff", start)
+        expansions = self._most_frequent(self.vocabulary[start:end])
+        if len(self._expansions) < 16 * self.CACHE_SIZE:
+            self._expansions[prefix] = expansions
+        return expansions
+
+    def _query_terms(self, query):
+        """Тройки (термин, множитель, глубина постингов): полные слова точно,
+        последнее - по префиксу"""
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+        terms = [(token, 1.0, self.MAX_POSTINGS) for token in tokens[:-1] if token in self.postings]
+        last = tokens[-1]
+        if query.rstrip() != query:
+            # Пробел после слова - слово дописано
+            if last in self.postings:
+                terms.append((last, 1.0, self.MAX_POSTINGS))
+            return terms
+        for term in self._expand(last):
+            if term == last:
+                terms.append((term, 1.0, self.MAX_POSTINGS))
+            else:
+                terms.append((term, self.PREFIX_WEIGHT, self.PREFIX_POSTINGS))
+        return terms
+
+    def _rank(self, query, limit):
+        terms = self._query_terms(query)
+        if len(terms) == 1:
+            # Один термин: постинги уже отсортированы по весу
+            term = terms[0][0]
+            return [doc for doc, _ in self.postings[term][:limit]]
+        scores = {}
+        get = scores.get
+        for term, multiplier, depth in terms:
+            for doc, weight in self.postings[term][:depth]:
+                scores[doc] = get(doc, 0.0) + weight * multiplier
+        # Кандидатов не больше суммы глубин постингов: полная сортировка в C быстрее nlargest
+        return sorted(scores, key=scores.__getitem__, reverse=True)[:limit]
+
+    def search(self, query, offset=0, limit=20):
+        """Страница результатов: (записи, есть ли следующая страница)"""
+        need = offset + limit + 1
+        cached = self._cache.get(query)
+        if cached is None or (not cached[1] and len(cached[0]) < need):
+            # Ранжируем с запасом на несколько страниц вперед
+            depth = max(need, 5 * limit)
+            docs = self._rank(query, depth)
+            # complete: в списке уже все совпадения, глубже искать нечего
+            cached = self._cache[query] = (docs, len(docs) < depth)
+            if len(self._cache) > self.CACHE_SIZE:
+                self._cache.popitem(last=False)
+        else:
+            self._cache.move_to_end(query)
+        docs, _ = cached
+        page = [self.entries[doc] for doc in docs[offset:offset + limit]]
+        return page, len(docs) > offset + limit
+
+
+def load_catalog(path, store_path=None):
+    """Загружает каталог и строит индекс; None, если файла нет или он поврежден.
+
+    С store_path записи хранятся в компактном файле через mmap и не занимают
+    память процесса; без него весь каталог загружается в память.
+    """
+    if not path or not os.path.exists(path):
+        return None
+    try:
+        if store_path:
+            from catalog_store import open_catalog_store
+            catalog = CatalogIndex(open_catalog_store(path, store_path))
+        else:
+            with open(path, "r", encoding="utf-8") as f:
+                catalog = CatalogIndex.from_dicts(json.load(f))
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        logger.error(f"❌ Не удалось загрузить каталог {path}: {e}")
+        return None
+    logger.info(f"📚 Каталог загружен: {len(catalog)} записей, {len(catalog.postings)} терминов")
+    return catalog
@@ -0,0 +1,174 @@
+"""
+Компактное хранилище записей каталога на диске с доступом через mmap.
+
+Вместо сотен тысяч строк Python в памяти каждого процесса записи лежат в одном файле
+и декодируются по требованию. Страницы файла отображаются в память операционной
+системой и разделяются между всеми процессами бота, открывшими один и тот же файл.
+
+Формат файла (little-endian):
+
+    заголовок   8s magic, I версия, I количество записей N
+    смещения    (N + 1) x Q - начало каждой записи относительно области данных
+    хэши id     N x Q - хэши id по возрастанию
+    номера      N x I - номер записи для каждого хэша (дополнено до 8 байт)
+    данные      записи UTF-8: поля через \\x1f, теги через \\x1e
+
+Таблицы читаются прямо из mmap через memoryview.cast, без копирования в память
+процесса (порядок байт платформы; x86 и ARM - little-endian).
+"""
+
+import hashlib
+import json
+import mmap
+import os
+import struct
+import sys
+import tempfile
+from bisect import bisect_left
+from contextlib import suppress
+
+from catalog import CatalogEntry
+
+MAGIC = b"BBCATLG1"
+VERSION = 1
+
+_HEADER = struct.Struct("<8sII")
+
+FIELD_SEPARATOR = "\x1f"
+TAG_SEPARATOR = "\x1e"
+
+
+def _layout(count):
+    """Начала таблиц смещений, хэшей, номеров и области данных для N записей"""
+    offsets_start = _HEADER.size
+    hashes_start = offsets_start + (count + 1) * 8
+    docs_start = hashes_start + count * 8
+    data_start = docs_start + count * 4
+    return offsets_start, hashes_start, docs_start, (data_start + 7) // 8 * 8
+
+
+def id_hash(entry_id):
+    return int.from_bytes(hashlib.blake2b(str(entry_id).encode("utf-8"), digest_size=8).digest(),
+                          "little")
+
+
+def encode_entry(entry):
+    fields = [entry["id"], entry["title"], entry.get("description", ""),
+              entry.get("text", ""), TAG_SEPARATOR.join(entry.get("tags", ()))]
+    return FIELD_SEPARATOR.join(str(field) for field in fields).encode("utf-8")
+
+
+def decode_entry(data):
+    entry_id, title, description, text, tags = data.decode("utf-8").split(FIELD_SEPARATOR)
+    return CatalogEntry(entry_id, title, description, text, tags.split(TAG_SEPARATOR) if tags else ())
+
+
+class CatalogStore:
+    """Записи каталога из файла, отображенного в память; запись декодируется при обращении"""
+
+    def __init__(self, path):
+        if sys.byteorder != "little":
+            raise ValueError("Файл каталога поддерживается только на little-endian платформах")
+        self.path = path
+        self._file = open(path, "rb")
+        try:
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self._file.close()
+            raise ValueError(f"Пустой файл каталога: {path}")
+        try:
+            magic, version, count = _HEADER.unpack_from(self._mmap, 0)
+        except struct.error:
+            magic, version, count = None, None, 0
+        if magic != MAGIC or version != VERSION:
+            self._mmap.close()
+            self._file.close()
+            raise ValueError(f"Неизвестный формат файла каталога: {path}")
+        self.count = count
+        offsets_start, hashes_start, docs_start, self._data_start = _layout(count)
+        view = memoryview(self._mmap)
+        self._views = [view]
+        self._offsets = self._cast(view, offsets_start, hashes_start, "Q")
+        self._hashes = self._cast(view, hashes_start, docs_start, "Q")
+        self._docs = self._cast(view, docs_start, docs_start + count * 4, "I")
+
+    def _cast(self, view, start, end, format):
+        table = view[start:end].cast(format)
+        self._views.append(table)
+        return table
+
+    @classmethod
+    def build(cls, path, entries):
+        """Записывает словари записей в файл формата каталога (атомарно)"""
+        blobs = [encode_entry(entry) for entry in entries]
+        offsets = [0]
+        for blob in blobs:
+            offsets.append(offsets[-1] + len(blob))
+        id_rows = sorted((id_hash(entry["id"]), doc) for doc, entry in enumerate(entries))
+        count = len(blobs)
+        data_start = _layout(count)[3]
+
+        # Свой временный файл у каждой сборки: процессы sharding.py собирают каталог
+        # одновременно, и общий path.tmp перемешал бы их записи
+        fd, tmp_path = tempfile.mkstemp(prefix=f"{os.path.basename(path)}.", suffix=".tmp",
+                                        dir=os.path.dirname(path) or ".")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(_HEADER.pack(MAGIC, VERSION, count))
+                f.write(struct.pack(f"<{count + 1}Q", *offsets))
+                f.write(struct.pack(f"<{count}Q", *(hashed for hashed, _ in id_rows)))
+                f.write(struct.pack(f"<{count}I", *(doc for _, doc in id_rows)))
+                f.write(b"\0" * (data_start - f.tell()))
+                for blob in blobs:
+                    f.write(blob)
+            # mkstemp создает файл с правами 0600
+            os.chmod(tmp_path, 0o644)
+            os.replace(tmp_path, path)
+        except BaseException:
+            with suppress(FileNotFoundError):
+                os.unlink(tmp_path)
+            raise
+        return len(blobs)
+
+    def __len__(self):
+        return self.count
+
+    def _raw(self, doc):
+        return self._mmap[self._data_start + self._offsets[doc]:self._data_start + self._offsets[doc + 1]]
+
+    def __getitem__(self, doc):
+        if not 0 <= doc < self.count:
+            raise IndexError(doc)
+        return decode_entry(self._raw(doc))
+
+    def __iter__(self):
+        for doc in range(self.count):
+            yield decode_entry(self._raw(doc))
+
+    def get(self, entry_id):
+        """Запись по id (бинарный поиск по хэшу в id-индексе) или None"""
+        entry_id = str(entry_id)
+        hashed = id_hash(entry_id)
+        position = bisect_left(self._hashes, hashed)
+        while position < self.count and self._hashes[position] == hashed:
+            entry = self[self._docs[position]]
+            if entry.id == entry_id:
+                return entry
+            position += 1
+        return None
+
+    def close(self):
+        # mmap нельзя закрыть, пока на него есть memoryview
+        for view in reversed(self._views):
+            view.release()
+        self._mmap.close()
+        self._file.close()
+
+
+def open_catalog_store(source_path, store_path):
+    """Открывает файл каталога, пересобирая его из JSON, если исходник новее"""
+    if (not os.path.exists(store_path)
+            or os.path.getmtime(store_path) < os.path.getmtime(source_path)):
+        with open(source_path, "r", encoding="utf-8") as f:
+            CatalogStore.build(store_path, json.load(f))
+    return CatalogStore(store_path)
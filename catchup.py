@@ -0,0 +1,167 @@
+"""
+Продолжение с сохраненного update_id после перезапуска вместо drop_pending_updates.
+
+Telegram хранит неподтвержденные апдейты сутки. При запуске confirm_offset
+подтверждает апдейты до сохраненного update_id (runtime.last_update_id), и polling
+забирает только то, что пришло за время простоя. Вопросы пользователей больше не
+теряются при каждом перезапуске. Если Telegram начал счет update_id заново (после
+недели без апдейтов) и новые id ниже сохраненного, сохраненный offset сбрасывается.
+
+Апдейты выполняются параллельно и завершаются не по порядку, поэтому сохраняется не
+наибольший завершенный update_id, а наибольший, до которого включительно завершены
+все принятые (OffsetTracker): апдейт, еще выполнявшийся при падении, придет снова.
+
+Доставка - "хотя бы один раз". StateStore пишет пакетами раз в STATE_FLUSH_INTERVAL:
+после падения процесса (не штатной остановки) апдейты последнего незаписанного
+интервала и выполнявшиеся в момент падения придут повторно, и ответ на них может
+повториться. При штатной остановке offset записывается на диск, повторов нет.
+
+Накопленное за простой разбирается в режиме догоняния: сообщение отправлено раньше
+запуска процесса. CatchUp в этом режиме:
+
+- сворачивает повторы: один ответ пользователю в чате на вид ответа (три "/start" и
+  "привет" в личку за время простоя - одно стартовое сообщение);
+- пропускает триггеры в группах старше stale_seconds: ответ на вопрос часовой давности
+  посреди чужого разговора только мешает. Личные сообщения отвечаются всегда.
+
+Первое свежее сообщение завершает догоняние: в лог пишется сводка и время разбора
+накопленного (от запуска до последнего сообщения из простоя).
+"""
+
+import heapq
+import logging
+import time
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+# Насколько первый ожидающий апдейт может быть ниже сохраненного без сброса счета:
+# неподтвержденными у Telegram остаются только апдейты последней пачки getUpdates (до 100)
+OFFSET_RESET_GAP = 1000
+
+
+async def confirm_offset(bot, last_update_id, allowed_updates=None):
+    """Подтверждает Telegram апдейты до last_update_id включительно; возвращает
+    update_id, с которым продолжать (ниже сохраненного, если Telegram начал счет заново).
+
+    getUpdates с offset = last_update_id + 1 отбрасывает обработанные апдейты на
+    стороне Telegram; полученный апдейт не подтверждается и придет снова в polling.
+    После недели без апдейтов Bot API выбирает update_id заново, и новые id могут
+    оказаться ниже сохраненного: такое подтверждение отбросило бы все. Поэтому сначала
+    первый ожидающий апдейт читается без offset (без подтверждения): если он намного
+    ниже сохраненного, подтверждать нечего.
+    """
+    if not last_update_id:
+        return last_update_id
+    pending = await bot.get_updates(limit=1, timeout=0, allowed_updates=allowed_updates)
+    if pending and pending[0].update_id < last_update_id - OFFSET_RESET_GAP:
+        logger.warning(f"⚠️ Telegram начал счет апдейтов заново: первый ожидающий "
+                       f"{pending[0].update_id}, сохранен {last_update_id}; продолжаем с него")
+        return pending[0].update_id - 1
+    await bot.get_updates(offset=last_update_id + 1, limit=1, timeout=0, allowed_updates=allowed_updates)
+    logger.info(f"⏪ Продолжаем с апдейта {last_update_id + 1}")
+    return last_update_id
+
+
+class OffsetTracker:
+    """Наибольший update_id, до которого включительно завершены все принятые апдейты"""
+
+    def __init__(self):
+        # Принятые и не завершенные апдейты; в куче завершенные удаляются лениво
+        self._pending = set()
+        self._heap = []
+        self._completed = 0
+
+    def __contains__(self, update_id):
+        return update_id in self._pending
+
+    def begin(self, update_id):
+        """Апдейт принят в обработку (в порядке getUpdates)"""
+        self._pending.add(update_id)
+        heapq.heappush(self._heap, update_id)
+
+    def finish(self, update_id):
+        """Апдейт завершен или отброшен; возвращает id, который можно подтвердить"""
+        self._pending.discard(update_id)
+        self._completed = max(self._completed, update_id)
+        while self._heap and self._heap[0] not in self._pending:
+            heapq.heappop(self._heap)
+        return self._heap[0] - 1 if self._heap else self._completed
+
+
+class CatchUp:
+    """Разбор апдейтов, накопленных за время простоя"""
+
+    def __init__(self, stale_seconds=600):
+        self.stale_seconds = stale_seconds
+        self.started = None
+        self.finished = None
+        # Когда разобрано последнее сообщение из простоя
+        self.last_backlog = None
+        # (чат, пользователь, вид ответа), на которые уже ответили при догонянии
+        self._answered = set()
+        self.stats = {"backlog": 0, "replied": 0, "collapsed": 0, "stale": 0}
+
+    @classmethod
+    def from_config(cls):
+        return cls(stale_seconds=Config.CATCHUP_STALE_SECONDS)
+
+    def start(self, now=None):
+        self.started = now or time.time()
+
+    @property
+    def active(self):
+        return self.started is not None and self.finished is None
+
+    @property
+    def elapsed(self):
+        """Секунды от запуска до последнего разобранного сообщения из простоя"""
+        if self.started is None or self.last_backlog is None:
+            return 0.0
+        return self.last_backlog - self.started
+
+    def admit(self, message, kind, now=None):
+        """Можно ли отвечать на сообщение; kind - вид ответа (интент, команда)"""
+        if not self.active:
+            return True
+        now = now or time.time()
+        # Правка старого сообщения, сделанная после запуска, - свежая
+        sent_at = (message.edit_date or message.date).timestamp()
+        # Дата сообщения в Telegram - целые секунды
+        if sent_at >= int(self.started):
+            self.finish(now)
+            return True
+
+        self.stats["backlog"] += 1
+        self.last_backlog = now
+        is_group = message.chat.type in ('group', 'supergroup')
+        if is_group and self.stale_seconds > 0 and now - sent_at > self.stale_seconds:
+            self.stats["stale"] += 1
+            return False
+        user_id = message.from_user.id if message.from_user else None
+        key = (message.chat.id, user_id, kind)
+        if key in self._answered:
+            self.stats["collapsed"] += 1
+            return False
+        self._answered.add(key)
+        self.stats["replied"] += 1
+        return True
+
+    def finish(self, now=None):
+        """Конец догоняния: сводка в лог, память о свернутых ответах освобождается"""
+        if not self.active:
+            return
+        self.finished = now or time.time()
+        self._answered.clear()
+        if self.stats["backlog"]:
+            logger.info(f"⏪ Догоняние завершено за {self.elapsed:.1f} с: {self.format_counts()}")
+
+    def format_counts(self):
+        stats = self.stats
+        return (f"из простоя {stats['backlog']}, отвечено {stats['replied']}, "
+                f"свернуто повторов {stats['collapsed']}, устаревших в группах {stats['stale']}")
+
+    def format(self):
+        state = "идет" if self.active else "завершено"
+        return f"⏪ Догоняние: {state}, {self.elapsed:.1f} с, {self.format_counts()}"
@@ -3,9 +3,172 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
+
+def _env_flag(name, default=False):
+    """Читает булев флаг из переменных окружения (1/true/yes/on)"""
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ('1', 'true', 'yes', 'on')
+
+
 class Config:
     TELEGRAM_BOT_TOKEN = os.getenv('TELEGRAM_BOT_TOKEN')
     ADMIN_CONTACT = os.getenv('ADMIN_CONTACT', 'smkbdh')
+
+    # Опциональный event loop на uvloop (нужен установленный пакет uvloop)
+    USE_UVLOOP = _env_flag('USE_UVLOOP')
+
+    # Определения ботов для запуска нескольких ботов в одном процессе (multibot.py)
+    BOTS_FILE = os.getenv('BOTS_FILE', 'bots.json')
+
+    # Режим вебхука с шардированием по процессам (sharding.py): адрес приема, путь,
+    # секрет заголовка X-Telegram-Bot-Api-Secret-Token и число процессов-обработчиков.
+    # WEBHOOK_URL - публичный адрес для setWebhook; пусто - вебхук уже зарегистрирован
+    WEBHOOK_LISTEN = os.getenv('WEBHOOK_LISTEN', '0.0.0.0')
+    WEBHOOK_PORT = int(os.getenv('WEBHOOK_PORT', '8443'))
+    WEBHOOK_PATH = os.getenv('WEBHOOK_PATH', '/webhook')
+    WEBHOOK_URL = os.getenv('WEBHOOK_URL', '')
+    WEBHOOK_SECRET = os.getenv('WEBHOOK_SECRET', '')
+    SHARD_WORKERS = int(os.getenv('SHARD_WORKERS', str(os.cpu_count() or 1)))
+
+    # Файл кэша скомпилированных матчеров и отрендеренных шаблонов
+    STARTUP_CACHE_PATH = os.getenv('STARTUP_CACHE_PATH', '.startup_cache.json')
+
+    # Хранилище состояния (SQLite, WAL); пустое значение - хранить только в памяти
+    STATE_DB_PATH = os.getenv('STATE_DB_PATH', 'bot_state.db')
+    STATE_FLUSH_INTERVAL = float(os.getenv('STATE_FLUSH_INTERVAL', '1.0'))
+
+    # После перезапуска продолжать с сохраненного update_id (иначе накопленное отбрасывается);
+    # триггеры в группах старше CATCHUP_STALE_SECONDS при догонянии не отвечаются (0 - отвечать)
+    RESUME_UPDATES = _env_flag('RESUME_UPDATES', True)
+    CATCHUP_STALE_SECONDS = int(os.getenv('CATCHUP_STALE_SECONDS', '600'))
+
+    # Не повторять один и тот же ответ пользователю в группе чаще, чем раз в N секунд (0 - выкл.)
+    REPLY_COOLDOWN_SECONDS = int(os.getenv('REPLY_COOLDOWN_SECONDS', '0'))
+
+    # Telegram ID администраторов через запятую (доступ к админ-командам)
+    ADMIN_IDS = [int(admin_id) for admin_id in os.getenv('ADMIN_IDS', '').split(',') if admin_id.strip()]
+
+    # Каталог для почасовых выгрузок аналитики воронки; пусто - хранить только в памяти
+    ANALYTICS_DIR = os.getenv('ANALYTICS_DIR', 'analytics')
+    ANALYTICS_ROLLUP_INTERVAL = float(os.getenv('ANALYTICS_ROLLUP_INTERVAL', '60'))
+
+    # Каталог промптов и материалов для inline-поиска (JSON); нет файла - поиск выключен
+    CATALOG_PATH = os.getenv('CATALOG_PATH', 'catalog.json')
+    INLINE_PAGE_SIZE = int(os.getenv('INLINE_PAGE_SIZE', '20'))
+    # Пауза перед поиском: если пользователь допечатал запрос за это время, старый не отвечаем;
+    # 0 - без паузы и без отсечения, ответ на каждый запрос
+    INLINE_DEBOUNCE_SECONDS = float(os.getenv('INLINE_DEBOUNCE_SECONDS', '0.25'))
+    # Компактная копия каталога для mmap (общая для процессов); пусто - держать в памяти
+    CATALOG_STORE_PATH = os.getenv('CATALOG_STORE_PATH', '.catalog.bin')
+
+    # Медиафайлы для отправки в личку: загружаются один раз, дальше уходят по file_id
+    MEDIA_DIR = os.getenv('MEDIA_DIR', 'media')
+    MEDIA_ASSETS = {
+        'veo_guide': {'kind': 'video', 'file': os.getenv('MEDIA_VEO_GUIDE', 'veo3_guide.mp4'),
+                      'caption': '🎬 Видеогайд по VEO 3'},
+        'materials': {'kind': 'document', 'file': os.getenv('MEDIA_MATERIALS', 'buddah_base_materials.pdf'),
+                      'caption': '📁 Материалы BUDDAH BASE'},
+    }
+
+    # Ограничение нагрузки: одновременно обрабатываемые апдейты и пороги очереди, после
+    # которых отбрасываются ответы в группах. Личка, кнопки и команды бота идут мимо общей
+    # очереди со своим пределом одновременности и отбрасываются только сверх MAX_CRITICAL_BACKLOG
+    UPDATE_CONCURRENCY = int(os.getenv('UPDATE_CONCURRENCY', '8'))
+    UPDATE_QUEUE_SIZE = int(os.getenv('UPDATE_QUEUE_SIZE', '1000'))
+    SHED_ENGAGEMENT_AT = int(os.getenv('SHED_ENGAGEMENT_AT', '50'))
+    SHED_REPEAT_JOIN_AT = int(os.getenv('SHED_REPEAT_JOIN_AT', '100'))
+    MAX_BACKLOG = int(os.getenv('MAX_BACKLOG', '200'))
+    CRITICAL_CONCURRENCY = int(os.getenv('CRITICAL_CONCURRENCY', '32'))
+    MAX_CRITICAL_BACKLOG = int(os.getenv('MAX_CRITICAL_BACKLOG', '500'))
+
+    # Отвечать на исправленные сообщения тем же матчером (без повтора того же ответа);
+    # выключено - правки не запрашиваются у Telegram (allowed_updates)
+    HANDLE_EDITED_MESSAGES = _env_flag('HANDLE_EDITED_MESSAGES', False)
+
+    # Антиспам в группах: флуд (больше N сообщений за окно) и почти одинаковые тексты;
+    # выключен по умолчанию - боту нужны права удалять сообщения и ограничивать участников
+    SPAM_GUARD = _env_flag('SPAM_GUARD', False)
+    SPAM_RATE_LIMIT = int(os.getenv('SPAM_RATE_LIMIT', '6'))
+    SPAM_RATE_WINDOW = float(os.getenv('SPAM_RATE_WINDOW', '10'))
+    SPAM_DUPLICATE_LIMIT = int(os.getenv('SPAM_DUPLICATE_LIMIT', '3'))
+    SPAM_DUPLICATE_WINDOW = float(os.getenv('SPAM_DUPLICATE_WINDOW', '120'))
+    # После скольких нарушений за окно дублей пользователь ограничивается и на сколько секунд
+    SPAM_RESTRICT_AFTER = int(os.getenv('SPAM_RESTRICT_AFTER', '3'))
+    SPAM_RESTRICT_SECONDS = int(os.getenv('SPAM_RESTRICT_SECONDS', '3600'))
+    SPAM_ACTIONS_PER_SECOND = float(os.getenv('SPAM_ACTIONS_PER_SECOND', '5'))
+
+    # Темы форума, в которых можно писать (message_thread_id через запятую, General - 1);
+    # сообщения в остальных темах удаляются. Пусто - модерация тем выключена
+    TOPIC_ALLOWED_THREADS = [int(thread_id) for thread_id in os.getenv('TOPIC_ALLOWED_THREADS', '').split(',')
+                             if thread_id.strip()]
+    # Чаты, в которых действует модерация тем (пусто - во всех форумах)
+    TOPIC_CHAT_IDS = [int(chat_id) for chat_id in os.getenv('TOPIC_CHAT_IDS', '').split(',') if chat_id.strip()]
+    # Как часто отправлять накопленные удаления одним deleteMessages, сек
+    TOPIC_FLUSH_INTERVAL = float(os.getenv('TOPIC_FLUSH_INTERVAL', '1.0'))
+
+    # Рассылка подписчикам (всем, кто писал боту в личку): сообщений в секунду и запросов в полете
+    BROADCAST_RATE = float(os.getenv('BROADCAST_RATE', '25'))
+    BROADCAST_CONCURRENCY = int(os.getenv('BROADCAST_CONCURRENCY', '8'))
+
+    # Проверка новых участников кнопкой: кто не нажал за JOIN_VERIFY_TIMEOUT секунд - исключается
+    JOIN_VERIFICATION = _env_flag('JOIN_VERIFICATION', False)
+    JOIN_VERIFY_TIMEOUT = float(os.getenv('JOIN_VERIFY_TIMEOUT', '120'))
+    # Сообщение с кнопкой - не чаще раза за интервал на чат (кнопка общая для всех вошедших)
+    JOIN_CHALLENGE_INTERVAL = float(os.getenv('JOIN_CHALLENGE_INTERVAL', '30'))
+    JOIN_VERIFY_MAX_PENDING = int(os.getenv('JOIN_VERIFY_MAX_PENDING', '50000'))
+    JOIN_ACTIONS_PER_SECOND = float(os.getenv('JOIN_ACTIONS_PER_SECOND', '20'))
+
+    # Через сколько секунд удалять ответы бота в группах (0 - не удалять) и шаг таймера, сек
+    GROUP_REPLY_TTL_SECONDS = int(os.getenv('GROUP_REPLY_TTL_SECONDS', '0'))
+    GROUP_REPLY_TTL_TICK = float(os.getenv('GROUP_REPLY_TTL_TICK', '1.0'))
+
+    # Трассировка апдейтов: доля апдейтов в выборке (0 - выкл., 1 - все), файл в формате
+    # Chrome Trace Event, размер файла до ротации и число старых файлов
+    TRACE_SAMPLE_RATE = float(os.getenv('TRACE_SAMPLE_RATE', '0'))
+    TRACE_PATH = os.getenv('TRACE_PATH', 'traces/trace.json')
+    TRACE_MAX_BYTES = int(os.getenv('TRACE_MAX_BYTES', str(10 * 1024 * 1024)))
+    TRACE_BACKUPS = int(os.getenv('TRACE_BACKUPS', '3'))
+
+    # Профилирование по /profile и SIGUSR2: каталог результатов (пусто - выкл.),
+    # интервал сэмплов, длительность по умолчанию и максимальная, сек
+    PROFILE_DIR = os.getenv('PROFILE_DIR', 'profiles')
+    PROFILE_INTERVAL = float(os.getenv('PROFILE_INTERVAL', '0.01'))
+    PROFILE_SECONDS = float(os.getenv('PROFILE_SECONDS', '30'))
+    PROFILE_MAX_SECONDS = float(os.getenv('PROFILE_MAX_SECONDS', '300'))
+
+    # Монитор цикла событий: период замера задержки (0 - выкл.) и с какой длительности
+    # блокировки цикла записывать стек и обработчик, сек
+    LOOP_MONITOR_INTERVAL = float(os.getenv('LOOP_MONITOR_INTERVAL', '0.05'))
+    LOOP_SLOW_CALLBACK_SECONDS = float(os.getenv('LOOP_SLOW_CALLBACK_SECONDS', '0.1'))
+
+    # Предохранитель вызовов Bot API: после скольких ошибок подряд метод размыкается и на
+    # сколько секунд, повторы идемпотентных методов и пределы адаптивного таймаута чтения, сек
+    API_BREAKER = _env_flag('API_BREAKER', True)
+    API_BREAKER_FAILURES = int(os.getenv('API_BREAKER_FAILURES', '5'))
+    API_BREAKER_RESET_SECONDS = float(os.getenv('API_BREAKER_RESET_SECONDS', '10'))
+    API_RETRIES = int(os.getenv('API_RETRIES', '2'))
+    API_MIN_TIMEOUT = float(os.getenv('API_MIN_TIMEOUT', '1.0'))
+    API_MAX_TIMEOUT = float(os.getenv('API_MAX_TIMEOUT', '5.0'))
+
+    # Проверки здоровья по HTTP (/healthz, /readyz): адрес и порт (0 - выкл.); не готов, если
+    # getUpdates не отвечал дольше HEALTH_POLL_MAX_AGE, задержка цикла выше HEALTH_MAX_LAG или
+    # исходящих запросов в полете не меньше HEALTH_MAX_OUTBOUND; нездоров - после HEALTH_STUCK_SECONDS
+    HEALTH_LISTEN = os.getenv('HEALTH_LISTEN', '127.0.0.1')
+    HEALTH_PORT = int(os.getenv('HEALTH_PORT', '8081'))
+    HEALTH_POLL_MAX_AGE = float(os.getenv('HEALTH_POLL_MAX_AGE', '60'))
+    HEALTH_MAX_LAG = float(os.getenv('HEALTH_MAX_LAG', '1.0'))
+    HEALTH_MAX_OUTBOUND = int(os.getenv('HEALTH_MAX_OUTBOUND', '100'))
+    HEALTH_STUCK_SECONDS = float(os.getenv('HEALTH_STUCK_SECONDS', '300'))
+
+    # Одинаковые ошибки (тип исключения и метод Bot API) пишутся в лог не чаще раза в
+    # ERROR_LOG_INTERVAL секунд, с образцом апдейта до ERROR_SNAPSHOT_CHARS символов
+    ERROR_LOG_INTERVAL = float(os.getenv('ERROR_LOG_INTERVAL', '60'))
+    ERROR_SNAPSHOT_CHARS = int(os.getenv('ERROR_SNAPSHOT_CHARS', '500'))
+
+    # Окно скользящих метрик для /stats, сек
+    METRICS_WINDOW_SECONDS = int(os.getenv('METRICS_WINDOW_SECONDS', '60'))
     
     # Ключевые слова для определения запросов о вступлении
     JOIN_KEYWORDS = [
@@ -0,0 +1,67 @@
+"""
+Отсечение устаревших inline-запросов.
+
+Telegram присылает новый inline-запрос почти на каждое нажатие клавиши. Для каждого
+пользователя запоминается последний запрос: каждый запрос ждет delay секунд (debounce),
+и если за это время пришел более свежий, прежний прерывается и не отвечается - так
+пользователь успевает допечатать слово до дорогого поиска. delay должен быть больше
+нуля; INLINE_DEBOUNCE_SECONDS=0 выключает отсечение (InlineDebouncer не создается,
+ответ на каждый запрос).
+
+Работает, когда InlineQueryHandler зарегистрирован с block=False: обработчики
+запросов выполняются параллельно, и свежий запрос может застать старый в ожидании.
+"""
+
+import asyncio
+
+# Пауза по умолчанию: обычный интервал между нажатиями короче, слово успевает допечататься
+DEFAULT_DELAY = 0.25
+
+
+class _PendingQuery:
+    __slots__ = ("query_id", "superseded")
+
+    def __init__(self, query_id):
+        self.query_id = query_id
+        self.superseded = asyncio.Event()
+
+
+class InlineDebouncer:
+    """Отвечает только на самый свежий inline-запрос каждого пользователя"""
+
+    def __init__(self, delay=DEFAULT_DELAY):
+        if delay <= 0:
+            raise ValueError(f"Пауза debounce должна быть больше нуля: {delay}")
+        self.delay = delay
+        self._latest = {}
+        self.answered = 0
+        self.skipped = 0
+
+    @property
+    def in_flight(self):
+        return len(self._latest)
+
+    async def run(self, user_id, query_id, answer):
+        """Выполняет answer() (корутинную функцию), если запрос не устарел.
+
+        Возвращает True, если запрос был отвечен, и False, если его вытеснил более
+        свежий запрос того же пользователя.
+        """
+        previous = self._latest.get(user_id)
+        if previous is not None:
+            previous.superseded.set()
+        pending = self._latest[user_id] = _PendingQuery(query_id)
+        try:
+            try:
+                await asyncio.wait_for(pending.superseded.wait(), self.delay)
+            except asyncio.TimeoutError:
+                pass
+            if pending.superseded.is_set():
+                self.skipped += 1
+                return False
+            await answer()
+            self.answered += 1
+            return True
+        finally:
+            if self._latest.get(user_id) is pending:
+                del self._latest[user_id]
@@ -0,0 +1,165 @@
+"""
+Классификация и агрегация ошибок обработки апдейтов для error_handler и /stats.
+
+Одна волна RetryAfter или Forbidden (рассылка, рейд в группе) дает тысячи одинаковых
+строк в логе без контекста. ErrorAggregator вместо этого:
+
+- классифицирует исключение (flood, forbidden, bad_request, timeout, network, bug...)
+  и группирует по ключу (тип исключения, метод Bot API). Метод, на котором упал
+  вызов, отмечает metrics.OutboundTracker, обработчик - runtime.timed;
+- считает каждую группу: всего, за скользящее окно, когда впервые и последний раз;
+- пишет в лог первую ошибку группы и дальше не чаще раза в log_interval секунд -
+  сводку "повторилась N раз" с образцом: урезанный до snapshot_chars JSON апдейта.
+  Ошибки кода (bug) пишутся с трассировкой стека.
+
+Объем лога ограничен числом групп, а не потоком ошибок. Групп не больше max_groups:
+остальное попадает в общую группу переполнения.
+"""
+
+import json
+import logging
+import time
+
+from telegram.error import (BadRequest, Conflict, Forbidden, InvalidToken, NetworkError, RetryAfter,
+                            TelegramError, TimedOut)
+
+from breaker import CircuitOpen
+from config import Config
+from metrics import RollingCounter
+
+logger = logging.getLogger(__name__)
+
+# Порядок важен: подклассы раньше базовых классов
+CATEGORIES = (
+    (RetryAfter, "flood"),
+    (Forbidden, "forbidden"),
+    (BadRequest, "bad_request"),
+    (InvalidToken, "auth"),
+    (Conflict, "conflict"),
+    (CircuitOpen, "circuit_open"),
+    (TimedOut, "timeout"),
+    (NetworkError, "network"),
+    (TelegramError, "telegram"),
+)
+
+OVERFLOW_KEY = ("…", "…")
+
+
+def classify(error):
+    """Категория исключения; все, что не ошибка Bot API, - ошибка кода (bug)"""
+    for error_class, category in CATEGORIES:
+        if isinstance(error, error_class):
+            return category
+    return "bug"
+
+
+def windowed(counter):
+    """Сумма RollingCounter за его окно"""
+    return round(counter.rate() * counter.window)
+
+
+def snapshot(update, limit=500):
+    """Урезанный JSON апдейта для образца в логе"""
+    if update is None:
+        return "-"
+    data = update.to_dict() if hasattr(update, "to_dict") else repr(update)
+    text = json.dumps(data, ensure_ascii=False, default=str)
+    return text if len(text) <= limit else text[:limit] + "…"
+
+
+class ErrorGroup:
+    """Счетчики одной группы ошибок: тип исключения и метод Bot API"""
+
+    def __init__(self, category, error_type, method, window):
+        self.category = category
+        self.error_type = error_type
+        self.method = method
+        self.count = 0
+        self.recent = RollingCounter(window)
+        self.first_seen = time.time()
+        self.last_seen = None
+        self.message = None
+        self.handler = None
+        self.sample = None
+        # Ошибки с последней записи в лог и когда можно писать снова (monotonic)
+        self.suppressed = 0
+        self.next_log = 0.0
+
+    @property
+    def name(self):
+        return f"{self.error_type}/{self.method}"
+
+
+class ErrorAggregator:
+    """Группы ошибок бота с ограниченной по частоте записью в лог"""
+
+    def __init__(self, window=60, log_interval=60.0, snapshot_chars=500, max_groups=200):
+        self.window = window
+        self.log_interval = log_interval
+        self.snapshot_chars = snapshot_chars
+        self.max_groups = max_groups
+        self.groups = {}
+        self.total = 0
+        self.recent = RollingCounter(window)
+        self.logged = 0
+
+    @classmethod
+    def from_config(cls):
+        return cls(window=Config.METRICS_WINDOW_SECONDS, log_interval=Config.ERROR_LOG_INTERVAL,
+                   snapshot_chars=Config.ERROR_SNAPSHOT_CHARS)
+
+    def record(self, error, update=None):
+        """Учитывает ошибку и пишет ее в лог, если группе пора"""
+        now = time.monotonic()
+        method = getattr(error, "api_method", None) or "-"
+        key = (type(error).__name__, method)
+        group = self.groups.get(key)
+        if group is None:
+            if len(self.groups) >= self.max_groups:
+                key = OVERFLOW_KEY
+                group = self.groups.get(key)
+            if group is None:
+                group = self.groups[key] = ErrorGroup(classify(error), key[0], key[1], self.window)
+        group.count += 1
+        group.recent.add(1, now)
+        group.last_seen = time.time()
+        group.message = str(error)[:200]
+        group.handler = getattr(error, "handler_name", None) or group.handler
+        self.total += 1
+        self.recent.add(1, now)
+
+        if now < group.next_log:
+            group.suppressed += 1
+            return group
+        group.next_log = now + self.log_interval
+        group.sample = snapshot(update, self.snapshot_chars)
+        self._log(group, error)
+        group.suppressed = 0
+        return group
+
+    def _log(self, group, error):
+        self.logged += 1
+        if group.count == 1:
+            head = f"❗ {group.category}: {group.name} в {group.handler or '-'}: {group.message}"
+        else:
+            head = (f"❗ {group.category}: {group.name} повторилась {group.suppressed + 1} раз "
+                    f"с прошлой записи (всего {group.count}), последняя в "
+                    f"{group.handler or '-'}: {group.message}")
+        level = logging.ERROR if group.category == "bug" else logging.WARNING
+        exc_info = error if group.category == "bug" else None
+        logger.log(level, f"{head}\n    апдейт: {group.sample}", exc_info=exc_info)
+
+    def top(self, limit=3):
+        """Частые группы: по числу за окно, затем всего"""
+        return sorted(self.groups.values(), key=lambda group: (windowed(group.recent), group.count),
+                      reverse=True)[:limit]
+
+    def format(self, limit=3):
+        if not self.groups:
+            return "❗ Ошибки: нет"
+        lines = [f"❗ Ошибки: за {self.window} с {windowed(self.recent)}, всего {self.total}, "
+                 f"групп {len(self.groups)}, записано в лог {self.logged}"]
+        for group in self.top(limit):
+            lines.append(f"  • {group.category} {group.name}: за окно {windowed(group.recent)}, "
+                         f"всего {group.count}")
+        return "\n".join(lines)
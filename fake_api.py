@@ -0,0 +1,241 @@
+"""
+Офлайн-эмулятор Telegram Bot API для тестов и бенчмарков.
+
+FakeTelegramAPI подключается к Application вместо HTTPXRequest и отвечает на вызовы
+Bot API из памяти, записывая каждый вызов для последующих проверок. Загрузки файлов
+(multipart) выдают новый file_id; отправка по file_id проверяет, что он известен
+и не был отозван, иначе отвечает 400, как настоящий Bot API.
+
+Для рассылок эмулятор умеет отвечать 403 чатам из blocked (бот заблокирован) и 429 с
+retry_after при превышении flood_limit отправок в секунду (скользящее окно).
+Флаг outage имитирует недоступность Bot API: на все вызовы - 502 Bad Gateway; методы
+из failing получают 502 по отдельности. stall - секунды, на которые зависает каждый
+вызов, кроме getUpdates: дольше таймаута чтения - TimedOut, как у HTTPXRequest.
+getUpdates, как сервер Telegram, отбрасывает апдейты, не входящие в allowed_updates.
+Несколько ботов одного процесса (multibot.py) получают по эмулятору со своим bot_user.
+"""
+
+import asyncio
+import json
+import time
+from collections import deque
+
+from telegram.error import TimedOut
+from telegram.request import BaseRequest
+
+FAKE_BOT_TOKEN = "123456:FAKE-TOKEN"
+
+FAKE_BOT_USER = {
+    "id": 123456,
+    "is_bot": True,
+    "first_name": "Buddah Base",
+    "username": "saint_buddah_bot",
+    "can_join_groups": True,
+    "can_read_all_group_messages": True,
+    "supports_inline_queries": True,
+}
+
+# Поле медиа в параметрах метода отправки
+MEDIA_FIELDS = {
+    "sendVideo": "video",
+    "sendDocument": "document",
+    "sendPhoto": "photo",
+    "sendAudio": "audio",
+    "sendAnimation": "animation",
+}
+
+WRONG_FILE_ID = "Bad Request: wrong file identifier/HTTP URL specified"
+BOT_BLOCKED = "Forbidden: bot was blocked by the user"
+
+# Типы апдейтов getUpdates без allowed_updates (chat_member и реакции - только по запросу)
+DEFAULT_ALLOWED_UPDATES = frozenset({
+    "message", "edited_message", "channel_post", "edited_channel_post", "inline_query",
+    "chosen_inline_result", "callback_query", "shipping_query", "pre_checkout_query", "poll",
+    "poll_answer", "my_chat_member", "chat_join_request",
+})
+
+
+class FakeTelegramAPI(BaseRequest):
+    """In-process замена HTTP-запросов к Bot API"""
+
+    def __init__(self, latency=0.0, flood_limit=0, bot_user=None):
+        self.latency = latency
+        # Ответ getMe и отправитель сообщений бота
+        self.bot_user = bot_user or FAKE_BOT_USER
+        # Чаты, заблокировавшие бота, и лимит отправок в секунду (0 - без лимита)
+        self.blocked = set()
+        self.flood_limit = flood_limit
+        self.flood_errors = 0
+        self._send_times = deque()
+        # Bot API недоступен: все вызовы получают 502
+        self.outage = False
+        self.failing = set()
+        self.stall = 0.0
+        self.calls = []
+        self.updates = deque()
+        # Апдейты, отброшенные по allowed_updates последнего getUpdates
+        self.filtered = 0
+        # Апдейты, сброшенные deleteWebhook(drop_pending_updates=True)
+        self.dropped = 0
+        self.uploads = []
+        self.file_ids = set()
+        # Права участников по умолчанию в ответе getChat
+        self.chat_permissions = {"can_send_messages": True, "can_send_polls": True,
+                                 "can_send_other_messages": True, "can_add_web_page_previews": True}
+        # chat_id -> время (loop.time()) первого sendMessage в этот чат
+        self.first_sent = {}
+        # (chat_id, message_id) всех сообщений, отправленных ботом
+        self.sent = []
+        self._message_id = 0
+
+    @property
+    def read_timeout(self):
+        return 5.0
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
+    def add_updates(self, updates):
+        """Ставит update-словари в очередь для getUpdates"""
+        self.updates.extend(updates)
+
+    def calls_to(self, method):
+        """Параметры всех вызовов указанного метода Bot API"""
+        return [params for name, params in self.calls if name == method]
+
+    def count(self, method):
+        return sum(1 for name, _ in self.calls if name == method)
+
+    def invalidate_file_id(self, file_id):
+        """Отзывает file_id: следующая отправка по нему получит 400"""
+        self.file_ids.discard(file_id)
+
+    def reset(self):
+        self.calls.clear()
+        self.uploads.clear()
+        self.first_sent.clear()
+        self.sent.clear()
+
+    async def do_request(self, url, method, request_data=None, read_timeout=None,
+                         write_timeout=None, connect_timeout=None, pool_timeout=None):
+        endpoint = url.rsplit("/", 1)[-1]
+        params = request_data.parameters if request_data else {}
+        self.calls.append((endpoint, params))
+        if self.stall and endpoint != "getUpdates":
+            await self._hang(self.read_timeout if read_timeout is BaseRequest.DEFAULT_NONE else read_timeout)
+        if self.outage or endpoint in self.failing:
+            await asyncio.sleep(0.01)
+            error = {"ok": False, "error_code": 502, "description": "Bad Gateway"}
+            return 502, json.dumps(error).encode("utf-8")
+        if endpoint == "sendMessage":
+            self.first_sent.setdefault(params.get("chat_id"), asyncio.get_running_loop().time())
+            error = self._check_send(params.get("chat_id"))
+            if error:
+                return error
+
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+        field = MEDIA_FIELDS.get(endpoint)
+        if field:
+            if request_data and request_data.contains_files:
+                file_id = f"FAKE-{field.upper()}-{len(self.uploads) + 1}"
+                self.uploads.append((endpoint, file_id))
+                self.file_ids.add(file_id)
+            else:
+                file_id = params.get(field)
+                if file_id not in self.file_ids:
+                    error = {"ok": False, "error_code": 400, "description": WRONG_FILE_ID}
+                    return 400, json.dumps(error).encode("utf-8")
+            message = self._sent_message(params)
+            message[field] = self._media(field, file_id)
+            return 200, json.dumps({"ok": True, "result": message}).encode("utf-8")
+
+        result = await self._dispatch(endpoint, params)
+        return 200, json.dumps({"ok": True, "result": result}).encode("utf-8")
+
+    async def _hang(self, timeout):
+        """Ждет stall секунд (меньше, если stall сняли) или бросает TimedOut по таймауту"""
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        while self.stall and loop.time() - started < self.stall:
+            if timeout is not None and loop.time() - started >= timeout:
+                raise TimedOut()
+            await asyncio.sleep(0.01)
+
+    def _check_send(self, chat_id):
+        """Ответ 429 или 403 вместо отправки, как у настоящего Bot API"""
+        if self.flood_limit:
+            now = asyncio.get_running_loop().time()
+            while self._send_times and now - self._send_times[0] >= 1.0:
+                self._send_times.popleft()
+            if len(self._send_times) >= self.flood_limit:
+                self.flood_errors += 1
+                error = {"ok": False, "error_code": 429, "description": "Too Many Requests: retry after 1",
+                         "parameters": {"retry_after": 1}}
+                return 429, json.dumps(error).encode("utf-8")
+            self._send_times.append(now)
+        if chat_id in self.blocked:
+            error = {"ok": False, "error_code": 403, "description": BOT_BLOCKED}
+            return 403, json.dumps(error).encode("utf-8")
+        return None
+
+    @staticmethod
+    def _media(field, file_id):
+        media = {"file_id": file_id, "file_unique_id": f"{file_id}-U",
+                 "width": 1280, "height": 720, "duration": 60}
+        return [media] if field == "photo" else media
+
+    async def _dispatch(self, endpoint, params):
+        if endpoint == "getMe":
+            return self.bot_user
+        if endpoint == "getUpdates":
+            return await self._get_updates(params)
+        if endpoint == "deleteWebhook" and params.get("drop_pending_updates"):
+            # drop_pending_updates=True в start_polling: накопленные апдейты теряются
+            self.dropped += len(self.updates)
+            self.updates.clear()
+        if endpoint == "getChat":
+            chat_id = int(params["chat_id"])
+            return {"id": chat_id, "type": "private" if chat_id > 0 else "supergroup",
+                    "permissions": self.chat_permissions}
+        if endpoint.startswith("send"):
+            return self._sent_message(params)
+        return True
+
+    async def _get_updates(self, params):
+        offset = int(params.get("offset") or 0)
+        # Как Telegram: без allowed_updates - все, кроме chat_member и реакций
+        allowed = set(params.get("allowed_updates") or ()) or DEFAULT_ALLOWED_UPDATES
+        while self.updates and self.updates[0]["update_id"] < offset:
+            self.updates.popleft()
+        pending = [update for update in self.updates if allowed.intersection(update)]
+        if len(pending) < len(self.updates):
+            self.filtered += len(self.updates) - len(pending)
+            self.updates = deque(pending)
+
+        if not self.updates:
+            # Имитация long polling без реального ожидания
+            await asyncio.sleep(0.01)
+            return []
+
+        limit = int(params.get("limit") or 100)
+        return [self.updates[i] for i in range(min(limit, len(self.updates)))]
+
+    def _sent_message(self, params):
+        self._message_id += 1
+        chat_id = params.get("chat_id", 0)
+        self.sent.append((chat_id, self._message_id))
+        is_private = isinstance(chat_id, int) and chat_id > 0
+        message = {
+            "message_id": self._message_id,
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private" if is_private else "supergroup"},
+            "from": self.bot_user,
+        }
+        if "text" in params:
+            message["text"] = params["text"]
+        return message
@@ -1,8 +1,15 @@
 import logging
-from telegram import Update, InlineQueryResultArticle, InputTextMessageContent
-from telegram.ext import ContextTypes
+from telegram import (Update, InlineKeyboardButton, InlineKeyboardMarkup, InlineQueryResultArticle,
+                      InputTextMessageContent)
+from telegram.ext import ApplicationHandlerStop, ContextTypes
 from config import Config
 from messages import BotMessages
+from analytics import EVENT_ENGAGEMENT, EVENT_FILES, EVENT_JOIN, EVENT_START
+from matcher import INTENT_ENGAGEMENT, INTENT_FILES, INTENT_JOIN
+from metrics import format_stats
+from broadcast import format_progress
+from runtime import get_runtime
+from verification import VERIFY_CALLBACK
 
 # Настройка логирования
 logging.basicConfig(
@@ -11,123 +18,327 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Вид ответа без интента: стартовое сообщение (личка, упоминание, ответ боту, /start)
+REPLY_START = "start"
+REPLY_HELP = "help"
+
 class BotHandlers:
     
     @staticmethod
     async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Обработчик команды /start"""
-        message = BotMessages.format_message(
-            BotMessages.START_MESSAGE, 
-            Config.ADMIN_CONTACT
-        )
+        runtime = get_runtime(context)
+        if not runtime.catch_up(update.message, REPLY_START):
+            return
+        message = runtime.precomputed.render(BotMessages.START_MESSAGE)
         await update.message.reply_text(message, parse_mode='Markdown')
         logger.info(f"Start command from user {update.effective_user.id}")
 
     @staticmethod
     async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Обработчик команды /help"""
-        message = BotMessages.format_message(
-            BotMessages.GROUP_INFO_MESSAGE, 
-            Config.ADMIN_CONTACT
-        )
+        runtime = get_runtime(context)
+        if not runtime.catch_up(update.message, REPLY_HELP):
+            return
+        message = runtime.precomputed.render(BotMessages.GROUP_INFO_MESSAGE)
         await update.message.reply_text(message, parse_mode='Markdown')
         logger.info(f"Help command from user {update.effective_user.id}")
 
     @staticmethod
     async def info_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Обработчик команды /info - полная информация"""
-        message = BotMessages.format_message(
-            BotMessages.MAIN_INFO_MESSAGE, 
-            Config.ADMIN_CONTACT
-        )
+        # Тот же ответ, что на вопрос о вступлении: при догонянии сворачиваются вместе
+        runtime = get_runtime(context)
+        if not runtime.catch_up(update.message, INTENT_JOIN):
+            return
+        message = runtime.precomputed.render(BotMessages.MAIN_INFO_MESSAGE)
         await update.message.reply_text(message, parse_mode='Markdown')
+        await BotHandlers.send_media(update, context, 'veo_guide')
         logger.info(f"Info command from user {update.effective_user.id}")
 
+    @staticmethod
+    async def send_media(update: Update, context: ContextTypes.DEFAULT_TYPE, name):
+        """Отправляет медиафайл из реестра в личный чат (по кэшированному file_id)"""
+        media = get_runtime(context).media
+        chat = update.effective_chat
+        if not media or not chat or chat.type != 'private' or not media.available(name):
+            return
+        try:
+            await media.send(context.bot, chat.id, name)
+        except Exception as e:
+            logger.error(f"Не удалось отправить медиа {name}: {e}")
+
+    @staticmethod
+    def is_admin(update: Update, context: ContextTypes.DEFAULT_TYPE = None):
+        """Проверяет, что команду вызвал администратор бота (по умолчанию Config.ADMIN_IDS)"""
+        admin_ids = get_runtime(context).admin_ids if context is not None else Config.ADMIN_IDS
+        return bool(update.effective_user) and update.effective_user.id in admin_ids
+
+    @staticmethod
+    async def funnel_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Обработчик команды /funnel [часы] - сводка воронки лидов (только для админов)"""
+        if not BotHandlers.is_admin(update, context):
+            logger.info(f"Funnel command denied for user {update.effective_user.id}")
+            return
+
+        analytics = get_runtime(context).analytics
+        if not analytics:
+            await update.message.reply_text("📈 Аналитика воронки отключена")
+            return
+
+        hours = 24
+        if context.args and context.args[0].isdigit():
+            hours = max(1, min(int(context.args[0]), 24 * 31))
+        await update.message.reply_text(await analytics.format_summary(hours))
+        logger.info(f"Funnel command from admin {update.effective_user.id}")
+
+    @staticmethod
+    async def stats_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Обработчик команды /stats - живые метрики бота (только для админов)"""
+        if not BotHandlers.is_admin(update, context):
+            logger.info(f"Stats command denied for user {update.effective_user.id}")
+            return
+
+        await update.message.reply_text(format_stats(get_runtime(context)))
+        logger.info(f"Stats command from admin {update.effective_user.id}")
+
+    @staticmethod
+    async def profile_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Обработчик команды /profile [секунд] - профиль CPU работающего бота (только для админов).
+
+        Профиль идет в фоне; по окончании бот присылает горячие функции и пути файлов.
+        """
+        if not BotHandlers.is_admin(update, context):
+            logger.info(f"Profile command denied for user {update.effective_user.id}")
+            return
+
+        profiler = get_runtime(context).profiler
+        if not profiler:
+            await update.message.reply_text("🔥 Профилирование отключено")
+            return
+        if not profiler.available:
+            await update.message.reply_text("🔥 Профилирование недоступно на этой платформе")
+            return
+
+        seconds = None
+        if context.args and context.args[0].isdigit():
+            seconds = int(context.args[0])
+        message = update.message
+        task = profiler.launch(seconds, on_done=lambda profile: message.reply_text(profile.report()))
+        if task is None:
+            await message.reply_text("🔥 Профилирование уже идет")
+            return
+        seconds = min(seconds or profiler.default_seconds, profiler.max_seconds)
+        await message.reply_text(f"🔥 Профилирую {seconds:.0f} с, результат пришлю по окончании")
+        logger.info(f"Profile command from admin {update.effective_user.id}")
+
+    @staticmethod
+    async def broadcast_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Обработчик команды /broadcast <текст> - рассылка подписчикам (только для админов).
+
+        Без текста показывает прогресс последней рассылки.
+        """
+        if not BotHandlers.is_admin(update, context):
+            logger.info(f"Broadcast command denied for user {update.effective_user.id}")
+            return
+
+        broadcaster = get_runtime(context).broadcaster
+        if not broadcaster:
+            await update.message.reply_text("📣 Рассылки отключены")
+            return
+
+        # Текст после команды целиком, с переносами строк
+        parts = update.message.text.split(maxsplit=1)
+        if len(parts) < 2:
+            job = broadcaster.latest()
+            await update.message.reply_text(f"📣 {format_progress(job)}" if job else "📣 Рассылок еще не было")
+            return
+
+        job = broadcaster.create(parts[1].strip())
+        broadcaster.launch(job)
+        await update.message.reply_text(
+            f"📣 Рассылка {job['id']} запущена: {job['total']} подписчиков, "
+            f"~{job['total'] / broadcaster.rate:.0f} с при {broadcaster.rate:.0f} сообщ/с"
+        )
+        logger.info(f"Broadcast {job['id']} started by admin {update.effective_user.id}")
+
     @staticmethod
     async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Обработчик обычных сообщений"""
         if not update.message or not update.message.text:
             return
+        await BotHandlers.respond(update, context, update.message)
 
-        message_text = update.message.text.lower()
-        user_id = update.effective_user.id
-        chat_type = update.message.chat.type
-        
-        logger.info(f"Message from user {user_id} in {chat_type}: {message_text[:50]}...")
+    @staticmethod
+    async def handle_edited_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Правка сообщения: отвечаем, только если на новый текст положен другой ответ"""
+        message = update.edited_message
+        if not message or not message.text:
+            return
+        runtime = get_runtime(context)
+        key = (message.chat.id, message.message_id)
+        if runtime.replies is None or key not in runtime.replies:
+            # Исходное сообщение этот процесс не видел: старая правка или до перезапуска
+            logger.info(f"Ignoring edit of unseen message {message.message_id} in {message.chat.id}")
+            return
+        kind, _ = BotHandlers.reply_kind(runtime, message)
+        if kind is None or kind == runtime.replies[key]:
+            logger.info(f"Edit of message {message.message_id} needs no new reply ({kind})")
+            return
+        await BotHandlers.respond(update, context, message)
+
+    @staticmethod
+    def reply_kind(runtime, message):
+        """Какой ответ положен на текст: (интент или REPLY_START или None, интент)"""
+        message_text = message.text.lower()
+        # Проверяем ключевые слова (один проход скомпилированного матчера)
+        intent = runtime.precomputed.classify(message_text)
+        if intent is not None:
+            return intent, intent
 
-        # В группах отвечаем только если:
+        # В группах без ключевых слов отвечаем только если:
         # 1. Сообщение содержит упоминание бота
         # 2. Сообщение является ответом на сообщение бота
-        # 3. Сообщение содержит ключевые слова
+        is_group = message.chat.type in ['group', 'supergroup']
+        bot_mentioned = any(mention in message_text for mention in runtime.mentions)
+        is_reply_to_bot = (message.reply_to_message and
+                          message.reply_to_message.from_user and
+                          message.reply_to_message.from_user.is_bot)
+        # В приватном чате отвечаем всегда
+        if not is_group or bot_mentioned or is_reply_to_bot:
+            return REPLY_START, None
+        return None, None
+
+    @staticmethod
+    async def respond(update: Update, context: ContextTypes.DEFAULT_TYPE, message):
+        """Ответ на текст сообщения (нового или исправленного) по интенту"""
+        user_id = update.effective_user.id
+        chat_id = message.chat.id
+        chat_type = message.chat.type
+        runtime = get_runtime(context)
+        precomputed = runtime.precomputed
+
+        logger.info(f"Message from user {user_id} in {chat_type}: {message.text.lower()[:50]}...")
+
         is_group = chat_type in ['group', 'supergroup']
-        bot_mentioned = '@saint_buddah_bot' in message_text or 'saint_buddah' in message_text
-        is_reply_to_bot = (update.message.reply_to_message and 
-                          update.message.reply_to_message.from_user and
-                          update.message.reply_to_message.from_user.is_bot)
-        
-        # Проверяем ключевые слова
-        has_join_keywords = any(keyword in message_text for keyword in Config.JOIN_KEYWORDS)
-        has_files_keywords = any(keyword in message_text for keyword in Config.FILES_KEYWORDS)
-        has_engagement_keywords = any(keyword in message_text for keyword in Config.ENGAGEMENT_KEYWORDS)
-        
-        # В приватном чате отвечаем всегда, в группе - только при определенных условиях
-        should_respond = (not is_group) or bot_mentioned or is_reply_to_bot or has_join_keywords or has_files_keywords or has_engagement_keywords
-        
-        if not should_respond:
+        kind, intent = BotHandlers.reply_kind(runtime, message)
+        # Правки сверяются с ответом на исходное сообщение
+        runtime.remember_reply(chat_id, message.message_id, None)
+
+        if kind is None:
             logger.info(f"Ignoring message in group without trigger")
             return
 
+        # Правка - то же обращение: воронка и лиды считают только исходное сообщение
+        counted = update.edited_message is None
+        if counted:
+            runtime.record_lead(user_id, chat_id, chat_type, intent)
+
+        # Накопленное за простой: один ответ на вид, без устаревших триггеров в группах
+        if not runtime.catch_up(message, kind):
+            logger.info(f"Catch-up: skipping {kind} reply to user {user_id}")
+            return
+
+        # В группах не повторяем один и тот же ответ пользователю чаще кулдауна
+        if is_group and not runtime.allow_reply(chat_id, user_id, intent or 'mention'):
+            logger.info(f"Cooldown: skipping {intent or 'mention'} reply to user {user_id}")
+            return
+
         # Приоритет ответов: файлы > вступление > взаимодействие > упоминания
-        
+
         # Проверяем запросы файлов (высший приоритет)
-        if has_files_keywords:
-            response = BotMessages.format_message(
-                BotMessages.FILES_REQUEST_MESSAGE, 
-                Config.ADMIN_CONTACT
-            )
-            await update.message.reply_text(response, parse_mode='Markdown')
+        if kind == INTENT_FILES:
+            response = precomputed.render(BotMessages.FILES_REQUEST_MESSAGE)
+            sent = await message.reply_text(response, parse_mode='Markdown')
+            await BotHandlers.send_media(update, context, 'materials')
+            event = EVENT_FILES
             logger.info(f"Sent files request message to user {user_id}")
-            
+
         # Проверяем запросы о вступлении
-        elif has_join_keywords:
-            response = BotMessages.format_message(
-                BotMessages.MAIN_INFO_MESSAGE, 
-                Config.ADMIN_CONTACT
-            )
-            await update.message.reply_text(response, parse_mode='Markdown')
+        elif kind == INTENT_JOIN:
+            response = precomputed.render(BotMessages.MAIN_INFO_MESSAGE)
+            sent = await message.reply_text(response, parse_mode='Markdown')
+            await BotHandlers.send_media(update, context, 'veo_guide')
+            event = EVENT_JOIN
             logger.info(f"Sent join info to user {user_id}")
-            
+
         # Проверяем ключевые слова для общего взаимодействия
-        elif has_engagement_keywords:
-            response = BotMessages.format_message(
-                BotMessages.ENGAGEMENT_MESSAGE, 
-                Config.ADMIN_CONTACT
-            )
-            await update.message.reply_text(response, parse_mode='Markdown')
+        elif kind == INTENT_ENGAGEMENT:
+            response = precomputed.render(BotMessages.ENGAGEMENT_MESSAGE)
+            sent = await message.reply_text(response, parse_mode='Markdown')
+            event = EVENT_ENGAGEMENT
             logger.info(f"Sent engagement message to user {user_id}")
-        
-        # Если упоминули бота, но нет ключевых слов - отправляем стартовое сообщение
-        elif bot_mentioned or is_reply_to_bot:
-            response = BotMessages.format_message(
-                BotMessages.START_MESSAGE, 
-                Config.ADMIN_CONTACT
-            )
-            await update.message.reply_text(response, parse_mode='Markdown')
-            logger.info(f"Sent start message to user {user_id} (bot mentioned)")
-        
-        # В приватном чате, если нет ключевых слов - отправляем стартовое сообщение
-        elif not is_group:
-            response = BotMessages.format_message(
-                BotMessages.START_MESSAGE, 
-                Config.ADMIN_CONTACT
+
+        # Упомянули бота без ключевых слов или написали в личку - стартовое сообщение
+        else:
+            response = precomputed.render(BotMessages.START_MESSAGE)
+            sent = await message.reply_text(response, parse_mode='Markdown')
+            event = EVENT_START
+            reason = "bot mentioned" if is_group else "private chat fallback"
+            logger.info(f"Sent start message to user {user_id} ({reason})")
+
+        if counted:
+            runtime.track(event, chat_id, user_id)
+        runtime.remember_reply(chat_id, message.message_id, kind)
+
+        # Ответы в группах удаляются через GROUP_REPLY_TTL_SECONDS, чтобы не засорять чат
+        if is_group:
+            runtime.expire_reply(sent)
+
+    @staticmethod
+    def parse_offset(offset):
+        """Номер первой записи страницы из offset inline-запроса"""
+        return int(offset) if isinstance(offset, str) and offset.isdigit() else 0
+
+    @staticmethod
+    def catalog_results(catalog, query, offset):
+        """Страница результатов поиска по каталогу и next_offset для следующей"""
+        if not catalog or not query.strip():
+            return [], None
+        entries, has_more = catalog.search(query, offset, Config.INLINE_PAGE_SIZE)
+        results = [
+            InlineQueryResultArticle(
+                id=f"catalog:{entry.id}"[:64],
+                title=entry.title,
+                description=entry.description[:200],
+                input_message_content=InputTextMessageContent(message_text=entry.text)
             )
-            await update.message.reply_text(response, parse_mode='Markdown')
-            logger.info(f"Sent start message to user {user_id} (private chat fallback)")
+            for entry in entries
+        ]
+        next_offset = str(offset + len(entries)) if has_more else None
+        return results, next_offset
 
     @staticmethod
     async def handle_inline_query(update: Update, context: ContextTypes.DEFAULT_TYPE):
-        """Обработчик inline-запросов"""
-        query = update.inline_query.query.lower() if update.inline_query.query else ""
+        """Обработчик inline-запросов: отвечает только на самый свежий запрос пользователя"""
+        inline = get_runtime(context).inline
+        if not inline or not update.inline_query.from_user:
+            await BotHandlers.answer_inline_query(update, context)
+            return
+
+        answered = await inline.run(
+            update.inline_query.from_user.id,
+            update.inline_query.id,
+            lambda: BotHandlers.answer_inline_query(update, context)
+        )
+        if not answered:
+            logger.info(f"Skipped superseded inline query from user {update.inline_query.from_user.id}")
+
+    @staticmethod
+    async def answer_inline_query(update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Собирает результаты и отвечает на inline-запрос"""
+        raw_query = update.inline_query.query or ""
+        query = raw_query.lower()
+        offset = BotHandlers.parse_offset(update.inline_query.offset)
+        runtime = get_runtime(context)
+        precomputed = runtime.precomputed
+        
+        # Поиск по каталогу; следующие страницы приходят с offset из next_offset
+        catalog_results, next_offset = BotHandlers.catalog_results(runtime.catalog, raw_query, offset)
+        if offset:
+            await update.inline_query.answer(catalog_results, cache_time=300, next_offset=next_offset)
+            logger.info(f"Answered inline query page: '{query}' offset {offset}")
+            return
         
         results = []
         
@@ -140,10 +351,7 @@ class BotHandlers:
                     title="📁 Хочешь файлы и промпты?",
                     description="2000+ промптов, шаблоны, AI-инструменты",
                     input_message_content=InputTextMessageContent(
-                        message_text=BotMessages.format_message(
-                            BotMessages.FILES_REQUEST_MESSAGE, 
-                            Config.ADMIN_CONTACT
-                        ),
+                        message_text=precomputed.render(BotMessages.FILES_REQUEST_MESSAGE),
                         parse_mode='Markdown'
                     )
                 )
@@ -157,10 +365,7 @@ class BotHandlers:
                     title="💎 Как вступить в Buddah Base",
                     description="Полная информация о VEO 3 и подписке за 999₽",
                     input_message_content=InputTextMessageContent(
-                        message_text=BotMessages.format_message(
-                            BotMessages.MAIN_INFO_MESSAGE, 
-                            Config.ADMIN_CONTACT
-                        ),
+                        message_text=precomputed.render(BotMessages.MAIN_INFO_MESSAGE),
                         parse_mode='Markdown'
                     )
                 )
@@ -174,10 +379,7 @@ class BotHandlers:
                     title="🔥 Заинтересовался?",
                     description="Получи доступ к VEO 3 и AI-инструментам",
                     input_message_content=InputTextMessageContent(
-                        message_text=BotMessages.format_message(
-                            BotMessages.ENGAGEMENT_MESSAGE, 
-                            Config.ADMIN_CONTACT
-                        ),
+                        message_text=precomputed.render(BotMessages.ENGAGEMENT_MESSAGE),
                         parse_mode='Markdown'
                     )
                 )
@@ -190,33 +392,114 @@ class BotHandlers:
                 title="📌 О группе Buddah Base",
                 description="Структура группы и что внутри",
                 input_message_content=InputTextMessageContent(
-                    message_text=BotMessages.format_message(
-                        BotMessages.GROUP_INFO_MESSAGE, 
-                        Config.ADMIN_CONTACT
-                    ),
+                    message_text=precomputed.render(BotMessages.GROUP_INFO_MESSAGE),
                     parse_mode='Markdown'
                 )
             )
         )
         
-        await update.inline_query.answer(results, cache_time=300)
+        results.extend(catalog_results)
+        
+        await update.inline_query.answer(results, cache_time=300, next_offset=next_offset)
         logger.info(f"Answered inline query: '{query}' with {len(results)} results")
 
     @staticmethod
     async def handle_new_member(update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Обработчик новых участников группы"""
+        runtime = get_runtime(context)
+        if runtime.verifier:
+            await BotHandlers.challenge_new_members(update, context)
+            return
         for member in update.message.new_chat_members:
-            welcome_message = BotMessages.format_message(
-                BotMessages.GROUP_INFO_MESSAGE, 
-                Config.ADMIN_CONTACT
-            )
-            await update.message.reply_text(
-                f"👋 Добро пожаловать, {member.first_name}!\n\n{welcome_message}", 
-                parse_mode='Markdown'
-            )
-            logger.info(f"Welcomed new member: {member.first_name} (ID: {member.id})")
+            runtime.record_member(update.message.chat.id, member.id)
+            await BotHandlers.welcome(update.message, member, runtime)
+
+    @staticmethod
+    async def welcome(message, member, runtime):
+        """Приветствие участника группы"""
+        welcome_message = runtime.precomputed.render(BotMessages.GROUP_INFO_MESSAGE)
+        sent = await message.reply_text(
+            f"👋 Добро пожаловать, {member.first_name}!\n\n{welcome_message}", 
+            parse_mode='Markdown'
+        )
+        runtime.expire_reply(sent)
+        logger.info(f"Welcomed new member: {member.first_name} (ID: {member.id})")
+
+    @staticmethod
+    async def challenge_new_members(update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Ограничивает вошедших до нажатия кнопки "Я не бот" (JOIN_VERIFICATION)"""
+        runtime = get_runtime(context)
+        verifier = runtime.verifier
+        chat_id = update.message.chat.id
+        send_challenge = False
+        for member in update.message.new_chat_members:
+            # Ботов добавляют администраторы, и нажать кнопку они не могут
+            if member.is_bot:
+                continue
+            send_challenge |= verifier.challenge(context.bot, chat_id, member.id)
+        if not send_challenge:
+            return
+        keyboard = InlineKeyboardMarkup([[InlineKeyboardButton(BotMessages.VERIFY_BUTTON,
+                                                               callback_data=VERIFY_CALLBACK)]])
+        sent = await context.bot.send_message(
+            chat_id,
+            BotMessages.VERIFY_CHALLENGE_MESSAGE.format(timeout=int(verifier.timeout)),
+            reply_markup=keyboard,
+        )
+        runtime.expire_reply(sent)
+
+    @staticmethod
+    async def verify_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Нажатие кнопки "Я не бот": снимает ограничение и приветствует участника"""
+        query = update.callback_query
+        runtime = get_runtime(context)
+        message = query.message
+        if not runtime.verifier or message is None:
+            await query.answer()
+            return
+        member = query.from_user
+        if not runtime.verifier.verify(context.bot, message.chat.id, member.id):
+            await query.answer(BotMessages.VERIFY_NOT_NEEDED)
+            return
+        await query.answer(BotMessages.VERIFY_PASSED)
+        runtime.record_member(message.chat.id, member.id)
+        await BotHandlers.welcome(message, member, runtime)
+
+    @staticmethod
+    async def guard_group_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Модерация: темы форума и антиспам до остальных обработчиков сообщений группы"""
+        verdict = get_runtime(context).moderate(context.bot, update.effective_message)
+        if verdict:
+            logger.info(f"Moderation ({verdict}) for user {update.effective_user.id}, message queued for deletion")
+            # Дальше обработчики не вызываются, но update_id учитываем как обработанный
+            await BotHandlers.track_update(update, context)
+            raise ApplicationHandlerStop
+
+    @staticmethod
+    async def track_update(update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Запоминает последний обработанный update_id и подписчиков рассылки"""
+        runtime = get_runtime(context)
+        runtime.record_update(update.update_id)
+        chat = update.effective_chat
+        if chat and chat.type == 'private':
+            runtime.subscribe(chat.id)
 
     @staticmethod
     async def error_handler(update: object, context: ContextTypes.DEFAULT_TYPE):
         """Обработчик ошибок"""
-        logger.error(f"Exception while handling an update: {context.error}")
\ No newline at end of file
+        runtime = get_runtime(context)
+        runtime.metrics.errors += 1
+        # Группировка по типу и методу Bot API, в лог - первая ошибка группы и сводки
+        runtime.errors.record(context.error, update if isinstance(update, Update) else None)
+
+
+# Команды бота: bot.py регистрирует их обработчики, LoadShedder считает их критичными
+COMMANDS = {
+    "start": BotHandlers.start_command,
+    "help": BotHandlers.help_command,
+    "info": BotHandlers.info_command,
+    "funnel": BotHandlers.funnel_command,
+    "stats": BotHandlers.stats_command,
+    "profile": BotHandlers.profile_command,
+    "broadcast": BotHandlers.broadcast_command,
+}
@@ -0,0 +1,247 @@
+"""
+Проверки живости и готовности процесса бота по HTTP: GET /healthz и GET /readyz.
+
+Процесс, который есть в списке процессов, еще не работает: бот может часами крутиться
+в цикле ошибок getUpdates (сеть, неверный токен, конфликт двух экземпляров). Поэтому:
+
+- PollingTracker - транспорт getUpdates, запоминающий исход каждого long polling:
+  время последнего успешного ответа, число ошибок подряд и последнюю ошибку;
+- /readyz - 200, если getUpdates отвечал не позже HEALTH_POLL_MAX_AGE назад, цикл
+  событий не отстает больше HEALTH_MAX_LAG, очередь апдейтов ниже MAX_BACKLOG,
+  исходящих запросов в полете меньше HEALTH_MAX_OUTBOUND и ни одна цепь
+  предохранителя Bot API (breaker.py) не разомкнута; иначе 503;
+- /healthz - 503, только если процесс, похоже, не восстановится сам: getUpdates не
+  отвечает дольше HEALTH_STUCK_SECONDS. Перезапускать по нему. Задержку цикла событий
+  /healthz не проверяет: отставший цикл догоняет сам (это повод для /readyz), а стоящий
+  не ответит на запрос вовсе - таймаут запроса тоже означает "нездоров".
+
+Тело ответа - JSON с результатом каждой проверки. Ответ собирается из счетчиков без
+обхода истории, поэтому опрашивать можно хоть каждую секунду.
+"""
+
+import asyncio
+import json
+import logging
+import time
+
+from telegram.request import BaseRequest
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+STATUS_TEXT = {200: "OK", 404: "Not Found", 405: "Method Not Allowed", 503: "Service Unavailable"}
+
+
+class PollingTracker(BaseRequest):
+    """Транспорт getUpdates, запоминающий исход каждого long polling"""
+
+    def __init__(self, request):
+        self._request = request
+        self.started = time.monotonic()
+        self.last_success = None
+        self.last_failure = None
+        self.last_error = None
+        self.failures = 0
+        self.polls = 0
+
+    @property
+    def read_timeout(self):
+        return self._request.read_timeout
+
+    async def initialize(self):
+        await self._request.initialize()
+
+    async def shutdown(self):
+        await self._request.shutdown()
+
+    async def do_request(self, url, method, request_data=None, **kwargs):
+        if not url.endswith("/getUpdates"):
+            return await self._request.do_request(url, method, request_data, **kwargs)
+        try:
+            code, payload = await self._request.do_request(url, method, request_data, **kwargs)
+        except Exception as e:
+            self._failed(f"{type(e).__name__}: {e}")
+            raise
+        if code == 200:
+            self.polls += 1
+            self.failures = 0
+            self.last_success = time.monotonic()
+        else:
+            self._failed(f"HTTP {code}")
+        return code, payload
+
+    def _failed(self, error):
+        self.failures += 1
+        self.last_failure = time.monotonic()
+        self.last_error = error
+
+    def age(self, now=None):
+        """Секунды с последнего успешного getUpdates (с запуска, если успехов не было)"""
+        return (now or time.monotonic()) - (self.last_success or self.started)
+
+
+class HealthCheck:
+    """Живость и готовность одного бота по его runtime и PollingTracker"""
+
+    def __init__(self, runtime, polling=None, poll_max_age=60.0, stuck_seconds=300.0, max_lag=1.0,
+                 max_outbound=100, max_backlog=200):
+        self.runtime = runtime
+        self.polling = polling
+        self.poll_max_age = poll_max_age
+        self.stuck_seconds = stuck_seconds
+        self.max_lag = max_lag
+        self.max_outbound = max_outbound
+        self.max_backlog = max_backlog
+
+    @classmethod
+    def from_config(cls, runtime, polling=None):
+        return cls(runtime, polling, poll_max_age=Config.HEALTH_POLL_MAX_AGE,
+                   stuck_seconds=Config.HEALTH_STUCK_SECONDS, max_lag=Config.HEALTH_MAX_LAG,
+                   max_outbound=Config.HEALTH_MAX_OUTBOUND, max_backlog=Config.MAX_BACKLOG)
+
+    def evaluate(self, now=None):
+        """(жив, готов, проверки) - проверки с числами для тела ответа"""
+        now = now or time.monotonic()
+        metrics = self.runtime.metrics
+        checks = {}
+        alive = ready = True
+
+        if self.polling is not None:
+            age = self.polling.age(now)
+            ok = age <= self.poll_max_age
+            checks["polling"] = {
+                "ok": ok,
+                "last_success_ago": round(age, 3) if self.polling.last_success else None,
+                "polls": self.polling.polls,
+                "failures": self.polling.failures,
+                "last_error": self.polling.last_error if self.polling.failures else None,
+            }
+            ready = ready and ok
+            alive = alive and age <= self.stuck_seconds
+
+        monitor = self.runtime.monitor
+        if monitor is not None:
+            lag = monitor.last_lag
+            ok = lag <= self.max_lag
+            checks["loop"] = {"ok": ok, "lag_ms": round(lag * 1000, 2),
+                              "p99_ms": round(monitor.lag.percentile(99), 2),
+                              "blocked": monitor.slow_total}
+            ready = ready and ok
+
+        ok = metrics.outbound_in_flight < self.max_outbound
+        checks["outbound"] = {"ok": ok, "in_flight": metrics.outbound_in_flight,
+                              "peak": metrics.outbound_peak, "errors": metrics.outbound_errors}
+        ready = ready and ok
+
+        breakers = self.runtime.breakers
+        if breakers is not None:
+            opened = breakers.open_methods()
+            checks["breaker"] = {"ok": not opened, "open": opened, "rejected": breakers.rejected}
+            ready = ready and not opened
+
+        ok = metrics.backlog < self.max_backlog
+        checks["updates"] = {"ok": ok, "backlog": metrics.backlog, "total": metrics.updates_total}
+        ready = ready and ok
+        return alive, ready, checks
+
+
+class HealthServer:
+    """Минимальный HTTP/1.1-сервер /healthz и /readyz для ботов процесса"""
+
+    def __init__(self, checks):
+        # Имя бота -> HealthCheck; процесс готов, когда готовы все боты
+        self.checks = checks
+        self.requests = 0
+        self._server = None
+
+    @property
+    def port(self):
+        return self._server.sockets[0].getsockname()[1]
+
+    async def start(self, host="127.0.0.1", port=8081):
+        self._server = await asyncio.start_server(self._serve, host, port)
+        logger.info(f"🩺 Проверки здоровья: http://{host}:{self.port}/healthz, /readyz")
+
+    async def stop(self):
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+
+    def report(self):
+        """(жив, готов, тело ответа)"""
+        now = time.monotonic()
+        alive = ready = True
+        bots = {}
+        for name, check in self.checks.items():
+            bot_alive, bot_ready, checks = check.evaluate(now)
+            alive = alive and bot_alive
+            ready = ready and bot_ready
+            bots[name] = {"alive": bot_alive, "ready": bot_ready, "checks": checks}
+        return alive, ready, {"alive": alive, "ready": ready, "bots": bots}
+
+    def handle(self, method, target):
+        """(HTTP-статус, тело) ответа на запрос"""
+        path = target.split("?", 1)[0]
+        if path not in ("/healthz", "/readyz"):
+            return 404, {"error": "not found"}
+        if method not in ("GET", "HEAD"):
+            return 405, {"error": "method not allowed"}
+        alive, ready, body = self.report()
+        ok = alive if path == "/healthz" else ready
+        return (200 if ok else 503), body
+
+    async def _serve(self, reader, writer):
+        try:
+            while True:
+                request = await read_request_head(reader)
+                if request is None:
+                    break
+                method, target, headers = request
+                close = headers.get("connection", "").lower() == "close"
+                self.requests += 1
+                status, body = self.handle(method, target)
+                payload = json.dumps(body, ensure_ascii=False).encode("utf-8")
+                writer.write(f"HTTP/1.1 {status} {STATUS_TEXT[status]}\r\n"
+                             f"Content-Type: application/json; charset=utf-8\r\n"
+                             f"Cache-Control: no-store\r\n"
+                             f"Content-Length: {len(payload)}\r\n\r\n".encode("latin-1")
+                             + (payload if method != "HEAD" else b""))
+                await writer.drain()
+                if close:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+
+async def read_request_head(reader):
+    """(метод, путь, заголовки в нижнем регистре) запроса HTTP/1.1 или None в конце соединения"""
+    request_line = await reader.readline()
+    if not request_line:
+        return None
+    method, target, _ = request_line.decode("latin-1").split(" ", 2)
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    return method, target, headers
+
+
+async def start_health_server(checks, port=None):
+    """HealthServer на HEALTH_LISTEN:port (по умолчанию HEALTH_PORT); None, если
+    проверки выключены (HEALTH_PORT=0) или порт занят"""
+    if Config.HEALTH_PORT <= 0:
+        return None
+    port = Config.HEALTH_PORT if port is None else port
+    server = HealthServer(checks)
+    try:
+        await server.start(Config.HEALTH_LISTEN, port)
+    except OSError as e:
+        logger.warning(f"⚠️ Проверки здоровья не запущены на порту {port}: {e}")
+        return None
+    return server
@@ -0,0 +1,176 @@
+"""
+Задержка цикла событий и медленные колбэки.
+
+Блокирующий вызов в обработчике (синхронная запись в файл, time.sleep, тяжелый
+подсчет) останавливает цикл событий - и все чаты ждут. LoopMonitor замечает это:
+
+- задача-тикер просыпается каждые interval секунд; насколько позже срока она
+  проснулась - задержка цикла (гистограмма LatencyWindow за окно, в /stats);
+- поток-сторож проверяет, что тикер проснулся вовремя. Если цикл не отвечает
+  дольше slow_threshold, сторож снимает стек потока цикла (sys._current_frames) и
+  текущую задачу: какой обработчик (через runtime.timed) и какой апдейт ее вызвали.
+  Когда цикл оживает, запись о медленном колбэке получает длительность и пишется в лог.
+
+Блокировку длиннее interval + slow_threshold сторож замечает всегда, короче -
+видна в гистограмме задержки. Монитор один на цикл событий (боты multibot.py
+делят его), start/stop считают пользователей.
+"""
+
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+
+from config import Config
+from metrics import LatencyWindow
+
+logger = logging.getLogger(__name__)
+
+STACK_DEPTH = 12
+
+
+class LoopMonitor:
+    """Задержка цикла событий и медленные колбэки со стеком и обработчиком"""
+
+    def __init__(self, interval=0.05, slow_threshold=0.1, window=60, keep=20):
+        self.interval = interval
+        self.slow_threshold = slow_threshold
+        self.lag = LatencyWindow(window)
+        self.last_lag = 0.0
+        self.slow = deque(maxlen=keep)
+        self.slow_total = 0
+        # Задача -> (обработчик, update_id); пишет runtime.timed, читает сторож
+        self._active = {}
+        self._users = 0
+        self._loop = None
+        self._thread_id = None
+        self._deadline = None
+        self._pending = None
+        self._ticker = None
+        self._watchdog = None
+        self._stopped = threading.Event()
+
+    @classmethod
+    def from_config(cls):
+        return cls(interval=Config.LOOP_MONITOR_INTERVAL, slow_threshold=Config.LOOP_SLOW_CALLBACK_SECONDS,
+                   window=Config.METRICS_WINDOW_SECONDS)
+
+    # --- обработчики -----------------------------------------------------------------
+
+    def enter(self, handler, update):
+        """Отмечает, что текущая задача выполняет обработчик handler для update"""
+        task = asyncio.current_task()
+        if task is not None:
+            self._active[task] = (handler, getattr(update, "update_id", None))
+        return task
+
+    def exit(self, task):
+        if task is not None:
+            self._active.pop(task, None)
+
+    # --- жизненный цикл --------------------------------------------------------------
+
+    async def start(self):
+        self._users += 1
+        if self._users > 1:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._thread_id = threading.get_ident()
+        self._deadline = time.monotonic() + self.interval
+        self._stopped.clear()
+        self._ticker = self._loop.create_task(self._tick())
+        self._watchdog = threading.Thread(target=self._watch, name="loop-monitor", daemon=True)
+        self._watchdog.start()
+
+    async def stop(self):
+        if self._users == 0:
+            return
+        self._users -= 1
+        if self._users > 0:
+            return
+        self._stopped.set()
+        self._ticker.cancel()
+        try:
+            await self._ticker
+        except asyncio.CancelledError:
+            pass
+        await asyncio.to_thread(self._watchdog.join)
+
+    async def _tick(self):
+        previous = (None, 0.0)
+        while True:
+            deadline = self._deadline = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, time.monotonic() - deadline)
+            self.lag.record(lag)
+            self.last_lag = lag
+            pending, self._pending = self._pending, None
+            if pending is not None:
+                # Сторож мог снять стек уже после пробуждения прошлого тика
+                self._finish(pending, lag if pending["deadline"] == deadline else previous[1])
+            previous = (deadline, lag)
+
+    # --- сторож ----------------------------------------------------------------------
+
+    def _watch(self):
+        period = self.slow_threshold / 4
+        while not self._stopped.wait(period):
+            if self._pending is not None:
+                continue
+            deadline = self._deadline
+            if time.monotonic() - deadline >= self.slow_threshold:
+                self._pending = self._capture(deadline)
+
+    def _capture(self, deadline):
+        """Стек потока цикла и текущая задача в момент блокировки"""
+        frame = sys._current_frames().get(self._thread_id)
+        stack = traceback.extract_stack(frame, limit=STACK_DEPTH) if frame is not None else []
+        del frame
+        task = asyncio.current_task(self._loop)
+        handler, update_id = self._active.get(task, (None, None))
+        if handler is None and task is not None:
+            handler = getattr(task.get_coro(), "__qualname__", task.get_name())
+        return {
+            "at": time.time(),
+            "deadline": deadline,
+            "handler": handler,
+            "update_id": update_id,
+            "stack": [f"{frame.filename}:{frame.lineno} in {frame.name}" for frame in stack],
+        }
+
+    def _finish(self, record, lag):
+        record["duration_ms"] = round(lag * 1000, 1)
+        del record["deadline"]
+        self.slow.append(record)
+        self.slow_total += 1
+        where = record["stack"][-1] if record["stack"] else "?"
+        logger.warning(f"🐢 Цикл событий заблокирован на {record['duration_ms']:.0f} мс: "
+                       f"{record['handler'] or 'вне задач'} (update {record['update_id']}), {where}\n"
+                       + "\n".join(f"    {line}" for line in record["stack"]))
+
+    # --- отчет -----------------------------------------------------------------------
+
+    def format(self):
+        lines = [f"🐢 Цикл событий: задержка p50 {self.lag.percentile(50):.2f} / "
+                 f"p99 {self.lag.percentile(99):.2f} мс (макс {self.lag.max_ms:.0f}), "
+                 f"блокировок от {self.slow_threshold * 1000:.0f} мс: {self.slow_total}"]
+        if self.slow:
+            record = self.slow[-1]
+            where = record["stack"][-1] if record["stack"] else "?"
+            lines.append(f"  • последняя: {record['handler'] or 'вне задач'} "
+                         f"(update {record['update_id']}) {record['duration_ms']:.0f} мс, {where}")
+        return "\n".join(lines)
+
+
+_shared = None
+
+
+def shared_monitor():
+    """Монитор цикла событий процесса: общий для всех ботов процесса (multibot.py)"""
+    global _shared
+    if _shared is None:
+        _shared = LoopMonitor.from_config()
+    return _shared
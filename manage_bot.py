@@ -3,11 +3,13 @@
 Управление ботом - старт, стоп, статус, перезапуск
 """
 
+import json
 import subprocess
 import sys
 import time
 import signal
-import psutil
+import urllib.error
+import urllib.request
 from pathlib import Path
 
 class BotManager:
@@ -17,6 +19,8 @@ class BotManager:
     
     def get_bot_process(self):
         """Найти процесс бота"""
+        # psutil нужен только командам управления, не загружаем его при импорте
+        import psutil
         for proc in psutil.process_iter(['pid', 'name', 'cmdline']):
             try:
                 if 'python' in proc.info['name'] and any('bot.py' in cmd for cmd in proc.info['cmdline']):
@@ -53,6 +57,7 @@ class BotManager:
             return False
         
         print("🛑 Останавливаем бота...")
+        import psutil
         try:
             proc.terminate()
             proc.wait(timeout=10)
@@ -81,6 +86,7 @@ class BotManager:
             print(f"✅ Бот запущен (PID: {proc.pid})")
             print(f"📊 Использование CPU: {proc.cpu_percent():.1f}%")
             print(f"💾 Использование памяти: {proc.memory_info().rss / 1024 / 1024:.1f} MB")
+            ready = self.readiness()
             
             # Показать последние логи
             if Path(self.log_file).exists():
@@ -93,11 +99,34 @@ class BotManager:
                 except Exception as e:
                     print(f"   ❌ Ошибка чтения логов: {e}")
             
-            return True
+            # Процесс есть, но бот может крутиться в цикле ошибок getUpdates
+            return ready is not False
         else:
             print("❌ Бот не запущен")
             return False
     
+    def readiness(self, timeout=2.0):
+        """Готовность по /readyz работающего бота: True/False, None - проверки выключены"""
+        from config import Config
+        if Config.HEALTH_PORT <= 0:
+            return None
+        url = f"http://127.0.0.1:{Config.HEALTH_PORT}/readyz"
+        try:
+            with urllib.request.urlopen(url, timeout=timeout) as response:
+                body = json.load(response)
+        except urllib.error.HTTPError as e:
+            body = json.load(e)
+        except (OSError, ValueError) as e:
+            print(f"❌ Проверка готовности не ответила ({url}): {e}")
+            return False
+
+        print(f"{'✅ Готов' if body['ready'] else '❌ Не готов'} ({url})")
+        for name, bot in body["bots"].items():
+            for check, result in bot["checks"].items():
+                details = ", ".join(f"{key}={value}" for key, value in result.items() if key != "ok")
+                print(f"   {'✅' if result['ok'] else '❌'} {name}/{check}: {details}")
+        return body["ready"]
+
     def logs(self, lines=20):
         """Показать логи"""
         if not Path(self.log_file).exists():
@@ -0,0 +1,220 @@
+"""
+Скомпилированный матчер ключевых слов и предрендеренные шаблоны сообщений.
+
+Вместо трех проходов any(keyword in text) по спискам из config.py каждый интент
+проверяется одним регулярным выражением. Шаблоны из messages.py рендерятся с контактом
+администратора один раз. Результат сохраняется в файл кэша с отпечатком исходных данных
+и при следующем запуске загружается без повторной сборки.
+
+Боты одного процесса (multibot.py) с одинаковыми ключевыми словами, контактом и
+шаблонами получают общий экземпляр через shared_precomputed().
+"""
+
+import hashlib
+import json
+import logging
+import os
+import re
+import tempfile
+from contextlib import suppress
+
+from config import Config
+from messages import BotMessages
+from tracing import span
+
+logger = logging.getLogger(__name__)
+
+INTENT_FILES = "files"
+INTENT_JOIN = "join"
+INTENT_ENGAGEMENT = "engagement"
+
+# Приоритет ответов: файлы > вступление > взаимодействие
+INTENT_PRIORITY = (INTENT_FILES, INTENT_JOIN, INTENT_ENGAGEMENT)
+
+TEMPLATE_NAMES = (
+    "MAIN_INFO_MESSAGE",
+    "FILES_REQUEST_MESSAGE",
+    "GROUP_INFO_MESSAGE",
+    "ENGAGEMENT_MESSAGE",
+    "START_MESSAGE",
+    "UNKNOWN_COMMAND",
+)
+
+CACHE_VERSION = 1
+
+
+def config_keywords():
+    """Ключевые слова интентов из Config"""
+    return {
+        INTENT_FILES: Config.FILES_KEYWORDS,
+        INTENT_JOIN: Config.JOIN_KEYWORDS,
+        INTENT_ENGAGEMENT: Config.ENGAGEMENT_KEYWORDS,
+    }
+
+
+def build_pattern(keywords):
+    """Собирает регулярное выражение, эквивалентное any(keyword in text)"""
+    unique = sorted(set(keywords), key=lambda keyword: (-len(keyword), keyword))
+    return "|".join(re.escape(keyword) for keyword in unique)
+
+
+class KeywordMatcher:
+    """Определяет интент сообщения по скомпилированным выражениям"""
+
+    def __init__(self, patterns):
+        self.patterns = dict(patterns)
+        self._compiled = [
+            (intent, re.compile(self.patterns[intent]))
+            for intent in INTENT_PRIORITY
+            if self.patterns.get(intent)
+        ]
+
+    @classmethod
+    def from_keywords(cls, keywords):
+        return cls({intent: build_pattern(words) for intent, words in keywords.items()})
+
+    def classify(self, text):
+        """Возвращает интент с наивысшим приоритетом или None.
+
+        Текст должен быть уже приведен к нижнему регистру.
+        """
+        for intent, pattern in self._compiled:
+            if pattern.search(text):
+                return intent
+        return None
+
+
+def source_templates(overrides=None):
+    """Исходные шаблоны BotMessages с заменами бота (имя -> текст)"""
+    templates = {name: getattr(BotMessages, name) for name in TEMPLATE_NAMES}
+    templates.update({name: text for name, text in (overrides or {}).items() if name in templates})
+    return templates
+
+
+def render_templates(admin_contact, overrides=None):
+    """Рендерит все шаблоны BotMessages (с заменами бота) с контактом администратора"""
+    return {
+        name: BotMessages.format_message(template, admin_contact)
+        for name, template in source_templates(overrides).items()
+    }
+
+
+def fingerprint(keywords, admin_contact, overrides=None):
+    """Отпечаток исходных данных кэша: ключевые слова, шаблоны и контакт"""
+    source = {
+        "version": CACHE_VERSION,
+        "keywords": keywords,
+        "templates": source_templates(overrides),
+        "admin_contact": admin_contact,
+    }
+    payload = json.dumps(source, ensure_ascii=False, sort_keys=True).encode("utf-8")
+    return hashlib.sha1(payload).hexdigest()
+
+
+class Precomputed:
+    """Матчер и отрендеренные сообщения, готовые к использованию обработчиками"""
+
+    def __init__(self, matcher, rendered, admin_contact):
+        self.matcher = matcher
+        self.rendered = rendered
+        self.admin_contact = admin_contact
+        self.from_cache = False
+        self.render_hits = 0
+        self.render_misses = 0
+        # Поиск по самому шаблону, чтобы вызовы выглядели как render(BotMessages.X)
+        self._by_template = {
+            getattr(BotMessages, name): text for name, text in rendered.items()
+        }
+
+    @classmethod
+    def build(cls, keywords=None, admin_contact=None, templates=None):
+        admin_contact = admin_contact or Config.ADMIN_CONTACT
+        keywords = keywords or config_keywords()
+        return cls(KeywordMatcher.from_keywords(keywords), render_templates(admin_contact, templates),
+                   admin_contact)
+
+    def classify(self, text):
+        with span("match"):
+            return self.matcher.classify(text)
+
+    def render(self, template):
+        """Отрендеренный шаблон; незнакомые шаблоны форматируются на лету"""
+        with span("render"):
+            text = self._by_template.get(template)
+            if text is None:
+                self.render_misses += 1
+                return BotMessages.format_message(template, self.admin_contact)
+            self.render_hits += 1
+            return text
+
+
+def load_precomputed(path, keywords=None, admin_contact=None):
+    """Загружает матчер и шаблоны из файла кэша или собирает и сохраняет их заново"""
+    admin_contact = admin_contact or Config.ADMIN_CONTACT
+    keywords = keywords or config_keywords()
+    expected = fingerprint(keywords, admin_contact)
+
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            cached = json.load(f)
+        if cached.get("fingerprint") == expected:
+            precomputed = Precomputed(KeywordMatcher(cached["patterns"]), cached["rendered"],
+                                      admin_contact)
+            precomputed.from_cache = True
+            return precomputed
+    except FileNotFoundError:
+        pass
+    except (OSError, ValueError, KeyError) as e:
+        logger.warning(f"⚠️ Кэш запуска {path} поврежден, пересобираем: {e}")
+
+    precomputed = Precomputed.build(keywords, admin_contact)
+    try:
+        # Свой временный файл у каждого процесса: процессы sharding.py пересобирают кэш
+        # одновременно, и общий path.tmp перемешал бы их записи
+        fd, tmp_path = tempfile.mkstemp(prefix=f"{os.path.basename(path)}.", suffix=".tmp",
+                                        dir=os.path.dirname(path) or ".")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump({
+                    "fingerprint": expected,
+                    "patterns": precomputed.matcher.patterns,
+                    "rendered": precomputed.rendered,
+                }, f, ensure_ascii=False)
+            # mkstemp создает файл с правами 0600
+            os.chmod(tmp_path, 0o644)
+            os.replace(tmp_path, path)
+        except BaseException:
+            with suppress(FileNotFoundError):
+                os.unlink(tmp_path)
+            raise
+    except OSError as e:
+        logger.warning(f"⚠️ Не удалось сохранить кэш запуска {path}: {e}")
+    return precomputed
+
+
+_active = None
+_shared = {}
+
+
+def get_precomputed():
+    """Активный набор матчера и шаблонов (по умолчанию собирается из Config)"""
+    global _active
+    if _active is None:
+        _active = Precomputed.build()
+    return _active
+
+
+def set_precomputed(precomputed):
+    global _active
+    _active = precomputed
+
+
+def shared_precomputed(keywords=None, admin_contact=None, templates=None):
+    """Матчер и шаблоны, общие для всех ботов процесса с теми же исходными данными"""
+    admin_contact = admin_contact or Config.ADMIN_CONTACT
+    keywords = keywords or config_keywords()
+    key = fingerprint(keywords, admin_contact, templates)
+    precomputed = _shared.get(key)
+    if precomputed is None:
+        precomputed = _shared[key] = Precomputed.build(keywords, admin_contact, templates)
+    return precomputed
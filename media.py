@@ -0,0 +1,126 @@
+"""
+Реестр медиафайлов бота: видеогайд по VEO 3, PDF с материалами и т.п.
+
+Каждый файл загружается в Telegram один раз; полученный file_id сохраняется в
+хранилище состояния и используется для всех следующих отправок, так что ответ с
+медиа стоит столько же, сколько текстовый. Если Telegram перестал принимать file_id
+или файл на диске изменился, файл загружается заново.
+"""
+
+import asyncio
+import logging
+import os
+import time
+
+from telegram.error import BadRequest
+
+logger = logging.getLogger(__name__)
+
+# Пространство имен в StateStore
+NS_MEDIA = "media"
+
+# Ошибки 400, означающие, что Telegram не принимает сохраненный file_id
+FILE_ID_ERRORS = ("wrong file identifier", "wrong remote file identifier", "file_id")
+
+# Тип медиа -> (метод Bot, имя параметра с файлом)
+SENDERS = {
+    "video": ("send_video", "video"),
+    "document": ("send_document", "document"),
+    "photo": ("send_photo", "photo"),
+    "audio": ("send_audio", "audio"),
+    "animation": ("send_animation", "animation"),
+}
+
+
+class MediaRegistry:
+    """Загружает каждый файл один раз и отправляет дальше по сохраненному file_id"""
+
+    def __init__(self, assets, directory="", store=None):
+        self.assets = assets
+        self.directory = directory
+        self.store = store
+        self._memory = {}
+        self._locks = {}
+        self.stats = {"uploads": 0, "cached_sends": 0, "reuploads": 0}
+
+    def path(self, name):
+        asset = self.assets.get(name)
+        return os.path.join(self.directory, asset["file"]) if asset else None
+
+    def available(self, name):
+        """Файл описан в настройках и лежит на диске"""
+        path = self.path(name)
+        return bool(path) and os.path.isfile(path)
+
+    @staticmethod
+    def _fingerprint(path):
+        stat = os.stat(path)
+        return f"{stat.st_size}:{int(stat.st_mtime)}"
+
+    def _get(self, name):
+        return self.store.get(NS_MEDIA, name) if self.store else self._memory.get(name)
+
+    def _set(self, name, record):
+        if self.store:
+            self.store.set(NS_MEDIA, name, record)
+        else:
+            self._memory[name] = record
+
+    def _delete(self, name):
+        if self.store:
+            self.store.delete(NS_MEDIA, name)
+        else:
+            self._memory.pop(name, None)
+
+    def file_id(self, name):
+        """Сохраненный file_id, если он относится к текущей версии файла"""
+        record = self._get(name)
+        if record and record["fingerprint"] == self._fingerprint(self.path(name)):
+            return record["file_id"]
+        return None
+
+    async def send(self, bot, chat_id, name, **kwargs):
+        """Отправляет медиа по имени; None, если файла нет на диске"""
+        if not self.available(name):
+            return None
+        asset = self.assets[name]
+        method, field = SENDERS[asset["kind"]]
+        sender = getattr(bot, method)
+        if asset.get("caption") and "caption" not in kwargs:
+            kwargs["caption"] = asset["caption"]
+
+        file_id = self.file_id(name)
+        if file_id:
+            try:
+                message = await sender(chat_id=chat_id, **{field: file_id}, **kwargs)
+                self.stats["cached_sends"] += 1
+                return message
+            except BadRequest as e:
+                # Остальные 400 (чат не найден, длинная подпись) к file_id не относятся
+                if not any(error in e.message.lower() for error in FILE_ID_ERRORS):
+                    raise
+                logger.warning(f"⚠️ file_id для {name} больше не принимается ({e}), загружаем заново")
+                self._delete(name)
+                self.stats["reuploads"] += 1
+
+        lock = self._locks.setdefault(name, asyncio.Lock())
+        async with lock:
+            # Пока ждали блокировку, файл мог загрузить другой обработчик
+            fresh_id = self.file_id(name)
+            if fresh_id and fresh_id != file_id:
+                message = await sender(chat_id=chat_id, **{field: fresh_id}, **kwargs)
+                self.stats["cached_sends"] += 1
+                return message
+
+            path = self.path(name)
+            fingerprint = self._fingerprint(path)
+            with open(path, "rb") as f:
+                message = await sender(chat_id=chat_id, **{field: f},
+                                       filename=os.path.basename(path), **kwargs)
+            media = getattr(message, field)
+            uploaded = media[-1] if isinstance(media, tuple) else media
+            self._set(name, {"file_id": uploaded.file_id, "fingerprint": fingerprint,
+                             "uploaded_at": time.time()})
+            self.stats["uploads"] += 1
+            logger.info(f"📤 {name} загружен в Telegram, file_id сохранен")
+            return message
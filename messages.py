@@ -92,6 +92,14 @@ Buddah Base — это готовая база с видеоуроками, пр
 
 Или напиши [администратору](https://t.me/{admin_contact}) напрямую!"""
 
+    # Проверка новых участников (одно сообщение с общей кнопкой на всех вошедших)
+    VERIFY_CHALLENGE_MESSAGE = """👋 Новые участники, нажмите кнопку ниже, чтобы писать в чате.
+
+Кто не нажмет за {timeout} сек, будет удален из группы."""
+    VERIFY_BUTTON = "✅ Я не бот"
+    VERIFY_PASSED = "✅ Спасибо! Теперь можно писать в чате"
+    VERIFY_NOT_NEEDED = "👌 Проверка не требуется"
+
     @staticmethod
     def format_message(message_template, admin_contact="smkbdh"):
         """Форматирует сообщение с подстановкой контакта администратора"""
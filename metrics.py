@@ -0,0 +1,305 @@
+"""
+Метрики бота в памяти процесса для админ-команды /stats.
+
+Все значения поддерживаются инкрементально: счетчики и гистограммы задержек хранятся
+по слотам скользящего окна, устаревший слот вычитается из итога при сдвиге окна.
+Построение отчета не зависит от объема трафика: O(обработчиков x корзин гистограммы).
+"""
+
+import math
+import os
+import time
+
+from telegram.ext import BaseRateLimiter
+
+from tracing import span
+
+
+class RollingCounter:
+    """Сумма значений за последние window секунд (кольцо из slots слотов)"""
+
+    def __init__(self, window=60, slots=60):
+        self.window = window
+        self.slot_seconds = window / slots
+        self.counts = [0] * slots
+        self.total = 0
+        self._slot = None
+
+    def _advance(self, now):
+        slot = int(now // self.slot_seconds)
+        if self._slot is not None and slot > self._slot:
+            size = len(self.counts)
+            for step in range(1, min(slot - self._slot, size) + 1):
+                index = (self._slot + step) % size
+                self.total -= self.counts[index]
+                self.counts[index] = 0
+        if self._slot is None or slot > self._slot:
+            self._slot = slot
+        return self._slot
+
+    def add(self, value=1, now=None):
+        slot = self._advance(time.monotonic() if now is None else now)
+        self.counts[slot % len(self.counts)] += value
+        self.total += value
+
+    def rate(self, now=None):
+        """Среднее значение в секунду за окно"""
+        self._advance(time.monotonic() if now is None else now)
+        return self.total / self.window
+
+
+class LatencyWindow:
+    """Перцентили задержки за скользящее окно по логарифмической гистограмме.
+
+    Корзина i покрывает (BASE_MS * FACTOR^(i-1), BASE_MS * FACTOR^i], поэтому
+    относительная погрешность перцентиля не превышает FACTOR.
+    """
+
+    BASE_MS = 0.05
+    FACTOR = 1.25
+    BUCKETS = 64
+    _LOG_FACTOR = math.log(FACTOR)
+
+    def __init__(self, window=60, slots=6):
+        self.window = window
+        self.slot_seconds = window / slots
+        self.slots = [[0] * self.BUCKETS for _ in range(slots)]
+        self.histogram = [0] * self.BUCKETS
+        self.count = 0
+        self.total_count = 0
+        self.max_ms = 0.0
+        self._slot = None
+
+    @classmethod
+    def _bucket(cls, ms):
+        if ms <= cls.BASE_MS:
+            return 0
+        return min(cls.BUCKETS - 1, int(math.log(ms / cls.BASE_MS) / cls._LOG_FACTOR) + 1)
+
+    def _advance(self, now):
+        slot = int(now // self.slot_seconds)
+        if self._slot is not None and slot > self._slot:
+            size = len(self.slots)
+            for step in range(1, min(slot - self._slot, size) + 1):
+                expired = self.slots[(self._slot + step) % size]
+                for index, value in enumerate(expired):
+                    if value:
+                        self.histogram[index] -= value
+                        self.count -= value
+                        expired[index] = 0
+        if self._slot is None or slot > self._slot:
+            self._slot = slot
+        return self._slot
+
+    def record(self, seconds, now=None):
+        ms = seconds * 1000
+        slot = self._advance(time.monotonic() if now is None else now)
+        bucket = self._bucket(ms)
+        self.slots[slot % len(self.slots)][bucket] += 1
+        self.histogram[bucket] += 1
+        self.count += 1
+        self.total_count += 1
+        if ms > self.max_ms:
+            self.max_ms = ms
+
+    def percentile(self, q, now=None):
+        """Верхняя граница корзины, в которую попадает q-й перцентиль, в мс"""
+        self._advance(time.monotonic() if now is None else now)
+        if not self.count:
+            return 0.0
+        rank = max(1, math.ceil(self.count * q / 100))
+        seen = 0
+        for index, value in enumerate(self.histogram):
+            seen += value
+            if seen >= rank:
+                return self.BASE_MS * self.FACTOR ** index
+        return self.BASE_MS * self.FACTOR ** (self.BUCKETS - 1)
+
+
+class BotMetrics:
+    """Живые метрики одного экземпляра бота"""
+
+    def __init__(self, window=60):
+        self.window = window
+        self._started = time.monotonic()
+        self.updates = RollingCounter(window)
+        self.updates_total = 0
+        self.handlers = {}
+        self.outbound = LatencyWindow(window)
+        self.outbound_in_flight = 0
+        self.outbound_peak = 0
+        self.outbound_errors = 0
+        self.errors = 0
+        # Очередь апдейтов и отброшенная при перегрузке работа (по уровням LoadShedder)
+        self.backlog = 0
+        self.backlog_peak = 0
+        self.shed = {}
+
+    @property
+    def uptime(self):
+        return time.monotonic() - self._started
+
+    def record_update(self, now=None):
+        self.updates.add(1, now)
+        self.updates_total += 1
+
+    def observe(self, handler, seconds, now=None):
+        """Задержка обработчика handler (имя колбэка) в секундах"""
+        window = self.handlers.get(handler)
+        if window is None:
+            window = self.handlers[handler] = LatencyWindow(self.window)
+        window.record(seconds, now)
+
+    def outbound_started(self):
+        self.outbound_in_flight += 1
+        if self.outbound_in_flight > self.outbound_peak:
+            self.outbound_peak = self.outbound_in_flight
+
+    def outbound_finished(self, seconds, failed=False):
+        self.outbound_in_flight -= 1
+        self.outbound.record(seconds)
+        if failed:
+            self.outbound_errors += 1
+
+
+class OutboundTracker(BaseRateLimiter):
+    """Прослойка PTB для исходящих запросов к Bot API: глубина очереди и задержки.
+
+    Подключается через Application.builder().rate_limiter(); getUpdates PTB через
+    нее не пропускает, так что учитываются только ответы бота.
+    """
+
+    def __init__(self, metrics):
+        self.metrics = metrics
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
+    async def process_request(self, callback, args, kwargs, endpoint, data, rate_limit_args):
+        self.metrics.outbound_started()
+        started = time.perf_counter()
+        failed = False
+        try:
+            with span("send", {"method": endpoint}):
+                return await callback(*args, **kwargs)
+        except Exception as e:
+            failed = True
+            # Для группировки ошибок в error_handler: на каком методе Bot API упало
+            if getattr(e, "api_method", None) is None:
+                e.api_method = endpoint
+            raise
+        finally:
+            self.metrics.outbound_finished(time.perf_counter() - started, failed)
+
+
+def memory_rss_mb():
+    """Текущий RSS процесса в МБ (Linux), иначе пиковый RSS; None, если недоступно"""
+    try:
+        with open("/proc/self/statm", "r") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, AttributeError, IndexError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def format_duration(seconds):
+    seconds = int(seconds)
+    days, seconds = divmod(seconds, 86400)
+    hours, seconds = divmod(seconds, 3600)
+    minutes, seconds = divmod(seconds, 60)
+    if days:
+        return f"{days} д {hours} ч {minutes} мин"
+    if hours:
+        return f"{hours} ч {minutes} мин"
+    return f"{minutes} мин {seconds} с"
+
+
+def format_stats(runtime):
+    """Текст отчета /stats по метрикам runtime; не зависит от истории трафика"""
+    metrics = runtime.metrics
+    lines = [
+        "📊 Статистика бота",
+        f"⏱ Аптайм: {format_duration(metrics.uptime)}",
+        f"📥 Апдейты: {metrics.updates.rate():.2f}/с за {metrics.window} с, "
+        f"всего {metrics.updates_total}, ошибок {metrics.errors}",
+        f"⚙️ Обработчики (p50 / p99 за {metrics.window} с):",
+    ]
+    for name, window in sorted(metrics.handlers.items()):
+        lines.append(f"  • {name}: {window.percentile(50):.2f} / {window.percentile(99):.2f} мс "
+                     f"(за окно {window.count}, всего {window.total_count})")
+    if not metrics.handlers:
+        lines.append("  • вызовов пока не было")
+
+    outbound = metrics.outbound
+    lines.append(f"📤 Исходящие запросы: в полете {metrics.outbound_in_flight} "
+                 f"(пик {metrics.outbound_peak}), p50 {outbound.percentile(50):.2f} / "
+                 f"p99 {outbound.percentile(99):.2f} мс, ошибок {metrics.outbound_errors}")
+    lines.append(f"🧊 Кулдаун: подавлено ответов {runtime.cooldown_suppressed}")
+    shed = ", ".join(f"{tier} {count}" for tier, count in sorted(metrics.shed.items())) or "нет"
+    lines.append(f"🚦 Очередь апдейтов: {metrics.backlog} (пик {metrics.backlog_peak}), "
+                 f"отброшено при перегрузке: {shed}")
+    if runtime.inline:
+        lines.append(f"🔍 Inline: отвечено {runtime.inline.answered}, "
+                     f"пропущено устаревших {runtime.inline.skipped}")
+
+    if runtime.spam:
+        spam = runtime.spam.stats
+        lines.append(f"🛡 Антиспам: проверено {spam['checked']}, флуд {spam['flood']}, "
+                     f"дубли {spam['duplicate']}, удалено {spam['deleted']}, "
+                     f"ограничено {spam['restricted']}, в очереди {runtime.spam.actions.qsize()}")
+    if runtime.topics:
+        topics = runtime.topics.stats
+        lines.append(f"🧹 Темы: вне темы {topics['violations']}, удалено {topics['deleted']} "
+                     f"за {topics['api_calls']} запросов, ждут удаления {runtime.topics.pending}")
+    if runtime.broadcaster:
+        broadcaster = runtime.broadcaster
+        lines.append(f"📣 Подписчики: {broadcaster.subscribers}, активных рассылок {len(broadcaster.active)}")
+    if runtime.verifier:
+        verifier = runtime.verifier.stats
+        lines.append(f"🔐 Проверка входа: ждут {runtime.verifier.pending}, прошли {verifier['passed']}, "
+                     f"исключено {verifier['kicked']}, сверх лимита {verifier['overflow']}, "
+                     f"в очереди {runtime.verifier.actions.qsize()}")
+    if runtime.janitor:
+        janitor = runtime.janitor.stats
+        lines.append(f"🗑 Автоудаление ответов: ждут {runtime.janitor.pending}, удалено {janitor['deleted']} "
+                     f"за {janitor['api_calls']} запросов")
+    if runtime.media:
+        media = runtime.media.stats
+        lines.append(f"🎬 Медиа: загрузок {media['uploads']}, по file_id {media['cached_sends']}, "
+                     f"перезагрузок {media['reuploads']}")
+
+    if runtime.catchup and runtime.catchup.stats["backlog"]:
+        lines.append(runtime.catchup.format())
+    if runtime.errors.groups:
+        lines.append(runtime.errors.format())
+    if runtime.monitor:
+        lines.append(runtime.monitor.format())
+    if runtime.breakers:
+        lines.append(runtime.breakers.format())
+    if runtime.tracer:
+        tracer = runtime.tracer
+        lines.append(f"🔎 Трассировка: выборка {tracer.sample_rate:.1%}, трасс {tracer.stats['sampled']}, "
+                     f"спанов {tracer.stats['spans']}, файл {tracer.path}")
+
+    precomputed = runtime.precomputed
+    lookups = precomputed.render_hits + precomputed.render_misses
+    hit_rate = precomputed.render_hits / lookups * 100 if lookups else 100.0
+    startup_cache = "загружен с диска" if precomputed.from_cache else "собран заново"
+    lines.append(f"🎯 Кэш шаблонов: {hit_rate:.1f}% попаданий из {lookups}; "
+                 f"кэш запуска {startup_cache}")
+
+    if runtime.store:
+        lines.append(f"💾 Состояние: {runtime.store.pending} ключей ждут записи, "
+                     f"сбросов {runtime.store.stats['flushes']}")
+    rss = memory_rss_mb()
+    if rss is not None:
+        lines.append(f"🧠 Память: {rss:.1f} МБ RSS")
+    return "\n".join(lines)
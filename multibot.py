@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+"""
+Несколько ботов для разных сообществ в одном процессе и одном цикле событий.
+
+Файл определений (JSON) описывает ботов:
+
+    {"bots": [{"name": "buddah", "token_env": "BUDDAH_BOT_TOKEN", "admin_contact": "smkbdh",
+               "admin_ids": [1], "mentions": ["@saint_buddah_bot"],
+               "keywords": {"join": ["как вступить"]}, "templates": {"START_MESSAGE": "..."},
+               "state_db": "state_buddah.db"}]}
+
+Токен задается напрямую (token) или именем переменной окружения (token_env). Не
+заданные интенты keywords, шаблоны templates, администраторы и контакт берутся из
+Config; упоминания по умолчанию - @username бота из getMe.
+
+Общее для всех ботов процесса:
+- скомпилированные матчеры и отрендеренные шаблоны (matcher.shared_precomputed):
+  боты с одинаковыми ключевыми словами, шаблонами и контактом используют один экземпляр;
+- индекс каталога inline-поиска (только чтение);
+- пул HTTP-соединений к Bot API (токен - часть URL, поэтому пул общий) и отдельный
+  пул long polling getUpdates на одно соединение на бота.
+
+У каждого бота свои Application, очередь апдейтов и LoadShedder, хранилище состояния,
+метрики, кулдауны, модерация и рассылки: перегрузка или ошибка одного бота не
+затрагивает остальных.
+
+Запуск: python multibot.py [bots.json]
+"""
+
+import asyncio
+import json
+import logging
+import os
+import sys
+
+from telegram.request import BaseRequest, HTTPXRequest
+
+from analytics import FunnelAnalytics
+from bot import BuddahBaseBot
+from catalog import load_catalog
+from config import Config
+from matcher import config_keywords, shared_precomputed
+from health import start_health_server
+from persistence import StateStore
+from profiling import install_signal_handler, shared_profiler
+from runtime import BotRuntime
+from startup import install_event_loop_policy
+from tracing import Tracer
+
+logger = logging.getLogger(__name__)
+
+
+class BotDefinition:
+    """Описание одного бота из файла определений"""
+
+    def __init__(self, name, token, admin_contact=None, admin_ids=None, mentions=None,
+                 keywords=None, templates=None, state_db="", analytics_dir=""):
+        self.name = name
+        self.token = token
+        self.admin_contact = admin_contact or Config.ADMIN_CONTACT
+        self.admin_ids = admin_ids
+        self.mentions = tuple(mention.lower() for mention in mentions) if mentions else None
+        self.keywords = keywords or {}
+        self.templates = templates or {}
+        self.state_db = state_db
+        self.analytics_dir = analytics_dir
+
+    @classmethod
+    def from_dict(cls, data):
+        name = data.get("name")
+        if not name:
+            raise ValueError("У бота в файле определений нет name")
+        token = data.get("token") or os.getenv(data.get("token_env") or "", "")
+        if not token:
+            raise ValueError(f"Бот {name}: не задан token или переменная token_env")
+        return cls(name, token, admin_contact=data.get("admin_contact"),
+                   admin_ids=data.get("admin_ids"), mentions=data.get("mentions"),
+                   keywords=data.get("keywords"), templates=data.get("templates"),
+                   state_db=data.get("state_db", ""), analytics_dir=data.get("analytics_dir", ""))
+
+    def keyword_set(self):
+        """Ключевые слова интентов: свои списки бота поверх Config"""
+        keywords = config_keywords()
+        keywords.update({intent: words for intent, words in self.keywords.items() if intent in keywords})
+        return keywords
+
+    def build_runtime(self, catalog=None):
+        """Runtime бота: общие матчер и каталог, свои хранилище, метрики и очереди"""
+        overrides = {
+            "store": StateStore(self.state_db or None, flush_interval=Config.STATE_FLUSH_INTERVAL),
+            "analytics": FunnelAnalytics(self.analytics_dir or None,
+                                         rollup_interval=Config.ANALYTICS_ROLLUP_INTERVAL),
+            "precomputed": shared_precomputed(self.keyword_set(), self.admin_contact, self.templates),
+            "catalog": catalog,
+            "admin_ids": self.admin_ids,
+        }
+        if self.mentions:
+            overrides["mentions"] = self.mentions
+        if Config.TRACE_SAMPLE_RATE > 0:
+            # Трассы ботов - в разные файлы: traces/trace.json -> traces/trace.<имя>.json
+            root, ext = os.path.splitext(Config.TRACE_PATH)
+            overrides["tracer"] = Tracer.from_config(f"{root}.{self.name}{ext}")
+        return BotRuntime.from_config(**overrides)
+
+
+def load_definitions(path):
+    """Читает файл определений ботов; имена должны быть уникальны"""
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    definitions = [BotDefinition.from_dict(item) for item in data.get("bots", [])]
+    names = [definition.name for definition in definitions]
+    duplicates = sorted({name for name in names if names.count(name) > 1})
+    if duplicates:
+        raise ValueError(f"Повторяющиеся имена ботов: {', '.join(duplicates)}")
+    return definitions
+
+
+class SharedRequest(BaseRequest):
+    """Один транспорт Bot API для нескольких Application.
+
+    Каждый Bot инициализирует и закрывает свой request; общий пул открывается с первым
+    ботом и закрывается с последним.
+    """
+
+    def __init__(self, request):
+        self._request = request
+        self._users = 0
+        self._lock = asyncio.Lock()
+
+    @property
+    def read_timeout(self):
+        return self._request.read_timeout
+
+    async def initialize(self):
+        async with self._lock:
+            if self._users == 0:
+                await self._request.initialize()
+            self._users += 1
+
+    async def shutdown(self):
+        async with self._lock:
+            if self._users == 0:
+                return
+            self._users -= 1
+            if self._users == 0:
+                await self._request.shutdown()
+
+    async def do_request(self, *args, **kwargs):
+        return await self._request.do_request(*args, **kwargs)
+
+
+def shared_http_requests(count):
+    """Фабрика транспортов ботов: общий пул запросов и общий пул getUpdates"""
+    requests = SharedRequest(HTTPXRequest(connection_pool_size=max(8, 2 * count)))
+    # Long polling держит соединение до ответа: по одному на бота
+    updates = SharedRequest(HTTPXRequest(connection_pool_size=count))
+    return lambda definition: (requests, updates)
+
+
+class BotHost:
+    """Запускает ботов из определений в одном цикле событий"""
+
+    def __init__(self, definitions, request_factory=None):
+        self.definitions = {definition.name: definition for definition in definitions}
+        # request_factory(definition) -> (request, get_updates_request)
+        self.request_factory = request_factory or shared_http_requests(len(self.definitions))
+        self.bots = {}
+        self.failed = {}
+
+    @property
+    def runtimes(self):
+        return {name: bot.runtime for name, bot in self.bots.items()}
+
+    async def initialize(self):
+        """Собирает ботов; каталог загружается один раз для всех"""
+        catalog = load_catalog(Config.CATALOG_PATH, Config.CATALOG_STORE_PATH or None)
+        for name, definition in self.definitions.items():
+            request, updates_request = self.request_factory(definition)
+            bot = BuddahBaseBot(token=definition.token, request=request,
+                                get_updates_request=updates_request,
+                                runtime=definition.build_runtime(catalog))
+            await bot.initialize()
+            self.bots[name] = bot
+
+    async def start(self, polling=True):
+        """Запускает всех ботов параллельно; не запустившиеся боты не мешают остальным"""
+        await self.initialize()
+        names = list(self.bots)
+        results = await asyncio.gather(*(self._start_bot(name, polling) for name in names),
+                                       return_exceptions=True)
+        for name, result in zip(names, results):
+            if isinstance(result, Exception):
+                logger.error(f"❌ Бот {name} не запущен: {result}")
+                self.failed[name] = result
+                await self._stop_bot(self.bots.pop(name))
+        logger.info(f"✅ Запущено ботов: {len(self.bots)} из {len(self.definitions)}")
+
+    async def _start_bot(self, name, polling):
+        bot = self.bots[name]
+        await bot.runtime.start()
+        # getMe: имя бота для упоминаний по умолчанию
+        await bot.application.initialize()
+        username = bot.application.bot.username
+        if self.definitions[name].mentions is None and username:
+            bot.runtime.mentions = (f"@{username.lower()}",)
+        await bot.application.start()
+        if polling:
+            await bot.start_polling()
+        logger.info(f"🤖 {name}: @{username} запущен")
+
+    async def stop(self):
+        await asyncio.gather(*(self._stop_bot(bot) for bot in self.bots.values()),
+                             return_exceptions=True)
+        self.bots.clear()
+        logger.info("🛑 Все боты остановлены")
+
+    @staticmethod
+    async def _stop_bot(bot):
+        application = bot.application
+        if application.updater and application.updater.running:
+            await application.updater.stop()
+        if application.running:
+            await application.stop()
+        await application.shutdown()
+        await bot.runtime.stop()
+
+
+async def main(path):
+    """Главная функция"""
+    host = BotHost(load_definitions(path))
+    health = None
+    try:
+        await host.start()
+        if Config.PROFILE_DIR:
+            # Один профиль на процесс: цикл событий общий для всех ботов
+            install_signal_handler(shared_profiler())
+        # Один сервер проверок на процесс: готов, когда готовы все запущенные боты
+        health = await start_health_server({name: bot.health_check() for name, bot in host.bots.items()})
+        await asyncio.Event().wait()
+    except KeyboardInterrupt:
+        logger.info("👋 Получен сигнал остановки...")
+    finally:
+        if health:
+            await health.stop()
+        await host.stop()
+
+
+if __name__ == "__main__":
+    loop_name = install_event_loop_policy(Config.USE_UVLOOP)
+    logger.info(f"🔁 Event loop: {loop_name}")
+    try:
+        asyncio.run(main(sys.argv[1] if len(sys.argv) > 1 else Config.BOTS_FILE))
+    except KeyboardInterrupt:
+        logger.info("👋 Боты остановлены пользователем")
+    except Exception as e:
+        logger.error(f"❌ Ошибка запуска: {e}")
@@ -0,0 +1,180 @@
+"""
+Хранилище состояния бота на SQLite (WAL) с отложенной пакетной записью.
+
+Обработчики читают и пишут только в память: set() обновляет словарь и ставит ключ в
+буфер записи, фоновая задача раз в flush_interval сбрасывает буфер одной транзакцией
+в отдельном потоке. При запуске все состояние загружается из базы (теплый старт).
+Без пути к базе хранилище работает только в памяти.
+"""
+
+import asyncio
+import json
+import logging
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+_DELETED = object()
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS state (
+    namespace TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT NOT NULL,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (namespace, key)
+)
+"""
+
+
+class StateStore:
+    """Key-value состояние по пространствам имен с write-behind записью в SQLite"""
+
+    def __init__(self, path=None, flush_interval=1.0, max_pending=10000):
+        self.path = path
+        self.flush_interval = flush_interval
+        # При переполнении буфера сброс запускается, не дожидаясь таймера
+        self.max_pending = max_pending
+        self._data = {}
+        self._pending = {}
+        self._conn = None
+        self._executor = None
+        self._flush_task = None
+        self._overflow_task = None
+        self._flush_lock = asyncio.Lock()
+        self.stats = {"writes": 0, "flushes": 0, "rows_flushed": 0, "flush_seconds": 0.0}
+
+    # --- жизненный цикл -------------------------------------------------------------
+
+    async def open(self):
+        """Открывает базу, загружает состояние и запускает фоновый сброс"""
+        if self.path:
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="state-store")
+            loop = asyncio.get_running_loop()
+            rows = await loop.run_in_executor(self._executor, self._open_and_load)
+            for namespace, key, value in rows:
+                self._data.setdefault(namespace, {})[key] = json.loads(value)
+            logger.info(f"💾 Состояние загружено из {self.path}: {len(rows)} записей")
+            self._flush_task = asyncio.create_task(self._flush_loop())
+        return self
+
+    async def close(self):
+        """Останавливает фоновый сброс и записывает остаток буфера"""
+        if self._flush_task:
+            self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except asyncio.CancelledError:
+                pass
+            self._flush_task = None
+        if self._overflow_task:
+            await asyncio.gather(self._overflow_task, return_exceptions=True)
+        if self._conn:
+            await self.flush()
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(self._executor, self._conn.close)
+            self._conn = None
+        if self._executor:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def _open_and_load(self):
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(SCHEMA)
+        self._conn.commit()
+        return self._conn.execute("SELECT namespace, key, value FROM state").fetchall()
+
+    # --- доступ из обработчиков (только память) ---------------------------------------
+
+    def get(self, namespace, key, default=None):
+        return self._data.get(namespace, {}).get(key, default)
+
+    def items(self, namespace):
+        return self._data.get(namespace, {}).items()
+
+    def count(self, namespace):
+        return len(self._data.get(namespace, {}))
+
+    def set(self, namespace, key, value):
+        """Обновляет значение в памяти и ставит его в очередь на запись"""
+        key = str(key)
+        self._data.setdefault(namespace, {})[key] = value
+        self._schedule(namespace, key, value)
+
+    def delete(self, namespace, key):
+        key = str(key)
+        if self._data.get(namespace, {}).pop(key, None) is not None:
+            self._schedule(namespace, key, _DELETED)
+
+    def _schedule(self, namespace, key, value):
+        self.stats["writes"] += 1
+        if not self._conn:
+            return
+        # Сериализуем сразу: обработчики могут дальше менять тот же объект в памяти.
+        # Повторные записи одного ключа схлопываются до последнего значения
+        if value is not _DELETED:
+            value = json.dumps(value, ensure_ascii=False)
+        self._pending[(namespace, key)] = value
+        if len(self._pending) >= self.max_pending and (
+                self._overflow_task is None or self._overflow_task.done()):
+            self._overflow_task = asyncio.get_running_loop().create_task(self.flush())
+
+    @property
+    def pending(self):
+        return len(self._pending)
+
+    # --- пакетная запись ---------------------------------------------------------------
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"❌ Ошибка записи состояния: {e}")
+
+    async def flush(self):
+        """Сбрасывает буфер одной транзакцией в потоке записи"""
+        async with self._flush_lock:
+            if not self._pending or not self._conn:
+                return 0
+            batch, self._pending = self._pending, {}
+            started = time.perf_counter()
+            loop = asyncio.get_running_loop()
+            try:
+                await loop.run_in_executor(self._executor, self._write_batch, batch)
+            except Exception:
+                # Не теряем данные: возвращаем пакет, более новые значения важнее
+                batch.update(self._pending)
+                self._pending = batch
+                raise
+            self.stats["flushes"] += 1
+            self.stats["rows_flushed"] += len(batch)
+            self.stats["flush_seconds"] += time.perf_counter() - started
+            return len(batch)
+
+    def _write_batch(self, batch):
+        now = time.time()
+        upserts = []
+        deletes = []
+        for (namespace, key), value in batch.items():
+            if value is _DELETED:
+                deletes.append((namespace, key))
+            else:
+                upserts.append((namespace, key, value, now))
+        with self._conn:
+            if upserts:
+                self._conn.executemany(
+                    "INSERT INTO state (namespace, key, value, updated_at) VALUES (?, ?, ?, ?) "
+                    "ON CONFLICT(namespace, key) DO UPDATE SET "
+                    "value = excluded.value, updated_at = excluded.updated_at",
+                    upserts,
+                )
+            if deletes:
+                self._conn.executemany(
+                    "DELETE FROM state WHERE namespace = ? AND key = ?", deletes
+                )
@@ -0,0 +1,198 @@
+"""
+Профилирование CPU работающего бота по запросу: админ-команда /profile [секунд] или
+сигнал SIGUSR2 (kill -USR2 <pid>), без перезапуска.
+
+SamplingProfiler на время профиля включает таймер ITIMER_PROF: каждые interval секунд
+процессорного времени процесса приходит SIGPROF, и обработчик в главном потоке (там
+работает цикл событий) записывает стек прерванного кадра. Таймер считает только
+CPU, поэтому сэмплы приходятся на работу, а не на ожидание событий. Поток-сэмплер
+через sys._current_frames здесь не годится: он получает GIL, когда цикл событий сам
+отпускает его в select, и видит только ожидание.
+
+Вне профиля профилировщик ничего не стоит; во время профиля цена - один обход стека
+на сэмпл, обработчики бота не инструментируются.
+
+Результат пишется в PROFILE_DIR:
+
+- profile-<время>-<pid>.collapsed - свернутые стеки "корень;...;лист число" для
+  flamegraph.pl, speedscope.app и inferno;
+- profile-<время>-<pid>.txt - горячие функции по собственному времени (функция на
+  вершине стека) и по времени с вызовами.
+"""
+
+import asyncio
+import logging
+import os
+import signal
+import threading
+import time
+from collections import Counter
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+
+class Profile:
+    """Результат профиля: счетчики свернутых стеков"""
+
+    def __init__(self, stacks, seconds, cpu_seconds, interval):
+        self.stacks = stacks
+        self.seconds = seconds
+        self.cpu_seconds = cpu_seconds
+        self.interval = interval
+        self.samples = sum(stacks.values())
+        self.paths = []
+
+    @property
+    def load(self):
+        """Доля одного ядра, занятая процессом за время профиля"""
+        return self.cpu_seconds / self.seconds if self.seconds else 0.0
+
+    def collapsed(self):
+        """Строки формата свернутых стеков, самые частые первыми"""
+        return [f"{';'.join(stack)} {count}" for stack, count in self.stacks.most_common()]
+
+    def hot(self, limit=15):
+        """Горячие функции: [(функция, собственные сэмплы, сэмплы с вызовами)]"""
+        own = Counter()
+        total = Counter()
+        for stack, count in self.stacks.items():
+            own[stack[-1]] += count
+            for label in set(stack):
+                total[label] += count
+        return [(label, count, total[label]) for label, count in own.most_common(limit)]
+
+    def report(self, limit=15):
+        lines = [f"🔥 Профиль за {self.seconds:.1f} с: CPU {self.cpu_seconds:.2f} с "
+                 f"(загрузка {self.load:.0%}), {self.samples} сэмплов"]
+        if self.samples:
+            lines.append("Горячие функции (собственное время / с вызовами, доля сэмплов):")
+            for label, own, total in self.hot(limit):
+                lines.append(f"  • {label}: {own / self.samples:.1%} / {total / self.samples:.1%}")
+        else:
+            lines.append("Процесс почти не тратил CPU")
+        for path in self.paths:
+            lines.append(f"📁 {path}")
+        return "\n".join(lines)
+
+
+def frame_label(code):
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class SamplingProfiler:
+    """Сэмплирующий профилировщик CPU главного потока, один на процесс"""
+
+    def __init__(self, directory="profiles", interval=0.01, default_seconds=30, max_seconds=300):
+        self.directory = directory
+        self.interval = interval
+        self.default_seconds = default_seconds
+        self.max_seconds = max_seconds
+        self.last = None
+        self._task = None
+
+    @classmethod
+    def from_config(cls):
+        return cls(directory=Config.PROFILE_DIR, interval=Config.PROFILE_INTERVAL,
+                   default_seconds=Config.PROFILE_SECONDS, max_seconds=Config.PROFILE_MAX_SECONDS)
+
+    @property
+    def available(self):
+        """SIGPROF есть только на Unix и обрабатывается только в главном потоке"""
+        return hasattr(signal, "setitimer") and threading.current_thread() is threading.main_thread()
+
+    @property
+    def running(self):
+        return self._task is not None and not self._task.done()
+
+    def launch(self, seconds=None, on_done=None):
+        """Запускает профиль в фоне; None, если профиль уже идет или недоступен.
+
+        on_done(profile) - корутина, которой передается результат (ответ админу).
+        """
+        if self.running or not self.available:
+            return None
+        seconds = min(max(seconds or self.default_seconds, 0.1), self.max_seconds)
+        self._task = asyncio.get_running_loop().create_task(self._run(seconds, on_done))
+        return self._task
+
+    async def _run(self, seconds, on_done):
+        logger.info(f"🔥 Профилирование на {seconds:.0f} с")
+        profile = await self.run(seconds)
+        logger.info(profile.report(limit=5))
+        if on_done:
+            try:
+                await on_done(profile)
+            except Exception as e:
+                logger.error(f"❌ Не удалось отправить результат профиля: {e}")
+        return profile
+
+    async def run(self, seconds):
+        """Профилирует процесс seconds секунд и пишет файлы"""
+        stacks = Counter()
+        labels = {}
+
+        def sample(signum, frame):
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                label = labels.get(code)
+                if label is None:
+                    label = labels[code] = frame_label(code)
+                stack.append(label)
+                frame = frame.f_back
+            stack.reverse()
+            stacks[tuple(stack)] += 1
+
+        previous = signal.signal(signal.SIGPROF, sample)
+        started = time.perf_counter()
+        cpu_started = time.process_time()
+        signal.setitimer(signal.ITIMER_PROF, self.interval, self.interval)
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            signal.setitimer(signal.ITIMER_PROF, 0, 0)
+            signal.signal(signal.SIGPROF, previous)
+        profile = Profile(stacks, time.perf_counter() - started, time.process_time() - cpu_started,
+                          self.interval)
+        self.last = profile
+        try:
+            profile.paths = await asyncio.to_thread(self.write, profile)
+        except OSError as e:
+            logger.warning(f"⚠️ Не удалось записать профиль в {self.directory}: {e}")
+        return profile
+
+    def write(self, profile):
+        """Пишет свернутые стеки и горячие функции; возвращает пути файлов"""
+        os.makedirs(self.directory, exist_ok=True)
+        base = os.path.join(self.directory, f"profile-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}")
+        with open(f"{base}.collapsed", "w", encoding="utf-8") as f:
+            f.write("\n".join(profile.collapsed()) + "\n")
+        with open(f"{base}.txt", "w", encoding="utf-8") as f:
+            f.write(profile.report(limit=50) + "\n")
+        return [f"{base}.collapsed", f"{base}.txt"]
+
+
+_shared = None
+
+
+def shared_profiler():
+    """Профилировщик процесса: общий для всех ботов процесса (multibot.py)"""
+    global _shared
+    if _shared is None:
+        _shared = SamplingProfiler.from_config()
+    return _shared
+
+
+def install_signal_handler(profiler, signum=getattr(signal, "SIGUSR2", None)):
+    """Профиль на default_seconds по сигналу (по умолчанию SIGUSR2); False, если нельзя"""
+    if signum is None or not profiler.available:
+        return False
+    try:
+        asyncio.get_running_loop().add_signal_handler(signum, profiler.launch)
+    except (NotImplementedError, RuntimeError, ValueError) as e:
+        logger.warning(f"⚠️ Профилирование по сигналу недоступно: {e}")
+        return False
+    logger.info(f"🔥 Профилирование по сигналу: kill -{signal.Signals(signum).name[3:]} {os.getpid()}")
+    return True
@@ -0,0 +1,443 @@
+"""
+Офлайн-реплей трафика через настоящий стек обработчиков бота.
+
+UpdateFactory собирает update-словари в формате Bot API, build_corpus генерирует
+смешанный трафик (личка, группы, команды, inline, новые участники), build_catalog -
+синтетический каталог материалов для inline-поиска, build_typing_timeline - inline-запросы
+на каждое нажатие клавиши, build_spike_timeline - всплеск группового трафика с сообщениями
+в личку, build_spam_timeline - размеченный трафик группы со спамом, а ReplayHarness
+прогоняет трафик через Application с FakeTelegramAPI вместо сети.
+"""
+
+import asyncio
+import random
+import time
+
+from telegram import Update
+
+from fake_api import FAKE_BOT_TOKEN, FAKE_BOT_USER, FakeTelegramAPI
+
+PRIVATE_TEXTS = [
+    "привет", "как вступить?", "сколько стоит подписка", "дайте файлик пожалуйста",
+    "интересно, расскажи подробнее", "что это за бот", "хочу доступ",
+]
+
+GROUP_TRIGGER_TEXTS = [
+    "как вступить в группу", "скиньте student id", "есть промпты?", "veo круто",
+    "где скачать материалы", "нужен доступ к каналу", "@saint_buddah_bot помоги",
+]
+
+GROUP_CHATTER_TEXTS = [
+    "всем привет", "спасибо за урок", "отличный эфир был вчера", "согласен",
+    "у меня получилось", "кто пробовал midjourney?", "до завтра",
+]
+
+SPAM_TEMPLATES = [
+    "🔥 Заработок от {n}$ в день без вложений и опыта! Пиши в лс @{nick} 💰",
+    "Продам базу промптов дешевле в {n} раз, все курсы сразу, ссылка в профиле {nick}",
+    "Крипто-сигналы с точностью {n}%, первая неделя бесплатно, вступай t.me/{nick}",
+]
+
+FLOOD_TEXTS = ["ааа", "ау", "купи", "???", "эй", "алло", "ответьте", "ну"]
+
+COMMANDS = ["/start", "/help", "/info"]
+
+INLINE_QUERIES = ["", "файл", "доступ", "veo", "промпт", "вступить", "круто"]
+
+CATALOG_TOPICS = [
+    "промпт", "шаблон", "нейросеть", "видео", "картинка", "текст", "маркетинг", "продажи",
+    "гайд", "инструмент", "чат", "бот", "midjourney", "veo", "gpt", "фото", "логотип",
+    "реклама", "копирайтинг", "сценарий", "музыка", "голос", "перевод", "код", "python",
+    "excel", "презентация", "резюме", "пост", "инструкция",
+]
+
+CATALOG_ENDINGS = ["", "ы", "а", "ов", "ам", "и", "ой", "ах", "ом"]
+
+CATALOG_FILLER = [
+    "для", "как", "лучший", "быстро", "профессиональный", "бесплатно", "новый",
+    "простой", "эффективный", "готовый",
+]
+
+DEFAULT_MIX = {
+    "private": 0.25,
+    "group_trigger": 0.20,
+    "group_chatter": 0.35,
+    "command": 0.08,
+    "inline": 0.10,
+    "new_member": 0.02,
+}
+
+GROUP_CHAT_ID = -1001234567890
+
+
+class UpdateFactory:
+    """Генератор update-словарей в формате Bot API"""
+
+    def __init__(self, start_update_id=1, date=None):
+        self.update_id = start_update_id - 1
+        self.date = date
+
+    def _next_id(self):
+        self.update_id += 1
+        return self.update_id
+
+    def _date(self):
+        return self.date if self.date is not None else int(time.time())
+
+    @staticmethod
+    def user(user_id, is_bot=False):
+        return {"id": user_id, "is_bot": is_bot, "first_name": f"User{user_id}"}
+
+    @staticmethod
+    def chat(chat_id, chat_type):
+        chat = {"id": chat_id, "type": chat_type}
+        if chat_type != "private":
+            chat["title"] = "Buddah Base"
+        return chat
+
+    def message(self, text, chat_type="private", user_id=1001, chat_id=None, **extra):
+        """Текстовое сообщение; команды автоматически получают entity bot_command"""
+        update_id = self._next_id()
+        if chat_id is None:
+            chat_id = user_id if chat_type == "private" else GROUP_CHAT_ID
+        message = {
+            "message_id": update_id,
+            "date": self._date(),
+            "chat": self.chat(chat_id, chat_type),
+            "from": self.user(user_id),
+            "text": text,
+        }
+        if text.startswith("/"):
+            command = text.split()[0]
+            message["entities"] = [{"type": "bot_command", "offset": 0, "length": len(command)}]
+        message.update(extra)
+        return {"update_id": update_id, "message": message}
+
+    def topic_message(self, text, thread_id=None, user_id=1001, chat_id=GROUP_CHAT_ID, **extra):
+        """Сообщение в теме форума; thread_id=None - тема General"""
+        data = self.message(text, "supergroup", user_id, chat_id, **extra)
+        data["message"]["chat"]["is_forum"] = True
+        if thread_id is not None:
+            data["message"]["message_thread_id"] = thread_id
+            data["message"]["is_topic_message"] = True
+        return data
+
+    def inline_query(self, query, user_id=1001, offset=""):
+        update_id = self._next_id()
+        return {
+            "update_id": update_id,
+            "inline_query": {
+                "id": str(update_id),
+                "from": self.user(user_id),
+                "query": query,
+                "offset": offset,
+            },
+        }
+
+    def callback_query(self, data, user_id=1001, message_id=1, chat_id=GROUP_CHAT_ID):
+        """Нажатие inline-кнопки под сообщением бота"""
+        update_id = self._next_id()
+        chat_type = "private" if chat_id > 0 else "supergroup"
+        return {
+            "update_id": update_id,
+            "callback_query": {
+                "id": str(update_id),
+                "from": self.user(user_id),
+                "chat_instance": str(chat_id),
+                "data": data,
+                "message": {
+                    "message_id": message_id,
+                    "date": self._date(),
+                    "chat": self.chat(chat_id, chat_type),
+                    "from": self.user(FAKE_BOT_USER["id"], is_bot=True),
+                    "text": "👋",
+                },
+            },
+        }
+
+    def edited_message(self, original, text):
+        """Правка сообщения из message(): тот же message_id, новый текст и edit_date"""
+        message = dict(original["message"], text=text, edit_date=self._date())
+        message.pop("entities", None)
+        if text.startswith("/"):
+            message["entities"] = [{"type": "bot_command", "offset": 0, "length": len(text.split()[0])}]
+        return {"update_id": self._next_id(), "edited_message": message}
+
+    def channel_post(self, text, chat_id=-1009876543210):
+        update_id = self._next_id()
+        return {
+            "update_id": update_id,
+            "channel_post": {
+                "message_id": update_id,
+                "date": self._date(),
+                "chat": {"id": chat_id, "type": "channel", "title": "Buddah Base News"},
+                "text": text,
+            },
+        }
+
+    def my_chat_member(self, status="left", user_id=1001, chat_id=GROUP_CHAT_ID):
+        """Смена статуса бота в чате: member - добавили, left - удалили"""
+        update_id = self._next_id()
+        bot = self.user(FAKE_BOT_USER["id"], is_bot=True)
+        return {
+            "update_id": update_id,
+            "my_chat_member": {
+                "chat": self.chat(chat_id, "supergroup"),
+                "from": self.user(user_id),
+                "date": self._date(),
+                "old_chat_member": {"user": bot, "status": "member"},
+                "new_chat_member": {"user": bot, "status": status},
+            },
+        }
+
+    def new_members(self, user_ids, chat_id=GROUP_CHAT_ID):
+        update_id = self._next_id()
+        return {
+            "update_id": update_id,
+            "message": {
+                "message_id": update_id,
+                "date": self._date(),
+                "chat": self.chat(chat_id, "supergroup"),
+                "from": self.user(user_ids[0]),
+                "new_chat_members": [self.user(user_id) for user_id in user_ids],
+            },
+        }
+
+
+def build_corpus(count, seed=42, mix=None, users=500, factory=None):
+    """Генерирует детерминированный смешанный корпус update-словарей"""
+    rng = random.Random(seed)
+    factory = factory or UpdateFactory()
+    mix = mix or DEFAULT_MIX
+    kinds = list(mix)
+    weights = [mix[kind] for kind in kinds]
+
+    corpus = []
+    for kind in rng.choices(kinds, weights=weights, k=count):
+        user_id = 1000 + rng.randrange(users)
+        if kind == "private":
+            corpus.append(factory.message(rng.choice(PRIVATE_TEXTS), "private", user_id))
+        elif kind == "group_trigger":
+            corpus.append(factory.message(rng.choice(GROUP_TRIGGER_TEXTS), "supergroup", user_id))
+        elif kind == "group_chatter":
+            corpus.append(factory.message(rng.choice(GROUP_CHATTER_TEXTS), "supergroup", user_id))
+        elif kind == "command":
+            chat_type = rng.choice(["private", "supergroup"])
+            corpus.append(factory.message(rng.choice(COMMANDS), chat_type, user_id))
+        elif kind == "inline":
+            corpus.append(factory.inline_query(rng.choice(INLINE_QUERIES), user_id))
+        else:
+            corpus.append(factory.new_members([user_id]))
+    return corpus
+
+
+def build_catalog(count, seed=7, rare_words=3000):
+    """Генерирует детерминированный каталог записей в формате catalog.json"""
+    rng = random.Random(seed)
+    words = [topic + ending for topic in CATALOG_TOPICS for ending in CATALOG_ENDINGS]
+    words += [f"слово{i}" for i in range(rare_words)]
+    description_words = words + CATALOG_FILLER * 20
+    catalog = []
+    for i in range(count):
+        title = " ".join(rng.choice(words) for _ in range(rng.randint(3, 7)))
+        description = " ".join(rng.choice(description_words) for _ in range(rng.randint(8, 20)))
+        catalog.append({
+            "id": f"item{i}",
+            "title": title,
+            "description": description,
+            "tags": [rng.choice(CATALOG_TOPICS)],
+        })
+    return catalog
+
+
+def build_typing_timeline(users, text="промпт для видео", interval=0.12, jitter=0.5, seed=3,
+                          factory=None):
+    """Inline-запросы на каждое нажатие клавиши: [(секунда, update), ...] для users
+    пользователей, печатающих text с паузой interval +- jitter между нажатиями"""
+    rng = random.Random(seed)
+    factory = factory or UpdateFactory()
+    timeline = []
+    for user in range(users):
+        at = rng.uniform(0, interval)
+        for length in range(1, len(text) + 1):
+            timeline.append((at, factory.inline_query(text[:length], 5000 + user)))
+            at += interval * rng.uniform(1 - jitter, 1 + jitter)
+    return timeline
+
+
+def build_spike_timeline(phases=((1.0, 100), (1.0, 1000)), private_rate=10, seed=5, factory=None):
+    """Групповой трафик по фазам [(длительность, апдейтов в секунду), ...] и равномерные
+    сообщения в личку private_rate в секунду от разных пользователей (id с 9000)"""
+    rng = random.Random(seed)
+    factory = factory or UpdateFactory()
+    group_mix = {"group_trigger": 0.5, "group_chatter": 0.5}
+    timeline = []
+    started = 0.0
+    for duration, rate in phases:
+        corpus = build_corpus(int(duration * rate), seed=rng.randrange(1 << 30), mix=group_mix,
+                              users=200, factory=factory)
+        timeline.extend((started + rng.random() * duration, update) for update in corpus)
+        started += duration
+    for index in range(int(started * private_rate)):
+        timeline.append((index / private_rate, factory.message("как вступить?", "private", 9000 + index)))
+    timeline.sort(key=lambda item: item[0])
+    return timeline
+
+
+def build_spam_timeline(seconds=600, rate=5.0, waves=10, wave_size=20, flooders=5, flood_size=15,
+                        users=2000, seed=11, factory=None):
+    """Трафик группы с разметкой: [(секунда, update, спам ли), ...].
+
+    Обычные сообщения users участников идут с частотой rate в секунду. Волна рекламы -
+    wave_size вариаций одного шаблона от разных новых аккаунтов за несколько секунд,
+    флудер - flood_size коротких сообщений одного пользователя подряд.
+    """
+    rng = random.Random(seed)
+    factory = factory or UpdateFactory()
+    normal_texts = GROUP_CHATTER_TEXTS + GROUP_TRIGGER_TEXTS
+    timeline = []
+    at = 0.0
+    while True:
+        at += rng.expovariate(rate)
+        if at >= seconds:
+            break
+        user_id = 1000 + rng.randrange(users)
+        timeline.append((at, factory.message(rng.choice(normal_texts), "supergroup", user_id), False))
+
+    spammer_id = 70000
+    for _ in range(waves):
+        template = rng.choice(SPAM_TEMPLATES)
+        start = rng.uniform(0, seconds)
+        for _ in range(wave_size):
+            spammer_id += 1
+            text = template.format(n=rng.randint(3, 99), nick=f"earn{rng.randint(100, 999)}")
+            timeline.append((start + rng.uniform(0, 5), factory.message(text, "supergroup", spammer_id), True))
+    for flooder in range(flooders):
+        start = rng.uniform(0, seconds)
+        for index in range(flood_size):
+            message = factory.message(rng.choice(FLOOD_TEXTS), "supergroup", 80000 + flooder)
+            timeline.append((start + index * 0.4, message, True))
+    timeline.sort(key=lambda item: item[0])
+    return timeline
+
+
+class ReplayHarness:
+    """Прогоняет update-словари через обработчики бота без сети.
+
+    Использование:
+
+        async with ReplayHarness() as harness:
+            stats = await harness.replay(build_corpus(1000))
+    """
+
+    def __init__(self, api=None, bot_factory=None, runtime=None):
+        self.api = api or FakeTelegramAPI()
+        self.bot_factory = bot_factory
+        self.runtime = runtime
+        self.bot = None
+        self.application = None
+        self._background = set()
+
+    async def __aenter__(self):
+        # Импорт здесь, чтобы модуль можно было использовать без загрузки bot.py
+        from bot import BuddahBaseBot
+        from persistence import StateStore
+        from runtime import BotRuntime
+
+        # По умолчанию состояние только в памяти, чтобы реплей не писал файлы
+        runtime = self.runtime or BotRuntime(store=StateStore())
+        factory = self.bot_factory or BuddahBaseBot
+        self.bot = factory(token=FAKE_BOT_TOKEN, request=self.api, runtime=runtime)
+        await self.bot.initialize()
+        self.runtime = self.bot.runtime
+        self.application = self.bot.application
+        await self.runtime.start()
+        await self.application.initialize()
+        # start() нужен для неблокирующих обработчиков; polling при этом не запускается
+        await self.application.start()
+        # Фоновые циклы runtime живут до выхода; drain ждет только задачи обработчиков
+        self._background = asyncio.all_tasks()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.application.stop()
+        await self.application.shutdown()
+        await self.runtime.stop()
+
+    async def process(self, data, wait=True):
+        """Обрабатывает один update-словарь.
+
+        По умолчанию дожидается и неблокирующих обработчиков (block=False); с wait=False
+        апдейт только передается в Application, как при получении пачки getUpdates.
+        """
+        update = Update.de_json(data, self.application.bot)
+        await self.application.process_update(update)
+        if wait:
+            await self.drain()
+
+    async def drain(self):
+        """Ждет завершения всех задач, запущенных обработчиками"""
+        current = asyncio.current_task()
+        while True:
+            await asyncio.sleep(0)
+            pending = asyncio.all_tasks() - self._background - {current}
+            if not pending:
+                return
+            await asyncio.wait(pending)
+
+    async def enqueue(self, data):
+        """Кладет update-словарь в update_queue, как Updater после getUpdates: апдейт
+        проходит через обработчик апдейтов Application (очередь и отбрасывание нагрузки)"""
+        await self.application.update_queue.put(Update.de_json(data, self.application.bot))
+
+    async def feed(self, timeline, queued=False):
+        """Подает апдейты по расписанию [(секунда от начала, update), ...], не дожидаясь
+        ответов между ними, и возвращает число вызовов API за прогон.
+
+        С queued=True апдейты идут через update_queue, иначе сразу в process_update.
+        """
+        calls_before = len(self.api.calls)
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        for at, data in sorted(timeline, key=lambda item: item[0]):
+            delay = started + at - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            if queued:
+                await self.enqueue(data)
+            else:
+                await self.process(data, wait=False)
+        if queued:
+            await self.application.update_queue.join()
+        await self.drain()
+        return len(self.api.calls) - calls_before
+
+    async def replay(self, corpus):
+        """Последовательно обрабатывает корпус и возвращает статистику"""
+        calls_before = len(self.api.calls)
+        latencies = []
+        started = time.perf_counter()
+        for data in corpus:
+            update_started = time.perf_counter()
+            await self.process(data)
+            latencies.append(time.perf_counter() - update_started)
+            # Как и при реальном polling, между апдейтами работают фоновые задачи
+            await asyncio.sleep(0)
+        seconds = time.perf_counter() - started
+        latencies.sort()
+        return {
+            "updates": len(corpus),
+            "seconds": seconds,
+            "updates_per_sec": len(corpus) / seconds if seconds else 0.0,
+            "api_calls": len(self.api.calls) - calls_before,
+            "p50_ms": percentile(latencies, 0.50) * 1000,
+            "p99_ms": percentile(latencies, 0.99) * 1000,
+        }
+
+
+def percentile(sorted_values, fraction):
+    """Перцентиль отсортированного списка (ближайший ранг)"""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(fraction * len(sorted_values)))
+    return sorted_values[index]
@@ -0,0 +1,357 @@
+"""
+Состояние одного экземпляра бота, доступное обработчикам.
+
+BotRuntime кладется в application.bot_data['runtime'] и объединяет хранилище
+состояния, кулдауны ответов, учет лидов и приветствованных участников, аналитику воронки,
+индекс каталога и отсечение устаревших запросов для inline-поиска, реестр медиафайлов,
+модерацию групп (темы форума, антиспам, проверка новых участников), автоудаление
+ответов в группах, рассылки подписчикам, живые метрики, сводку ошибок, трассировку апдейтов,
+профилировщик процесса, монитор задержки цикла событий, предохранитель вызовов Bot API и
+догоняние апдейтов, накопленных за время простоя.
+"""
+
+import functools
+import time
+from collections import OrderedDict
+
+from analytics import EVENT_CONVERTED, EVENT_DM, FunnelAnalytics
+from broadcast import Broadcaster
+from catchup import OFFSET_RESET_GAP, CatchUp, OffsetTracker
+from config import Config
+from debounce import InlineDebouncer
+from errors import ErrorAggregator
+from matcher import get_precomputed
+from media import MediaRegistry
+from metrics import BotMetrics
+from persistence import StateStore
+from tracing import Tracer, current_trace
+
+# Пространства имен в StateStore
+NS_COOLDOWN = "cooldown"
+NS_MEMBER = "member"
+NS_LEAD = "lead"
+NS_META = "meta"
+
+# Сколько последних сообщений помнить для сверки правок с исходным ответом
+REPLY_MEMORY = 10000
+
+# Упоминания бота в тексте (в нижнем регистре); у ботов multibot.py - свои
+BOT_MENTIONS = ("@saint_buddah_bot", "saint_buddah")
+
+
+class BotRuntime:
+    def __init__(self, store=None, precomputed=None, reply_cooldown=0, analytics=None, metrics=None,
+                 catalog=None, inline=None, media=None, spam=None, topics=None, janitor=None,
+                 verifier=None, broadcaster=None, mentions=BOT_MENTIONS, admin_ids=None, tracer=None,
+                 profiler=None, monitor=None, breakers=None, errors=None, handle_edits=False,
+                 catchup=None):
+        self.store = store
+        self._precomputed = precomputed
+        self.reply_cooldown = reply_cooldown
+        self.analytics = analytics
+        self.metrics = metrics or BotMetrics()
+        self.errors = errors or ErrorAggregator()
+        self.catalog = catalog
+        self.inline = inline
+        self.media = media
+        self.spam = spam
+        self.topics = topics
+        self.janitor = janitor
+        self.verifier = verifier
+        self.broadcaster = broadcaster
+        self.mentions = tuple(mentions)
+        # None - администраторы из Config.ADMIN_IDS
+        self._admin_ids = admin_ids
+        self.tracer = tracer
+        self.profiler = profiler
+        self.monitor = monitor
+        # Цепи методов Bot API; транспорт бота (breaker.BreakerRequest) - в bot.py
+        self.breakers = breakers
+        self.cooldown_suppressed = 0
+        # Правки сообщений обрабатываются тем же матчером; (чат, сообщение) -> вид ответа
+        self.handle_edits = handle_edits
+        self.replies = OrderedDict() if handle_edits else None
+        # Продолжение с last_update_id после перезапуска (bot.py) и разбор накопленного
+        self.catchup = catchup
+        # Апдейты в работе: сохраняется id, до которого завершены все (catchup.py)
+        self.offsets = OffsetTracker()
+
+    @classmethod
+    def from_config(cls, store=None, analytics=None, **overrides):
+        """Runtime с хранилищем из настроек (только память, если путь к базе пуст).
+
+        Боты multibot.py передают свои хранилище, аналитику и параметры конструктора
+        (матчер, упоминания, администраторы); остальное собирается из Config.
+        """
+        if store is None:
+            store = StateStore(Config.STATE_DB_PATH or None, flush_interval=Config.STATE_FLUSH_INTERVAL)
+        if analytics is None:
+            analytics = FunnelAnalytics(Config.ANALYTICS_DIR or None,
+                                        rollup_interval=Config.ANALYTICS_ROLLUP_INTERVAL)
+        components = dict(
+            store=store, reply_cooldown=Config.REPLY_COOLDOWN_SECONDS, analytics=analytics,
+            metrics=BotMetrics(Config.METRICS_WINDOW_SECONDS),
+            errors=ErrorAggregator.from_config(),
+            handle_edits=Config.HANDLE_EDITED_MESSAGES,
+            catchup=CatchUp.from_config() if Config.RESUME_UPDATES else None,
+            inline=InlineDebouncer(Config.INLINE_DEBOUNCE_SECONDS) if Config.INLINE_DEBOUNCE_SECONDS > 0 else None,
+            media=MediaRegistry(Config.MEDIA_ASSETS, Config.MEDIA_DIR, store),
+            broadcaster=Broadcaster.from_config(store),
+            tracer=Tracer.from_config() if Config.TRACE_SAMPLE_RATE > 0 else None,
+        )
+        # Модули необязательных функций импортируются, только если функция включена:
+        # выключенные не замедляют холодный старт
+        if Config.SPAM_GUARD:
+            from spam_guard import SpamGuard
+            components["spam"] = SpamGuard.from_config()
+        if Config.TOPIC_ALLOWED_THREADS:
+            from topic_guard import TopicGuard
+            components["topics"] = TopicGuard.from_config()
+        if Config.GROUP_REPLY_TTL_SECONDS > 0:
+            from autodelete import ReplyJanitor
+            components["janitor"] = ReplyJanitor.from_config(store)
+        if Config.JOIN_VERIFICATION:
+            from verification import JoinVerifier
+            components["verifier"] = JoinVerifier.from_config(store)
+        if Config.PROFILE_DIR:
+            from profiling import shared_profiler
+            components["profiler"] = shared_profiler()
+        if Config.LOOP_MONITOR_INTERVAL > 0:
+            from loop_monitor import shared_monitor
+            components["monitor"] = shared_monitor()
+        if Config.API_BREAKER:
+            from breaker import CircuitBreakers
+            components["breakers"] = CircuitBreakers.from_config()
+        components.update(overrides)
+        return cls(**components)
+
+    @property
+    def precomputed(self):
+        return self._precomputed or get_precomputed()
+
+    @property
+    def has_own_precomputed(self):
+        """Свои матчер и шаблоны (бот хоста multibot.py) вместо общих из Config"""
+        return self._precomputed is not None
+
+    @property
+    def admin_ids(self):
+        return Config.ADMIN_IDS if self._admin_ids is None else self._admin_ids
+
+    async def start(self):
+        """Открывает хранилище (теплый старт) и чистит истекшие кулдауны"""
+        if self.store:
+            await self.store.open()
+            self._prune_cooldowns(time.time())
+        if self.catchup:
+            self.catchup.start()
+        if self.analytics:
+            await self.analytics.start()
+        if self.spam:
+            await self.spam.start()
+        if self.topics:
+            await self.topics.start()
+        if self.janitor:
+            await self.janitor.start()
+        if self.verifier:
+            await self.verifier.start()
+        if self.broadcaster:
+            await self.broadcaster.start()
+        if self.monitor:
+            await self.monitor.start()
+
+    async def stop(self):
+        if self.monitor:
+            await self.monitor.stop()
+        if self.broadcaster:
+            await self.broadcaster.stop()
+        if self.verifier:
+            await self.verifier.stop()
+        if self.janitor:
+            await self.janitor.stop()
+        if self.topics:
+            await self.topics.stop()
+        if self.spam:
+            await self.spam.stop()
+        if self.analytics:
+            await self.analytics.stop()
+        if self.store:
+            await self.store.close()
+        if self.tracer:
+            self.tracer.close()
+
+    def track(self, event, chat_id, user_id):
+        """Учитывает событие воронки в аналитике, если она включена"""
+        if self.analytics:
+            self.analytics.record(event, chat_id, user_id)
+
+    def moderate(self, bot, message):
+        """Модерация сообщения группы: непроверенные участники, темы форума, антиспам.
+
+        Возвращает вердикт, если сообщение поставлено в очередь на удаление, иначе None.
+        """
+        verdict = self.verifier.inspect(bot, message) if self.verifier else None
+        if verdict is None and self.topics:
+            verdict = self.topics.inspect(bot, message)
+        if verdict is None and self.spam:
+            verdict = self.spam.inspect(bot, message)
+        return verdict
+
+    def expire_reply(self, message):
+        """Ставит ответ бота в группе на автоудаление, если оно включено"""
+        if self.janitor and message is not None:
+            self.janitor.schedule(message.chat_id, message.message_id)
+
+    def remember_reply(self, chat_id, message_id, kind):
+        """Запоминает вид ответа на сообщение (None - без ответа), если правки обрабатываются"""
+        if self.replies is None:
+            return
+        key = (chat_id, message_id)
+        self.replies[key] = kind
+        self.replies.move_to_end(key)
+        if len(self.replies) > REPLY_MEMORY:
+            self.replies.popitem(last=False)
+
+    def catch_up(self, message, kind):
+        """Отвечать ли на сообщение, накопленное за время простоя (всегда - вне догоняния)"""
+        return self.catchup.admit(message, kind) if self.catchup else True
+
+    def allow_reply(self, chat_id, user_id, intent, now=None):
+        """Проверяет кулдаун ответа пользователю в чате и отмечает ответ"""
+        if not self.store or self.reply_cooldown <= 0:
+            return True
+        now = now or time.time()
+        key = f"{chat_id}:{user_id}:{intent}"
+        last = self.store.get(NS_COOLDOWN, key)
+        if last is not None and now - last < self.reply_cooldown:
+            self.cooldown_suppressed += 1
+            return False
+        self.store.set(NS_COOLDOWN, key, now)
+        return True
+
+    def _prune_cooldowns(self, now):
+        expired = [key for key, last in self.store.items(NS_COOLDOWN)
+                   if now - last >= self.reply_cooldown]
+        for key in expired:
+            self.store.delete(NS_COOLDOWN, key)
+
+    def record_lead(self, user_id, chat_id, chat_type, intent, now=None):
+        """Учитывает обращение пользователя в воронке лидов.
+
+        Первое сообщение в личку от пользователя, которому бот уже отвечал в группе,
+        считается переходом из группы в личку.
+        """
+        if chat_type == "private":
+            self.track(EVENT_DM, chat_id, user_id)
+        if not self.store:
+            return
+        now = now or time.time()
+        lead = self.store.get(NS_LEAD, str(user_id))
+        if lead is None:
+            lead = {"first_seen": now, "intents": {}, "private": False}
+        lead["last_seen"] = now
+        lead["last_chat_id"] = chat_id
+        if chat_type == "private":
+            if not lead["private"] and lead["intents"]:
+                self.track(EVENT_CONVERTED, chat_id, user_id)
+            lead["private"] = True
+        if intent:
+            lead["intents"][intent] = lead["intents"].get(intent, 0) + 1
+        self.store.set(NS_LEAD, user_id, lead)
+
+    def record_member(self, chat_id, user_id, now=None):
+        """Отмечает приветствованного участника; возвращает True при первом входе"""
+        if not self.store:
+            return True
+        key = f"{chat_id}:{user_id}"
+        member = self.store.get(NS_MEMBER, key)
+        first_time = member is None
+        member = member or {"first_welcomed": now or time.time(), "joins": 0}
+        member["joins"] += 1
+        self.store.set(NS_MEMBER, key, member)
+        return first_time
+
+    def subscribe(self, chat_id):
+        """Запоминает личный чат как подписчика рассылок"""
+        if self.broadcaster:
+            self.broadcaster.subscribe(chat_id)
+
+    def begin_update(self, update_id):
+        """Апдейт принят LoadShedder; offset сдвигается только после его завершения"""
+        self.offsets.begin(update_id)
+
+    def finish_update(self, update_id):
+        self._save_offset(self.offsets.finish(update_id))
+
+    def record_update(self, update_id):
+        self.metrics.record_update()
+        # Апдейты мимо LoadShedder (Application.process_update напрямую) идут по одному
+        if update_id not in self.offsets:
+            self._save_offset(update_id)
+
+    def _save_offset(self, update_id):
+        if not self.store:
+            return
+        saved = self.last_update_id or 0
+        # Намного ниже сохраненного - Telegram начал счет заново (catchup.py)
+        if update_id > saved or update_id < saved - OFFSET_RESET_GAP:
+            self.store.set(NS_META, "last_update_id", update_id)
+
+    def reset_offset(self, update_id):
+        """Telegram начал счет update_id заново (catchup.confirm_offset): сохраненный
+        offset понижается, дальше растет от нового значения"""
+        if self.store:
+            self.store.set(NS_META, "last_update_id", update_id)
+
+    @property
+    def last_update_id(self):
+        return self.store.get(NS_META, "last_update_id") if self.store else None
+
+
+_DEFAULT_RUNTIME = BotRuntime()
+
+
+def get_runtime(context):
+    """BotRuntime приложения из bot_data.
+
+    В тестах с Mock-контекстом bot_data не является словарем - тогда возвращается
+    пустой runtime без хранилища, и обработчики работают как раньше.
+    """
+    bot_data = getattr(context, "bot_data", None)
+    runtime = bot_data.get("runtime") if isinstance(bot_data, dict) else None
+    return runtime or _DEFAULT_RUNTIME
+
+
+def timed(callback):
+    """Оборачивает обработчик PTB замером задержки в метрики runtime и спаном трассы.
+
+    Монитор цикла событий узнает, какой обработчик и апдейт выполняет задача, а
+    исключение - имя обработчика (handler_name) для сводки ошибок.
+    """
+    name = callback.__name__
+
+    @functools.wraps(callback)
+    async def wrapper(update, context):
+        started = time.perf_counter()
+        runtime = get_runtime(context)
+        monitor = runtime.monitor
+        task = monitor.enter(name, update) if monitor else None
+        trace = current_trace()
+        if trace is not None and trace.handler_started is None:
+            trace.handler_started = started
+        try:
+            return await callback(update, context)
+        except Exception as e:
+            # Для группировки ошибок в error_handler: в каком обработчике упало
+            if getattr(e, "handler_name", None) is None:
+                e.handler_name = name
+            raise
+        finally:
+            finished = time.perf_counter()
+            runtime.metrics.observe(name, finished - started)
+            if monitor:
+                monitor.exit(task)
+            if trace is not None:
+                trace.add(name, started, finished)
+
+    return wrapper
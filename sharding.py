@@ -0,0 +1,420 @@
+#!/usr/bin/env python3
+"""
+Режим вебхука с шардированием апдейтов по процессам.
+
+Один процесс Python упирается в одно ядро. В этом режиме фронт принимает вебхуки
+Telegram (WebhookReceiver) и раскладывает апдейты по SHARD_WORKERS процессам-
+обработчикам (ShardRouter) по согласованному хешу id чата (HashRing):
+
+- все апдейты чата попадают в один процесс и передаются ему по одному упорядоченному
+  каналу (Unix-сокет); в процессе LoadShedder выполняет апдейты одного чата по одному
+  в порядке приема (serialize_chats), разные чаты - параллельно;
+- inline-запросы и нажатия кнопок без сообщения идут по id пользователя - туда же,
+  куда его личный чат;
+- при изменении числа процессов к другому процессу переезжает только ~1/N чатов.
+
+Процессы ничего не разделяют: у каждого свой BuddahBaseBot с LoadShedder, свое
+хранилище состояния (STATE_DB_PATH с суффиксом .shardN), аналитика и файл трасс. Данные, общие
+для нескольких чатов одного пользователя (воронка группа -> личка), и подписчики
+рассылок считаются в пределах шарда. Поэтому /broadcast доходит только до подписчиков
+процесса, куда попал личный чат администратора: рассылку всем подписчикам в этом
+режиме запускают в каждом процессе отдельно или из бота в режиме polling с общей базой.
+
+Проверки здоровья (health.py) у каждого процесса свои: /healthz и /readyz на
+HEALTH_PORT + номер процесса, без проверки getUpdates.
+
+Фронт отвечает Telegram 200 после передачи апдейта в канал процесса. Процесс не
+читает канал, пока принятых им и не обработанных апдейтов MAX_BACKLOG и больше
+(малоценное при этом отбрасывается раньше, как при polling): буфер сокета
+заполняется, фронт медлит с ответом и Telegram снижает темп.
+
+Запуск: python sharding.py (процессы-обработчики запускаются сами)
+"""
+
+import asyncio
+import bisect
+import hashlib
+import json
+import logging
+import os
+import struct
+import sys
+import tempfile
+from contextlib import suppress
+
+from telegram import Update
+
+from analytics import FunnelAnalytics
+from bot import BuddahBaseBot
+from config import Config
+from health import HealthCheck, read_request_head, start_health_server
+from persistence import StateStore
+from profiling import install_signal_handler, shared_profiler
+from runtime import BotRuntime
+from startup import install_event_loop_policy
+from tracing import Tracer
+from update_types import allowed_updates
+
+logger = logging.getLogger(__name__)
+
+# Кадр канала фронт <-> процесс: тип (1 байт) и длина данных
+FRAME = struct.Struct(">cI")
+KIND_HELLO = b"H"
+KIND_UPDATE = b"U"
+KIND_STATS = b"S"
+KIND_QUIT = b"Q"
+
+# Поля апдейта с чатом и поля, где есть только пользователь
+CHAT_FIELDS = ("message", "edited_message", "channel_post", "edited_channel_post",
+               "my_chat_member", "chat_member", "chat_join_request")
+USER_FIELDS = ("inline_query", "chosen_inline_result", "shipping_query", "pre_checkout_query")
+
+RESPONSES = {
+    200: b"HTTP/1.1 200 OK\r\nContent-Length: 0\r\n\r\n",
+    400: b"HTTP/1.1 400 Bad Request\r\nContent-Length: 0\r\n\r\n",
+    403: b"HTTP/1.1 403 Forbidden\r\nContent-Length: 0\r\n\r\n",
+    404: b"HTTP/1.1 404 Not Found\r\nContent-Length: 0\r\n\r\n",
+    413: b"HTTP/1.1 413 Payload Too Large\r\nContent-Length: 0\r\nConnection: close\r\n\r\n",
+    503: b"HTTP/1.1 503 Service Unavailable\r\nContent-Length: 0\r\n\r\n",
+}
+
+
+def _hash(text):
+    return int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+class HashRing:
+    """Согласованное хеширование: replicas виртуальных точек на процесс"""
+
+    def __init__(self, nodes, replicas=100):
+        points = sorted((_hash(f"{node}:{replica}"), node)
+                        for node in range(nodes) for replica in range(replicas))
+        self._hashes = [point for point, _ in points]
+        self._nodes = [node for _, node in points]
+
+    def node(self, key):
+        index = bisect.bisect(self._hashes, _hash(str(key)))
+        return self._nodes[index % len(self._nodes)]
+
+
+def chat_key(update):
+    """Ключ шардирования апдейта-словаря: id чата, иначе id пользователя"""
+    for field in CHAT_FIELDS:
+        item = update.get(field)
+        if item and "chat" in item:
+            return item["chat"]["id"]
+    callback = update.get("callback_query")
+    if callback:
+        message = callback.get("message")
+        return message["chat"]["id"] if message else callback["from"]["id"]
+    for field in USER_FIELDS:
+        item = update.get(field)
+        if item and "from" in item:
+            return item["from"]["id"]
+    poll_answer = update.get("poll_answer")
+    if poll_answer and "user" in poll_answer:
+        return poll_answer["user"]["id"]
+    return update.get("update_id", 0)
+
+
+def shard_path(path, index):
+    """Путь файла процесса: bot_state.db -> bot_state.shard0.db"""
+    if not path:
+        return ""
+    root, ext = os.path.splitext(path)
+    return f"{root}.shard{index}{ext}"
+
+
+def write_frame(writer, kind, payload=b""):
+    writer.write(FRAME.pack(kind, len(payload)) + payload)
+
+
+async def read_frame(reader):
+    kind, length = FRAME.unpack(await reader.readexactly(FRAME.size))
+    payload = await reader.readexactly(length) if length else b""
+    return kind, payload
+
+
+class ShardRouter:
+    """Запускает процессы-обработчики и раскладывает по ним апдейты"""
+
+    def __init__(self, workers, socket_path=None, command=None, spawn=True, start_timeout=60.0):
+        self.workers = workers
+        self.ring = HashRing(workers)
+        self.socket_path = socket_path or os.path.join(tempfile.gettempdir(),
+                                                       f"buddah-shards-{os.getpid()}.sock")
+        # К команде добавляются номер процесса и путь сокета
+        self.command = command or [sys.executable, os.path.abspath(__file__), "--worker"]
+        self.spawn = spawn
+        self.start_timeout = start_timeout
+        self.routed = [0] * workers
+        self.processes = []
+        self._writers = {}
+        self._replies = {}
+        self._connected = None
+        self._server = None
+
+    async def start(self):
+        """Открывает сокет и ждет, пока все процессы подключатся"""
+        with suppress(FileNotFoundError):
+            os.unlink(self.socket_path)
+        self._connected = asyncio.Event()
+        self._server = await asyncio.start_unix_server(self._accept, path=self.socket_path)
+        if self.spawn:
+            for index in range(self.workers):
+                self.processes.append(await asyncio.create_subprocess_exec(
+                    *self.command, str(index), self.socket_path))
+        await asyncio.wait_for(self._connected.wait(), self.start_timeout)
+        logger.info(f"🧩 Подключено процессов-обработчиков: {self.workers}")
+
+    async def _accept(self, reader, writer):
+        kind, payload = await read_frame(reader)
+        if kind != KIND_HELLO:
+            writer.close()
+            return
+        index = int(payload)
+        self._writers[index] = writer
+        replies = self._replies[index] = asyncio.Queue()
+        if len(self._writers) == self.workers:
+            self._connected.set()
+        try:
+            while True:
+                kind, payload = await read_frame(reader)
+                if kind == KIND_STATS:
+                    replies.put_nowait(json.loads(payload))
+        except (asyncio.IncompleteReadError, ConnectionError):
+            if self._writers.pop(index, None) is not None:
+                logger.error(f"❌ Процесс-обработчик {index} отключился")
+
+    def shard(self, update):
+        return self.ring.node(chat_key(update))
+
+    async def route(self, update, body=None):
+        """Передает апдейт процессу его чата; возвращает номер процесса"""
+        index = self.shard(update)
+        writer = self._writers.get(index)
+        if writer is None:
+            raise ConnectionError(f"процесс-обработчик {index} недоступен")
+        write_frame(writer, KIND_UPDATE, body if body is not None else json.dumps(update).encode("utf-8"))
+        self.routed[index] += 1
+        # Процесс не успевает - ждем, пока канал освободится
+        await writer.drain()
+        return index
+
+    async def stats(self):
+        """Статистика процессов после обработки всех переданных им апдейтов"""
+        indexes = sorted(self._writers)
+        for index in indexes:
+            write_frame(self._writers[index], KIND_STATS)
+            await self._writers[index].drain()
+        return [await self._replies[index].get() for index in indexes]
+
+    async def stop(self):
+        # Отключение процессов после KIND_QUIT - штатное, не ошибка
+        writers = list(self._writers.values())
+        self._writers.clear()
+        for writer in writers:
+            write_frame(writer, KIND_QUIT)
+            with suppress(ConnectionError):
+                await writer.drain()
+        for process in self.processes:
+            try:
+                await asyncio.wait_for(process.wait(), 30)
+            except asyncio.TimeoutError:
+                process.kill()
+                await process.wait()
+        for writer in writers:
+            writer.close()
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+        with suppress(FileNotFoundError):
+            os.unlink(self.socket_path)
+
+
+class WebhookReceiver:
+    """Минимальный HTTP/1.1-сервер для вебхука Telegram (keep-alive, без зависимостей)"""
+
+    def __init__(self, router, path="/webhook", secret_token="", max_body=1 << 20):
+        self.router = router
+        self.path = path
+        self.secret_token = secret_token
+        self.max_body = max_body
+        self.stats = {"accepted": 0, "rejected": 0}
+        self.first_request_at = None
+        self._server = None
+
+    @property
+    def port(self):
+        return self._server.sockets[0].getsockname()[1]
+
+    async def start(self, host="0.0.0.0", port=8443):
+        self._server = await asyncio.start_server(self._serve, host, port)
+        logger.info(f"🌐 Вебхук принимается на {host}:{self.port}{self.path}")
+
+    async def stop(self):
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+
+    async def _serve(self, reader, writer):
+        try:
+            while True:
+                request = await read_request_head(reader)
+                if request is None:
+                    break
+                method, target, headers = request
+                length = int(headers.get("content-length") or 0)
+                if length > self.max_body:
+                    writer.write(RESPONSES[413])
+                    break
+                body = await reader.readexactly(length) if length else b""
+                status = await self.handle(method, target, headers, body)
+                writer.write(RESPONSES[status])
+                await writer.drain()
+                if headers.get("connection", "").lower() == "close":
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def handle(self, method, target, headers, body):
+        """HTTP-статус ответа на запрос вебхука"""
+        if method != "POST" or target != self.path:
+            return 404
+        if self.secret_token and headers.get("x-telegram-bot-api-secret-token") != self.secret_token:
+            self.stats["rejected"] += 1
+            return 403
+        try:
+            update = json.loads(body)
+        except ValueError:
+            self.stats["rejected"] += 1
+            return 400
+        if not isinstance(update, dict):
+            self.stats["rejected"] += 1
+            return 400
+        if self.first_request_at is None:
+            self.first_request_at = asyncio.get_running_loop().time()
+        try:
+            await self.router.route(update, body)
+        except ConnectionError as e:
+            # Telegram повторит апдейт позже
+            logger.error(f"❌ Апдейт {update.get('update_id')} не передан: {e}")
+            return 503
+        self.stats["accepted"] += 1
+        return 200
+
+
+async def run_worker(index, socket_path, request=None, token=None, extra_stats=None):
+    """Процесс-обработчик: свой бот и состояние, апдейты из канала фронта"""
+    store = StateStore(shard_path(Config.STATE_DB_PATH, index) or None,
+                       flush_interval=Config.STATE_FLUSH_INTERVAL)
+    analytics = FunnelAnalytics(os.path.join(Config.ANALYTICS_DIR, f"shard{index}") if Config.ANALYTICS_DIR else None,
+                                rollup_interval=Config.ANALYTICS_ROLLUP_INTERVAL)
+    overrides = {"store": store, "analytics": analytics}
+    if Config.TRACE_SAMPLE_RATE > 0:
+        overrides["tracer"] = Tracer.from_config(shard_path(Config.TRACE_PATH, index))
+    runtime = BotRuntime.from_config(**overrides)
+    bot = BuddahBaseBot(token=token, request=request, runtime=runtime, ordered=True)
+    await bot.initialize()
+    await runtime.start()
+    application = bot.application
+    await application.initialize()
+    await application.start()
+    if runtime.profiler:
+        install_signal_handler(runtime.profiler)
+    shedder = application.update_processor
+    # Вебхук вместо getUpdates: проверка polling не нужна
+    health = await start_health_server({f"shard{index}": HealthCheck.from_config(runtime)},
+                                       port=Config.HEALTH_PORT + index)
+
+    reader, writer = await asyncio.open_unix_connection(socket_path)
+    write_frame(writer, KIND_HELLO, str(index).encode())
+    await writer.drain()
+    logger.info(f"🧩 Процесс-обработчик {index} готов")
+    received = 0
+    # CPU процесса без импортов и запуска бота
+    times = os.times()
+    cpu_started = times.user + times.system
+    try:
+        while True:
+            # Процесс не успевает: не читаем канал, пока работа не разойдется
+            while shedder.backlog >= Config.MAX_BACKLOG:
+                await asyncio.sleep(0.005)
+            try:
+                kind, payload = await read_frame(reader)
+            except (asyncio.IncompleteReadError, ConnectionError):
+                break
+            if kind == KIND_UPDATE:
+                received += 1
+                await application.update_queue.put(Update.de_json(json.loads(payload), application.bot))
+            elif kind == KIND_STATS:
+                while shedder.handled < received:
+                    await asyncio.sleep(0.005)
+                times = os.times()
+                stats = {"worker": index, "received": received, "handled": shedder.handled,
+                         "shed": sum(runtime.metrics.shed.values()),
+                         "cpu": times.user + times.system - cpu_started}
+                if extra_stats:
+                    stats.update(extra_stats())
+                write_frame(writer, KIND_STATS, json.dumps(stats).encode("utf-8"))
+                await writer.drain()
+            elif kind == KIND_QUIT:
+                break
+    finally:
+        writer.close()
+        if health:
+            await health.stop()
+        await application.stop()
+        await application.shutdown()
+        await runtime.stop()
+
+
+async def register_webhook():
+    """Регистрирует WEBHOOK_URL с секретом у Telegram: только типы апдейтов, которые
+    обрабатывают процессы (по обработчикам BuddahBaseBot)"""
+    from telegram import Bot
+    from telegram.ext import Application
+
+    application = Application.builder().token(Config.TELEGRAM_BOT_TOKEN).build()
+    application.bot_data["runtime"] = BotRuntime(handle_edits=Config.HANDLE_EDITED_MESSAGES)
+    BuddahBaseBot.register_handlers(application)
+    allowed = allowed_updates(application)
+    async with Bot(Config.TELEGRAM_BOT_TOKEN) as bot:
+        await bot.set_webhook(Config.WEBHOOK_URL, secret_token=Config.WEBHOOK_SECRET or None,
+                              allowed_updates=allowed)
+    logger.info(f"🔗 Вебхук зарегистрирован: {Config.WEBHOOK_URL} ({', '.join(allowed)})")
+
+
+async def main():
+    """Главная функция фронта"""
+    router = ShardRouter(Config.SHARD_WORKERS)
+    receiver = WebhookReceiver(router, Config.WEBHOOK_PATH, Config.WEBHOOK_SECRET)
+    try:
+        await router.start()
+        await receiver.start(Config.WEBHOOK_LISTEN, Config.WEBHOOK_PORT)
+        if Config.PROFILE_DIR:
+            install_signal_handler(shared_profiler())
+        if Config.WEBHOOK_URL:
+            await register_webhook()
+        await asyncio.Event().wait()
+    except KeyboardInterrupt:
+        logger.info("👋 Получен сигнал остановки...")
+    finally:
+        await receiver.stop()
+        await router.stop()
+        logger.info("🛑 Фронт и процессы-обработчики остановлены")
+
+
+if __name__ == "__main__":
+    install_event_loop_policy(Config.USE_UVLOOP)
+    try:
+        if len(sys.argv) > 1 and sys.argv[1] == "--worker":
+            asyncio.run(run_worker(int(sys.argv[2]), sys.argv[3]))
+        else:
+            asyncio.run(main())
+    except KeyboardInterrupt:
+        logger.info("👋 Остановлено пользователем")
+    except Exception as e:
+        logger.error(f"❌ Ошибка запуска: {e}")
@@ -0,0 +1,262 @@
+"""
+Антиспам для групп: частота сообщений и почти одинаковые тексты в скользящих окнах.
+
+Каждое сообщение группы проверяется за постоянное время:
+- частота: у пользователя хранятся времена последних rate_limit + 1 сообщений, флуд -
+  если все они уложились в rate_window секунд;
+- дубли: текст (не длиннее MAX_CHARS) превращается в MinHash-подпись по шинглам символов,
+  подпись режется на полосы (LSH). Счетчики полос за duplicate_window секунд
+  показывают, сколько почти таких же сообщений уже было в чате.
+
+Правка сообщения (HANDLE_EDITED_MESSAGES) не считается новым сообщением: частота не
+растет, а подпись исправленного сообщения в окне дублей заменяется новой.
+
+Память ограничена: пользователи вытесняются по LRU после max_users, окно дублей - не
+больше max_recent сообщений. Удаление сообщений и ограничение нарушителей идут через
+очередь действий с ограничением скорости, чтобы не упереться в лимиты Bot API.
+"""
+
+import asyncio
+import logging
+import re
+import time
+import zlib
+from collections import OrderedDict, deque
+
+from telegram import ChatPermissions
+from telegram.error import TelegramError
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+VERDICT_FLOOD = "flood"
+VERDICT_DUPLICATE = "duplicate"
+
+_NON_WORD = re.compile(r"[\W_]+")
+
+
+def minhash(text, bins=32, shingle=8, max_chars=512):
+    """MinHash-подпись текста с одной перестановкой: crc32 каждого шингла (shingle байт
+    UTF-8) попадает в одну из bins корзин, в корзине остается минимум. Пустая корзина -
+    None. crc32 детерминирован, в отличие от hash() с рандомизацией между процессами."""
+    data = _NON_WORD.sub(" ", text[:max_chars].lower()).strip().encode("utf-8")
+    signature = [None] * bins
+    for start in range(len(data) - shingle + 1):
+        value = zlib.crc32(data[start:start + shingle])
+        index = value % bins
+        value //= bins
+        current = signature[index]
+        if current is None or value < current:
+            signature[index] = value
+    return signature
+
+
+class _UserState:
+    __slots__ = ("times", "strikes")
+
+    def __init__(self, rate_limit, restrict_after):
+        self.times = deque(maxlen=rate_limit + 1)
+        self.strikes = deque(maxlen=restrict_after)
+
+
+class SpamGuard:
+    """Проверка сообщений групп на флуд и дубли с очередью модерационных действий"""
+
+    BINS = 32
+    BAND_ROWS = 4
+    MAX_CHARS = 512
+
+    def __init__(self, rate_limit=6, rate_window=10.0, duplicate_limit=3, duplicate_window=120.0,
+                 min_duplicate_length=32, restrict_after=3, restrict_seconds=3600,
+                 max_users=10000, max_recent=5000, actions_per_second=5.0, max_actions=500,
+                 exempt_ids=()):
+        self.rate_limit = rate_limit
+        self.rate_window = rate_window
+        self.duplicate_limit = duplicate_limit
+        self.duplicate_window = duplicate_window
+        self.min_duplicate_length = min_duplicate_length
+        self.restrict_after = restrict_after
+        self.restrict_seconds = restrict_seconds
+        self.max_users = max_users
+        self.max_recent = max_recent
+        self.actions_per_second = actions_per_second
+        self.exempt_ids = set(exempt_ids)
+        self.actions = asyncio.Queue(maxsize=max_actions)
+        self._users = OrderedDict()
+        # Записи окна дублей [время, ключи полос, (чат, сообщение)] и запись по сообщению
+        self._recent = deque()
+        self._messages = {}
+        self._band_counts = {}
+        self._worker = None
+        self.stats = {"checked": 0, VERDICT_FLOOD: 0, VERDICT_DUPLICATE: 0, "deleted": 0,
+                      "restricted": 0, "dropped_actions": 0, "failed_actions": 0}
+
+    @classmethod
+    def from_config(cls):
+        return cls(rate_limit=Config.SPAM_RATE_LIMIT, rate_window=Config.SPAM_RATE_WINDOW,
+                   duplicate_limit=Config.SPAM_DUPLICATE_LIMIT,
+                   duplicate_window=Config.SPAM_DUPLICATE_WINDOW,
+                   restrict_after=Config.SPAM_RESTRICT_AFTER,
+                   restrict_seconds=Config.SPAM_RESTRICT_SECONDS,
+                   actions_per_second=Config.SPAM_ACTIONS_PER_SECOND,
+                   exempt_ids=Config.ADMIN_IDS)
+
+    # --- жизненный цикл -------------------------------------------------------------
+
+    async def start(self):
+        self._worker = asyncio.create_task(self._action_loop())
+
+    async def stop(self):
+        if self._worker:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+
+    # --- проверка -------------------------------------------------------------------
+
+    @property
+    def users_tracked(self):
+        return len(self._users)
+
+    @property
+    def recent_tracked(self):
+        return len(self._recent)
+
+    def _user(self, chat_id, user_id):
+        key = (chat_id, user_id)
+        state = self._users.get(key)
+        if state is None:
+            state = self._users[key] = _UserState(self.rate_limit, self.restrict_after)
+            if len(self._users) > self.max_users:
+                self._users.popitem(last=False)
+        else:
+            self._users.move_to_end(key)
+        return state
+
+    def _band_keys(self, chat_id, text):
+        # Короткие фразы ("как вступить в группу") участники повторяют и без спама
+        if len(text) < self.min_duplicate_length:
+            return ()
+        signature = minhash(text, self.BINS, max_chars=self.MAX_CHARS)
+        keys = []
+        for start in range(0, self.BINS, self.BAND_ROWS):
+            band = tuple(signature[start:start + self.BAND_ROWS])
+            # Полоса из пустых корзин совпадала бы у любых коротких сообщений
+            if any(value is not None for value in band):
+                keys.append((chat_id, start, band))
+        return keys
+
+    def _forget_oldest(self):
+        _, keys, message_key = self._recent.popleft()
+        if message_key is not None:
+            self._messages.pop(message_key, None)
+        self._release(keys)
+
+    def _release(self, keys):
+        for key in keys:
+            count = self._band_counts[key] - 1
+            if count:
+                self._band_counts[key] = count
+            else:
+                del self._band_counts[key]
+
+    def check(self, chat_id, user_id, text, now=None, message_id=None, edited=False):
+        """Вердикт для сообщения (VERDICT_FLOOD, VERDICT_DUPLICATE) или None.
+
+        edited - правка сообщения message_id: в частоту не идет, а подпись заменяет
+        подпись исходного сообщения, если оно еще в окне дублей.
+        """
+        now = time.monotonic() if now is None else now
+        self.stats["checked"] += 1
+        state = self._user(chat_id, user_id)
+        verdict = None
+        if not edited:
+            state.times.append(now)
+            if len(state.times) == state.times.maxlen and now - state.times[0] < self.rate_window:
+                verdict = VERDICT_FLOOD
+
+        while self._recent and now - self._recent[0][0] >= self.duplicate_window:
+            self._forget_oldest()
+        message_key = (chat_id, message_id) if message_id is not None else None
+        entry = self._messages.get(message_key) if edited else None
+        if entry is not None:
+            self._release(entry[1])
+            entry[1] = ()
+        keys = self._band_keys(chat_id, text or "")
+        if keys:
+            seen = max(self._band_counts.get(key, 0) for key in keys)
+            if entry is None:
+                entry = [now, keys, message_key]
+                self._recent.append(entry)
+                if message_key is not None:
+                    self._messages[message_key] = entry
+            else:
+                entry[1] = keys
+            for key in keys:
+                self._band_counts[key] = self._band_counts.get(key, 0) + 1
+            if len(self._recent) > self.max_recent:
+                self._forget_oldest()
+            if verdict is None and seen + 1 >= self.duplicate_limit:
+                verdict = VERDICT_DUPLICATE
+
+        if verdict:
+            self.stats[verdict] += 1
+            state.strikes.append(now)
+        return verdict
+
+    def _should_restrict(self, chat_id, user_id, now):
+        strikes = self._user(chat_id, user_id).strikes
+        if len(strikes) == strikes.maxlen and now - strikes[0] < self.duplicate_window:
+            strikes.clear()
+            return True
+        return False
+
+    def inspect(self, bot, message, now=None):
+        """Проверяет сообщение группы и ставит в очередь удаление и ограничение нарушителя.
+
+        Личные чаты, сообщения ботов и пользователей из exempt_ids не проверяются.
+        """
+        if (message is None or message.chat is None or message.chat.type == "private"
+                or message.from_user is None or message.from_user.is_bot
+                or message.from_user.id in self.exempt_ids):
+            return None
+        now = time.monotonic() if now is None else now
+        chat_id = message.chat.id
+        user_id = message.from_user.id
+        verdict = self.check(chat_id, user_id, message.text or message.caption, now,
+                             message_id=message.message_id, edited=message.edit_date is not None)
+        if verdict:
+            self._enqueue(bot, "delete_message", chat_id=chat_id, message_id=message.message_id)
+            if self._should_restrict(chat_id, user_id, now):
+                self._enqueue(bot, "restrict_chat_member", chat_id=chat_id, user_id=user_id,
+                              permissions=ChatPermissions.no_permissions(),
+                              until_date=int(time.time()) + self.restrict_seconds)
+                logger.info(f"🚫 Пользователь {user_id} ограничен в чате {chat_id} за {verdict}")
+        return verdict
+
+    # --- очередь действий -----------------------------------------------------------
+
+    def _enqueue(self, bot, method, **kwargs):
+        try:
+            self.actions.put_nowait((bot, method, kwargs))
+        except asyncio.QueueFull:
+            self.stats["dropped_actions"] += 1
+
+    async def _action_loop(self):
+        interval = 1 / self.actions_per_second if self.actions_per_second > 0 else 0
+        while True:
+            bot, method, kwargs = await self.actions.get()
+            try:
+                await getattr(bot, method)(**kwargs)
+                self.stats["deleted" if method == "delete_message" else "restricted"] += 1
+            except TelegramError as e:
+                self.stats["failed_actions"] += 1
+                logger.warning(f"⚠️ Антиспам: {method} не выполнен: {e}")
+            finally:
+                self.actions.task_done()
+            if interval:
+                await asyncio.sleep(interval)
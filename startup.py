@@ -0,0 +1,68 @@
+"""
+Профилирование холодного старта бота и опциональный event loop на uvloop
+"""
+
+import asyncio
+import importlib
+import logging
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+
+class StartupProfiler:
+    """Замеряет длительность этапов запуска: импорты, сборку Application, регистрацию
+    обработчиков и первый getMe"""
+
+    def __init__(self):
+        self.started_at = time.perf_counter()
+        self.phases = []
+
+    def import_module(self, name):
+        """Импортирует модуль и записывает время импорта"""
+        started = time.perf_counter()
+        module = importlib.import_module(name)
+        self.phases.append((f"import {name}", time.perf_counter() - started))
+        return module
+
+    @contextmanager
+    def phase(self, name):
+        """Замеряет произвольный этап запуска"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases.append((name, time.perf_counter() - started))
+
+    @property
+    def total(self):
+        """Время с момента создания профайлера, в секундах"""
+        return time.perf_counter() - self.started_at
+
+    def report(self):
+        """Текстовый отчет по этапам запуска"""
+        width = max((len(name) for name, _ in self.phases), default=0)
+        lines = ["⏱ Отчет о запуске бота:"]
+        for name, seconds in self.phases:
+            lines.append(f"   {name.ljust(width)}  {seconds * 1000:8.1f} ms")
+        lines.append(f"   {'итого с начала запуска'.ljust(width)}  {self.total * 1000:8.1f} ms")
+        return "\n".join(lines)
+
+
+def install_event_loop_policy(use_uvloop):
+    """Включает политику uvloop, если она запрошена и пакет установлен.
+
+    Возвращает название используемого event loop.
+    """
+    if not use_uvloop:
+        return "asyncio"
+
+    try:
+        import uvloop
+    except ImportError:
+        logger.warning("⚠️ USE_UVLOOP включен, но uvloop не установлен - используем asyncio")
+        return "asyncio"
+
+    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    return "uvloop"
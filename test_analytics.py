@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+Тестирование аналитики воронки: точность HyperLogLog, память под нагрузкой,
+выгрузка на диск и админ-команда /funnel
+"""
+
+import asyncio
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from analytics import (
+    EVENT_CONVERTED, EVENT_DM, EVENT_ENGAGEMENT, EVENT_FILES, EVENT_JOIN,
+    FunnelAnalytics, HyperLogLog,
+)
+from config import Config
+from persistence import StateStore
+from replay import GROUP_CHAT_ID, ReplayHarness, UpdateFactory
+from runtime import BotRuntime
+
+HOUR = 3600
+START = 1_700_000_000 // HOUR * HOUR
+
+
+class AnalyticsTester:
+    def __init__(self):
+        self.tests_run = 0
+        self.tests_passed = 0
+
+    def log_test(self, name, success, details=""):
+        """Log test results"""
+        self.tests_run += 1
+        if success:
+            self.tests_passed += 1
+            print(f"✅ {name} - PASSED {details}")
+        else:
+            print(f"❌ {name} - FAILED {details}")
+        return success
+
+    def test_hyperloglog_accuracy(self):
+        """Оценка уникальных в пределах ошибки скетча"""
+        print("\n🔢 Testing HyperLogLog Accuracy...")
+
+        for true_count in (50, 5000, 200000):
+            sketch = HyperLogLog()
+            for user_id in range(true_count):
+                sketch.add(user_id)
+                sketch.add(user_id)  # повторы не должны влиять
+            error = abs(sketch.estimate() - true_count) / true_count
+            self.log_test(f"Estimate {true_count}", error < 0.07, f"- error {error:.2%}")
+
+        left, right = HyperLogLog(), HyperLogLog()
+        for user_id in range(10000):
+            (left if user_id % 2 else right).add(user_id)
+        left.merge(HyperLogLog.from_base64(right.to_base64()))
+        error = abs(left.estimate() - 10000) / 10000
+        self.log_test("Merge After Serialization", error < 0.07, f"- error {error:.2%}")
+
+    async def test_synthetic_load(self, tmp):
+        """300k событий за сутки: точность по интентам и ограниченная память"""
+        print("\n📈 Testing Synthetic Load...")
+
+        events = [EVENT_FILES, EVENT_JOIN, EVENT_ENGAGEMENT]
+        chats = [GROUP_CHAT_ID - i for i in range(20)]
+        total = 300000
+
+        def stream(count):
+            rng = random.Random(1)
+            for i in range(count):
+                now = START + i * (24 * HOUR) // count
+                yield i, now, events[i % 3], rng.choice(chats), rng.randrange(60000)
+
+        throughput = FunnelAnalytics()
+        started = time.perf_counter()
+        for _, now, event, chat_id, user_id in stream(100000):
+            throughput.record(event, chat_id, user_id, now=now)
+        rate = 100000 / (time.perf_counter() - started)
+        self.log_test("Throughput", rate > 50000, f"- {rate:,.0f} events/s "
+                      f"(~{rate * 86400 / 1e6:,.0f}M events/day on one core)")
+
+        analytics = FunnelAnalytics(tmp)
+        await analytics.start()
+        tracemalloc.start()
+        peak_buckets = 0
+        for i, now, event, chat_id, user_id in stream(total):
+            analytics.record(event, chat_id, user_id, now=now)
+            if i % 10000 == 0:
+                # Периодическая выгрузка закрытых часов, как делает фоновая задача
+                await analytics.rollup(now=now)
+                peak_buckets = max(peak_buckets, analytics.buckets_in_memory)
+        _, peak_memory = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        self.log_test("Bounded Buckets", peak_buckets <= 2 * 20 * 3,
+                      f"- peak {peak_buckets} buckets in memory")
+        self.log_test("Bounded Memory", peak_memory < 2 * 1024 * 1024,
+                      f"- peak {peak_memory / 1024:.0f} KB")
+
+        exact = {event: set() for event in events}
+        for _, _, event, _, user_id in stream(total):
+            exact[event].add(user_id)
+
+        summary = analytics.query(hours=24, now=START + 24 * HOUR - 1)
+        for event in events:
+            count, users = summary[event]
+            error = abs(users - len(exact[event])) / len(exact[event])
+            self.log_test(f"Accuracy {event}", error < 0.07,
+                          f"- ~{users} vs {len(exact[event])} exact ({error:.2%}), {count} events")
+        self.log_test("Event Counts Exact", sum(summary[event][0] for event in events) == total)
+
+        await analytics.stop()
+        restarted = FunnelAnalytics(tmp)
+        restarted.record(EVENT_FILES, chats[0], 10**9, now=START + 23 * HOUR)
+        count, _ = restarted.query(hours=24, now=START + 24 * HOUR - 1)[EVENT_FILES]
+        self.log_test("Rollups Survive Restart", count == summary[EVENT_FILES][0] + 1)
+
+    async def test_funnel_command(self):
+        """Конверсия из группы в личку и админ-команда /funnel"""
+        print("\n🎯 Testing Funnel Command...")
+
+        factory = UpdateFactory()
+        corpus = [
+            factory.message("как вступить?", "supergroup", 700),
+            factory.message("скиньте файл", "supergroup", 701),
+            factory.message("хочу доступ", "private", 700),
+            factory.message("/funnel", "private", 999),
+            factory.message("/funnel 48", "private", 1),
+        ]
+
+        admin_ids = Config.ADMIN_IDS
+        Config.ADMIN_IDS = [1]
+        try:
+            runtime = BotRuntime(store=StateStore(), analytics=FunnelAnalytics())
+            async with ReplayHarness(runtime=runtime) as harness:
+                await harness.replay(corpus)
+                replies = harness.api.calls_to("sendMessage")
+        finally:
+            Config.ADMIN_IDS = admin_ids
+
+        summary = runtime.analytics.query(hours=1)
+        self.log_test("Conversion Counted", summary.get(EVENT_CONVERTED, (0, 0))[0] == 1)
+        self.log_test("DM Counted", summary.get(EVENT_DM, (0, 0))[0] == 1)
+        self.log_test("Non-Admin Ignored", all(reply["chat_id"] != 999 for reply in replies))
+
+        admin_replies = [reply["text"] for reply in replies if reply["chat_id"] == 1]
+        self.log_test("Admin Gets Summary", len(admin_replies) == 1
+                      and "Воронка за 48 ч" in admin_replies[0]
+                      and "Из группы в личку: 1" in admin_replies[0])
+
+    async def run_all_tests(self):
+        """Run all analytics tests"""
+        print("🚀 Starting Funnel Analytics Testing")
+        print("=" * 50)
+
+        self.test_hyperloglog_accuracy()
+        with tempfile.TemporaryDirectory() as tmp:
+            await self.test_synthetic_load(tmp)
+        await self.test_funnel_command()
+
+        print("\n" + "=" * 50)
+        print(f"📊 Test Results: {self.tests_passed}/{self.tests_run} tests passed")
+
+        if self.tests_passed == self.tests_run:
+            print("🎉 All analytics tests passed!")
+            return 0
+        else:
+            failed_tests = self.tests_run - self.tests_passed
+            print(f"⚠️ {failed_tests} test(s) failed. Please review the issues above.")
+            return 1
+
+
+async def main():
+    """Main testing function"""
+    tester = AnalyticsTester()
+    return await tester.run_all_tests()
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
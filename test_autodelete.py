@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+"""
+Тестирование колеса таймеров и автоудаления ответов бота в группах на фальшивых часах
+"""
+
+import asyncio
+import logging
+import math
+import os
+import random
+import sys
+import tempfile
+import time
+
+from telegram import Bot
+
+from autodelete import NS_AUTODELETE, ReplyJanitor
+from metrics import format_stats
+from persistence import StateStore
+from replay import GROUP_CHAT_ID, ReplayHarness, UpdateFactory
+from runtime import BotRuntime
+from timer_wheel import TimerWheel
+
+# deleteMessages есть в python-telegram-bot с 20.8; в более ранних версиях
+# сообщения удаляются по одному
+BATCH_DELETE = hasattr(Bot, "delete_messages")
+
+
+class FakeClock:
+    def __init__(self, now=1_700_000_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class AutoDeleteTester:
+    def __init__(self):
+        self.tests_run = 0
+        self.tests_passed = 0
+
+    def log_test(self, name, success, details=""):
+        """Log test results"""
+        self.tests_run += 1
+        if success:
+            self.tests_passed += 1
+            print(f"✅ {name} - PASSED {details}")
+        else:
+            print(f"❌ {name} - FAILED {details}")
+        return success
+
+    def test_wheel_exact(self):
+        """Каждый таймер истекает ровно на тике своего срока, на всех уровнях и за горизонтом"""
+        print("\n🎡 Testing Timer Wheel Expiry...")
+
+        rng = random.Random(3)
+        # Маленькие уровни: горизонт 8 * 4 * 4 = 128 тиков, каскады происходят часто
+        wheel = TimerWheel(tick=1.0, levels=(8, 4, 4), now=5.0)
+        deadlines = {}
+        inserted_at = {}
+        fired_at = {}
+        for step in range(3000):
+            tick = wheel.current
+            for _ in range(rng.randrange(3)):
+                item = len(deadlines)
+                deadlines[item] = tick + rng.choice([rng.uniform(-2, 10), rng.uniform(0, 120),
+                                                     rng.uniform(100, 1000)])
+                inserted_at[item] = tick
+                wheel.insert(deadlines[item], item)
+            for item in wheel.advance(tick + 1):
+                fired_at[item] = tick + 1
+
+        # Срок в прошлом - на ближайшем тике, иначе - на первом тике не раньше срока
+        expected = {item: max(math.ceil(deadline), inserted_at[item] + 1) for item, deadline in deadlines.items()}
+        early = [item for item, at in fired_at.items() if at < deadlines[item]]
+        late = [item for item, at in fired_at.items() if at != expected[item]]
+        unfired_due = [item for item in deadlines if item not in fired_at and expected[item] <= wheel.current]
+        self.log_test("Never Early", not early, f"- {len(early)} of {len(fired_at)}")
+        self.log_test("Fires On Its Tick", not late and not unfired_due,
+                      f"- {len(late)} late, {len(unfired_due)} lost")
+        self.log_test("Size Tracked", len(wheel) == len(deadlines) - len(fired_at),
+                      f"- {len(wheel)} pending")
+
+        rest = wheel.advance(wheel.current + 10_000)
+        self.log_test("Long Jump Drains Everything", len(rest) + len(fired_at) == len(deadlines)
+                      and len(wheel) == 0)
+        wheel.insert(wheel.current * wheel.tick + 3, "after jump")
+        self.log_test("Idle Wheel Skips Ahead", wheel.advance(wheel.current + 2) == []
+                      and wheel.advance(wheel.current + 1) == ["after jump"])
+
+    def test_wheel_constant_time(self):
+        """Вставка и истечение не дорожают с числом отложенных таймеров"""
+        print("\n⏱ Testing Constant-Time Operations...")
+
+        def insert_cost(wheel, count=20000):
+            rng = random.Random(count)
+            started = time.perf_counter()
+            for i in range(count):
+                wheel.insert(rng.uniform(1, 86400), i)
+            return (time.perf_counter() - started) / count * 1e9
+
+        small = insert_cost(TimerWheel())
+        big = TimerWheel()
+        insert_cost(big, 300000)
+        large = insert_cost(big)
+        self.log_test("Insert Independent Of Size", large < small * 2 + 500,
+                      f"- {small:.0f} ns empty, {large:.0f} ns with 300k pending")
+
+        pending = len(big)
+        started = time.perf_counter()
+        expired = 0
+        for second in range(60, 86400 + 60, 60):
+            expired += len(big.advance(second))
+        seconds = time.perf_counter() - started
+        self.log_test("Expire 320k Over A Day", pending == 320000 and expired == pending and len(big) == 0,
+                      f"- {expired / seconds / 1000:.0f}k timers/s")
+
+    async def test_group_replies(self):
+        """Ответы бота в группе удаляются через TTL одним deleteMessages, личка не трогается"""
+        print("\n🗑 Testing Group Reply Cleanup...")
+
+        clock = FakeClock()
+        janitor = ReplyJanitor(ttl=600, clock=clock)
+        runtime = BotRuntime(store=StateStore(), janitor=janitor)
+        factory = UpdateFactory()
+        async with ReplayHarness(runtime=runtime) as harness:
+            api = harness.api
+            for i in range(5):
+                await harness.process(factory.message("как вступить в группу", "supergroup", user_id=100 + i))
+            await harness.process(factory.message("всем привет", "supergroup", user_id=200))
+            await harness.process(factory.message("как вступить в группу", "private", user_id=300))
+            replies = [message_id for chat_id, message_id in api.sent if chat_id == GROUP_CHAT_ID]
+
+            clock.now += 599
+            await janitor.run_once()
+            early = api.count("deleteMessages")
+            clock.now += 1
+            await janitor.run_once()
+            calls = api.calls_to("deleteMessages")
+            single = sorted(call["message_id"] for call in api.calls_to("deleteMessage"))
+            stats = format_stats(runtime)
+
+        self.log_test("Only Group Replies Scheduled", janitor.stats["scheduled"] == len(replies) == 5,
+                      f"- {janitor.stats['scheduled']} scheduled")
+        self.log_test("Kept Until TTL", early == 0)
+        if BATCH_DELETE:
+            self.log_test("Deleted In One Call", len(calls) == 1 and calls[0]["chat_id"] == GROUP_CHAT_ID
+                          and sorted(calls[0]["message_ids"]) == replies, f"- {calls}")
+        else:
+            self.log_test("Deleted One By One Before PTB 20.8", not calls and single == replies, f"- {single}")
+        requests = 1 if BATCH_DELETE else len(replies)
+        self.log_test("Stats Line", f"🗑 Автоудаление ответов: ждут 0, удалено 5 за {requests} запросов" in stats)
+
+    async def test_restart(self):
+        """Отложенные удаления переживают перезапуск; истекшие за простой удаляются сразу"""
+        print("\n💾 Testing Persistence Across Restart...")
+
+        class FakeBot:
+            def __init__(self):
+                self.calls = []
+
+            async def delete_messages(self, chat_id, message_ids):
+                self.calls.append((chat_id, list(message_ids)))
+                return True
+
+        clock = FakeClock()
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "state.db")
+            store = await StateStore(path).open()
+            janitor = ReplyJanitor(ttl=3600, store=store, clock=clock)
+            for i in range(250):
+                janitor.schedule(-100 - i % 2, i, ttl=60 if i < 150 else 7200)
+            await store.close()
+
+            clock.now += 1800
+            store = await StateStore(path).open()
+            janitor = ReplyJanitor(ttl=3600, store=store, clock=clock)
+            janitor.bot = bot = FakeBot()
+            await janitor.start()
+            await janitor.stop()
+            restored = janitor.stats["restored"]
+            await janitor.run_once()
+            after_downtime = sorted(message_id for _, ids in bot.calls for message_id in ids)
+            calls_after_downtime = len(bot.calls)
+
+            clock.now += 7200
+            await janitor.run_once()
+            remaining = store.count(NS_AUTODELETE)
+            await store.close()
+
+        self.log_test("Restored From Store", restored == 250, f"- {restored}")
+        self.log_test("Overdue Deleted On First Tick", after_downtime == list(range(150))
+                      and calls_after_downtime == 2, f"- {len(after_downtime)} in {calls_after_downtime} calls")
+        self.log_test("Store Emptied", remaining == 0 and janitor.stats["deleted"] == 250,
+                      f"- {remaining} left")
+
+    async def run_all_tests(self):
+        """Run all auto-delete tests"""
+        print("🚀 Starting Auto-Delete Testing")
+        print("=" * 50)
+
+        logging.disable(logging.INFO)
+        self.test_wheel_exact()
+        self.test_wheel_constant_time()
+        await self.test_group_replies()
+        await self.test_restart()
+        logging.disable(logging.NOTSET)
+
+        print("\n" + "=" * 50)
+        print(f"📊 Test Results: {self.tests_passed}/{self.tests_run} tests passed")
+
+        if self.tests_passed == self.tests_run:
+            print("🎉 All auto-delete tests passed!")
+            return 0
+        else:
+            failed_tests = self.tests_run - self.tests_passed
+            print(f"⚠️ {failed_tests} test(s) failed. Please review the issues above.")
+            return 1
+
+
+async def main():
+    """Main testing function"""
+    tester = AutoDeleteTester()
+    return await tester.run_all_tests()
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,302 @@
+#!/usr/bin/env python3
+"""
+Тестирование ограничения нагрузки: очередь апдейтов, отбрасывание по уровням,
+задержка ответов в личку при всплеске трафика
+"""
+
+import asyncio
+import logging
+import sys
+import tracemalloc
+
+from telegram import Update
+
+from backpressure import (TIER_CHATTER, TIER_CRITICAL, TIER_ENGAGEMENT, TIER_NORMAL,
+                          TIER_REPEAT_JOIN, LoadShedder)
+from config import Config
+from fake_api import FakeTelegramAPI
+from persistence import StateStore
+from replay import ReplayHarness, UpdateFactory, build_spike_timeline, percentile
+from runtime import NS_LEAD, BotRuntime
+
+SHED_SETTINGS = ("UPDATE_CONCURRENCY", "SHED_ENGAGEMENT_AT", "SHED_REPEAT_JOIN_AT", "MAX_BACKLOG")
+
+
+class BackpressureTester:
+    def __init__(self):
+        self.tests_run = 0
+        self.tests_passed = 0
+
+    def log_test(self, name, success, details=""):
+        """Log test results"""
+        self.tests_run += 1
+        if success:
+            self.tests_passed += 1
+            print(f"✅ {name} - PASSED {details}")
+        else:
+            print(f"❌ {name} - FAILED {details}")
+        return success
+
+    @staticmethod
+    def make_runtime():
+        runtime = BotRuntime(store=StateStore())
+        runtime.store.set(NS_LEAD, 42, {"intents": {"join": 1}, "private": False})
+        return runtime
+
+    def test_classify(self):
+        """Уровни ценности апдейтов"""
+        print("\n🏷 Testing Update Tiers...")
+
+        shedder = LoadShedder(self.make_runtime())
+        factory = UpdateFactory()
+        cases = [
+            (factory.message("veo круто", "private"), TIER_CRITICAL),
+            (factory.message("/info", "supergroup"), TIER_CRITICAL),
+            (factory.message("/start@saint_buddah_bot", "supergroup"), TIER_CRITICAL),
+            (factory.message("/xyz", "supergroup"), TIER_CHATTER),
+            (factory.message("всем привет", "supergroup"), TIER_CHATTER),
+            (factory.message("veo круто", "supergroup"), TIER_ENGAGEMENT),
+            (factory.message("как вступить в группу", "supergroup", user_id=7), TIER_NORMAL),
+            (factory.message("как вступить в группу", "supergroup", user_id=42), TIER_REPEAT_JOIN),
+            (factory.message("где скачать материалы", "supergroup"), TIER_NORMAL),
+            (factory.message("спасибо", "supergroup", reply_to_message=factory.message(
+                "привет", "supergroup", user_id=1)["message"] | {"from": factory.user(1, is_bot=True)}),
+             TIER_NORMAL),
+            (factory.new_members([5]), TIER_NORMAL),
+            (factory.inline_query("veo"), TIER_NORMAL),
+        ]
+        tiers = [shedder.classify(Update.de_json(data, None)) for data, _ in cases]
+        expected = [tier for _, tier in cases]
+        self.log_test("Tiers Assigned", tiers == expected, f"- {tiers}")
+
+    async def test_shed_order(self):
+        """Порог каждого уровня: сначала болтовня и вовлечение, затем повторы, затем остальное"""
+        print("\n🚦 Testing Shed Order...")
+
+        runtime = self.make_runtime()
+        shedder = LoadShedder(runtime, max_concurrent_updates=1, max_backlog=4,
+                              shed_engagement_at=2, shed_repeat_join_at=3)
+        factory = UpdateFactory()
+        gate = asyncio.Event()
+        started = []
+
+        async def work(tag):
+            started.append(tag)
+            await gate.wait()
+
+        plan = [
+            ("files-1", factory.message("где скачать материалы", "supergroup")),
+            ("files-2", factory.message("где скачать материалы", "supergroup")),
+            ("engagement", factory.message("veo круто", "supergroup")),
+            ("chatter", factory.message("всем привет", "supergroup")),
+            ("repeat-1", factory.message("как вступить в группу", "supergroup", user_id=42)),
+            ("repeat-2", factory.message("как вступить в группу", "supergroup", user_id=42)),
+            ("join-new", factory.message("как вступить в группу", "supergroup", user_id=7)),
+            ("files-3", factory.message("где скачать материалы", "supergroup")),
+            ("private", factory.message("как вступить?", "private", user_id=8)),
+        ]
+        tasks = []
+        for tag, data in plan:
+            tasks.append(asyncio.create_task(shedder.process_update(Update.de_json(data, None), work(tag))))
+            await asyncio.sleep(0)
+
+        backlog = shedder.backlog
+        gate.set()
+        await asyncio.gather(*tasks)
+
+        self.log_test("Lowest Tiers Shed First", runtime.metrics.shed == {
+            TIER_ENGAGEMENT: 1, TIER_CHATTER: 1, TIER_REPEAT_JOIN: 1, TIER_NORMAL: 1},
+            f"- {runtime.metrics.shed}")
+        self.log_test("Private Bypasses Queue", "private" in started and started[:2] == ["files-1", "private"],
+                      f"- started {started}")
+        self.log_test("Backlog Bounded", backlog == 5 and runtime.metrics.backlog_peak == 5,
+                      f"- {backlog} admitted (4 + private)")
+        self.log_test("Backlog Released", shedder.backlog == 0 and runtime.metrics.backlog == 0)
+        self.log_test("Admitted Work Ran", sorted(started) == sorted(
+            ["files-1", "files-2", "repeat-1", "join-new", "private"]))
+        # process_update в PTB @final: логика - в do_process_update, а семафор PTB не
+        # ограничивает принятые апдейты (иначе при UPDATE_CONCURRENCY=1 PTB обрабатывал бы
+        # апдейты по одному, без задач, и личка ждала бы за группой)
+        self.log_test("PTB Extension Point", "process_update" not in vars(LoadShedder)
+                      and shedder.max_concurrent_updates == 4 + shedder.max_critical_backlog,
+                      f"- PTB limit {shedder.max_concurrent_updates}")
+
+    async def test_critical_limits(self):
+        """Личка и команды: свой предел одновременности и жесткий предел в работе"""
+        print("\n🧱 Testing Critical Tier Limits...")
+
+        runtime = self.make_runtime()
+        shedder = LoadShedder(runtime, critical_concurrency=2, max_critical_backlog=4)
+        factory = UpdateFactory()
+        gate = asyncio.Event()
+        running = []
+        peak = 0
+
+        async def work():
+            nonlocal peak
+            running.append(1)
+            peak = max(peak, len(running))
+            await gate.wait()
+            running.pop()
+
+        tasks = []
+        for user_id in range(6):
+            data = factory.message("привет", "private", user_id=100 + user_id)
+            tasks.append(asyncio.create_task(shedder.process_update(Update.de_json(data, None), work())))
+            await asyncio.sleep(0)
+        flooded = runtime.metrics.shed.get(TIER_CRITICAL, 0)
+        gate.set()
+        await asyncio.gather(*tasks)
+
+        self.log_test("Critical Concurrency Limited", peak == 2, f"- {peak} at once")
+        self.log_test("Critical Backlog Capped", flooded == 2 and shedder.backlog == 0,
+                      f"- {flooded} shed of 6")
+
+    async def test_chat_order(self):
+        """serialize_chats: апдейты чата по одному в порядке приема, чаты параллельно"""
+        print("\n🧵 Testing Per-Chat Serialization...")
+
+        factory = UpdateFactory()
+        results = {}
+        for serialize in (False, True):
+            shedder = LoadShedder(self.make_runtime(), max_concurrent_updates=8, serialize_chats=serialize)
+            finished = {}
+            running = set()
+            overlap = peak = 0
+
+            async def work(chat_id, index, delay):
+                nonlocal overlap, peak
+                overlap += chat_id in running
+                running.add(chat_id)
+                peak = max(peak, len(running))
+                await asyncio.sleep(delay)
+                running.discard(chat_id)
+                finished.setdefault(chat_id, []).append(index)
+
+            tasks = []
+            for index in range(30):
+                chat_id = 100 + index % 3
+                data = factory.message("привет", "private", user_id=chat_id)
+                # Ранние апдейты чата дольше поздних: без очереди чата поздние их обгоняют
+                work_item = work(chat_id, index, 0.03 - index * 0.001)
+                tasks.append(asyncio.create_task(shedder.process_update(Update.de_json(data, None), work_item)))
+            await asyncio.gather(*tasks)
+            ordered = all(indexes == sorted(indexes) for indexes in finished.values())
+            results[serialize] = (ordered, overlap, peak, len(shedder._chats))
+
+        self.log_test("Unordered By Default", not results[False][0] and results[False][1] > 0)
+        self.log_test("Chat Updates Serialized", results[True][0] and results[True][1] == 0,
+                      f"- {results[True]}")
+        self.log_test("Chats Run In Parallel", results[True][2] == 3)
+        self.log_test("Chat Locks Released", results[True][3] == 0)
+
+    @staticmethod
+    async def run_spike(timeline, limits, measure_memory=False):
+        """Прогон таймлайна через update_queue: runtime, задержки лички, пик памяти очереди"""
+        saved = {name: getattr(Config, name) for name in SHED_SETTINGS}
+        for name, value in zip(SHED_SETTINGS, limits):
+            setattr(Config, name, value)
+        api = FakeTelegramAPI(latency=0.05)
+        runtime = BotRuntime(store=StateStore())
+        try:
+            async with ReplayHarness(api=api, runtime=runtime) as harness:
+                if measure_memory:
+                    tracemalloc.start()
+                started = asyncio.get_running_loop().time()
+                await harness.feed(timeline, queued=True)
+                # Пик сверх памяти, оставшейся после прогона (журнал вызовов FakeTelegramAPI,
+                # лиды): столько занимали апдейты и задачи в очереди
+                current, peak = tracemalloc.get_traced_memory() if measure_memory else (0, 0)
+                tracemalloc.stop()
+        finally:
+            for name, value in saved.items():
+                setattr(Config, name, value)
+
+        latencies = {"baseline": [], "spike": []}
+        for at, data in timeline:
+            message = data.get("message")
+            if message and message["chat"]["type"] == "private":
+                sent = api.first_sent.get(message["chat"]["id"])
+                phase = "baseline" if at < 1.0 else "spike"
+                latencies[phase].append((sent - started - at) * 1000 if sent else float("inf"))
+        for values in latencies.values():
+            values.sort()
+        return runtime, latencies, peak - current, api.count("sendMessage")
+
+    async def test_traffic_spike(self):
+        """Всплеск трафика в 10 раз: очередь ограничена, личка отвечает так же быстро"""
+        print("\n🌊 Testing 10x Traffic Spike...")
+
+        limits = (8, 50, 100, 200)
+        timeline = build_spike_timeline(phases=((1.0, 100), (1.0, 1000)))
+        runtime, latencies, _, sent = await self.run_spike(timeline, limits)
+        _, _, _, unshed_sent = await self.run_spike(timeline, (8, 10 ** 9, 10 ** 9, 10 ** 9))
+
+        metrics = runtime.metrics
+        baseline_p99 = percentile(latencies["baseline"], 0.99)
+        spike_p99 = percentile(latencies["spike"], 0.99)
+        self.log_test("Backlog Within Limit", metrics.backlog_peak <= 200 + 10,
+                      f"- peak {metrics.backlog_peak}")
+        self.log_test("Engagement Shed", metrics.shed.get(TIER_ENGAGEMENT, 0) > 0
+                      and metrics.shed.get(TIER_CHATTER, 0) > 0, f"- {metrics.shed}")
+        self.log_test("Outbound Reduced", sent < unshed_sent,
+                      f"- {sent} vs {unshed_sent} sendMessage")
+        self.log_test("Every Private Chat Answered", all(value != float("inf")
+                                                         for values in latencies.values() for value in values))
+        self.log_test("Private Latency Stable", spike_p99 < max(3 * baseline_p99, 25),
+                      f"- p99 {baseline_p99:.1f} ms baseline, {spike_p99:.1f} ms spike")
+
+    async def test_bounded_memory(self):
+        """Очередь и память при всплеске не растут с его длительностью"""
+        print("\n🧠 Testing Bounded Memory...")
+
+        limits = (8, 50, 100, 200)
+        unbounded = (8, 10 ** 9, 10 ** 9, 10 ** 9)
+        short = build_spike_timeline(phases=((0.2, 100), (0.5, 1000)), private_rate=0)
+        long = build_spike_timeline(phases=((0.2, 100), (1.5, 1000)), private_rate=0)
+        short_runtime, _, _, _ = await self.run_spike(short, limits)
+        long_runtime, _, long_peak, _ = await self.run_spike(long, limits, measure_memory=True)
+        unshed_runtime, _, unshed_peak, _ = await self.run_spike(long, unbounded, measure_memory=True)
+
+        short_backlog = short_runtime.metrics.backlog_peak
+        long_backlog = long_runtime.metrics.backlog_peak
+        self.log_test("Backlog Independent Of Spike Length", short_backlog <= 200 and long_backlog <= 200,
+                      f"- peak {short_backlog} for 0.5 s, {long_backlog} for 1.5 s, "
+                      f"{unshed_runtime.metrics.backlog_peak} without shedding")
+        self.log_test("Memory Below Unbounded Queue", long_peak < unshed_peak,
+                      f"- {long_peak / 1024:.0f} KB vs {unshed_peak / 1024:.0f} KB without shedding")
+
+    async def run_all_tests(self):
+        """Run all backpressure tests"""
+        print("🚀 Starting Backpressure Testing")
+        print("=" * 50)
+
+        logging.disable(logging.WARNING)
+        self.test_classify()
+        await self.test_shed_order()
+        await self.test_critical_limits()
+        await self.test_chat_order()
+        await self.test_traffic_spike()
+        await self.test_bounded_memory()
+        logging.disable(logging.NOTSET)
+
+        print("\n" + "=" * 50)
+        print(f"📊 Test Results: {self.tests_passed}/{self.tests_run} tests passed")
+
+        if self.tests_passed == self.tests_run:
+            print("🎉 All backpressure tests passed!")
+            return 0
+        else:
+            failed_tests = self.tests_run - self.tests_passed
+            print(f"⚠️ {failed_tests} test(s) failed. Please review the issues above.")
+            return 1
+
+
+async def main():
+    """Main testing function"""
+    tester = BackpressureTester()
+    return await tester.run_all_tests()
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,314 @@
+#!/usr/bin/env python3
+"""
+Тестирование предохранителя Bot API: размыкание и пробный вызов, адаптивный таймаут,
+повторы идемпотентных методов, цепи по методам, занятый пул соединений и сколько
+корутин и памяти держит бот во время недоступности API с предохранителем и без него
+"""
+
+import asyncio
+import json
+import logging
+import sys
+import time
+import tracemalloc
+
+from telegram.error import NetworkError, TimedOut
+from telegram.request import HTTPXRequest
+
+from breaker import CLOSED, HALF_OPEN, OPEN, BreakerRequest, CircuitBreakers, CircuitOpen, MethodCircuit
+from fake_api import FakeTelegramAPI
+from metrics import format_stats
+from persistence import StateStore
+from replay import ReplayHarness, UpdateFactory
+from runtime import BotRuntime
+
+CHAT_ID = 5001
+
+
+class FlakyAPI(FakeTelegramAPI):
+    """Эмулятор, отвечающий 502 на первые flaky вызовов каждого метода"""
+
+    def __init__(self, flaky=2):
+        super().__init__()
+        self.flaky = flaky
+        self.attempts = {}
+
+    async def do_request(self, url, method, request_data=None, **kwargs):
+        endpoint = url.rsplit("/", 1)[-1]
+        self.attempts[endpoint] = self.attempts.get(endpoint, 0) + 1
+        if self.attempts[endpoint] <= self.flaky:
+            self.calls.append((endpoint, {}))
+            return 502, json.dumps({"ok": False, "error_code": 502, "description": "Bad Gateway"}).encode()
+        return await super().do_request(url, method, request_data, **kwargs)
+
+
+async def slow_api(reader, writer, delay=0.5):
+    """HTTP-сервер, отвечающий на каждый запрос через delay секунд"""
+    try:
+        while True:
+            head = await reader.readuntil(b"\r\n\r\n")
+            length = 0
+            for line in head.decode("latin-1").split("\r\n"):
+                if line.lower().startswith("content-length:"):
+                    length = int(line.split(":", 1)[1])
+            await reader.readexactly(length)
+            await asyncio.sleep(delay)
+            body = json.dumps({"ok": True, "result": True}).encode()
+            writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+                         b"Content-Length: %d\r\n\r\n%s" % (len(body), body))
+            await writer.drain()
+    except (asyncio.IncompleteReadError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+
+
+def breakers(**overrides):
+    settings = dict(failures=3, reset_timeout=0.3, retries=2, min_timeout=0.05, max_timeout=5.0,
+                    retry_base=0.01, retry_cap=0.02)
+    settings.update(overrides)
+    return CircuitBreakers(**settings)
+
+
+class BreakerTester:
+    def __init__(self):
+        self.tests_run = 0
+        self.tests_passed = 0
+
+    def log_test(self, name, success, details=""):
+        """Log test results"""
+        self.tests_run += 1
+        if success:
+            self.tests_passed += 1
+            print(f"✅ {name} - PASSED {details}")
+        else:
+            print(f"❌ {name} - FAILED {details}")
+        return success
+
+    async def test_states(self):
+        """Замкнута -> разомкнута -> один пробный вызов -> замкнута или снова разомкнута"""
+        print("\n🔌 Testing Circuit States...")
+
+        circuit = MethodCircuit("sendMessage", failures=3, reset_timeout=0.1, min_timeout=0.05, max_timeout=5.0)
+        for _ in range(2):
+            circuit.failure()
+        closed_after_two = circuit.state == CLOSED
+        circuit.failure()
+        rejected = False
+        try:
+            circuit.acquire()
+        except CircuitOpen as e:
+            rejected = e.method == "sendMessage" and 0 < e.retry_in <= 0.1
+        await asyncio.sleep(0.12)
+        circuit.acquire()
+        probe_state = circuit.state
+        second_rejected = False
+        try:
+            circuit.acquire()
+        except CircuitOpen:
+            second_rejected = True
+        circuit.failure()
+        reopened = circuit.state == OPEN and circuit.trips == 2
+        await asyncio.sleep(0.12)
+        circuit.acquire()
+        circuit.success(0.02)
+
+        self.log_test("Stays Closed Below Threshold", closed_after_two)
+        self.log_test("Opens And Fails Fast", rejected and circuit.rejected >= 1)
+        self.log_test("Single Probe When Half-Open", probe_state == HALF_OPEN and second_rejected)
+        self.log_test("Failed Probe Reopens", reopened)
+        self.log_test("Successful Probe Closes", circuit.state == CLOSED and circuit.failures == 0)
+
+    async def test_adaptive_timeout(self):
+        """Таймаут по наблюдаемой задержке, удвоение после таймаута, зависший API"""
+        print("\n⏱ Testing Adaptive Timeout...")
+
+        circuit = MethodCircuit("getChat", failures=5, reset_timeout=1, min_timeout=0.05, max_timeout=5.0)
+        initial = circuit.timeout()
+        for _ in range(30):
+            circuit.success(0.2)
+        steady = circuit.timeout()
+        circuit.failure(timed_out=True)
+        doubled = circuit.timeout()
+        self.log_test("Unknown Latency Uses Max", initial == 5.0)
+        self.log_test("Converges To Latency", 0.2 <= steady < 0.3, f"- {steady:.3f} s")
+        self.log_test("Doubles After Timeout", abs(doubled - 2 * steady) < 1e-9, f"- {doubled:.3f} s")
+
+        api = FakeTelegramAPI()
+        runtime = BotRuntime(store=StateStore(), breakers=breakers(failures=10))
+        async with ReplayHarness(api=api, runtime=runtime) as harness:
+            bot = harness.application.bot
+            for _ in range(10):
+                await bot.send_message(CHAT_ID, "разогрев")
+            api.stall = 2.0
+            started = time.perf_counter()
+            timed_out = False
+            try:
+                await bot.send_message(CHAT_ID, "зависнет")
+            except TimedOut:
+                timed_out = True
+            adaptive = time.perf_counter() - started
+            started = time.perf_counter()
+            api.stall = 0.3
+            sent = await bot.send_message(CHAT_ID, "явный таймаут", read_timeout=1.0)
+            explicit = time.perf_counter() - started
+            api.stall = 0
+        self.log_test("Stalled Call Times Out Early", timed_out and adaptive < 0.5, f"- {adaptive:.2f} s")
+        self.log_test("Explicit Timeout Respected", sent.text == "явный таймаут" and explicit >= 0.3,
+                      f"- {explicit:.2f} s")
+
+    async def test_retries(self):
+        """Удаления и get* повторяются до успеха, отправки - нет"""
+        print("\n🔁 Testing Jittered Retries...")
+
+        api = FlakyAPI(flaky=2)
+        runtime = BotRuntime(store=StateStore(), breakers=breakers(failures=5))
+        async with ReplayHarness(api=api, runtime=runtime) as harness:
+            bot = harness.application.bot
+            retried = runtime.breakers.retried
+            deleted = await bot.delete_message(CHAT_ID, 1)
+            retried = runtime.breakers.retried - retried
+            send_failed = False
+            try:
+                await bot.send_message(CHAT_ID, "не повторять")
+            except NetworkError:
+                send_failed = True
+        self.log_test("Idempotent Call Retried", deleted is True and api.attempts["deleteMessage"] == 3
+                      and retried == 2, f"- {api.attempts['deleteMessage']} attempts")
+        self.log_test("Send Not Retried", send_failed and api.attempts["sendMessage"] == 1)
+
+    async def test_per_method(self):
+        """Ошибки одного метода не размыкают остальные; /stats и /readyz видят цепь"""
+        print("\n🧩 Testing Per-Method Circuits...")
+
+        from health import HealthCheck
+
+        api = FakeTelegramAPI()
+        runtime = BotRuntime(store=StateStore(), breakers=breakers(reset_timeout=30))
+        async with ReplayHarness(api=api, runtime=runtime) as harness:
+            bot = harness.application.bot
+            api.failing = {"sendMessage"}
+            errors = []
+            for _ in range(5):
+                try:
+                    await bot.send_message(CHAT_ID, "упадет")
+                except NetworkError as e:
+                    errors.append(type(e).__name__)
+            deleted = await bot.delete_message(CHAT_ID, 1)
+            stats = format_stats(runtime)
+            _, ready, checks = HealthCheck(runtime).evaluate()
+
+        self.log_test("Method Circuit Opens", errors == ["NetworkError"] * 3 + ["CircuitOpen"] * 2
+                      and api.count("sendMessage") == 3, f"- {errors}")
+        self.log_test("Other Methods Closed", deleted is True and runtime.breakers.open_methods() == ["sendMessage"])
+        self.log_test("Stats Line", "🔌 Предохранитель Bot API: разомкнуто 1: sendMessage" in stats
+                      and "быстрых отказов 2" in stats)
+        self.log_test("Readiness Reports Open Circuit", not ready and checks["breaker"]["open"] == ["sendMessage"])
+
+    async def test_pool_timeout(self):
+        """Занятый пул соединений PTB - не ошибка API: цепь не размыкается"""
+        print("\n🚰 Testing Saturated Connection Pool...")
+
+        server = await asyncio.start_server(slow_api, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        guarded = breakers()
+        request = BreakerRequest(HTTPXRequest(connection_pool_size=1, pool_timeout=0.05), guarded)
+        await request.initialize()
+        try:
+            url = f"http://127.0.0.1:{port}/bot123:TOKEN/sendMessage"
+            results = await asyncio.gather(*(request.do_request(url, "POST") for _ in range(8)),
+                                           return_exceptions=True)
+        finally:
+            await request.shutdown()
+            server.close()
+            await server.wait_closed()
+
+        pool_timeouts = [result for result in results
+                         if isinstance(result, TimedOut) and "Pool timeout" in result.message]
+        circuit = guarded.circuit("sendMessage")
+        answered = [result for result in results if isinstance(result, tuple) and result[0] == 200]
+        self.log_test("Pool Saturated", len(pool_timeouts) == 7 and len(answered) == 1,
+                      f"- {len(pool_timeouts)} pool timeouts")
+        # Ответ на первый запрос замыкает цепь в любом случае: важно, что она не размыкалась
+        self.log_test("Pool Timeouts Not Failures", circuit.trips == 0 and circuit.state == CLOSED
+                      and circuit.timeout() < 5.0, f"- {circuit.trips} trips")
+
+    async def run_outage(self, runtime, updates=300, seconds=1.0):
+        """Недоступность API (вызовы зависают) под потоком личных сообщений в течение
+        seconds: удерживаемые к концу потока задачи и память и восстановление"""
+        factory = UpdateFactory()
+        api = FakeTelegramAPI()
+        async with ReplayHarness(api=api, runtime=runtime) as harness:
+            for user_id in range(20):
+                await harness.process(factory.message("/start", "private", user_id=user_id))
+            baseline_tasks = len(asyncio.all_tasks())
+            api.stall = 30.0
+            tracemalloc.start()
+            before = tracemalloc.get_traced_memory()[0]
+            for user_id in range(updates):
+                await harness.enqueue(factory.message("/start", "private", user_id=1000 + user_id))
+                await asyncio.sleep(seconds / updates)
+            retained = len(asyncio.all_tasks()) - baseline_tasks
+            memory = tracemalloc.get_traced_memory()[0] - before
+            tracemalloc.stop()
+            api.stall = 0
+            await harness.application.update_queue.join()
+            await harness.drain()
+            await asyncio.sleep(0.4)
+            api.reset()
+            await harness.process(factory.message("/start", "private", user_id=99999))
+            recovered = api.count("sendMessage") == 1
+        return retained, memory, recovered
+
+    async def test_outage(self):
+        """Во время недоступности с предохранителем обработчики не копятся"""
+        print("\n🌩 Testing Retention During Outage...")
+
+        plain = await self.run_outage(BotRuntime(store=StateStore()))
+        guarded_runtime = BotRuntime(store=StateStore(), breakers=breakers())
+        guarded = await self.run_outage(guarded_runtime)
+        print(f"   без предохранителя: задач {plain[0]}, память {plain[1] / 1024:.0f} КБ")
+        print(f"   с предохранителем: задач {guarded[0]}, память {guarded[1] / 1024:.0f} КБ, "
+              f"быстрых отказов {guarded_runtime.breakers.rejected}")
+
+        self.log_test("Without Breaker Handlers Pile Up", plain[0] >= 250, f"- {plain[0]} tasks")
+        self.log_test("With Breaker Handlers Fail Fast", guarded[0] <= 5 and guarded_runtime.breakers.rejected >= 250,
+                      f"- {guarded[0]} tasks")
+        self.log_test("Less Memory Retained", guarded[1] < plain[1] / 2,
+                      f"- {guarded[1] / 1024:.0f} vs {plain[1] / 1024:.0f} KB")
+        self.log_test("Recovers After Outage", plain[2] and guarded[2])
+
+    async def run_all_tests(self):
+        """Run all breaker tests"""
+        print("🚀 Starting Bot API Breaker Testing")
+        print("=" * 50)
+
+        logging.disable(logging.ERROR)
+        await self.test_states()
+        await self.test_adaptive_timeout()
+        await self.test_retries()
+        await self.test_per_method()
+        await self.test_pool_timeout()
+        await self.test_outage()
+        logging.disable(logging.NOTSET)
+
+        print("\n" + "=" * 50)
+        print(f"📊 Test Results: {self.tests_passed}/{self.tests_run} tests passed")
+
+        if self.tests_passed == self.tests_run:
+            print("🎉 All breaker tests passed!")
+            return 0
+        else:
+            failed_tests = self.tests_run - self.tests_passed
+            print(f"⚠️ {failed_tests} test(s) failed. Please review the issues above.")
+            return 1
+
+
+async def main():
+    """Main testing function"""
+    tester = BreakerTester()
+    return await tester.run_all_tests()
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
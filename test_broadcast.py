@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+"""
+Тестирование рассылок: учет подписчиков, 100 тыс. получателей через эмулятор Bot API,
+глобальный лимит скорости и 429 (общий для заданий), пауза при недоступности Bot API, отписка
+заблокировавших, продолжение после перезапуска
+"""
+
+import asyncio
+import logging
+import os
+import sys
+import tempfile
+import time
+from collections import Counter
+
+from broadcast import NS_SUBSCRIBER, STATUS_DONE, STATUS_RUNNING, Broadcaster
+from config import Config
+from fake_api import FakeTelegramAPI
+from metrics import format_stats
+from persistence import StateStore
+from replay import ReplayHarness, UpdateFactory
+from runtime import BotRuntime
+
+
+def add_subscribers(store, count, first=1):
+    for chat_id in range(first, first + count):
+        store.set(NS_SUBSCRIBER, chat_id, 0)
+
+
+def deliveries(api):
+    return Counter(call["chat_id"] for call in api.calls_to("sendMessage"))
+
+
+class BroadcastTester:
+    def __init__(self):
+        self.tests_run = 0
+        self.tests_passed = 0
+
+    def log_test(self, name, success, details=""):
+        """Log test results"""
+        self.tests_run += 1
+        if success:
+            self.tests_passed += 1
+            print(f"✅ {name} - PASSED {details}")
+        else:
+            print(f"❌ {name} - FAILED {details}")
+        return success
+
+    async def test_subscribers(self):
+        """Подписчики - все, кто писал в личку; группы не подписываются"""
+        print("\n📝 Testing Subscriber Tracking...")
+
+        store = StateStore()
+        runtime = BotRuntime(store=store, broadcaster=Broadcaster(store))
+        factory = UpdateFactory()
+        async with ReplayHarness(runtime=runtime) as harness:
+            await harness.process(factory.message("/start", "private", user_id=11))
+            await harness.process(factory.message("привет", "private", user_id=12))
+            await harness.process(factory.message("привет еще раз", "private", user_id=12))
+            await harness.process(factory.message("как вступить в группу", "supergroup", user_id=13))
+        subscribers = sorted(int(chat_id) for chat_id, _ in store.items(NS_SUBSCRIBER))
+        self.log_test("Private Chats Subscribed", subscribers == [11, 12], f"- {subscribers}")
+
+    async def test_large_fanout(self):
+        """100 тыс. подписчиков: каждый получает ровно одно сообщение, заблокировавшие отписаны"""
+        print("\n📣 Testing 100k Fan-Out...")
+
+        count = 100000
+        store = StateStore()
+        add_subscribers(store, count)
+        broadcaster = Broadcaster(store, rate=100000, concurrency=64, checkpoint_every=1000)
+        api = FakeTelegramAPI()
+        api.blocked.update(range(1, count + 1, 50))
+        async with ReplayHarness(api=api, runtime=BotRuntime(store=store, broadcaster=broadcaster)):
+            started = time.perf_counter()
+            job = await broadcaster.run(broadcaster.create("📚 Новые материалы в Buddah Base!"))
+            elapsed = time.perf_counter() - started
+
+        delivered = deliveries(api)
+        blocked = len(api.blocked)
+        self.log_test("Everyone Reached Once", len(delivered) == count and max(delivered.values()) == 1,
+                      f"- {len(delivered)} chats in {elapsed:.1f} s ({count / elapsed:.0f} msg/s)")
+        self.log_test("Counters", job["sent"] == count - blocked and job["blocked"] == blocked
+                      and job["failed"] == 0 and job["done"] == count and job["status"] == STATUS_DONE,
+                      f"- sent {job['sent']}, blocked {job['blocked']}")
+        self.log_test("Blocked Users Pruned", broadcaster.subscribers == count - blocked
+                      and store.get(NS_SUBSCRIBER, "51") is None and store.get(NS_SUBSCRIBER, "2") is not None)
+        self.log_test("Checkpoint Stored", store.get("broadcast", job["id"])["cursor"] == count)
+
+    async def test_rate_limit(self):
+        """Скорость рассылки не превышает rate; при 429 вся рассылка ждет retry_after"""
+        print("\n🚦 Testing Global Rate Limit...")
+
+        store = StateStore()
+        add_subscribers(store, 1500)
+        broadcaster = Broadcaster(store, rate=1000, concurrency=16, checkpoint_every=250)
+        api = FakeTelegramAPI(flood_limit=1200)
+        async with ReplayHarness(api=api, runtime=BotRuntime(store=store, broadcaster=broadcaster)):
+            started = time.perf_counter()
+            job = await broadcaster.run(broadcaster.create("анонс"))
+            elapsed = time.perf_counter() - started
+        self.log_test("Paced Under Limit", api.flood_errors == 0 and job["sent"] == 1500 and elapsed >= 1.3,
+                      f"- {job['sent']} in {elapsed:.2f} s, {api.flood_errors} x 429")
+
+        store = StateStore()
+        add_subscribers(store, 3000)
+        greedy = Broadcaster(store, rate=50000, concurrency=32, checkpoint_every=500)
+        api = FakeTelegramAPI(flood_limit=1000)
+        async with ReplayHarness(api=api, runtime=BotRuntime(store=store, broadcaster=greedy)):
+            job = await greedy.run(greedy.create("анонс"))
+        delivered = deliveries(api)
+        self.log_test("429 Retried Until Delivered", job["sent"] == 3000 and job["failed"] == 0
+                      and job["retries"] > 0 and len(delivered) == 3000,
+                      f"- {job['retries']} retries, {api.flood_errors} x 429")
+
+    async def test_shared_pause(self):
+        """Второе задание не сбрасывает паузу после 429 первого: лимит общий для бота"""
+        print("\n⏸ Testing Pause Shared Between Jobs...")
+
+        store = StateStore()
+        add_subscribers(store, 600)
+        broadcaster = Broadcaster(store, rate=50000, concurrency=8, checkpoint_every=200)
+        api = FakeTelegramAPI(flood_limit=300)
+        async with ReplayHarness(api=api, runtime=BotRuntime(store=store, broadcaster=broadcaster)):
+            job = broadcaster.create("анонс")
+            first = broadcaster.launch(job)
+            while not job["retries"]:
+                await asyncio.sleep(0.005)
+            calls_at_429 = api.count("sendMessage")
+            second = broadcaster.launch(broadcaster.create("второй анонс"))
+            await asyncio.sleep(0.5)
+            # Вызовы Bot API во время паузы, в том числе получившие 429: допустим
+            # запрос первого задания, уже бывший в полете; сброс графика дал бы ~concurrency
+            calls_during_pause = api.count("sendMessage") - calls_at_429
+            jobs = await asyncio.gather(first, second)
+
+        delivered = Counter(chat_id for chat_id, _ in api.sent)
+        self.log_test("Second Job Waits Out 429", calls_during_pause <= 2,
+                      f"- {calls_during_pause} calls during retry_after")
+        self.log_test("Both Jobs Delivered", all(job["sent"] == 600 for job in jobs)
+                      and len(delivered) == 600 and set(delivered.values()) == {2},
+                      f"- {[job['sent'] for job in jobs]}")
+
+    async def test_outage(self):
+        """Сбой Bot API ставит рассылку на паузу: получатели не теряются и не дублируются"""
+        print("\n🔌 Testing Bot API Outage...")
+
+        store = StateStore()
+        add_subscribers(store, 2000)
+        broadcaster = Broadcaster(store, rate=20000, concurrency=16, checkpoint_every=250, outage_pause=0.05)
+        api = FakeTelegramAPI()
+        async with ReplayHarness(api=api, runtime=BotRuntime(store=store, broadcaster=broadcaster)):
+            task = broadcaster.launch(broadcaster.create("анонс"))
+            while api.count("sendMessage") < 500:
+                await asyncio.sleep(0.005)
+            api.outage = True
+            await asyncio.sleep(0.3)
+            during_outage = broadcaster.latest()
+            api.outage = False
+            job = await task
+
+        # Вызовы во время сбоя получили 502: доставленные - только принятые Bot API
+        delivered = Counter(chat_id for chat_id, _ in api.sent)
+        self.log_test("Outage Pauses Job", job["requeued"] > 0 and during_outage["status"] == STATUS_RUNNING,
+                      f"- {job['requeued']} requeued")
+        self.log_test("Everyone Reached After Outage", len(delivered) == 2000 and job["sent"] == 2000
+                      and job["failed"] == 0 and job["done"] == 2000, f"- {len(delivered)} chats")
+        self.log_test("Requeued Not Duplicated", max(delivered.values()) == 1)
+
+    async def test_resume(self):
+        """Остановленная рассылка продолжается с курсора после перезапуска"""
+        print("\n🔁 Testing Resume After Restart...")
+
+        count = 5000
+        api = FakeTelegramAPI()
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "state.db")
+            store = StateStore(path)
+            broadcaster = Broadcaster(store, rate=20000, checkpoint_every=500)
+            async with ReplayHarness(api=api, runtime=BotRuntime(store=store, broadcaster=broadcaster)):
+                add_subscribers(store, count)
+                job = broadcaster.create("анонс")
+                task = broadcaster.launch(job)
+                while store.get("broadcast", job["id"])["done"] < 2000:
+                    await asyncio.sleep(0.005)
+                task.cancel()
+            sent_before = api.count("sendMessage")
+
+            store = StateStore(path)
+            broadcaster = Broadcaster(store, rate=20000, checkpoint_every=500)
+            async with ReplayHarness(api=api, runtime=BotRuntime(store=store, broadcaster=broadcaster)):
+                resumed = list(broadcaster.active)
+                await asyncio.gather(*broadcaster._tasks.values())
+                final = broadcaster.latest()
+                progress = format_stats(BotRuntime(broadcaster=broadcaster))
+
+        delivered = deliveries(api)
+        duplicates = sum(times - 1 for times in delivered.values())
+        self.log_test("Interrupted Mid-Way", 2000 <= sent_before < count, f"- {sent_before} before restart")
+        self.log_test("Resumed On Start", resumed == [job["id"]] and final["status"] == STATUS_DONE)
+        self.log_test("Everyone Reached", len(delivered) == count, f"- {len(delivered)}/{count}")
+        self.log_test("At Most One Batch Repeated", duplicates <= broadcaster.checkpoint_every,
+                      f"- {duplicates} duplicates")
+        self.log_test("Stats Line", "📣 Подписчики: 5000, активных рассылок 0" in progress)
+
+    async def test_command(self):
+        """/broadcast запускает рассылку, без текста показывает прогресс; только для админов"""
+        print("\n🛠 Testing /broadcast Command...")
+
+        admin_ids = Config.ADMIN_IDS
+        Config.ADMIN_IDS = [1]
+        try:
+            store = StateStore()
+            add_subscribers(store, 20, first=100)
+            broadcaster = Broadcaster(store, rate=1000)
+            factory = UpdateFactory()
+            async with ReplayHarness(runtime=BotRuntime(store=store, broadcaster=broadcaster)) as harness:
+                api = harness.api
+                await harness.process(factory.message("/broadcast взлом", "private", user_id=2))
+                denied = api.count("sendMessage")
+                await harness.process(factory.message("/broadcast 📚 Новый гайд\nпо VEO 3", "private", user_id=1))
+                started = api.calls_to("sendMessage")[0]["text"]
+                texts = {call["text"] for call in api.calls_to("sendMessage")[1:]}
+                await harness.process(factory.message("/broadcast", "private", user_id=1))
+                status = api.calls_to("sendMessage")[-1]["text"]
+        finally:
+            Config.ADMIN_IDS = admin_ids
+
+        # Отправители команд подписываются после обработчика: 2 - до запуска рассылки,
+        # админ 1 - сразу после, и рассылка его тоже догоняет
+        self.log_test("Non-Admin Denied", denied == 0)
+        self.log_test("Broadcast Started", "запущена: 21 подписчиков" in started, f"- {started}")
+        self.log_test("Text Kept Verbatim", texts == {"📚 Новый гайд\nпо VEO 3"})
+        self.log_test("Progress Report", "22/22" in status and "завершена" in status
+                      and "сообщ/с" in status, f"- {status}")
+        self.log_test("Job Persisted", broadcaster.latest()["status"] != STATUS_RUNNING)
+
+    async def run_all_tests(self):
+        """Run all broadcast tests"""
+        print("🚀 Starting Broadcast Testing")
+        print("=" * 50)
+
+        logging.disable(logging.WARNING)
+        await self.test_subscribers()
+        await self.test_large_fanout()
+        await self.test_rate_limit()
+        await self.test_shared_pause()
+        await self.test_outage()
+        await self.test_resume()
+        await self.test_command()
+        logging.disable(logging.NOTSET)
+
+        print("\n" + "=" * 50)
+        print(f"📊 Test Results: {self.tests_passed}/{self.tests_run} tests passed")
+
+        if self.tests_passed == self.tests_run:
+            print("🎉 All broadcast tests passed!")
+            return 0
+        else:
+            failed_tests = self.tests_run - self.tests_passed
+            print(f"⚠️ {failed_tests} test(s) failed. Please review the issues above.")
+            return 1
+
+
+async def main():
+    """Main testing function"""
+    tester = BroadcastTester()
+    return await tester.run_all_tests()
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Тестирование inline-поиска по каталогу: BM25, префиксы, страницы и задержка
+"""
+
+import asyncio
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+
+from catalog import CatalogEntry, CatalogIndex, load_catalog, tokenize
+from persistence import StateStore
+from replay import ReplayHarness, UpdateFactory, build_catalog, percentile
+from runtime import BotRuntime
+
+ENTRIES = [
+    CatalogEntry("veo", "Промпты для VEO 3", "Готовые сценарии для видео"),
+    CatalogEntry("mj", "Гайд по Midjourney", "Как писать промпты для картинок"),
+    CatalogEntry("ads", "Шаблоны рекламы", "Тексты для таргета и постов", tags=["маркетинг"]),
+    CatalogEntry("cv", "Резюме с нейросетью", "Шаблон сопроводительного письма"),
+]
+
+
+class CatalogTester:
+    def __init__(self):
+        self.tests_run = 0
+        self.tests_passed = 0
+
+    def log_test(self, name, success, details=""):
+        """Log test results"""
+        self.tests_run += 1
+        if success:
+            self.tests_passed += 1
+            print(f"✅ {name} - PASSED {details}")
+        else:
+            print(f"❌ {name} - FAILED {details}")
+        return success
+
+    def test_ranking(self):
+        """BM25: совпадение в заголовке важнее описания, префиксы при наборе"""
+        print("\n🔎 Testing Ranking...")
+
+        index = CatalogIndex(ENTRIES)
+        self.log_test("Tokenize Normalizes", tokenize("Ещё ПРОМПТЫ!") == ["еще", "промпты"])
+
+        ids = [entry.id for entry in index.search("промпты ")[0]]
+        self.log_test("Title Match First", ids[:2] == ["veo", "mj"], f"- {ids}")
+
+        ids = [entry.id for entry in index.search("шабл")[0]]
+        self.log_test("Prefix While Typing", set(ids) == {"ads", "cv"} and ids[0] == "ads", f"- {ids}")
+
+        self.log_test("Finished Word Not Expanded", index.search("шабл ")[0] == [])
+        self.log_test("Tags Searchable", [e.id for e in index.search("маркетинг")[0]] == ["ads"])
+        self.log_test("Empty Query", index.search("  ")[0] == [])
+
+    def test_pagination(self):
+        """Страницы не пересекаются и покрывают все совпадения"""
+        print("\n📄 Testing Pagination...")
+
+        index = CatalogIndex.from_dicts(build_catalog(2000))
+        seen, offset, pages, has_more = [], 0, 0, True
+        while has_more:
+            page, has_more = index.search("промпт ", offset=offset, limit=20)
+            seen.extend(entry.id for entry in page)
+            offset += len(page)
+            pages += 1
+        matches = len(index.postings["промпт"])
+        self.log_test("Pages Cover All Matches", len(seen) == len(set(seen)) == matches,
+                      f"- {len(seen)} results in {pages} pages")
+
+    def test_latency(self):
+        """Ответ на каждое нажатие клавиши для каталога из 10k записей"""
+        print("\n⚡ Testing Keystroke Latency...")
+
+        started = time.perf_counter()
+        index = CatalogIndex.from_dicts(build_catalog(10000))
+        build_ms = (time.perf_counter() - started) * 1000
+
+        latencies = []
+        for query in ["промпт для видео", "шаблоны презентаций", "гайд по midjourney"]:
+            for length in range(1, len(query) + 1):
+                index._cache.clear()
+                started = time.perf_counter()
+                index.search(query[:length])
+                latencies.append(time.perf_counter() - started)
+        latencies.sort()
+        p50, p99 = percentile(latencies, 0.50) * 1000, percentile(latencies, 0.99) * 1000
+        self.log_test("Keystroke Under 1 ms", p50 < 0.5 and p99 < 1.0,
+                      f"- p50 {p50:.3f} ms, p99 {p99:.3f} ms, index built in {build_ms:.0f} ms")
+
+    def test_load_catalog(self, tmp):
+        """Загрузка каталога из файла"""
+        print("\n📚 Testing Catalog File...")
+
+        path = os.path.join(tmp, "catalog.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(build_catalog(50), f, ensure_ascii=False)
+        catalog = load_catalog(path)
+        self.log_test("Loaded From File", catalog is not None and len(catalog) == 50)
+        self.log_test("Missing File Disables Search", load_catalog(os.path.join(tmp, "none.json")) is None)
+
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("[{\"title\": ")
+        self.log_test("Broken File Disables Search", load_catalog(path) is None)
+
+    async def test_inline_pages(self):
+        """Inline-запрос: маркетинговые статьи + каталог, следующая страница по next_offset"""
+        print("\n📱 Testing Inline Pages...")
+
+        factory = UpdateFactory()
+        catalog = CatalogIndex.from_dicts(build_catalog(500))
+        runtime = BotRuntime(store=StateStore(), catalog=catalog)
+        async with ReplayHarness(runtime=runtime) as harness:
+            await harness.replay([factory.inline_query("промпт")])
+            first = harness.api.calls_to("answerInlineQuery")[-1]
+            await harness.replay([factory.inline_query("промпт", offset=first.get("next_offset", ""))])
+            second = harness.api.calls_to("answerInlineQuery")[-1]
+
+        first_ids = [result["id"] for result in first["results"]]
+        second_ids = [result["id"] for result in second["results"]]
+        self.log_test("First Page Keeps Marketing", "files_request" in first_ids
+                      and "group_info" in first_ids)
+        self.log_test("First Page Has Catalog", sum(i.startswith("catalog:") for i in first_ids) == 20
+                      and first.get("next_offset") == "20", f"- next_offset {first.get('next_offset')}")
+        self.log_test("Second Page Catalog Only", len(second_ids) == 20
+                      and all(i.startswith("catalog:") for i in second_ids)
+                      and not set(first_ids) & set(second_ids))
+
+    async def run_all_tests(self):
+        """Run all catalog tests"""
+        print("🚀 Starting Catalog Search Testing")
+        print("=" * 50)
+
+        logging.disable(logging.INFO)
+        self.test_ranking()
+        self.test_pagination()
+        self.test_latency()
+        with tempfile.TemporaryDirectory() as tmp:
+            self.test_load_catalog(tmp)
+        await self.test_inline_pages()
+        logging.disable(logging.NOTSET)
+
+        print("\n" + "=" * 50)
+        print(f"📊 Test Results: {self.tests_passed}/{self.tests_run} tests passed")
+
+        if self.tests_passed == self.tests_run:
+            print("🎉 All catalog tests passed!")
+            return 0
+        else:
+            failed_tests = self.tests_run - self.tests_passed
+            print(f"⚠️ {failed_tests} test(s) failed. Please review the issues above.")
+            return 1
+
+
+async def main():
+    """Main testing function"""
+    tester = CatalogTester()
+    return await tester.run_all_tests()
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Тестирование компактного файла каталога с доступом через mmap
+"""
+
+import asyncio
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from catalog import CatalogIndex, load_catalog
+from catalog_store import CatalogStore, open_catalog_store
+from replay import build_catalog
+
+
+class CatalogStoreTester:
+    def __init__(self):
+        self.tests_run = 0
+        self.tests_passed = 0
+
+    def log_test(self, name, success, details=""):
+        """Log test results"""
+        self.tests_run += 1
+        if success:
+            self.tests_passed += 1
+            print(f"✅ {name} - PASSED {details}")
+        else:
+            print(f"❌ {name} - FAILED {details}")
+        return success
+
+    def test_round_trip(self, tmp):
+        """Записи читаются из файла такими же, какими были записаны"""
+        print("\n💾 Testing Round Trip...")
+
+        items = build_catalog(1000)
+        items[0]["text"] = "Полный текст промпта\nс переносом строки"
+        items[1]["tags"] = []
+        path = os.path.join(tmp, "catalog.bin")
+        CatalogStore.build(path, items)
+        store = CatalogStore(path)
+
+        first, second = store[0], store[1]
+        self.log_test("Entry Decoded", first.id == "item0" and first.title == items[0]["title"]
+                      and first.text == items[0]["text"] and first.tags == items[0]["tags"])
+        self.log_test("Empty Tags And Text Fallback", second.tags == []
+                      and second.text == items[1]["description"])
+        self.log_test("Length And Iteration", len(store) == 1000
+                      and [entry.id for entry in store][-1] == "item999")
+        self.log_test("Lookup By Id", store.get("item537").title == items[537]["title"])
+        self.log_test("Missing Id", store.get("nope") is None)
+
+        try:
+            store[1000]
+            out_of_range = False
+        except IndexError:
+            out_of_range = True
+        self.log_test("Index Out Of Range", out_of_range)
+        store.close()
+
+        with open(os.path.join(tmp, "garbage.bin"), "wb") as f:
+            f.write(b"not a catalog at all")
+        try:
+            CatalogStore(os.path.join(tmp, "garbage.bin"))
+            rejected = False
+        except ValueError:
+            rejected = True
+        self.log_test("Foreign File Rejected", rejected)
+
+    def test_search_over_store(self, tmp):
+        """Индекс поверх mmap отвечает так же, как поверх записей в памяти"""
+        print("\n🔎 Testing Search Over Store...")
+
+        items = build_catalog(3000)
+        path = os.path.join(tmp, "search.bin")
+        CatalogStore.build(path, items)
+        store = CatalogStore(path)
+        on_disk = CatalogIndex(store)
+        in_memory = CatalogIndex.from_dicts(items)
+
+        same = all(
+            [entry.id for entry in on_disk.search(query)[0]]
+            == [entry.id for entry in in_memory.search(query)[0]]
+            for query in ["промпт", "шаблоны презентац", "слово12", "видео "]
+        )
+        self.log_test("Same Results", same)
+        self.log_test("Entries Not Copied", on_disk.entries is store)
+        store.close()
+
+    def test_concurrent_build(self, tmp):
+        """Одновременные сборки одного файла (процессы sharding.py) не портят его"""
+        print("\n🧩 Testing Concurrent Builds...")
+
+        path = os.path.join(tmp, "shared.bin")
+        sizes = [500, 1000, 1500, 2000]
+        with ProcessPoolExecutor(len(sizes)) as pool:
+            built = list(pool.map(CatalogStore.build, [path] * len(sizes), map(build_catalog, sizes)))
+        store = CatalogStore(path)
+        self.log_test("File Intact", len(store) in sizes and store[len(store) - 1].id == f"item{len(store) - 1}"
+                      and store.get("item0") is not None, f"- {len(store)} entries")
+        store.close()
+        leftovers = [name for name in os.listdir(tmp) if name.endswith(".tmp")]
+        self.log_test("No Temporary Files Left", built == sizes and not leftovers, f"- {leftovers}")
+
+    def test_rebuild_from_json(self, tmp):
+        """Файл каталога пересобирается, когда catalog.json новее"""
+        print("\n🔄 Testing Rebuild From JSON...")
+
+        source = os.path.join(tmp, "catalog.json")
+        compiled = os.path.join(tmp, "catalog.bin")
+        with open(source, "w", encoding="utf-8") as f:
+            json.dump(build_catalog(10), f, ensure_ascii=False)
+        store = open_catalog_store(source, compiled)
+        self.log_test("Built On First Open", len(store) == 10)
+        store.close()
+
+        with open(source, "w", encoding="utf-8") as f:
+            json.dump(build_catalog(20), f, ensure_ascii=False)
+        os.utime(source, (time.time() + 5, time.time() + 5))
+        store = open_catalog_store(source, compiled)
+        self.log_test("Rebuilt When Source Changes", len(store) == 20)
+        store.close()
+
+        catalog = load_catalog(source, compiled)
+        self.log_test("load_catalog Uses Store", isinstance(catalog.entries, CatalogStore)
+                      and len(catalog.search("промпт")[0]) > 0)
+        catalog.entries.close()
+
+    async def run_all_tests(self):
+        """Run all catalog store tests"""
+        print("🚀 Starting Catalog Store Testing")
+        print("=" * 50)
+
+        logging.disable(logging.INFO)
+        with tempfile.TemporaryDirectory() as tmp:
+            self.test_round_trip(tmp)
+            self.test_search_over_store(tmp)
+            self.test_concurrent_build(tmp)
+            self.test_rebuild_from_json(tmp)
+        logging.disable(logging.NOTSET)
+
+        print("\n" + "=" * 50)
+        print(f"📊 Test Results: {self.tests_passed}/{self.tests_run} tests passed")
+
+        if self.tests_passed == self.tests_run:
+            print("🎉 All catalog store tests passed!")
+            return 0
+        else:
+            failed_tests = self.tests_run - self.tests_passed
+            print(f"⚠️ {failed_tests} test(s) failed. Please review the issues above.")
+            return 1
+
+
+async def main():
+    """Main testing function"""
+    tester = CatalogStoreTester()
+    return await tester.run_all_tests()
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
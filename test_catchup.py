@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+"""
+Тестирование продолжения с сохраненного update_id: сохраненный offset не обгоняет
+выполняющиеся апдейты, после перезапуска бот не отвечает повторно на обработанное, разбирает накопленные за простой 10 тысяч апдейтов
+(один ответ пользователю на вид ответа, без устаревших триггеров в группах) и
+сообщает время догоняния; с drop_pending_updates накопленное теряется
+"""
+
+import asyncio
+import logging
+import os
+import sys
+import tempfile
+import time
+
+from telegram import Update
+from telegram.ext import TypeHandler
+
+from bot import BuddahBaseBot
+from backpressure import LoadShedder
+from catchup import CatchUp, OffsetTracker
+from fake_api import FAKE_BOT_TOKEN, FakeTelegramAPI
+from persistence import StateStore
+from replay import GROUP_CHAT_ID, UpdateFactory, build_corpus
+from runtime import BotRuntime
+
+BACKLOG = 10000
+DOWNTIME = 1800
+STALE_SECONDS = 600
+
+
+def backlog_corpus(factory, count=BACKLOG, downtime=DOWNTIME):
+    """Смешанный трафик, равномерно отправленный за downtime секунд до запуска
+    (последнее сообщение - за пару секунд: даты в Telegram - целые секунды)"""
+    corpus = build_corpus(count, factory=factory)
+    now = time.time() - 2
+    for index, data in enumerate(corpus):
+        message = data.get("message")
+        if message:
+            message["date"] = int(now - downtime + index * downtime / count)
+    return corpus
+
+
+async def wait_until(condition, timeout=60.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        await asyncio.sleep(0.02)
+    return condition()
+
+
+class CatchUpTester:
+    def __init__(self):
+        self.tests_run = 0
+        self.tests_passed = 0
+
+    def log_test(self, name, success, details=""):
+        """Log test results"""
+        self.tests_run += 1
+        if success:
+            self.tests_passed += 1
+            print(f"✅ {name} - PASSED {details}")
+        else:
+            print(f"❌ {name} - FAILED {details}")
+        return success
+
+    def test_admit(self):
+        """Сворачивание повторов, устаревшие триггеры в группах, конец догоняния"""
+        print("\n⏪ Testing Catch-Up Decisions...")
+
+        now = time.time()
+        catchup = CatchUp(stale_seconds=STALE_SECONDS)
+        catchup.start(now)
+        old = UpdateFactory(date=int(now - 3600))
+        recent = UpdateFactory(start_update_id=100, date=int(now - 60))
+        fresh = UpdateFactory(start_update_id=200, date=int(now + 1))
+
+        def message(factory, text, chat_type, user_id=1001):
+            return Update.de_json(factory.message(text, chat_type, user_id=user_id), None).message
+
+        first = catchup.admit(message(old, "/start", "private"), "start", now)
+        repeat = catchup.admit(message(recent, "привет", "private"), "start", now)
+        other_kind = catchup.admit(message(recent, "как вступить?", "private"), "join", now)
+        other_user = catchup.admit(message(recent, "/start", "private", user_id=1002), "start", now)
+        stale_group = catchup.admit(message(old, "как вступить в группу", "supergroup"), "join", now)
+        recent_group = catchup.admit(message(recent, "как вступить в группу", "supergroup"), "join", now)
+        stale_private = catchup.admit(message(old, "есть промпты?", "private", user_id=1003), "files", now)
+        live = catchup.admit(message(fresh, "/start", "private"), "start", now + 2)
+        after = catchup.admit(message(recent, "/start", "private"), "start", now + 3)
+
+        self.log_test("First Reply Per Kind", first and other_kind and other_user)
+        self.log_test("Repeats Collapsed", not repeat and catchup.stats["collapsed"] == 1)
+        self.log_test("Stale Group Trigger Skipped", not stale_group and recent_group
+                      and catchup.stats["stale"] == 1)
+        self.log_test("Old Private Message Answered", stale_private)
+        self.log_test("Live Message Ends Catch-Up", live and after and not catchup.active
+                      and catchup.stats["backlog"] == 7, f"- {catchup.format()}")
+
+    async def test_offset(self):
+        """Offset - наибольший id, до которого завершены все принятые апдейты"""
+        print("\n🔢 Testing Offset Watermark...")
+
+        tracker = OffsetTracker()
+        for update_id in (10, 11, 12, 13):
+            tracker.begin(update_id)
+        out_of_order = [tracker.finish(11), tracker.finish(13), tracker.finish(10), tracker.finish(12)]
+        self.log_test("Out-Of-Order Completion", out_of_order == [9, 9, 11, 13], f"- {out_of_order}")
+
+        runtime = BotRuntime(store=StateStore())
+        shedder = LoadShedder(runtime)
+        factory = UpdateFactory()
+        gate = asyncio.Event()
+
+        async def work(slow):
+            if slow:
+                await gate.wait()
+
+        updates = [factory.message("привет", "private", user_id=user_id) for user_id in range(1, 6)]
+        tasks = [asyncio.create_task(shedder.process_update(Update.de_json(data, None), work(index == 1)))
+                 for index, data in enumerate(updates)]
+        await asyncio.sleep(0.05)
+        while_slow = runtime.last_update_id
+        gate.set()
+        await asyncio.gather(*tasks)
+        self.log_test("Slow Update Holds Offset", while_slow == updates[0]["update_id"]
+                      and runtime.last_update_id == updates[-1]["update_id"],
+                      f"- {while_slow} while {updates[1]['update_id']} runs")
+
+    async def start_bot(self, api, path, resume=True):
+        runtime = BotRuntime(store=StateStore(path, flush_interval=0.2),
+                             catchup=CatchUp(stale_seconds=STALE_SECONDS) if resume else None)
+        bot = BuddahBaseBot(token=FAKE_BOT_TOKEN, request=api, runtime=runtime)
+        await bot.initialize()
+        seen = []
+
+        async def record(update, context):
+            seen.append(update.update_id)
+
+        bot.application.add_handler(TypeHandler(Update, record), group=-10)
+        await runtime.start()
+        await bot.application.initialize()
+        await bot.application.start()
+        await bot.start_polling()
+        return bot, seen
+
+    async def run_restart(self, directory, resume):
+        """Первый запуск, падение до подтверждения offset, простой и второй запуск"""
+        path = os.path.join(directory, f"state-{resume}.db")
+        factory = UpdateFactory()
+        api = FakeTelegramAPI()
+        bot, _ = await self.start_bot(api, path, resume)
+        processed = [factory.message("привет", "private", user_id=user_id) for user_id in range(1, 51)]
+        api.add_updates(processed)
+        await wait_until(lambda: bot.runtime.last_update_id == processed[-1]["update_id"])
+        await bot.stop()
+
+        # Telegram не получил подтверждения последних апдейтов: после падения они придут снова
+        api.updates.extendleft(reversed(processed[-20:]))
+        backlog = backlog_corpus(factory)
+        api.add_updates(backlog)
+        api.reset()
+
+        started = time.perf_counter()
+        bot, seen = await self.start_bot(api, path, resume)
+        last_id = backlog[-1]["update_id"]
+        await wait_until(lambda: not api.updates and (seen and seen[-1] == last_id or not resume))
+        await bot.application.update_queue.join()
+        caught_up = time.perf_counter() - started
+        # Первое сообщение после простоя
+        live = factory.message("как вступить?", "private", user_id=99999)
+        api.add_updates([live])
+        await wait_until(lambda: live["update_id"] in seen, timeout=5.0)
+        await asyncio.sleep(0.1)
+        await bot.stop()
+        return bot.runtime, api, seen, backlog, processed, caught_up
+
+    async def test_resume(self):
+        """10 тысяч апдейтов простоя разбираются без повторов и устаревших ответов"""
+        print("\n🔄 Testing Resume After Restart...")
+
+        with tempfile.TemporaryDirectory() as directory:
+            runtime, api, seen, backlog, processed, caught_up = await self.run_restart(directory, resume=True)
+            _, dropped_api, dropped_seen, _, _, _ = await self.run_restart(directory, resume=False)
+
+        catchup = runtime.catchup
+        dates = {data["update_id"]: data["message"]["date"] for data in backlog if "message" in data}
+        sends = api.calls_to("sendMessage")
+        private = [(int(params["chat_id"]), params["text"]) for params in sends if int(params["chat_id"]) > 0]
+        group_replies = [int(params["reply_to_message_id"]) for params in sends
+                         if int(params["chat_id"]) == GROUP_CHAT_ID and params.get("reply_to_message_id")]
+        oldest_reply = min((dates[message_id] for message_id in group_replies if message_id in dates),
+                           default=None)
+        print(f"   догоняние {BACKLOG} апдейтов: {caught_up:.2f} с, {catchup.format()}")
+        # Пачки getUpdates из простоя - тот же всплеск: малоценное в группах отбрасывается
+        print(f"   отброшено при перегрузке: {runtime.metrics.shed}")
+
+        self.log_test("Processed Updates Not Repeated", seen and min(seen) > processed[-1]["update_id"],
+                      f"- first {seen[0] if seen else None}")
+        self.log_test("Backlog Processed", backlog[-1]["update_id"] in seen and catchup.stats["backlog"] > 0,
+                      f"- {len(seen)} updates in {caught_up:.2f} s")
+        self.log_test("One Reply Per User Per Kind", len(private) == len(set(private))
+                      and catchup.stats["collapsed"] > 0, f"- {catchup.stats['collapsed']} collapsed")
+        self.log_test("Stale Group Triggers Skipped", catchup.stats["stale"] > 0 and oldest_reply is not None
+                      and time.time() - oldest_reply <= STALE_SECONDS + caught_up + 5,
+                      f"- {catchup.stats['stale']} stale")
+        self.log_test("Live Message Ends Catch-Up", not catchup.active and 0 < catchup.elapsed <= caught_up + 1
+                      and sends[-1]["chat_id"] == 99999)
+        self.log_test("Offset Persisted", runtime.last_update_id == seen[-1])
+        dropped = [update_id for update_id in dropped_seen if update_id <= backlog[-1]["update_id"]]
+        self.log_test("Drop Pending Loses Backlog", not dropped and dropped_api.count("sendMessage") == 1,
+                      f"- {len(dropped)} of {BACKLOG} handled")
+
+    async def test_offset_reset(self):
+        """Telegram начал счет update_id заново: новые апдейты ниже сохраненного не теряются"""
+        print("\n🔁 Testing Update Id Reset...")
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "state.db")
+            store = await StateStore(path).open()
+            store.set("meta", "last_update_id", 900_000_000)
+            await store.close()
+
+            factory = UpdateFactory(start_update_id=1000)
+            updates = [factory.message("как вступить?", "private", user_id=user_id) for user_id in range(1, 31)]
+            api = FakeTelegramAPI()
+            api.add_updates(updates)
+            bot, seen = await self.start_bot(api, path)
+            await wait_until(lambda: len(seen) == len(updates), timeout=10.0)
+            await bot.application.update_queue.join()
+            await asyncio.sleep(0.1)
+            await bot.stop()
+            saved = bot.runtime.last_update_id
+
+            # Следующий перезапуск продолжает с нового счета без повторов
+            api.reset()
+            bot, repeated = await self.start_bot(api, path)
+            await asyncio.sleep(0.2)
+            await bot.stop()
+
+        offsets = [call.get("offset") for call in api.calls_to("getUpdates")[:2]]
+        self.log_test("New Updates Not Dropped", seen == [data["update_id"] for data in updates],
+                      f"- {len(seen)}/{len(updates)}")
+        self.log_test("Offset Lowered", saved == updates[-1]["update_id"], f"- {saved}")
+        self.log_test("Confirmed After Reset", not repeated and offsets[0] is None
+                      and int(offsets[1]) == saved + 1, f"- {offsets}")
+
+    async def run_all_tests(self):
+        """Run all catch-up tests"""
+        print("🚀 Starting Resume And Catch-Up Testing")
+        print("=" * 50)
+
+        logging.disable(logging.WARNING)
+        self.test_admit()
+        await self.test_offset()
+        await self.test_resume()
+        await self.test_offset_reset()
+        logging.disable(logging.NOTSET)
+
+        print("\n" + "=" * 50)
+        print(f"📊 Test Results: {self.tests_passed}/{self.tests_run} tests passed")
+
+        if self.tests_passed == self.tests_run:
+            print("🎉 All catch-up tests passed!")
+            return 0
+        else:
+            failed_tests = self.tests_run - self.tests_passed
+            print(f"⚠️ {failed_tests} test(s) failed. Please review the issues above.")
+            return 1
+
+
+async def main():
+    """Main testing function"""
+    tester = CatchUpTester()
+    return await tester.run_all_tests()
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Тестирование отсечения устаревших inline-запросов при наборе текста
+"""
+
+import asyncio
+import logging
+import sys
+import time
+
+from debounce import InlineDebouncer
+from persistence import StateStore
+from replay import ReplayHarness, UpdateFactory, build_typing_timeline
+from runtime import BotRuntime
+
+
+class DebounceTester:
+    def __init__(self):
+        self.tests_run = 0
+        self.tests_passed = 0
+
+    def log_test(self, name, success, details=""):
+        """Log test results"""
+        self.tests_run += 1
+        if success:
+            self.tests_passed += 1
+            print(f"✅ {name} - PASSED {details}")
+        else:
+            print(f"❌ {name} - FAILED {details}")
+        return success
+
+    async def test_latest_wins(self):
+        """Из запросов пользователя внутри паузы отвечается только последний"""
+        print("\n🏁 Testing Latest Query Wins...")
+
+        debouncer = InlineDebouncer(delay=0.1)
+        answered = []
+
+        def answer(tag):
+            async def send():
+                answered.append(tag)
+            return send
+
+        async def typed(user_id, query_id, after):
+            await asyncio.sleep(after)
+            return await debouncer.run(user_id, query_id, answer(query_id))
+
+        results = await asyncio.gather(
+            typed(1, "q1", 0),
+            typed(1, "q2", 0.03),
+            typed(2, "other", 0),
+        )
+        self.log_test("Only Freshest Answered", sorted(answered) == ["other", "q2"], f"- {answered}")
+        self.log_test("Run Reports Outcome", results == [False, True, True])
+        self.log_test("Counters", debouncer.answered == 2 and debouncer.skipped == 1
+                      and debouncer.in_flight == 0)
+
+        try:
+            InlineDebouncer(delay=0)
+            rejected = False
+        except ValueError:
+            rejected = True
+        self.log_test("Zero Delay Rejected", rejected)
+
+    async def test_debounce_delay(self):
+        """Вытесненный запрос не ждет всю паузу, свежий отвечается после нее"""
+        print("\n⏳ Testing Debounce Delay...")
+
+        debouncer = InlineDebouncer(delay=0.2)
+        finished = {}
+
+        async def answer():
+            pass
+
+        async def typed(query_id, after):
+            await asyncio.sleep(after)
+            started = time.perf_counter()
+            answered = await debouncer.run(1, query_id, answer)
+            finished[query_id] = (answered, time.perf_counter() - started)
+
+        await asyncio.gather(typed("q1", 0), typed("q2", 0.05))
+        skipped_after = finished["q1"][1]
+        self.log_test("Superseded Released Early", finished["q1"][0] is False and skipped_after < 0.1,
+                      f"- {skipped_after * 1000:.0f} ms")
+        self.log_test("Fresh Answered After Pause", finished["q2"][0] is True
+                      and finished["q2"][1] >= 0.19)
+
+    async def test_batched_updates(self):
+        """Нажатия из одной пачки getUpdates: по одному ответу на пользователя"""
+        print("\n📦 Testing Batched Updates...")
+
+        factory = UpdateFactory()
+        timeline = [(0, update) for _, update in build_typing_timeline(5, factory=factory)]
+        runtime = BotRuntime(store=StateStore(), inline=InlineDebouncer(delay=0.05))
+        async with ReplayHarness(runtime=runtime) as harness:
+            await harness.feed(timeline)
+            answers = harness.api.calls_to("answerInlineQuery")
+
+        last_ids = {}
+        for _, update in timeline:
+            last_ids[update["inline_query"]["from"]["id"]] = update["inline_query"]["id"]
+        self.log_test("One Answer Per User", len(answers) == 5, f"- {len(answers)} answers")
+        self.log_test("Answered Final Query", {a["inline_query_id"] for a in answers}
+                      == set(last_ids.values()))
+
+    async def test_simulated_typing(self):
+        """Печать с паузами короче debounce: сколько answerInlineQuery сэкономлено"""
+        print("\n⌨️ Testing Simulated Typing...")
+
+        timeline = build_typing_timeline(20, interval=0.02)
+        baseline = BotRuntime(store=StateStore())
+        async with ReplayHarness(runtime=baseline) as harness:
+            baseline_calls = await harness.feed(timeline)
+
+        debounced = BotRuntime(store=StateStore(), inline=InlineDebouncer(delay=0.05))
+        async with ReplayHarness(runtime=debounced) as harness:
+            debounced_calls = await harness.feed(timeline)
+            answers = harness.api.count("answerInlineQuery")
+
+        inline = debounced.inline
+        saved = 1 - debounced_calls / baseline_calls
+        self.log_test("Baseline Answers Every Keystroke", baseline_calls == len(timeline),
+                      f"- {baseline_calls} calls for {len(timeline)} queries")
+        self.log_test("Every Query Accounted", inline.answered + inline.skipped == len(timeline)
+                      and inline.answered == answers,
+                      f"- answered {inline.answered}, skipped {inline.skipped}")
+        self.log_test("Calls Saved", saved > 0.5 and answers >= 20,
+                      f"- {debounced_calls} vs {baseline_calls} calls ({saved:.0%} saved)")
+
+    async def run_all_tests(self):
+        """Run all debounce tests"""
+        print("🚀 Starting Inline Debounce Testing")
+        print("=" * 50)
+
+        logging.disable(logging.INFO)
+        await self.test_latest_wins()
+        await self.test_debounce_delay()
+        await self.test_batched_updates()
+        await self.test_simulated_typing()
+        logging.disable(logging.NOTSET)
+
+        print("\n" + "=" * 50)
+        print(f"📊 Test Results: {self.tests_passed}/{self.tests_run} tests passed")
+
+        if self.tests_passed == self.tests_run:
+            print("🎉 All debounce tests passed!")
+            return 0
+        else:
+            failed_tests = self.tests_run - self.tests_passed
+            print(f"⚠️ {failed_tests} test(s) failed. Please review the issues above.")
+            return 1
+
+
+async def main():
+    """Main testing function"""
+    tester = DebounceTester()
+    return await tester.run_all_tests()
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
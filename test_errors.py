@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""
+Тестирование сводки ошибок: классификация по типу и методу Bot API, счетчики групп,
+ограниченный объем лога при потоке смешанных ошибок в реплее, образец апдейта и /stats
+"""
+
+import asyncio
+import logging
+import sys
+
+from telegram.error import BadRequest, Forbidden, NetworkError, RetryAfter, TimedOut
+from telegram.ext import MessageHandler, filters
+
+from breaker import CircuitOpen
+from errors import ErrorAggregator, classify, snapshot
+from fake_api import FakeTelegramAPI
+from metrics import format_stats
+from persistence import StateStore
+from replay import ReplayHarness, UpdateFactory
+from runtime import BotRuntime, timed
+
+BLOCKED_USERS = set(range(100, 140))
+
+
+async def broken_handler(update, context):
+    """Обработчик с ошибкой в коде"""
+    raise ValueError("сломанный обработчик")
+
+
+class ListHandler(logging.Handler):
+    """Собирает записи лога для проверки объема"""
+
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+
+class ErrorsTester:
+    def __init__(self):
+        self.tests_run = 0
+        self.tests_passed = 0
+
+    def log_test(self, name, success, details=""):
+        """Log test results"""
+        self.tests_run += 1
+        if success:
+            self.tests_passed += 1
+            print(f"✅ {name} - PASSED {details}")
+        else:
+            print(f"❌ {name} - FAILED {details}")
+        return success
+
+    def test_classify(self):
+        """Категории исключений Bot API и ошибок кода"""
+        print("\n🏷 Testing Classification...")
+
+        cases = {
+            "flood": RetryAfter(3),
+            "forbidden": Forbidden("bot was blocked by the user"),
+            "bad_request": BadRequest("message to edit not found"),
+            "circuit_open": CircuitOpen("sendMessage", 5),
+            "timeout": TimedOut(),
+            "network": NetworkError("Bad Gateway"),
+            "bug": KeyError("user"),
+        }
+        wrong = {category: classify(error) for category, error in cases.items() if classify(error) != category}
+        self.log_test("Categories", not wrong, f"- {wrong or len(cases)}")
+
+    async def run_replay(self, log_interval, seconds=0.0, messages=600):
+        """Реплей личных сообщений с флудом, заблокированными чатами и ошибкой в коде"""
+        factory = UpdateFactory()
+        api = FakeTelegramAPI(flood_limit=20)
+        api.blocked = set(BLOCKED_USERS)
+        errors = ErrorAggregator(log_interval=log_interval, snapshot_chars=200)
+        runtime = BotRuntime(store=StateStore(), errors=errors)
+        records = ListHandler()
+        error_logger = logging.getLogger("errors")
+        error_logger.addHandler(records)
+        error_logger.propagate = False
+        try:
+            async with ReplayHarness(api=api, runtime=runtime) as harness:
+                harness.application.add_handler(
+                    MessageHandler(filters.Regex("^сломать$"), timed(broken_handler)), group=-5)
+                for index in range(messages):
+                    user_id = 100 + index % 200
+                    text = "сломать" if index % 10 == 0 else "/start"
+                    await harness.process(factory.message(text, "private", user_id=user_id))
+                    if seconds:
+                        await asyncio.sleep(seconds / messages)
+                stats = format_stats(runtime)
+        finally:
+            error_logger.removeHandler(records)
+            error_logger.propagate = True
+        return runtime, records.records, stats
+
+    async def test_bounded_log(self):
+        """Сотни ошибок - по одной записи лога на группу"""
+        print("\n📉 Testing Bounded Log Volume...")
+
+        runtime, records, stats = await self.run_replay(log_interval=60)
+        errors = runtime.errors
+        groups = {(group.error_type, group.method): group for group in errors.groups.values()}
+        flood = groups.get(("RetryAfter", "sendMessage"))
+        blocked = groups.get(("Forbidden", "sendMessage"))
+        bug = groups.get(("ValueError", "-"))
+
+        self.log_test("Errors Counted", errors.total == runtime.metrics.errors and errors.total >= 300,
+                      f"- {errors.total} errors in {len(groups)} groups")
+        self.log_test("Grouped By Type And Method", flood and blocked and bug
+                      and flood.category == "flood" and blocked.category == "forbidden" and bug.category == "bug",
+                      f"- {sorted(group.name for group in groups.values())}")
+        self.log_test("Handler Recorded", blocked and blocked.handler == "start_command"
+                      and bug and bug.handler == "broken_handler")
+        self.log_test("One Log Line Per Group", len(records) == len(groups) and errors.logged == len(groups),
+                      f"- {len(records)} records for {errors.total} errors")
+        bug_record = next((record for record in records if record.levelno == logging.ERROR), None)
+        self.log_test("Bug Logged With Traceback", bug_record is not None and bug_record.exc_info is not None
+                      and "broken_handler" in bug_record.getMessage())
+        sample = blocked.sample if blocked else ""
+        self.log_test("Truncated Update Snapshot", sample.startswith('{"update_id"')
+                      and len(sample) <= 201 and sample.endswith("…"), f"- {len(sample)} chars")
+        self.log_test("Stats Line", f"всего {errors.total}" in stats and "flood RetryAfter/sendMessage" in stats,
+                      f"- {stats.splitlines()[-4:]}")
+
+    async def test_periodic_summary(self):
+        """Повторы пишутся сводкой не чаще раза в интервал"""
+        print("\n🔁 Testing Rate-Limited Summaries...")
+
+        runtime, records, _ = await self.run_replay(log_interval=0.25, seconds=1.0, messages=300)
+        errors = runtime.errors
+        summaries = [record for record in records if "повторилась" in record.getMessage()]
+        # Каждая группа: первая запись и не больше одной сводки на интервал
+        bound = len(errors.groups) * (1 + int(1.5 / 0.25))
+        self.log_test("Summaries Written", summaries and "апдейт: {" in summaries[0].getMessage(),
+                      f"- {len(summaries)} summaries")
+        self.log_test("Volume Bounded By Interval", len(records) <= bound and len(records) < errors.total / 3,
+                      f"- {len(records)} records for {errors.total} errors (bound {bound})")
+        counted = sum(group.count for group in errors.groups.values())
+        self.log_test("Counters Survive Sampling", counted == errors.total)
+
+    def test_overflow(self):
+        """Групп не больше max_groups; апдейт без to_dict и без апдейта"""
+        print("\n🧺 Testing Group Limit...")
+
+        errors = ErrorAggregator(max_groups=3)
+        logging.disable(logging.CRITICAL)
+        for index in range(50):
+            error = BadRequest(f"ошибка {index}")
+            error.api_method = f"method{index}"
+            errors.record(error)
+        logging.disable(logging.NOTSET)
+        self.log_test("Groups Capped", len(errors.groups) == 4 and errors.total == 50
+                      and sum(group.count for group in errors.groups.values()) == 50, f"- {len(errors.groups)} groups")
+        self.log_test("Snapshot Without Update", snapshot(None) == "-")
+
+    async def run_all_tests(self):
+        """Run all error aggregation tests"""
+        print("🚀 Starting Error Aggregation Testing")
+        print("=" * 50)
+
+        logging.disable(logging.INFO)
+        self.test_classify()
+        await self.test_bounded_log()
+        await self.test_periodic_summary()
+        self.test_overflow()
+        logging.disable(logging.NOTSET)
+
+        print("\n" + "=" * 50)
+        print(f"📊 Test Results: {self.tests_passed}/{self.tests_run} tests passed")
+
+        if self.tests_passed == self.tests_run:
+            print("🎉 All error aggregation tests passed!")
+            return 0
+        else:
+            failed_tests = self.tests_run - self.tests_passed
+            print(f"⚠️ {failed_tests} test(s) failed. Please review the issues above.")
+            return 1
+
+
+async def main():
+    """Main testing function"""
+    tester = ErrorsTester()
+    return await tester.run_all_tests()
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
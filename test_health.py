@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+"""
+Тестирование проверок здоровья: /readyz и /healthz бота, опрашивающего эмулятор Bot API,
+при недоступности API и после восстановления, пороги очередей и статус manage_bot.py
+"""
+
+import asyncio
+import contextlib
+import io
+import json
+import logging
+import sys
+
+from config import Config
+from bot import BuddahBaseBot
+from fake_api import FAKE_BOT_TOKEN, FakeTelegramAPI
+from health import HealthCheck, HealthServer, PollingTracker
+from loop_monitor import LoopMonitor
+from manage_bot import BotManager
+from persistence import StateStore
+from runtime import BotRuntime
+
+
+async def http_get(port, path, method="GET"):
+    """(статус, JSON-тело) ответа сервера проверок"""
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(f"{method} {path} HTTP/1.1\r\nHost: localhost\r\nConnection: close\r\n\r\n".encode())
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    head, _, body = response.partition(b"\r\n\r\n")
+    status = int(head.split(b" ", 2)[1])
+    return status, json.loads(body) if body else None
+
+
+async def wait_for_status(port, path, status, timeout=10.0):
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while True:
+        result = await http_get(port, path)
+        if result[0] == status or loop.time() > deadline:
+            return result
+        await asyncio.sleep(0.05)
+
+
+class BrokenRequest(FakeTelegramAPI):
+    """Транспорт, у которого обрывается соединение"""
+
+    async def do_request(self, url, method, request_data=None, **kwargs):
+        raise ConnectionResetError("connection reset by peer")
+
+
+class HealthTester:
+    def __init__(self):
+        self.tests_run = 0
+        self.tests_passed = 0
+
+    def log_test(self, name, success, details=""):
+        """Log test results"""
+        self.tests_run += 1
+        if success:
+            self.tests_passed += 1
+            print(f"✅ {name} - PASSED {details}")
+        else:
+            print(f"❌ {name} - FAILED {details}")
+        return success
+
+    async def test_outage(self):
+        """Недоступность Bot API переключает готовность, восстановление возвращает ее"""
+        print("\n🩺 Testing API Outage...")
+
+        api = FakeTelegramAPI()
+        monitor = LoopMonitor(interval=0.02, slow_threshold=0.2)
+        bot = BuddahBaseBot(token=FAKE_BOT_TOKEN, request=api,
+                            runtime=BotRuntime(store=StateStore(), monitor=monitor))
+        await bot.initialize()
+        await bot.runtime.start()
+        await bot.application.initialize()
+        await bot.application.start()
+        await bot.application.updater.start_polling(drop_pending_updates=True)
+        check = HealthCheck(bot.runtime, bot.polling, poll_max_age=0.3, stuck_seconds=1.5)
+        server = HealthServer({"bot": check})
+        await server.start(port=0)
+        try:
+            await asyncio.sleep(0.1)
+            ready = await http_get(server.port, "/readyz")
+            alive = await http_get(server.port, "/healthz")
+
+            api.outage = True
+            not_ready = await wait_for_status(server.port, "/readyz", 503, timeout=3.0)
+            still_alive = await http_get(server.port, "/healthz")
+            stuck = await wait_for_status(server.port, "/healthz", 503, timeout=5.0)
+
+            api.outage = False
+            recovered = await wait_for_status(server.port, "/readyz", 200)
+            healed = await http_get(server.port, "/healthz")
+            requests = server.requests
+        finally:
+            await server.stop()
+            await bot.stop()
+
+        checks = ready[1]["bots"]["bot"]["checks"]
+        self.log_test("Ready While Polling", ready[0] == 200 and alive[0] == 200 and ready[1]["ready"],
+                      f"- {ready[0]}, polls {checks['polling']['polls']}")
+        self.log_test("Body Has All Checks", set(checks) == {"polling", "loop", "outbound", "updates"}
+                      and checks["loop"]["lag_ms"] >= 0 and checks["polling"]["last_success_ago"] < 0.3,
+                      f"- {sorted(checks)}")
+        polling = not_ready[1]["bots"]["bot"]["checks"]["polling"]
+        self.log_test("Outage Flips Readiness", not_ready[0] == 503 and not polling["ok"]
+                      and polling["failures"] >= 1 and polling["last_error"] == "HTTP 502",
+                      f"- {not_ready[0]}, {polling['failures']} failures, {polling['last_error']}")
+        self.log_test("Alive During Short Outage", still_alive[0] == 200)
+        self.log_test("Stuck Polling Not Alive", stuck[0] == 503 and not stuck[1]["alive"], f"- {stuck[0]}")
+        polling = recovered[1]["bots"]["bot"]["checks"]["polling"]
+        self.log_test("Recovery Restores Readiness", recovered[0] == 200 and healed[0] == 200
+                      and polling["failures"] == 0 and polling["last_error"] is None,
+                      f"- {recovered[0]} / {healed[0]}")
+        self.log_test("Requests Counted", requests >= 6, f"- {requests}")
+
+    async def test_thresholds(self):
+        """Исходящие в полете, очередь апдейтов и задержка цикла выше порогов"""
+        print("\n📏 Testing Thresholds...")
+
+        runtime = BotRuntime(monitor=LoopMonitor())
+        check = HealthCheck(runtime, max_outbound=10, max_backlog=50, max_lag=0.5)
+        states = {"idle": check.evaluate()}
+        runtime.metrics.outbound_in_flight = 10
+        states["outbound"] = check.evaluate()
+        runtime.metrics.outbound_in_flight = 0
+        runtime.metrics.backlog = 50
+        states["backlog"] = check.evaluate()
+        runtime.metrics.backlog = 0
+        runtime.monitor.last_lag = 0.8
+        states["lag"] = check.evaluate()
+
+        self.log_test("Idle Ready", states["idle"][:2] == (True, True) and "polling" not in states["idle"][2])
+        for name, key in (("outbound", "outbound"), ("backlog", "updates"), ("lag", "loop")):
+            alive, ready, checks = states[name]
+            self.log_test(f"{name.title()} Not Ready", alive and not ready and not checks[key]["ok"]
+                          and all(result["ok"] for other, result in checks.items() if other != key),
+                          f"- {checks[key]}")
+
+    async def test_tracker(self):
+        """Обрыв соединения на getUpdates - ошибка; остальные методы не учитываются"""
+        print("\n📡 Testing Polling Tracker...")
+
+        tracker = PollingTracker(BrokenRequest())
+        url = f"https://api.telegram.org/bot{FAKE_BOT_TOKEN}"
+        raised = False
+        try:
+            await tracker.do_request(f"{url}/getUpdates", "POST")
+        except ConnectionResetError:
+            raised = True
+        with contextlib.suppress(ConnectionResetError):
+            await tracker.do_request(f"{url}/sendMessage", "POST")
+        self.log_test("Exception Passed Through", raised)
+        self.log_test("Only getUpdates Tracked", tracker.failures == 1 and tracker.polls == 0
+                      and tracker.last_error.startswith("ConnectionResetError"), f"- {tracker.last_error}")
+
+    async def test_http(self):
+        """Неизвестный путь - 404, запись - 405, HEAD без тела"""
+        print("\n🌐 Testing HTTP Surface...")
+
+        server = HealthServer({"bot": HealthCheck(BotRuntime())})
+        await server.start(port=0)
+        try:
+            missing = await http_get(server.port, "/metrics")
+            post = await http_get(server.port, "/readyz", method="POST")
+            head = await http_get(server.port, "/readyz", method="HEAD")
+            query = await http_get(server.port, "/healthz?verbose=1")
+        finally:
+            await server.stop()
+
+        self.log_test("Unknown Path 404", missing[0] == 404)
+        self.log_test("POST 405", post[0] == 405)
+        self.log_test("HEAD Without Body", head == (200, None))
+        self.log_test("Query String Ignored", query[0] == 200 and query[1]["alive"])
+
+    async def test_manage_status(self):
+        """manage_bot.py status читает /readyz и печатает проверки"""
+        print("\n🛠 Testing manage_bot Readiness...")
+
+        runtime = BotRuntime()
+        server = HealthServer({"bot": HealthCheck(runtime, max_backlog=5)})
+        await server.start(port=0)
+        port = Config.HEALTH_PORT
+        Config.HEALTH_PORT = server.port
+        manager = BotManager()
+        try:
+            output = io.StringIO()
+            with contextlib.redirect_stdout(output):
+                ready = await asyncio.to_thread(manager.readiness)
+                runtime.metrics.backlog = 7
+                not_ready = await asyncio.to_thread(manager.readiness)
+            Config.HEALTH_PORT = 0
+            disabled = manager.readiness()
+        finally:
+            Config.HEALTH_PORT = port
+            await server.stop()
+
+        text = output.getvalue()
+        self.log_test("Ready Reported", ready is True and "✅ Готов" in text)
+        self.log_test("Not Ready Reported", not_ready is False and "❌ bot/updates: backlog=7" in text,
+                      f"- {text.splitlines()[-2:]}")
+        self.log_test("Disabled Skipped", disabled is None)
+
+    async def run_all_tests(self):
+        """Run all health check tests"""
+        print("🚀 Starting Health Check Testing")
+        print("=" * 50)
+
+        logging.disable(logging.ERROR)
+        await self.test_outage()
+        await self.test_thresholds()
+        await self.test_tracker()
+        await self.test_http()
+        await self.test_manage_status()
+        logging.disable(logging.NOTSET)
+
+        print("\n" + "=" * 50)
+        print(f"📊 Test Results: {self.tests_passed}/{self.tests_run} tests passed")
+
+        if self.tests_passed == self.tests_run:
+            print("🎉 All health check tests passed!")
+            return 0
+        else:
+            failed_tests = self.tests_run - self.tests_passed
+            print(f"⚠️ {failed_tests} test(s) failed. Please review the issues above.")
+            return 1
+
+
+async def main():
+    """Main testing function"""
+    tester = HealthTester()
+    return await tester.run_all_tests()
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Тестирование монитора цикла событий: блокирующий обработчик в реплее, блокировка
+вне обработчиков, гистограмма задержки в /stats и общий монитор для нескольких ботов
+"""
+
+import asyncio
+import logging
+import sys
+import time
+
+from telegram.ext import MessageHandler, filters
+
+from loop_monitor import LoopMonitor
+from metrics import format_stats
+from persistence import StateStore
+from replay import ReplayHarness, UpdateFactory, build_corpus
+from runtime import BotRuntime, timed
+
+
+async def blocking_handler(update, context):
+    """Обработчик с синхронным вызовом, который останавливает цикл событий"""
+    time.sleep(0.3)
+
+
+class LoopMonitorTester:
+    def __init__(self):
+        self.tests_run = 0
+        self.tests_passed = 0
+
+    def log_test(self, name, success, details=""):
+        """Log test results"""
+        self.tests_run += 1
+        if success:
+            self.tests_passed += 1
+            print(f"✅ {name} - PASSED {details}")
+        else:
+            print(f"❌ {name} - FAILED {details}")
+        return success
+
+    async def test_blocking_handler(self):
+        """Блокирующий обработчик: запись со стеком, обработчиком и апдейтом"""
+        print("\n🐢 Testing Blocking Handler...")
+
+        factory = UpdateFactory()
+        corpus = build_corpus(200, factory=factory)
+        blocking = factory.message("блок", "private", user_id=42)
+        monitor = LoopMonitor(interval=0.02, slow_threshold=0.1)
+        runtime = BotRuntime(store=StateStore(), monitor=monitor)
+        async with ReplayHarness(runtime=runtime) as harness:
+            harness.application.add_handler(
+                MessageHandler(filters.Regex("^блок$"), timed(blocking_handler)), group=-5)
+            await harness.replay(corpus)
+            before = monitor.slow_total
+            await harness.process(blocking)
+            await asyncio.sleep(0.1)
+            stats = format_stats(runtime)
+
+        record = monitor.slow[-1] if monitor.slow else {}
+        self.log_test("Normal Replay Not Flagged", before == 0, f"- {before} records")
+        self.log_test("Blocking Detected", monitor.slow_total == 1 and record.get("duration_ms", 0) >= 250,
+                      f"- {record.get('duration_ms')} ms")
+        self.log_test("Handler And Update", record.get("handler") == "blocking_handler"
+                      and record.get("update_id") == blocking["update_id"],
+                      f"- {record.get('handler')} / {record.get('update_id')}")
+        self.log_test("Stack Captured", any(line.endswith("in blocking_handler") and "test_loop_monitor.py" in line
+                                            for line in record.get("stack", [])),
+                      f"- {record.get('stack', ['?'])[-1]}")
+        self.log_test("Lag Histogram", monitor.lag.max_ms >= 250 and monitor.lag.total_count > 5,
+                      f"- max {monitor.lag.max_ms:.0f} ms over {monitor.lag.total_count} ticks")
+        self.log_test("Stats Line", "🐢 Цикл событий" in stats and "blocking_handler" in stats
+                      and f"update {blocking['update_id']}" in stats)
+        self.log_test("Active Handlers Cleared", not monitor._active)
+
+    async def test_outside_handlers(self):
+        """Блокировка в колбэке цикла вне обработчиков и короткая блокировка ниже порога"""
+        print("\n⏳ Testing Blocking Outside Handlers...")
+
+        monitor = LoopMonitor(interval=0.02, slow_threshold=0.1)
+        await monitor.start()
+        try:
+            loop = asyncio.get_running_loop()
+            loop.call_soon(time.sleep, 0.06)
+            await asyncio.sleep(0.1)
+            short = monitor.slow_total
+            short_lag = monitor.lag.max_ms
+            loop.call_soon(time.sleep, 0.25)
+            await asyncio.sleep(0.1)
+        finally:
+            await monitor.stop()
+
+        record = monitor.slow[-1] if monitor.slow else {}
+        self.log_test("Short Block Only In Histogram", short == 0 and short_lag >= 35,
+                      f"- max lag {short_lag:.0f} ms")
+        self.log_test("Callback Block Detected", monitor.slow_total == 1 and record.get("handler") is None
+                      and record.get("duration_ms", 0) >= 200, f"- {record.get('duration_ms')} ms")
+
+    async def test_shared(self):
+        """Общий монитор: работает, пока его не остановит последний бот"""
+        print("\n🤝 Testing Shared Monitor...")
+
+        monitor = LoopMonitor(interval=0.01, slow_threshold=0.1)
+        first = BotRuntime(monitor=monitor)
+        second = BotRuntime(monitor=monitor)
+        await first.start()
+        await second.start()
+        ticker = monitor._ticker
+        await first.stop()
+        await asyncio.sleep(0.05)
+        running = not ticker.done() and monitor._watchdog.is_alive()
+        await second.stop()
+        self.log_test("Runs Until Last Stop", running and ticker.done() and not monitor._watchdog.is_alive())
+
+    async def test_disabled(self):
+        """Без монитора обработчики работают как раньше, /stats без строки цикла"""
+        print("\n⏸ Testing Monitor Disabled...")
+
+        factory = UpdateFactory()
+        runtime = BotRuntime(store=StateStore())
+        async with ReplayHarness(runtime=runtime) as harness:
+            await harness.process(factory.message("привет", "private", user_id=5))
+            stats = format_stats(runtime)
+        self.log_test("No Monitor Line", "Цикл событий" not in stats
+                      and "handle_message" in runtime.metrics.handlers)
+
+    async def run_all_tests(self):
+        """Run all loop monitor tests"""
+        print("🚀 Starting Loop Monitor Testing")
+        print("=" * 50)
+
+        logging.disable(logging.WARNING)
+        await self.test_blocking_handler()
+        await self.test_outside_handlers()
+        await self.test_shared()
+        await self.test_disabled()
+        logging.disable(logging.NOTSET)
+
+        print("\n" + "=" * 50)
+        print(f"📊 Test Results: {self.tests_passed}/{self.tests_run} tests passed")
+
+        if self.tests_passed == self.tests_run:
+            print("🎉 All loop monitor tests passed!")
+            return 0
+        else:
+            failed_tests = self.tests_run - self.tests_passed
+            print(f"⚠️ {failed_tests} test(s) failed. Please review the issues above.")
+            return 1
+
+
+async def main():
+    """Main testing function"""
+    tester = LoopMonitorTester()
+    return await tester.run_all_tests()
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+Тестирование скомпилированного матчера и кэша запуска
+"""
+
+import asyncio
+import json
+import logging
+import os
+import sys
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+from config import Config
+from matcher import (
+    INTENT_ENGAGEMENT, INTENT_FILES, INTENT_JOIN, KeywordMatcher, Precomputed,
+    config_keywords, fingerprint, load_precomputed,
+)
+from messages import BotMessages
+from replay import GROUP_CHATTER_TEXTS, GROUP_TRIGGER_TEXTS, PRIVATE_TEXTS
+
+
+def legacy_classify(text):
+    """Прежняя логика handle_message: три прохода any() с приоритетом файлов"""
+    if any(keyword in text for keyword in Config.FILES_KEYWORDS):
+        return INTENT_FILES
+    if any(keyword in text for keyword in Config.JOIN_KEYWORDS):
+        return INTENT_JOIN
+    if any(keyword in text for keyword in Config.ENGAGEMENT_KEYWORDS):
+        return INTENT_ENGAGEMENT
+    return None
+
+
+class WarningCounter(logging.Handler):
+    def __init__(self):
+        super().__init__(logging.WARNING)
+        self.count = 0
+
+    def emit(self, record):
+        self.count += 1
+
+
+def rebuild_cache(path, admin_contact):
+    """Сборка кэша в отдельном процессе (как при одновременном запуске шардов);
+    возвращает число предупреждений о поврежденном или несохраненном кэше"""
+    counter = WarningCounter()
+    logging.getLogger("matcher").addHandler(counter)
+    load_precomputed(path, admin_contact=admin_contact)
+    return counter.count
+
+
+class MatcherTester:
+    def __init__(self):
+        self.tests_run = 0
+        self.tests_passed = 0
+
+    def log_test(self, name, success, details=""):
+        """Log test results"""
+        self.tests_run += 1
+        if success:
+            self.tests_passed += 1
+            print(f"✅ {name} - PASSED {details}")
+        else:
+            print(f"❌ {name} - FAILED {details}")
+        return success
+
+    def test_matches_legacy_logic(self):
+        """Матчер дает те же интенты, что и прежние проверки any()"""
+        print("\n🔍 Testing Matcher Equivalence...")
+
+        matcher = KeywordMatcher.from_keywords(config_keywords())
+        texts = PRIVATE_TEXTS + GROUP_TRIGGER_TEXTS + GROUP_CHATTER_TEXTS + [
+            "дайте файлик как вступить", "email рассылка", "", "veo",
+            "поделитесь промптами как попасть", "скачать базу", "ии и нейросеть",
+        ]
+        texts += Config.FILES_KEYWORDS + Config.JOIN_KEYWORDS + Config.ENGAGEMENT_KEYWORDS
+
+        mismatches = [text for text in texts if matcher.classify(text) != legacy_classify(text)]
+        self.log_test("Same Intents As any()", not mismatches, f"- {len(texts)} texts, mismatches: {mismatches}")
+        self.log_test("Files Priority", matcher.classify("дайте файлик как вступить") == INTENT_FILES)
+        self.log_test("No Trigger", matcher.classify("всем привет") is None)
+
+    def test_rendered_templates(self):
+        """Отрендеренные шаблоны совпадают с format_message"""
+        print("\n📝 Testing Rendered Templates...")
+
+        precomputed = Precomputed.build(admin_contact="testadmin")
+        for name in ("MAIN_INFO_MESSAGE", "FILES_REQUEST_MESSAGE", "ENGAGEMENT_MESSAGE"):
+            template = getattr(BotMessages, name)
+            expected = BotMessages.format_message(template, "testadmin")
+            self.log_test(f"Rendered {name}", precomputed.render(template) == expected)
+
+        self.log_test("Unknown Template Fallback",
+                      precomputed.render("пиши @{admin_contact}") == "пиши @testadmin")
+
+    def test_startup_cache(self):
+        """Кэш сохраняется, переиспользуется и пересобирается при изменениях"""
+        print("\n💾 Testing Startup Cache...")
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "startup_cache.json")
+
+            first = load_precomputed(path, admin_contact="testadmin")
+            self.log_test("Cache File Written", os.path.exists(path))
+
+            mtime = os.path.getmtime(path)
+            second = load_precomputed(path, admin_contact="testadmin")
+            self.log_test("Cache Reused", os.path.getmtime(path) == mtime
+                          and second.rendered == first.rendered)
+            self.log_test("Cached Matcher Works", second.classify("как вступить") == INTENT_JOIN)
+
+            third = load_precomputed(path, admin_contact="otheradmin")
+            self.log_test("Cache Invalidated On Change",
+                          "otheradmin" in third.render(BotMessages.ENGAGEMENT_MESSAGE))
+
+            with open(path, "w", encoding="utf-8") as f:
+                f.write("{broken")
+            fourth = load_precomputed(path, admin_contact="testadmin")
+            self.log_test("Corrupted Cache Rebuilt", fourth.classify("скинь файл") == INTENT_FILES)
+
+    def test_concurrent_rebuild(self):
+        """Одновременные пересборки кэша (процессы sharding.py) не портят файл"""
+        print("\n🧩 Testing Concurrent Cache Rebuilds...")
+
+        contacts = [f"admin{i}" for i in range(8)]
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "startup_cache.json")
+            with ProcessPoolExecutor(4) as pool:
+                warnings = sum(sum(pool.map(rebuild_cache, [path] * len(contacts), contacts))
+                               for _ in range(5))
+            with open(path, encoding="utf-8") as f:
+                cached = json.load(f)
+            winner = next((contact for contact in contacts
+                           if cached.get("fingerprint") == fingerprint(config_keywords(), contact)), None)
+            reused = winner is not None and load_precomputed(path, admin_contact=winner).from_cache
+            leftovers = [name for name in os.listdir(tmp) if name.endswith(".tmp")]
+            mode = os.stat(path).st_mode & 0o777
+
+        self.log_test("Cache File Intact", reused and warnings == 0,
+                      f"- written by {winner}, {warnings} failed saves")
+        self.log_test("No Temporary Files Left", not leftovers and mode == 0o644, f"- {leftovers}, {oct(mode)}")
+
+    async def run_all_tests(self):
+        """Run all matcher tests"""
+        print("🚀 Starting Matcher & Startup Cache Testing")
+        print("=" * 50)
+
+        self.test_matches_legacy_logic()
+        self.test_rendered_templates()
+        self.test_startup_cache()
+        self.test_concurrent_rebuild()
+
+        print("\n" + "=" * 50)
+        print(f"📊 Test Results: {self.tests_passed}/{self.tests_run} tests passed")
+
+        if self.tests_passed == self.tests_run:
+            print("🎉 All matcher tests passed!")
+            return 0
+        else:
+            failed_tests = self.tests_run - self.tests_passed
+            print(f"⚠️ {failed_tests} test(s) failed. Please review the issues above.")
+            return 1
+
+
+async def main():
+    """Main testing function"""
+    tester = MatcherTester()
+    return await tester.run_all_tests()
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
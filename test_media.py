@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+Тестирование реестра медиафайлов: одна загрузка на файл, дальше отправка по file_id
+"""
+
+import asyncio
+import logging
+import os
+import sys
+import tempfile
+
+from telegram.error import BadRequest
+
+from fake_api import FakeTelegramAPI
+from media import MediaRegistry
+from metrics import format_stats
+from persistence import StateStore
+from replay import ReplayHarness, UpdateFactory
+from runtime import BotRuntime
+
+ASSETS = {
+    "veo_guide": {"kind": "video", "file": "veo3_guide.mp4", "caption": "🎬 Видеогайд по VEO 3"},
+    "materials": {"kind": "document", "file": "materials.pdf"},
+    "missing": {"kind": "document", "file": "missing.pdf"},
+}
+
+
+class MediaTester:
+    def __init__(self):
+        self.tests_run = 0
+        self.tests_passed = 0
+
+    def log_test(self, name, success, details=""):
+        """Log test results"""
+        self.tests_run += 1
+        if success:
+            self.tests_passed += 1
+            print(f"✅ {name} - PASSED {details}")
+        else:
+            print(f"❌ {name} - FAILED {details}")
+        return success
+
+    @staticmethod
+    def make_media_dir(tmp):
+        directory = os.path.join(tmp, "media")
+        os.makedirs(directory)
+        with open(os.path.join(directory, "veo3_guide.mp4"), "wb") as f:
+            f.write(b"\x00" * 4096)
+        with open(os.path.join(directory, "materials.pdf"), "wb") as f:
+            f.write(b"%PDF-1.4 test")
+        return directory
+
+    async def test_one_upload_per_asset(self, tmp):
+        """Много пользователей в личке: каждый файл загружается ровно один раз"""
+        print("\n📤 Testing One Upload Per Asset...")
+
+        media = MediaRegistry(ASSETS, self.make_media_dir(tmp))
+        runtime = BotRuntime(store=StateStore(), media=media)
+        factory = UpdateFactory()
+        async with ReplayHarness(runtime=runtime) as harness:
+            for user_id in range(2000, 2020):
+                await harness.process(factory.message("/info", user_id=user_id))
+                await harness.process(factory.message("где материалы", user_id=user_id))
+            api = harness.api
+            stats = format_stats(runtime)
+
+        uploads = [endpoint for endpoint, _ in api.uploads]
+        self.log_test("Exactly One Upload Per Asset", sorted(uploads) == ["sendDocument", "sendVideo"],
+                      f"- {uploads}")
+        self.log_test("Every User Got Media", api.count("sendVideo") == 20 and api.count("sendDocument") == 20)
+        self.log_test("Registry Counters", media.stats == {"uploads": 2, "cached_sends": 38, "reuploads": 0},
+                      f"- {media.stats}")
+        videos = api.calls_to("sendVideo")
+        self.log_test("Caption Sent", all(call.get("caption") == "🎬 Видеогайд по VEO 3" for call in videos))
+        self.log_test("Stats Line", "🎬 Медиа: загрузок 2" in stats)
+
+    async def test_group_and_missing(self, tmp):
+        """В группе и без файла на диске медиа не отправляется"""
+        print("\n🙈 Testing Group And Missing Files...")
+
+        media = MediaRegistry(ASSETS, self.make_media_dir(tmp))
+        runtime = BotRuntime(store=StateStore(), media=media)
+        factory = UpdateFactory()
+        async with ReplayHarness(runtime=runtime) as harness:
+            await harness.process(factory.message("/info", chat_type="supergroup"))
+            group_sends = harness.api.count("sendVideo")
+            message = await media.send(harness.application.bot, 1001, "missing")
+
+        self.log_test("No Media In Groups", group_sends == 0)
+        self.log_test("Missing File Skipped", message is None and not media.available("missing"))
+
+    async def test_concurrent_first_send(self, tmp):
+        """Одновременные первые отправки не загружают файл повторно"""
+        print("\n🏁 Testing Concurrent First Send...")
+
+        media = MediaRegistry(ASSETS, self.make_media_dir(tmp))
+        api = FakeTelegramAPI(latency=0.01)
+        runtime = BotRuntime(store=StateStore(), media=media)
+        async with ReplayHarness(api=api, runtime=runtime) as harness:
+            bot = harness.application.bot
+            await asyncio.gather(*(media.send(bot, user_id, "veo_guide") for user_id in range(10)))
+
+        self.log_test("Single Upload Under Concurrency", len(api.uploads) == 1,
+                      f"- {len(api.uploads)} uploads")
+        self.log_test("All Sends Delivered", api.count("sendVideo") == 10)
+
+    async def test_reupload_on_invalidation(self, tmp):
+        """Отозванный file_id и измененный файл приводят к одной повторной загрузке"""
+        print("\n♻️ Testing Re-upload On Invalidation...")
+
+        directory = self.make_media_dir(tmp)
+        media = MediaRegistry(ASSETS, directory)
+        async with ReplayHarness(runtime=BotRuntime(store=StateStore(), media=media)) as harness:
+            api = harness.api
+            bot = harness.application.bot
+            await media.send(bot, 1, "veo_guide")
+            api.invalidate_file_id(media.file_id("veo_guide"))
+            await media.send(bot, 2, "veo_guide")
+            await media.send(bot, 3, "veo_guide")
+            invalidated_uploads = len(api.uploads)
+
+            path = os.path.join(directory, "veo3_guide.mp4")
+            with open(path, "wb") as f:
+                f.write(b"\x01" * 8192)
+            await media.send(bot, 4, "veo_guide")
+            await media.send(bot, 5, "veo_guide")
+
+        self.log_test("Re-upload After Invalidation", invalidated_uploads == 2 and media.stats["reuploads"] == 1,
+                      f"- {invalidated_uploads} uploads")
+        self.log_test("Re-upload After File Change", len(api.uploads) == 3,
+                      f"- {len(api.uploads)} uploads")
+        self.log_test("Cached Sends Resume", media.stats["cached_sends"] == 2)
+
+        class RejectingBot:
+            async def send_video(self, **kwargs):
+                raise BadRequest("Bad Request: chat not found")
+
+        file_id = media.file_id("veo_guide")
+        try:
+            await media.send(RejectingBot(), 6, "veo_guide")
+            raised = False
+        except BadRequest:
+            raised = True
+        self.log_test("Other 400 Keeps file_id", raised and media.file_id("veo_guide") == file_id
+                      and media.stats["reuploads"] == 1)
+
+    async def test_persisted_across_restart(self, tmp):
+        """file_id переживает перезапуск бота вместе с базой состояния"""
+        print("\n💾 Testing Persistence Across Restart...")
+
+        directory = self.make_media_dir(tmp)
+        db_path = os.path.join(tmp, "state.db")
+        api = FakeTelegramAPI()
+        factory = UpdateFactory()
+
+        for user_id in (3001, 3002):
+            store = StateStore(db_path)
+            runtime = BotRuntime(store=store, media=MediaRegistry(ASSETS, directory, store))
+            async with ReplayHarness(api=api, runtime=runtime) as harness:
+                await harness.process(factory.message("/info", user_id=user_id))
+
+        self.log_test("No Upload After Restart", len(api.uploads) == 1 and api.count("sendVideo") == 2,
+                      f"- {len(api.uploads)} uploads")
+        self.log_test("Restarted Registry Used Cache", runtime.media.stats["cached_sends"] == 1)
+
+    async def run_all_tests(self):
+        """Run all media tests"""
+        print("🚀 Starting Media Registry Testing")
+        print("=" * 50)
+
+        logging.disable(logging.INFO)
+        for test in (self.test_one_upload_per_asset, self.test_group_and_missing,
+                     self.test_concurrent_first_send, self.test_reupload_on_invalidation,
+                     self.test_persisted_across_restart):
+            with tempfile.TemporaryDirectory() as tmp:
+                await test(tmp)
+        logging.disable(logging.NOTSET)
+
+        print("\n" + "=" * 50)
+        print(f"📊 Test Results: {self.tests_passed}/{self.tests_run} tests passed")
+
+        if self.tests_passed == self.tests_run:
+            print("🎉 All media tests passed!")
+            return 0
+        else:
+            failed_tests = self.tests_run - self.tests_passed
+            print(f"⚠️ {failed_tests} test(s) failed. Please review the issues above.")
+            return 1
+
+
+async def main():
+    """Main testing function"""
+    tester = MediaTester()
+    return await tester.run_all_tests()
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+"""
+Тестирование нескольких ботов в одном процессе: общие матчеры и транспорт, свои
+шаблоны, упоминания, администраторы, хранилища и метрики у каждого бота, polling
+через эмулятор Bot API
+"""
+
+import asyncio
+import json
+import logging
+import os
+import sys
+import tempfile
+
+from telegram.request import BaseRequest
+
+from fake_api import FAKE_BOT_USER, FakeTelegramAPI
+from matcher import INTENT_JOIN, config_keywords
+from multibot import BotDefinition, BotHost, SharedRequest, load_definitions
+from replay import GROUP_CHAT_ID, UpdateFactory
+
+
+def bot_user(bot_id, username):
+    return dict(FAKE_BOT_USER, id=bot_id, username=username)
+
+
+def definition(name, **extra):
+    return BotDefinition(name, f"{100000 + len(name)}:TOKEN-{name}", **extra)
+
+
+async def wait_for(condition, timeout=5.0):
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while not condition():
+        if loop.time() > deadline:
+            return False
+        await asyncio.sleep(0.01)
+    return True
+
+
+class UnauthorizedAPI(FakeTelegramAPI):
+    """Эмулятор, отвечающий 401 на любой вызов (неверный токен)"""
+
+    async def do_request(self, url, method, request_data=None, **kwargs):
+        error = {"ok": False, "error_code": 401, "description": "Unauthorized"}
+        return 401, json.dumps(error).encode("utf-8")
+
+
+class CountingRequest(BaseRequest):
+    """Транспорт, считающий открытия и закрытия пула"""
+
+    def __init__(self, api):
+        self.api = api
+        self.initialized = 0
+        self.closed = 0
+
+    async def initialize(self):
+        self.initialized += 1
+
+    async def shutdown(self):
+        self.closed += 1
+
+    async def do_request(self, *args, **kwargs):
+        return await self.api.do_request(*args, **kwargs)
+
+
+class MultiBotTester:
+    def __init__(self):
+        self.tests_run = 0
+        self.tests_passed = 0
+
+    def log_test(self, name, success, details=""):
+        """Log test results"""
+        self.tests_run += 1
+        if success:
+            self.tests_passed += 1
+            print(f"✅ {name} - PASSED {details}")
+        else:
+            print(f"❌ {name} - FAILED {details}")
+        return success
+
+    def test_definitions(self):
+        """Файл определений: токен из окружения, свои ключевые слова поверх Config"""
+        print("\n📄 Testing Bot Definitions...")
+
+        os.environ["TEST_MULTIBOT_TOKEN"] = "42:ENV-TOKEN"
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "bots.json")
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump({"bots": [
+                    {"name": "a", "token_env": "TEST_MULTIBOT_TOKEN", "keywords": {"join": ["пропуск"]}},
+                    {"name": "b", "token": "43:TOKEN", "mentions": ["@Neuro_Art_Bot"]},
+                ]}, f)
+            first, second = load_definitions(path)
+
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump({"bots": [{"name": "a", "token": "1:A"}, {"name": "a", "token": "2:A"}]}, f)
+            try:
+                load_definitions(path)
+                duplicates_rejected = False
+            except ValueError:
+                duplicates_rejected = True
+        del os.environ["TEST_MULTIBOT_TOKEN"]
+
+        keywords = first.keyword_set()
+        self.log_test("Token From Environment", first.token == "42:ENV-TOKEN" and second.token == "43:TOKEN")
+        self.log_test("Own Keywords Over Config", keywords[INTENT_JOIN] == ["пропуск"]
+                      and len(keywords) == len(config_keywords()))
+        self.log_test("Mentions Lowercased", second.mentions == ("@neuro_art_bot",))
+        self.log_test("Duplicate Names Rejected", duplicates_rejected)
+        try:
+            BotDefinition.from_dict({"name": "x"})
+            missing_token = False
+        except ValueError:
+            missing_token = True
+        self.log_test("Missing Token Rejected", missing_token)
+
+    def test_shared_matchers(self):
+        """Боты с одинаковыми исходными данными получают один матчер и шаблоны"""
+        print("\n🧩 Testing Shared Matchers...")
+
+        runtimes = [definition(f"bot{i}").build_runtime() for i in range(20)]
+        custom = definition("custom", admin_contact="other_admin").build_runtime()
+        shared = {id(runtime.precomputed) for runtime in runtimes}
+        self.log_test("Identical Bots Share Matcher", len(shared) == 1, f"- {len(shared)} instance(s) for 20 bots")
+        self.log_test("Different Bot Gets Own Matcher", id(custom.precomputed) not in shared)
+        self.log_test("Own Stores And Metrics", len({id(runtime.store) for runtime in runtimes}) == 20
+                      and len({id(runtime.metrics) for runtime in runtimes}) == 20)
+
+    async def test_polling(self):
+        """Три бота опрашивают свои эмуляторы и отвечают каждый своими шаблонами"""
+        print("\n🤖 Testing Polling Several Bots...")
+
+        apis = {
+            "buddah": FakeTelegramAPI(bot_user=bot_user(1001, "Saint_Buddah_Bot")),
+            "art": FakeTelegramAPI(bot_user=bot_user(1002, "neuro_art_bot")),
+            "code": FakeTelegramAPI(bot_user=bot_user(1003, "code_club_bot")),
+        }
+        definitions = [
+            definition("buddah", admin_ids=[7]),
+            definition("art", admin_contact="art_admin", admin_ids=[8],
+                       keywords={"join": ["хочу в клуб"]},
+                       templates={"START_MESSAGE": "🎨 Клуб Neuro Art, пишите @{admin_contact}"}),
+            definition("code", mentions=["кодбот"]),
+        ]
+        host = BotHost(definitions, request_factory=lambda item: (apis[item.name], apis[item.name]))
+        factory = UpdateFactory()
+        await host.start()
+        try:
+            runtimes = host.runtimes
+            apis["buddah"].add_updates([factory.message("/start", "private", user_id=501)])
+            apis["art"].add_updates([factory.message("/start", "private", user_id=501),
+                                     factory.message("хочу в клуб", "private", user_id=502),
+                                     factory.message("/stats", "private", user_id=7),
+                                     factory.message("/stats", "private", user_id=8)])
+            apis["code"].add_updates([factory.message("кодбот привет", "supergroup", user_id=503),
+                                      factory.message("@code_club_bot привет", "supergroup", user_id=504)])
+            delivered = await wait_for(lambda: apis["buddah"].count("sendMessage") >= 1
+                                       and apis["art"].count("sendMessage") >= 3
+                                       and apis["code"].count("sendMessage") >= 1)
+            await asyncio.sleep(0.05)
+            texts = {name: [call["text"] for call in api.calls_to("sendMessage")] for name, api in apis.items()}
+            updates = {name: runtime.metrics.updates_total for name, runtime in runtimes.items()}
+            subscribers = {name: runtime.broadcaster.subscribers for name, runtime in runtimes.items()}
+            mentions = {name: runtime.mentions for name, runtime in runtimes.items()}
+        finally:
+            await host.stop()
+
+        self.log_test("All Bots Answered", delivered, f"- {[len(sent) for sent in texts.values()]}")
+        self.log_test("Own Templates", "Buddah Base" in texts["buddah"][0]
+                      and texts["art"][0] == "🎨 Клуб Neuro Art, пишите @art_admin", f"- {texts['art'][0]!r}")
+        self.log_test("Own Keywords", "VEO 3" in texts["art"][1])
+        self.log_test("Own Admins", len(texts["art"]) == 3 and "📊" in texts["art"][2],
+                      f"- {len(texts['art'])} replies in art")
+        self.log_test("Mention Defaults To Username", mentions["buddah"] == ("@saint_buddah_bot",)
+                      and mentions["code"] == ("кодбот",))
+        self.log_test("Configured Mention Only", len(texts["code"]) == 1
+                      and apis["code"].calls_to("sendMessage")[0]["chat_id"] == GROUP_CHAT_ID)
+        self.log_test("Isolated Metrics", updates == {"buddah": 1, "art": 4, "code": 2}, f"- {updates}")
+        self.log_test("Isolated Stores", subscribers == {"buddah": 1, "art": 4, "code": 0}, f"- {subscribers}")
+
+    async def test_failed_bot(self):
+        """Бот с неверным токеном не мешает остальным; общий пул закрывается один раз"""
+        print("\n🛡 Testing Failure Isolation...")
+
+        api = FakeTelegramAPI()
+        transport = CountingRequest(api)
+        shared = SharedRequest(transport)
+        bad = SharedRequest(UnauthorizedAPI())
+        definitions = [definition("ok1"), definition("broken"), definition("ok2")]
+        host = BotHost(definitions, request_factory=lambda item: (bad, bad) if item.name == "broken"
+                       else (shared, shared))
+        await host.start(polling=False)
+        started = sorted(host.bots)
+        opened = transport.initialized
+        await host.stop()
+
+        self.log_test("Healthy Bots Started", started == ["ok1", "ok2"] and "broken" in host.failed,
+                      f"- {started}, failed {list(host.failed)}")
+        self.log_test("Shared Pool Opened Once", opened == 1 and transport.closed == 1,
+                      f"- opened {opened}, closed {transport.closed}")
+
+    async def run_all_tests(self):
+        """Run all multi-bot tests"""
+        print("🚀 Starting Multi-Bot Hosting Testing")
+        print("=" * 50)
+
+        logging.disable(logging.WARNING)
+        self.test_definitions()
+        self.test_shared_matchers()
+        await self.test_polling()
+        await self.test_failed_bot()
+        logging.disable(logging.NOTSET)
+
+        print("\n" + "=" * 50)
+        print(f"📊 Test Results: {self.tests_passed}/{self.tests_run} tests passed")
+
+        if self.tests_passed == self.tests_run:
+            print("🎉 All multi-bot tests passed!")
+            return 0
+        else:
+            failed_tests = self.tests_run - self.tests_passed
+            print(f"⚠️ {failed_tests} test(s) failed. Please review the issues above.")
+            return 1
+
+
+async def main():
+    """Main testing function"""
+    tester = MultiBotTester()
+    return await tester.run_all_tests()
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Тестирование хранилища состояния: write-behind запись, теплый старт, кулдауны
+"""
+
+import asyncio
+import os
+import sqlite3
+import sys
+import tempfile
+
+from persistence import StateStore
+from replay import GROUP_CHAT_ID, ReplayHarness, UpdateFactory
+from runtime import NS_LEAD, NS_MEMBER, BotRuntime
+
+
+def count_rows(path):
+    """Читает базу отдельным соединением, как это сделал бы другой процесс"""
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute("SELECT COUNT(*) FROM state").fetchone()[0]
+    finally:
+        conn.close()
+
+
+class PersistenceTester:
+    def __init__(self):
+        self.tests_run = 0
+        self.tests_passed = 0
+
+    def log_test(self, name, success, details=""):
+        """Log test results"""
+        self.tests_run += 1
+        if success:
+            self.tests_passed += 1
+            print(f"✅ {name} - PASSED {details}")
+        else:
+            print(f"❌ {name} - FAILED {details}")
+        return success
+
+    async def test_write_behind(self, tmp):
+        """Запись идет в память, на диск - только пакетным сбросом"""
+        print("\n💾 Testing Write-Behind Buffer...")
+
+        path = os.path.join(tmp, "state.db")
+        store = await StateStore(path, flush_interval=60).open()
+
+        for i in range(1000):
+            store.set("counter", "hits", i)
+        store.set("lead", 42, {"intents": {"join": 1}})
+
+        self.log_test("Read From Memory", store.get("counter", "hits") == 999)
+        self.log_test("Writes Coalesced", store.pending == 2, f"- {store.pending} pending keys")
+        self.log_test("Nothing On Disk Before Flush", count_rows(path) == 0)
+
+        flushed = await store.flush()
+        self.log_test("Batch Flushed", flushed == 2 and count_rows(path) == 2)
+
+        mode = sqlite3.connect(path).execute("PRAGMA journal_mode").fetchone()[0]
+        self.log_test("WAL Mode", mode.lower() == "wal", f"- {mode}")
+
+        store.delete("counter", "hits")
+        await store.close()
+        self.log_test("Delete Persisted On Close", count_rows(path) == 1)
+
+    async def test_warm_start(self, tmp):
+        """Состояние переживает перезапуск"""
+        print("\n🔥 Testing Warm Start...")
+
+        path = os.path.join(tmp, "warm.db")
+        store = await StateStore(path).open()
+        store.set("meta", "last_update_id", 777)
+        store.set("member", "-100:5", {"joins": 1})
+        await store.close()
+
+        restored = await StateStore(path).open()
+        self.log_test("Offset Restored", restored.get("meta", "last_update_id") == 777)
+        self.log_test("Member Restored", restored.get("member", "-100:5") == {"joins": 1})
+        await restored.close()
+
+    async def test_handlers_persist_state(self, tmp):
+        """Обработчики пишут лиды, участников и offset, кулдаун гасит повторы"""
+        print("\n🤖 Testing Handler State...")
+
+        path = os.path.join(tmp, "bot.db")
+        factory = UpdateFactory()
+        corpus = [
+            factory.message("как вступить?", "supergroup", 501),
+            factory.message("как вступить?", "supergroup", 501),
+            factory.message("привет", "private", 501),
+            factory.new_members([502]),
+        ]
+
+        runtime = BotRuntime(store=StateStore(path), reply_cooldown=60)
+        async with ReplayHarness(runtime=runtime) as harness:
+            await harness.replay(corpus)
+            sent = harness.api.count("sendMessage")
+
+        self.log_test("Cooldown Suppressed Repeat", runtime.cooldown_suppressed == 1
+                      and sent == 3, f"- {sent} replies")
+
+        restored = BotRuntime(store=StateStore(path), reply_cooldown=60)
+        await restored.start()
+        lead = restored.store.get(NS_LEAD, "501")
+        self.log_test("Lead Restored", lead is not None and lead["intents"].get("join") == 2
+                      and lead["private"])
+        self.log_test("Member Restored", restored.store.get(NS_MEMBER, f"{GROUP_CHAT_ID}:502") is not None)
+        self.log_test("Last Update Id Restored", restored.last_update_id == corpus[-1]["update_id"])
+        self.log_test("Cooldown Survives Restart",
+                      not restored.allow_reply(GROUP_CHAT_ID, 501, "join"))
+        await restored.stop()
+
+    async def run_all_tests(self):
+        """Run all persistence tests"""
+        print("🚀 Starting Persistence Testing")
+        print("=" * 50)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            await self.test_write_behind(tmp)
+            await self.test_warm_start(tmp)
+            await self.test_handlers_persist_state(tmp)
+
+        print("\n" + "=" * 50)
+        print(f"📊 Test Results: {self.tests_passed}/{self.tests_run} tests passed")
+
+        if self.tests_passed == self.tests_run:
+            print("🎉 All persistence tests passed!")
+            return 0
+        else:
+            failed_tests = self.tests_run - self.tests_passed
+            print(f"⚠️ {failed_tests} test(s) failed. Please review the issues above.")
+            return 1
+
+
+async def main():
+    """Main testing function"""
+    tester = PersistenceTester()
+    return await tester.run_all_tests()
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+Тестирование профилирования по запросу: /profile во время реплея, SIGUSR2,
+формат свернутых стеков и горячих функций, доступ только админам
+"""
+
+import asyncio
+import logging
+import os
+import re
+import signal
+import sys
+import tempfile
+
+from config import Config
+from persistence import StateStore
+from profiling import SamplingProfiler, install_signal_handler
+from replay import ReplayHarness, UpdateFactory, build_corpus
+from runtime import BotRuntime
+
+COLLAPSED_LINE = re.compile(r"^(\S.*) (\d+)$")
+
+
+def read_collapsed(path):
+    with open(path, "r", encoding="utf-8") as f:
+        lines = f.read().splitlines()
+    parsed = [COLLAPSED_LINE.match(line) for line in lines]
+    if not all(parsed):
+        return None
+    return [(match.group(1).split(";"), int(match.group(2))) for match in parsed]
+
+
+class ProfilingTester:
+    def __init__(self):
+        self.tests_run = 0
+        self.tests_passed = 0
+
+    def log_test(self, name, success, details=""):
+        """Log test results"""
+        self.tests_run += 1
+        if success:
+            self.tests_passed += 1
+            print(f"✅ {name} - PASSED {details}")
+        else:
+            print(f"❌ {name} - FAILED {details}")
+        return success
+
+    async def test_profile_command(self):
+        """/profile во время реплея: горячие функции бота в профиле и ответ админу"""
+        print("\n🔥 Testing /profile During Replay...")
+
+        factory = UpdateFactory()
+        corpus = build_corpus(400, factory=factory)
+        admin_ids = Config.ADMIN_IDS
+        Config.ADMIN_IDS = [1]
+        try:
+            with tempfile.TemporaryDirectory() as directory:
+                profiler = SamplingProfiler(directory=directory, interval=0.002, default_seconds=5)
+                runtime = BotRuntime(store=StateStore(), profiler=profiler)
+                async with ReplayHarness(runtime=runtime) as harness:
+                    await harness.process(factory.message("/profile 999", "private", 999), wait=False)
+                    denied = not profiler.running
+                    await harness.process(factory.message("/profile 1", "private", 1), wait=False)
+                    started = profiler.running
+                    await harness.process(factory.message("/profile", "private", 1), wait=False)
+                    # Нагрузка, пока идет профиль
+                    processed = 0
+                    while profiler.running:
+                        await harness.process(corpus[processed % len(corpus)], wait=False)
+                        processed += 1
+                        await asyncio.sleep(0)
+                    await harness.drain()
+                    calls = harness.api.calls_to("sendMessage")
+                    replies = [call["text"] for call in calls if call["chat_id"] == 1]
+                    denied = denied and not any(call["chat_id"] == 999 for call in calls)
+                profile = profiler.last
+                files = sorted(os.listdir(directory))
+                collapsed = read_collapsed(profile.paths[0]) if profile and profile.paths else None
+                with open(profile.paths[1], "r", encoding="utf-8") as f:
+                    top = f.read()
+        finally:
+            Config.ADMIN_IDS = admin_ids
+
+        self.log_test("Non-Admin Ignored", denied)
+        self.log_test("Admin Starts Profile", started and any(text.startswith("🔥 Профилирую 1 с") for text in replies),
+                      f"- {replies[:1]}")
+        self.log_test("Second Profile Refused", "🔥 Профилирование уже идет" in replies)
+        report = next((text for text in replies if text.startswith("🔥 Профиль за")), "")
+        self.log_test("Result Sent To Admin", "Горячие функции" in report and profile.paths[0] in report,
+                      f"- {processed} updates during profile")
+        self.log_test("Files Written", len(files) == 2 and files[0].endswith(".collapsed")
+                      and files[1].endswith(".txt"), f"- {files}")
+        self.log_test("Collapsed Format", collapsed is not None
+                      and sum(count for _, count in collapsed) == profile.samples and profile.samples > 50,
+                      f"- {profile.samples} samples")
+        bot_frames = [stack for stack, _ in collapsed
+                      if any(frame.startswith(("handle_message (handlers.py", "classify (matcher.py"))
+                             for frame in stack)]
+        self.log_test("Bot Handlers In Stacks", bool(bot_frames),
+                      f"- {len(bot_frames)} stacks through handlers")
+        hot = [label for label, _, _ in profile.hot()]
+        self.log_test("CPU Samples", bool(hot) and profile.load > 0.5 and not hot[0].startswith("select ("),
+                      f"- load {profile.load:.0%}, top {hot[:3]}")
+        self.log_test("Top File", top.startswith("🔥 Профиль за") and hot[0] in top)
+        self.log_test("Timer Stopped", signal.getitimer(signal.ITIMER_PROF) == (0.0, 0.0)
+                      and signal.getsignal(signal.SIGPROF) == signal.SIG_DFL)
+
+    async def test_signal(self):
+        """SIGUSR2 запускает профиль на default_seconds"""
+        print("\n📶 Testing SIGUSR2...")
+
+        if not hasattr(signal, "SIGUSR2"):
+            self.log_test("Signal Unsupported", True, "- skipped on this platform")
+            return
+        with tempfile.TemporaryDirectory() as directory:
+            profiler = SamplingProfiler(directory=directory, interval=0.005, default_seconds=0.3)
+            installed = install_signal_handler(profiler)
+            try:
+                os.kill(os.getpid(), signal.SIGUSR2)
+                await asyncio.sleep(0.05)
+                running = profiler.running
+                await profiler._task
+            finally:
+                asyncio.get_running_loop().remove_signal_handler(signal.SIGUSR2)
+            files = os.listdir(directory)
+        self.log_test("Handler Installed", installed)
+        self.log_test("Signal Starts Profile", running and profiler.last is not None
+                      and 0.3 <= profiler.last.seconds < 1.0, f"- {profiler.last.seconds:.2f} s")
+        self.log_test("Signal Profile Written", len(files) == 2, f"- {files}")
+        self.log_test("Idle Loop Has Few Samples", profiler.last.load < 0.5
+                      and profiler.last.samples < profiler.last.seconds / profiler.interval / 2,
+                      f"- load {profiler.last.load:.0%}, {profiler.last.samples} samples")
+
+    async def test_disabled(self):
+        """Без профилировщика команда отвечает, что профилирование отключено"""
+        print("\n⏸ Testing Profiling Disabled...")
+
+        factory = UpdateFactory()
+        admin_ids = Config.ADMIN_IDS
+        Config.ADMIN_IDS = [1]
+        try:
+            async with ReplayHarness(runtime=BotRuntime(store=StateStore())) as harness:
+                await harness.process(factory.message("/profile", "private", 1))
+                replies = [call["text"] for call in harness.api.calls_to("sendMessage")]
+        finally:
+            Config.ADMIN_IDS = admin_ids
+        self.log_test("Disabled Reply", replies == ["🔥 Профилирование отключено"], f"- {replies}")
+
+    async def run_all_tests(self):
+        """Run all profiling tests"""
+        print("🚀 Starting Profiling Testing")
+        print("=" * 50)
+
+        logging.disable(logging.WARNING)
+        await self.test_profile_command()
+        await self.test_signal()
+        await self.test_disabled()
+        logging.disable(logging.NOTSET)
+
+        print("\n" + "=" * 50)
+        print(f"📊 Test Results: {self.tests_passed}/{self.tests_run} tests passed")
+
+        if self.tests_passed == self.tests_run:
+            print("🎉 All profiling tests passed!")
+            return 0
+        else:
+            failed_tests = self.tests_run - self.tests_passed
+            print(f"⚠️ {failed_tests} test(s) failed. Please review the issues above.")
+            return 1
+
+
+async def main():
+    """Main testing function"""
+    tester = ProfilingTester()
+    return await tester.run_all_tests()
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
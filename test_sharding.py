@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+"""
+Тестирование шардирования вебхуков: согласованный хеш, ключ чата апдейта, прием
+вебхука по HTTP, порядок апдейтов чата в канале процесса, обработка процессами-
+обработчиками через эмулятор Bot API и их проверки здоровья
+"""
+
+import asyncio
+import json
+import logging
+import os
+import socket
+import sys
+from collections import defaultdict
+
+from fake_api import FAKE_BOT_TOKEN, FakeTelegramAPI
+from replay import UpdateFactory
+from sharding import (KIND_HELLO, KIND_QUIT, KIND_STATS, KIND_UPDATE, HashRing, ShardRouter,
+                      WebhookReceiver, chat_key, read_frame, run_worker, shard_path, write_frame)
+
+SECRET = "test-secret"
+
+
+def http_request(body, path="/webhook", secret=SECRET, method="POST"):
+    headers = [f"{method} {path} HTTP/1.1", "Host: localhost", "Content-Type: application/json",
+               f"Content-Length: {len(body)}"]
+    if secret:
+        headers.append(f"X-Telegram-Bot-Api-Secret-Token: {secret}")
+    return ("\r\n".join(headers) + "\r\n\r\n").encode("latin-1") + body
+
+
+async def send_requests(port, requests):
+    """Отправляет запросы одним keep-alive соединением подряд; статусы ответов"""
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(b"".join(requests))
+    await writer.drain()
+    statuses = []
+    try:
+        for _ in requests:
+            response = await reader.readuntil(b"\r\n\r\n")
+            statuses.append(int(response.split(b" ", 2)[1]))
+    except asyncio.IncompleteReadError:
+        pass
+    writer.close()
+    return statuses
+
+
+async def http_get(port, path):
+    """(статус, JSON-тело) ответа на GET"""
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(f"GET {path} HTTP/1.1\r\nHost: localhost\r\nConnection: close\r\n\r\n".encode("latin-1"))
+    response = await reader.read()
+    writer.close()
+    head, _, body = response.partition(b"\r\n\r\n")
+    return int(head.split(b" ", 2)[1]), json.loads(body)
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class RecordingRouter:
+    def __init__(self):
+        self.updates = []
+
+    async def route(self, update, body=None):
+        self.updates.append(update)
+        return 0
+
+
+class ShardingTester:
+    def __init__(self):
+        self.tests_run = 0
+        self.tests_passed = 0
+
+    def log_test(self, name, success, details=""):
+        """Log test results"""
+        self.tests_run += 1
+        if success:
+            self.tests_passed += 1
+            print(f"✅ {name} - PASSED {details}")
+        else:
+            print(f"❌ {name} - FAILED {details}")
+        return success
+
+    def test_ring(self):
+        """Равномерное распределение и переезд ~1/N чатов при добавлении процесса"""
+        print("\n💍 Testing Consistent Hash Ring...")
+
+        keys = [-1000000000000 - i for i in range(50000)] + list(range(1, 50001))
+        ring = HashRing(4)
+        counts = [0] * 4
+        for key in keys:
+            counts[ring.node(key)] += 1
+        self.log_test("Balanced", max(counts) / min(counts) < 1.35, f"- {counts}")
+        self.log_test("Deterministic", all(HashRing(4).node(key) == ring.node(key) for key in keys[:1000]))
+
+        grown = HashRing(5)
+        moved = [key for key in keys if grown.node(key) != ring.node(key)]
+        share = len(moved) / len(keys)
+        self.log_test("Minimal Remapping", 0.12 < share < 0.28 and all(grown.node(key) == 4 for key in moved),
+                      f"- {share:.1%} of chats moved")
+
+    def test_chat_key(self):
+        """Ключ шардирования: чат сообщения, иначе пользователь"""
+        print("\n🔑 Testing Chat Key...")
+
+        factory = UpdateFactory()
+        group = factory.message("привет", "supergroup", user_id=5, chat_id=-100777)
+        inline = factory.inline_query("промпты", user_id=42)
+        callback = factory.callback_query("verify", user_id=9, chat_id=-100555)
+        inline_callback = {"update_id": 7, "callback_query": {"id": "1", "from": {"id": 77}, "chat_instance": "x"}}
+        member = {"update_id": 8, "my_chat_member": {"chat": {"id": -100999}, "from": {"id": 1}}}
+        self.log_test("Message Chat", chat_key(group) == -100777)
+        self.log_test("Inline Query By User", chat_key(inline) == 42)
+        self.log_test("Callback By Message Chat", chat_key(callback) == -100555 and chat_key(inline_callback) == 77)
+        self.log_test("Member Update Chat", chat_key(member) == -100999)
+        self.log_test("Unknown Update By Id", chat_key({"update_id": 123}) == 123)
+        self.log_test("Shard State Path", shard_path("bot_state.db", 2) == "bot_state.shard2.db"
+                      and shard_path("", 2) == "")
+
+    async def test_receiver(self):
+        """HTTP-прием: секрет, путь, разбор JSON, лимит размера, keep-alive"""
+        print("\n🌐 Testing Webhook Receiver...")
+
+        router = RecordingRouter()
+        receiver = WebhookReceiver(router, "/webhook", SECRET, max_body=4096)
+        await receiver.start("127.0.0.1", 0)
+        factory = UpdateFactory()
+        update = json.dumps(factory.message("как вступить", "private", user_id=3)).encode()
+        statuses = await send_requests(receiver.port, [
+            http_request(update),
+            http_request(update, secret="wrong"),
+            http_request(b"{not json"),
+            http_request(update, path="/other"),
+            http_request(b"", method="GET"),
+            http_request(update),
+        ])
+        oversized = await send_requests(receiver.port, [http_request(b"x" * 5000), http_request(update)])
+        await receiver.stop()
+
+        self.log_test("Statuses", statuses == [200, 403, 400, 404, 404, 200], f"- {statuses}")
+        self.log_test("Keep-Alive Pipelining", len(router.updates) == 2
+                      and router.updates[0]["message"]["text"] == "как вступить")
+        self.log_test("Oversized Body Closes Connection", oversized == [413], f"- {oversized}")
+        self.log_test("Rejected Counted", receiver.stats == {"accepted": 2, "rejected": 2}, f"- {receiver.stats}")
+
+    async def test_routing_order(self):
+        """Апдейты чата приходят в один процесс в порядке приема"""
+        print("\n🧭 Testing Per-Chat Ordering...")
+
+        workers = 3
+        router = ShardRouter(workers, spawn=False)
+        seen = defaultdict(list)
+
+        async def fake_worker(index):
+            reader, writer = await asyncio.open_unix_connection(router.socket_path)
+            write_frame(writer, KIND_HELLO, str(index).encode())
+            received = 0
+            while True:
+                kind, payload = await read_frame(reader)
+                if kind == KIND_UPDATE:
+                    update = json.loads(payload)
+                    seen[chat_key(update)].append((index, update["update_id"]))
+                    received += 1
+                elif kind == KIND_STATS:
+                    write_frame(writer, KIND_STATS, json.dumps({"worker": index, "received": received}).encode())
+                elif kind == KIND_QUIT:
+                    writer.close()
+                    return
+
+        start = asyncio.create_task(router.start())
+        await asyncio.sleep(0.05)
+        fakes = [asyncio.create_task(fake_worker(index)) for index in range(workers)]
+        await start
+
+        factory = UpdateFactory()
+        count = 3000
+        for i in range(count):
+            chat_type = "private" if i % 3 else "supergroup"
+            chat_id = 1000 + i % 150 if chat_type == "private" else -1000 - i % 150
+            await router.route(factory.message("привет", chat_type, user_id=5, chat_id=chat_id))
+        stats = await router.stats()
+        await router.stop()
+        await asyncio.gather(*fakes)
+
+        single_worker = all(len({index for index, _ in items}) == 1 for items in seen.values())
+        ordered = all([update_id for _, update_id in items] == sorted(update_id for _, update_id in items)
+                      for items in seen.values())
+        received = [item["received"] for item in stats]
+        self.log_test("Chat Sticks To One Worker", single_worker and len(seen) == 150, f"- {len(seen)} chats")
+        self.log_test("Per-Chat Order Preserved", ordered)
+        self.log_test("All Workers Used", sum(received) == count and min(received) > count / workers / 2,
+                      f"- {received}")
+        self.log_test("Router Counts Match", router.routed == received)
+
+    async def test_end_to_end(self):
+        """Вебхуки через фронт обрабатываются ботами в двух процессах"""
+        print("\n🧩 Testing Worker Processes...")
+
+        saved = {name: os.environ.get(name) for name in ("STATE_DB_PATH", "ANALYTICS_DIR", "HEALTH_PORT")}
+        health_port = free_port()
+        os.environ.update(STATE_DB_PATH="", ANALYTICS_DIR="", HEALTH_PORT=str(health_port))
+        router = ShardRouter(2, command=[sys.executable, os.path.abspath(__file__), "--worker"])
+        receiver = WebhookReceiver(router, "/webhook", SECRET)
+        try:
+            await router.start()
+            await receiver.start("127.0.0.1", 0)
+            factory = UpdateFactory()
+            chats = list(range(2001, 2041))
+            updates = [factory.message("как вступить", "private", user_id=chat_id)
+                       for _ in range(3) for chat_id in chats]
+            statuses = await send_requests(receiver.port, [http_request(json.dumps(update).encode())
+                                                           for update in updates])
+            stats = await router.stats()
+            health = [await http_get(health_port + index, "/healthz") for index in range(2)]
+        finally:
+            await receiver.stop()
+            await router.stop()
+            for name, value in saved.items():
+                if value is None:
+                    os.environ.pop(name, None)
+                else:
+                    os.environ[name] = value
+
+        replied = defaultdict(set)
+        for item in stats:
+            for chat_id, count in item["replies"].items():
+                replied[int(chat_id)].add((item["worker"], count))
+        self.log_test("Webhooks Accepted", statuses == [200] * len(updates))
+        self.log_test("Every Update Handled", sum(item["handled"] for item in stats) == len(updates)
+                      and all(item["handled"] > 0 for item in stats),
+                      f"- {[item['handled'] for item in stats]}")
+        self.log_test("Each Chat Served By One Worker", sorted(replied) == chats
+                      and all(len(workers) == 1 and next(iter(workers))[1] == 3 for workers in replied.values()))
+        self.log_test("Worker Health Servers", [status for status, _ in health] == [200, 200]
+                      and [list(body["bots"]) for _, body in health] == [["shard0"], ["shard1"]],
+                      f"- {[status for status, _ in health]}")
+        self.log_test("Workers Exited", all(process.returncode == 0 for process in router.processes),
+                      f"- {[process.returncode for process in router.processes]}")
+
+    async def run_all_tests(self):
+        """Run all sharding tests"""
+        print("🚀 Starting Webhook Sharding Testing")
+        print("=" * 50)
+
+        logging.disable(logging.WARNING)
+        self.test_ring()
+        self.test_chat_key()
+        await self.test_receiver()
+        await self.test_routing_order()
+        await self.test_end_to_end()
+        logging.disable(logging.NOTSET)
+
+        print("\n" + "=" * 50)
+        print(f"📊 Test Results: {self.tests_passed}/{self.tests_run} tests passed")
+
+        if self.tests_passed == self.tests_run:
+            print("🎉 All sharding tests passed!")
+            return 0
+        else:
+            failed_tests = self.tests_run - self.tests_passed
+            print(f"⚠️ {failed_tests} test(s) failed. Please review the issues above.")
+            return 1
+
+
+async def worker(index, socket_path):
+    """Процесс-обработчик теста: бот на эмуляторе Bot API"""
+    logging.disable(logging.WARNING)
+    api = FakeTelegramAPI()
+
+    def replies():
+        counts = defaultdict(int)
+        for call in api.calls_to("sendMessage"):
+            counts[call["chat_id"]] += 1
+        return {"replies": counts}
+
+    await run_worker(index, socket_path, request=api, token=FAKE_BOT_TOKEN, extra_stats=replies)
+
+
+async def main():
+    """Main testing function"""
+    tester = ShardingTester()
+    return await tester.run_all_tests()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "--worker":
+        asyncio.run(worker(int(sys.argv[2]), sys.argv[3]))
+    else:
+        sys.exit(asyncio.run(main()))
@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""
+Тестирование антиспама: флуд, почти одинаковые тексты, ограниченная память,
+очередь модерационных действий
+"""
+
+import asyncio
+import logging
+import sys
+import time
+
+from persistence import StateStore
+from replay import GROUP_CHAT_ID, ReplayHarness, UpdateFactory, build_spam_timeline
+from runtime import BotRuntime
+from spam_guard import VERDICT_DUPLICATE, VERDICT_FLOOD, SpamGuard
+
+AD = "🔥 Заработок от {n}$ в день без вложений и опыта! Пиши в лс @earn{n} 💰"
+
+
+class SpamGuardTester:
+    def __init__(self):
+        self.tests_run = 0
+        self.tests_passed = 0
+
+    def log_test(self, name, success, details=""):
+        """Log test results"""
+        self.tests_run += 1
+        if success:
+            self.tests_passed += 1
+            print(f"✅ {name} - PASSED {details}")
+        else:
+            print(f"❌ {name} - FAILED {details}")
+        return success
+
+    def test_flood(self):
+        """Больше rate_limit сообщений за окно - флуд"""
+        print("\n🌊 Testing Flood Detection...")
+
+        guard = SpamGuard(rate_limit=6, rate_window=10)
+        verdicts = [guard.check(-1, 1, "ау", now=100 + i) for i in range(8)]
+        self.log_test("Flood After Limit", verdicts == [None] * 6 + [VERDICT_FLOOD] * 2, f"- {verdicts}")
+
+        calm = [guard.check(-1, 2, "ау", now=100 + i * 3) for i in range(10)]
+        self.log_test("Calm User Passes", calm == [None] * 10)
+        self.log_test("Rate Is Per Chat", guard.check(-2, 1, "ау", now=107) is None)
+
+    def test_near_duplicates(self):
+        """Вариации одного рекламного текста от разных аккаунтов"""
+        print("\n🧬 Testing Near-Duplicate Detection...")
+
+        guard = SpamGuard(duplicate_limit=3, duplicate_window=120)
+        verdicts = [guard.check(-1, 100 + i, AD.format(n=10 + i), now=10 + i) for i in range(5)]
+        self.log_test("Third Copy Flagged", verdicts == [None, None] + [VERDICT_DUPLICATE] * 3,
+                      f"- {verdicts}")
+
+        different = [
+            "Подскажите, какой промпт лучше для генерации видео в VEO 3?",
+            "Спасибо за вчерашний эфир, особенно за разбор автоматизации в n8n",
+            "У кого-нибудь получилось подключить Midjourney к телеграм-боту?",
+        ]
+        self.log_test("Distinct Long Texts Pass",
+                      all(guard.check(-1, 200 + i, text, now=20 + i) is None
+                          for i, text in enumerate(different)))
+        short = [guard.check(-1, 300 + i, "как вступить в группу", now=30 + i) for i in range(5)]
+        self.log_test("Short Repeated Questions Pass", short == [None] * 5)
+        self.log_test("Other Chat Not Affected", guard.check(-2, 400, AD.format(n=50), now=40) is None)
+        self.log_test("Window Expires", guard.check(-1, 500, AD.format(n=60), now=200) is None)
+
+    def test_edits(self):
+        """Правка заменяет исходное сообщение, а не считается новым"""
+        print("\n✏️ Testing Edited Messages...")
+
+        guard = SpamGuard(rate_limit=2, rate_window=10, duplicate_limit=3, duplicate_window=120)
+        text = "Подскажите, какой промпт лучше для генерации видео в VEO 3?"
+        verdicts = [guard.check(-1, 1, text, now=10, message_id=5),
+                    guard.check(-1, 1, text + "!", now=11, message_id=5, edited=True),
+                    guard.check(-1, 1, text + "!!", now=12, message_id=5, edited=True)]
+        self.log_test("Typo Edits Not Flagged", verdicts == [None] * 3
+                      and not guard._user(-1, 1).strikes, f"- {verdicts}")
+        self.log_test("Edit Replaces Signature", guard.recent_tracked == 1)
+
+        for i in range(2):
+            guard.check(-1, 100 + i, AD.format(n=10 + i), now=20 + i, message_id=50 + i)
+        innocent = guard.check(-1, 200, "Спасибо за вчерашний эфир, особенно за разбор n8n", now=30,
+                               message_id=60)
+        edited_in = guard.check(-1, 200, AD.format(n=30), now=31, message_id=60, edited=True)
+        self.log_test("Spam Edited In Still Caught", innocent is None and edited_in == VERDICT_DUPLICATE)
+
+    def test_bounded_memory(self):
+        """Память ограничена при любом числе пользователей и сообщений"""
+        print("\n🧠 Testing Bounded Memory...")
+
+        guard = SpamGuard(max_users=1000, max_recent=500)
+        for i in range(20000):
+            guard.check(-1, i, f"сообщение номер {i} с достаточно длинным текстом внутри", now=i * 0.001)
+        self.log_test("Users Capped", guard.users_tracked == 1000, f"- {guard.users_tracked}")
+        self.log_test("Recent Capped", guard.recent_tracked == 500
+                      and len(guard._band_counts) <= 500 * SpamGuard.BINS // SpamGuard.BAND_ROWS,
+                      f"- {guard.recent_tracked} messages, {len(guard._band_counts)} bands")
+
+    def test_constant_time(self):
+        """Время проверки не зависит от накопленной истории"""
+        print("\n⏱ Testing Constant Time...")
+
+        def per_message(guard, offset, count=2000):
+            started = time.perf_counter()
+            for i in range(count):
+                guard.check(-1, offset + i, f"{offset + i} длинное сообщение участника о промптах", now=offset + i)
+            return (time.perf_counter() - started) / count * 1e6
+
+        guard = SpamGuard(max_users=100000, max_recent=100000, duplicate_window=10 ** 9)
+        small = per_message(guard, 0)
+        for offset in range(2000, 60000, 2000):
+            per_message(guard, offset)
+        large = per_message(guard, 60000)
+        self.log_test("Check Time Independent Of History", large < small * 2 + 5,
+                      f"- {small:.1f} us with 2k messages, {large:.1f} us with 60k")
+
+    def test_replay_detection(self):
+        """Реплей смешанного трафика: нет ложных срабатываний, большая часть спама поймана"""
+        print("\n📼 Testing Mixed Traffic Replay...")
+
+        guard = SpamGuard()
+        caught = false_positives = spam_total = 0
+        timeline = build_spam_timeline()
+        for at, data, is_spam in timeline:
+            message = data["message"]
+            verdict = guard.check(message["chat"]["id"], message["from"]["id"], message["text"], now=at)
+            spam_total += is_spam
+            caught += bool(verdict) and is_spam
+            false_positives += bool(verdict) and not is_spam
+        self.log_test("No False Positives", false_positives == 0, f"- {false_positives} of {len(timeline)}")
+        self.log_test("Spam Caught", caught / spam_total >= 0.75, f"- {caught}/{spam_total}")
+
+    async def test_moderation_actions(self):
+        """Спам удаляется через очередь действий, повторный нарушитель ограничивается"""
+        print("\n🛡 Testing Moderation Actions...")
+
+        guard = SpamGuard(actions_per_second=50, exempt_ids=[42])
+        runtime = BotRuntime(store=StateStore(), spam=guard)
+        factory = UpdateFactory()
+        async with ReplayHarness(runtime=runtime) as harness:
+            api = harness.api
+            started = time.perf_counter()
+            spam_ids = []
+            for i in range(6):
+                data = factory.message(AD.format(n=20 + i), "supergroup", user_id=777)
+                spam_ids.append(data["message"]["message_id"])
+                await harness.process(data)
+            await harness.process(factory.message(AD.format(n=99), "supergroup", user_id=42))
+            await harness.process(factory.message(AD.format(n=98), "private", user_id=778))
+            await harness.process(factory.message("как вступить в группу", "supergroup", user_id=779))
+            await guard.actions.join()
+            elapsed = time.perf_counter() - started
+
+            deleted = [call["message_id"] for call in api.calls_to("deleteMessage")]
+            restricted = api.calls_to("restrictChatMember")
+            replies = [call["chat_id"] for call in api.calls_to("sendMessage")]
+
+        self.log_test("Duplicates Deleted", deleted == spam_ids[2:], f"- {deleted}")
+        self.log_test("Offender Restricted Once", len(restricted) == 1 and restricted[0]["user_id"] == 777
+                      and restricted[0]["permissions"]["can_send_messages"] is False)
+        self.log_test("Admin And Private Exempt", guard.stats["checked"] == 7, f"- {guard.stats}")
+        self.log_test("Legit Message Answered", GROUP_CHAT_ID in replies, f"- {len(replies)} replies")
+        self.log_test("Actions Rate Limited", elapsed >= 4 / 50, f"- {len(deleted) + 1} actions in {elapsed:.2f} s")
+
+    async def run_all_tests(self):
+        """Run all spam guard tests"""
+        print("🚀 Starting Spam Guard Testing")
+        print("=" * 50)
+
+        logging.disable(logging.INFO)
+        self.test_flood()
+        self.test_near_duplicates()
+        self.test_edits()
+        self.test_bounded_memory()
+        self.test_constant_time()
+        self.test_replay_detection()
+        await self.test_moderation_actions()
+        logging.disable(logging.NOTSET)
+
+        print("\n" + "=" * 50)
+        print(f"📊 Test Results: {self.tests_passed}/{self.tests_run} tests passed")
+
+        if self.tests_passed == self.tests_run:
+            print("🎉 All spam guard tests passed!")
+            return 0
+        else:
+            failed_tests = self.tests_run - self.tests_passed
+            print(f"⚠️ {failed_tests} test(s) failed. Please review the issues above.")
+            return 1
+
+
+async def main():
+    """Main testing function"""
+    tester = SpamGuardTester()
+    return await tester.run_all_tests()
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Тестирование отчета о запуске, выбора event loop и офлайн-реплея
+"""
+
+import asyncio
+import sys
+import time
+
+from replay import ReplayHarness, UpdateFactory, build_corpus
+from startup import StartupProfiler, install_event_loop_policy
+
+
+class StartupTester:
+    def __init__(self):
+        self.tests_run = 0
+        self.tests_passed = 0
+
+    def log_test(self, name, success, details=""):
+        """Log test results"""
+        self.tests_run += 1
+        if success:
+            self.tests_passed += 1
+            print(f"✅ {name} - PASSED {details}")
+        else:
+            print(f"❌ {name} - FAILED {details}")
+        return success
+
+    def test_profiler_report(self):
+        """Профайлер записывает импорты и этапы запуска"""
+        print("\n⏱ Testing Startup Profiler...")
+
+        profiler = StartupProfiler()
+        profiler.import_module("json")
+        with profiler.phase("сборка Application"):
+            time.sleep(0.01)
+
+        names = [name for name, _ in profiler.phases]
+        self.log_test("Import Phase Recorded", "import json" in names)
+        self.log_test("Custom Phase Recorded", "сборка Application" in names)
+
+        seconds = dict(profiler.phases)["сборка Application"]
+        self.log_test("Phase Duration", seconds >= 0.01, f"- {seconds * 1000:.1f} ms")
+
+        report = profiler.report()
+        self.log_test("Report Lists Phases", "import json" in report and "сборка Application" in report)
+
+    def test_event_loop_policy(self):
+        """uvloop включается только по флагу"""
+        print("\n🔁 Testing Event Loop Policy...")
+
+        self.log_test("Default Loop", install_event_loop_policy(False) == "asyncio")
+
+        loop_name = install_event_loop_policy(True)
+        try:
+            self.log_test("Opt-in Loop", loop_name in ("asyncio", "uvloop"), f"- {loop_name}")
+            if loop_name == "uvloop":
+                policy = type(asyncio.get_event_loop_policy())
+                self.log_test("uvloop Policy Installed", policy.__module__.startswith("uvloop"))
+        finally:
+            asyncio.set_event_loop_policy(None)
+
+    async def test_replay_harness(self):
+        """Реплей проходит через настоящие обработчики и фейковый API"""
+        print("\n🎬 Testing Replay Harness...")
+
+        factory = UpdateFactory()
+        corpus = [
+            factory.message("как вступить?", "private", 1001),
+            factory.message("/start", "private", 1002),
+            factory.message("всем привет", "supergroup", 1003),
+            factory.inline_query("файл", 1004),
+        ]
+
+        async with ReplayHarness() as harness:
+            stats = await harness.replay(corpus)
+            api = harness.api
+
+        self.log_test("All Updates Replayed", stats["updates"] == len(corpus))
+        self.log_test("Replies Sent", api.count("sendMessage") == 2,
+                      f"- {api.count('sendMessage')} sendMessage")
+        self.log_test("Inline Answered", api.count("answerInlineQuery") == 1)
+
+        texts = [params["text"] for params in api.calls_to("sendMessage")]
+        self.log_test("Join Reply Content", "Buddah Base" in texts[0])
+
+        corpus = build_corpus(200, seed=7)
+        self.log_test("Corpus Deterministic", corpus == build_corpus(200, seed=7))
+
+    async def run_all_tests(self):
+        """Run all startup tests"""
+        print("🚀 Starting Startup & Replay Testing")
+        print("=" * 50)
+
+        self.test_profiler_report()
+        self.test_event_loop_policy()
+        await self.test_replay_harness()
+
+        print("\n" + "=" * 50)
+        print(f"📊 Test Results: {self.tests_passed}/{self.tests_run} tests passed")
+
+        if self.tests_passed == self.tests_run:
+            print("🎉 All startup tests passed!")
+            return 0
+        else:
+            failed_tests = self.tests_run - self.tests_passed
+            print(f"⚠️ {failed_tests} test(s) failed. Please review the issues above.")
+            return 1
+
+
+async def main():
+    """Main testing function"""
+    tester = StartupTester()
+    return await tester.run_all_tests()
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Тестирование живых метрик и админ-команды /stats
+"""
+
+import asyncio
+import logging
+import sys
+import time
+
+from config import Config
+from metrics import BotMetrics, LatencyWindow, RollingCounter, format_stats
+from persistence import StateStore
+from replay import ReplayHarness, UpdateFactory, build_corpus
+from runtime import BotRuntime
+
+
+class StatsTester:
+    def __init__(self):
+        self.tests_run = 0
+        self.tests_passed = 0
+
+    def log_test(self, name, success, details=""):
+        """Log test results"""
+        self.tests_run += 1
+        if success:
+            self.tests_passed += 1
+            print(f"✅ {name} - PASSED {details}")
+        else:
+            print(f"❌ {name} - FAILED {details}")
+        return success
+
+    def test_rolling_counter(self):
+        """Скользящее окно забывает старые события"""
+        print("\n📥 Testing Rolling Counter...")
+
+        counter = RollingCounter(window=60)
+        for second in range(60):
+            counter.add(10, now=1000 + second)
+        self.log_test("Rate Over Window", counter.rate(now=1059) == 10.0,
+                      f"- {counter.rate(now=1059)}/s")
+        self.log_test("Half Expired", counter.rate(now=1089) == 5.0,
+                      f"- {counter.rate(now=1089)}/s")
+        self.log_test("Fully Expired", counter.rate(now=5000) == 0.0)
+
+    def test_latency_window(self):
+        """Перцентили по гистограмме в пределах шага корзины"""
+        print("\n⏱ Testing Latency Window...")
+
+        window = LatencyWindow(window=60)
+        for _ in range(980):
+            window.record(0.001, now=100)
+        for _ in range(20):
+            window.record(0.100, now=100)
+
+        p50, p99 = window.percentile(50, now=100), window.percentile(99, now=100)
+        self.log_test("p50 Close To 1 ms", 1.0 <= p50 <= 1.0 * LatencyWindow.FACTOR, f"- {p50:.3f} ms")
+        self.log_test("p99 Close To 100 ms", 100.0 <= p99 <= 100.0 * LatencyWindow.FACTOR,
+                      f"- {p99:.3f} ms")
+        self.log_test("Window Expires", window.percentile(99, now=200) == 0.0
+                      and window.total_count == 1000)
+
+    def test_report_is_constant_time(self):
+        """Стоимость отчета не зависит от объема истории"""
+        print("\n📏 Testing O(1) Report...")
+
+        def report_seconds(runtime):
+            best = float("inf")
+            for _ in range(20):
+                started = time.perf_counter()
+                format_stats(runtime)
+                best = min(best, time.perf_counter() - started)
+            return best
+
+        quiet = BotRuntime(metrics=BotMetrics())
+        quiet.metrics.observe("handle_message", 0.001)
+        busy = BotRuntime(metrics=BotMetrics())
+        for i in range(200000):
+            busy.metrics.observe("handle_message", (i % 1000) / 1e5)
+            busy.metrics.record_update()
+
+        quiet_time, busy_time = report_seconds(quiet), report_seconds(busy)
+        self.log_test("Report Cost Flat", busy_time < quiet_time * 3 + 0.0005,
+                      f"- {quiet_time * 1e6:.0f} us vs {busy_time * 1e6:.0f} us after 200k updates")
+
+    async def test_stats_command(self):
+        """Команда /stats через реплей: доступ только админам и содержимое отчета"""
+        print("\n📊 Testing /stats Command...")
+
+        factory = UpdateFactory()
+        corpus = build_corpus(300, factory=factory)
+        corpus.append(factory.message("/stats", "private", 999))
+        corpus.append(factory.message("/stats", "private", 1))
+
+        admin_ids = Config.ADMIN_IDS
+        Config.ADMIN_IDS = [1]
+        try:
+            runtime = BotRuntime(store=StateStore(), reply_cooldown=60)
+            async with ReplayHarness(runtime=runtime) as harness:
+                await harness.replay(corpus)
+                replies = harness.api.calls_to("sendMessage")
+        finally:
+            Config.ADMIN_IDS = admin_ids
+
+        metrics = runtime.metrics
+        self.log_test("Updates Counted", metrics.updates_total == len(corpus),
+                      f"- {metrics.updates_total}")
+        self.log_test("Handlers Timed", {"handle_message", "handle_inline_query",
+                                         "stats_command"} <= set(metrics.handlers),
+                      f"- {sorted(metrics.handlers)}")
+        self.log_test("Outbound Tracked", metrics.outbound.total_count > 0
+                      and metrics.outbound_in_flight == 0,
+                      f"- {metrics.outbound.total_count} requests")
+        self.log_test("Non-Admin Ignored", all(reply["chat_id"] != 999 for reply in replies))
+
+        admin_replies = [reply["text"] for reply in replies if reply["chat_id"] == 1]
+        report = admin_replies[0] if admin_replies else ""
+        sections = ["Аптайм", "Апдейты", "handle_message", "Исходящие запросы", "Кулдаун",
+                    "Кэш шаблонов", "Память"]
+        missing = [section for section in sections if section not in report]
+        self.log_test("Admin Gets Report", len(admin_replies) == 1 and not missing,
+                      f"- missing {missing}" if missing else "")
+        self.log_test("Cooldown Reported",
+                      f"подавлено ответов {runtime.cooldown_suppressed}" in report
+                      and runtime.cooldown_suppressed > 0,
+                      f"- {runtime.cooldown_suppressed} suppressed")
+
+    async def run_all_tests(self):
+        """Run all stats tests"""
+        print("🚀 Starting Stats Testing")
+        print("=" * 50)
+
+        logging.disable(logging.INFO)
+        self.test_rolling_counter()
+        self.test_latency_window()
+        self.test_report_is_constant_time()
+        await self.test_stats_command()
+        logging.disable(logging.NOTSET)
+
+        print("\n" + "=" * 50)
+        print(f"📊 Test Results: {self.tests_passed}/{self.tests_run} tests passed")
+
+        if self.tests_passed == self.tests_run:
+            print("🎉 All stats tests passed!")
+            return 0
+        else:
+            failed_tests = self.tests_run - self.tests_passed
+            print(f"⚠️ {failed_tests} test(s) failed. Please review the issues above.")
+            return 1
+
+
+async def main():
+    """Main testing function"""
+    tester = StatsTester()
+    return await tester.run_all_tests()
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
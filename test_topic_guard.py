@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+Тестирование модерации тем форума: удаление сообщений вне разрешенных тем пачками
+deleteMessages (с python-telegram-bot до 20.8 - по одному)
+"""
+
+import asyncio
+import logging
+import random
+import sys
+
+from telegram import Bot, Update
+
+from metrics import format_stats
+from persistence import StateStore
+from replay import GROUP_CHAT_ID, ReplayHarness, UpdateFactory
+from runtime import BotRuntime
+from topic_guard import MAX_DELETE_BATCH, VERDICT_OFF_TOPIC, TopicGuard
+
+CHAT_TOPIC = 7
+# deleteMessages есть в python-telegram-bot с 20.8; в более ранних версиях
+# сообщения удаляются по одному
+BATCH_DELETE = hasattr(Bot, "delete_messages")
+
+
+def deleted_ids(api):
+    """id удаленных сообщений по вызовам deleteMessages и deleteMessage"""
+    return ([message_id for call in api.calls_to("deleteMessages") for message_id in call["message_ids"]]
+            + [call["message_id"] for call in api.calls_to("deleteMessage")])
+
+
+def delete_requests(api):
+    return api.count("deleteMessages") + api.count("deleteMessage")
+
+
+class TopicGuardTester:
+    def __init__(self):
+        self.tests_run = 0
+        self.tests_passed = 0
+
+    def log_test(self, name, success, details=""):
+        """Log test results"""
+        self.tests_run += 1
+        if success:
+            self.tests_passed += 1
+            print(f"✅ {name} - PASSED {details}")
+        else:
+            print(f"❌ {name} - FAILED {details}")
+        return success
+
+    def test_violations(self):
+        """Какие сообщения считаются нарушением"""
+        print("\n🧭 Testing Topic Rules...")
+
+        guard = TopicGuard([CHAT_TOPIC], exempt_ids=[42])
+        factory = UpdateFactory()
+
+        def violation(data):
+            return guard.is_violation(Update.de_json(data, None).message)
+
+        self.log_test("Allowed Topic Passes", not violation(factory.topic_message("привет", CHAT_TOPIC)))
+        self.log_test("Other Topic Violates", violation(factory.topic_message("привет", 3)))
+        self.log_test("General Violates Unless Allowed", violation(factory.topic_message("привет"))
+                      and not TopicGuard([1]).is_violation(Update.de_json(factory.topic_message("привет"), None).message))
+        self.log_test("Admin Exempt", not violation(factory.topic_message("анонс", 3, user_id=42)))
+        bot_message = factory.topic_message("бот", 3)
+        bot_message["message"]["from"]["is_bot"] = True
+        self.log_test("Bots Exempt", not violation(bot_message))
+        anonymous = factory.topic_message("анонс", 3, sender_chat=factory.chat(GROUP_CHAT_ID, "supergroup"))
+        self.log_test("Anonymous Admin Exempt", not violation(anonymous))
+        self.log_test("Non-Forum Groups Ignored", not violation(factory.message("привет", "supergroup")))
+        scoped = TopicGuard([CHAT_TOPIC], chat_ids=[-100555])
+        self.log_test("Chat Allow-List", not scoped.is_violation(
+            Update.de_json(factory.topic_message("привет", 3), None).message))
+
+    async def test_mixed_topics(self):
+        """Смешанный трафик по темам: все нарушения удалены малым числом запросов"""
+        print("\n🧹 Testing Mixed-Topic Traffic...")
+
+        rng = random.Random(5)
+        guard = TopicGuard([CHAT_TOPIC], flush_interval=0.05)
+        runtime = BotRuntime(store=StateStore(), topics=guard)
+        factory = UpdateFactory()
+        texts = ["всем привет", "спасибо за урок", "как вступить в группу", "veo круто"]
+        off_topic = []
+        allowed_joins = 0
+        async with ReplayHarness(runtime=runtime) as harness:
+            api = harness.api
+            for _ in range(300):
+                thread_id = rng.choice([CHAT_TOPIC, CHAT_TOPIC, 3, 5, None])
+                text = rng.choice(texts)
+                data = factory.topic_message(text, thread_id, user_id=1000 + rng.randrange(50))
+                if thread_id != CHAT_TOPIC:
+                    off_topic.append(data["message"]["message_id"])
+                elif text == "как вступить в группу":
+                    allowed_joins += 1
+                await harness.process(data)
+            await asyncio.sleep(0.1)
+            stats = format_stats(runtime)
+
+        calls = api.calls_to("deleteMessages")
+        deleted = deleted_ids(api)
+        requests = delete_requests(api)
+        self.log_test("All Off-Topic Deleted", sorted(deleted) == off_topic,
+                      f"- {len(deleted)}/{len(off_topic)} messages")
+        if BATCH_DELETE:
+            self.log_test("Deletes Batched", 0 < len(calls) <= len(off_topic) // 10
+                          and api.count("deleteMessage") == 0,
+                          f"- {len(calls)} deleteMessages calls for {len(off_topic)} messages")
+        else:
+            self.log_test("One By One Before PTB 20.8", not calls and requests == len(off_topic),
+                          f"- {requests} deleteMessage calls for {len(off_topic)} messages")
+        self.log_test("No Replies Off Topic", all(call.get("message_thread_id") in (None, CHAT_TOPIC)
+                                                  for call in api.calls_to("sendMessage")))
+        self.log_test("Allowed Topic Still Served", api.count("sendMessage") >= allowed_joins,
+                      f"- {api.count('sendMessage')} replies")
+        self.log_test("Metrics", guard.stats["deleted"] == len(off_topic)
+                      and guard.stats["api_calls"] == requests and guard.pending == 0
+                      and f"удалено {len(off_topic)} за {requests} запросов" in stats, f"- {guard.stats}")
+
+    async def test_batch_limit(self):
+        """Пачка не больше 100 сообщений: полная пачка уходит сразу, остаток - при сбросе"""
+        print("\n📦 Testing Batch Limit...")
+
+        guard = TopicGuard([CHAT_TOPIC], flush_interval=3600)
+        runtime = BotRuntime(store=StateStore(), topics=guard)
+        factory = UpdateFactory()
+        async with ReplayHarness(runtime=runtime) as harness:
+            api = harness.api
+            bot = harness.application.bot
+            verdicts = set()
+            for i in range(250):
+                message = Update.de_json(factory.topic_message("оффтоп", 3, user_id=2000 + i), bot).message
+                verdicts.add(runtime.moderate(bot, message))
+            await harness.drain()
+            full_batches = [len(call["message_ids"]) for call in api.calls_to("deleteMessages")]
+            before_flush = len(deleted_ids(api))
+            await guard.flush()
+            batches = [len(call["message_ids"]) for call in api.calls_to("deleteMessages")]
+            after_flush = len(deleted_ids(api))
+
+        self.log_test("Verdict Reported", verdicts == {VERDICT_OFF_TOPIC})
+        self.log_test("Full Batches Sent Immediately", before_flush == 2 * MAX_DELETE_BATCH
+                      and (full_batches == [MAX_DELETE_BATCH] * 2 or not BATCH_DELETE),
+                      f"- {full_batches or before_flush}")
+        self.log_test("Remainder Flushed", after_flush == 250 and (batches == [100, 100, 50] or not BATCH_DELETE),
+                      f"- {batches or after_flush}")
+
+    async def run_all_tests(self):
+        """Run all topic moderation tests"""
+        print("🚀 Starting Topic Moderation Testing")
+        print("=" * 50)
+
+        logging.disable(logging.INFO)
+        self.test_violations()
+        await self.test_mixed_topics()
+        await self.test_batch_limit()
+        logging.disable(logging.NOTSET)
+
+        print("\n" + "=" * 50)
+        print(f"📊 Test Results: {self.tests_passed}/{self.tests_run} tests passed")
+
+        if self.tests_passed == self.tests_run:
+            print("🎉 All topic moderation tests passed!")
+            return 0
+        else:
+            failed_tests = self.tests_run - self.tests_passed
+            print(f"⚠️ {failed_tests} test(s) failed. Please review the issues above.")
+            return 1
+
+
+async def main():
+    """Main testing function"""
+    tester = TopicGuardTester()
+    return await tester.run_all_tests()
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
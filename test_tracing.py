@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+Тестирование трассировки апдейтов: спаны receive/enqueue/filter/обработчик/match/
+render/send, вложенность и длительности, выборка, отброшенные апдейты, ротация файла
+и отсутствие трассировки по умолчанию
+"""
+
+import asyncio
+import logging
+import os
+import random
+import sys
+import tempfile
+from collections import defaultdict
+
+from config import Config
+from fake_api import FakeTelegramAPI
+from metrics import format_stats
+from persistence import StateStore
+from replay import ReplayHarness, UpdateFactory
+from runtime import BotRuntime
+from tracing import ArrivalQueue, Tracer, current_trace, load_trace, span
+
+
+def by_update(events):
+    spans = defaultdict(dict)
+    for event in events:
+        spans[event["tid"]].setdefault(event["name"], []).append(event)
+    return spans
+
+
+async def run_updates(tracer, updates, api=None):
+    runtime = BotRuntime(store=StateStore(), tracer=tracer)
+    async with ReplayHarness(api=api, runtime=runtime) as harness:
+        for data in updates:
+            await harness.enqueue(data)
+        await harness.application.update_queue.join()
+        await harness.drain()
+        queue = harness.application.update_queue
+        # До остановки: Application.stop кладет в очередь свой сигнал остановки
+        leaked = len(getattr(queue, "arrivals", ()))
+        stats = format_stats(runtime)
+    return queue, leaked, stats
+
+
+class TracingTester:
+    def __init__(self):
+        self.tests_run = 0
+        self.tests_passed = 0
+
+    def log_test(self, name, success, details=""):
+        """Log test results"""
+        self.tests_run += 1
+        if success:
+            self.tests_passed += 1
+            print(f"✅ {name} - PASSED {details}")
+        else:
+            print(f"❌ {name} - FAILED {details}")
+        return success
+
+    def test_no_trace(self):
+        """Без трассы span() ничего не записывает"""
+        print("\n💤 Testing Spans Without Trace...")
+
+        tracer = Tracer(sample_rate=1.0, path=os.path.join(tempfile.gettempdir(), "unused-trace.json"))
+        with span("match"):
+            pass
+        self.log_test("No Current Trace", current_trace() is None)
+        self.log_test("Nothing Recorded", tracer.stats["spans"] == 0 and not tracer._events)
+
+    async def test_spans(self):
+        """Спаны одного апдейта вложены в receive; медленный sendMessage виден в send"""
+        print("\n🔎 Testing Update Spans...")
+
+        factory = UpdateFactory()
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "traces", "trace.json")
+            tracer = Tracer(sample_rate=1.0, path=path)
+            update = factory.message("как вступить в группу", "private", user_id=77)
+            queue, leaked, stats = await run_updates(tracer, [update], api=FakeTelegramAPI(latency=0.05))
+            events = load_trace(path)
+
+        spans = by_update(events)[update["update_id"]]
+        names = set(spans)
+        expected = {"receive", "enqueue", "filter", "handle_message", "match", "render", "send"}
+        self.log_test("All Span Kinds", expected <= names, f"- {sorted(names)}")
+        self.log_test("Chrome Trace Events", all(event["ph"] == "X" and "ts" in event and "dur" in event
+                                                 for event in events))
+
+        root = spans["receive"][0]
+        inside = all(root["ts"] - 1 <= event["ts"] and event["ts"] + event["dur"] <= root["ts"] + root["dur"] + 1
+                     for name, items in spans.items() for event in items)
+        self.log_test("Spans Nested In Receive", inside)
+        sends = {event["args"]["method"]: event["dur"] for event in spans["send"]}
+        self.log_test("Slow Send Visible", sends.get("sendMessage", 0) >= 50000
+                      and root["dur"] >= sends["sendMessage"], f"- send {sends.get('sendMessage', 0) / 1000:.1f} ms, "
+                      f"receive {root['dur'] / 1000:.1f} ms")
+        self.log_test("Root Args", root["args"]["update"] == "message" and root["args"]["chat_id"] == 77
+                      and root["args"]["tier"] == "critical" and root["args"]["shed"] is False, f"- {root['args']}")
+        self.log_test("Stats Line", "🔎 Трассировка: выборка 100.0%, трасс 1" in stats)
+        self.log_test("Arrivals Not Leaked", isinstance(queue, ArrivalQueue) and leaked == 0)
+
+    async def test_sampling(self):
+        """В выборку попадает заданная доля апдейтов"""
+        print("\n🎲 Testing Sampling...")
+
+        factory = UpdateFactory()
+        updates = [factory.message(f"привет {i}", "private", user_id=1000 + i) for i in range(400)]
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "trace.json")
+            tracer = Tracer(sample_rate=0.25, path=path, sample=random.Random(3).random)
+            _, leaked, _ = await run_updates(tracer, updates)
+            traced = {event["tid"] for event in load_trace(path) if event["name"] == "receive"}
+        self.log_test("Sample Share", 70 <= len(traced) <= 130 and tracer.stats["sampled"] == len(traced),
+                      f"- {len(traced)} of 400 traced")
+        self.log_test("Arrivals Consumed For Unsampled", leaked == 0)
+
+    async def test_shed(self):
+        """Отброшенный LoadShedder апдейт трассируется без обработчиков"""
+        print("\n🚦 Testing Shed Update Trace...")
+
+        saved = Config.SHED_ENGAGEMENT_AT
+        Config.SHED_ENGAGEMENT_AT = 0
+        try:
+            factory = UpdateFactory()
+            update = factory.message("всем хорошего дня", "supergroup", user_id=5)
+            with tempfile.TemporaryDirectory() as directory:
+                path = os.path.join(directory, "trace.json")
+                await run_updates(Tracer(sample_rate=1.0, path=path), [update])
+                spans = by_update(load_trace(path))[update["update_id"]]
+        finally:
+            Config.SHED_ENGAGEMENT_AT = saved
+        root = spans["receive"][0]
+        self.log_test("Shed Flag", root["args"]["shed"] is True and root["args"]["tier"] == "chatter",
+                      f"- {root['args']}")
+        self.log_test("No Handler Spans", "filter" not in spans and "handle_message" not in spans
+                      and "enqueue" in spans and "match" in spans, f"- {sorted(spans)}")
+
+    async def test_rotation(self):
+        """Файл ротируется по размеру, старые файлы ограничены backups"""
+        print("\n🔄 Testing Rotation...")
+
+        factory = UpdateFactory()
+        updates = [factory.message("как вступить", "private", user_id=2000 + i) for i in range(60)]
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "trace.json")
+            tracer = Tracer(sample_rate=1.0, path=path, max_bytes=4000, backups=2, flush_every=1)
+            await run_updates(tracer, updates)
+            files = sorted(os.listdir(directory))
+            valid = all(isinstance(load_trace(os.path.join(directory, name)), list) for name in files)
+        self.log_test("Rotated Files", files == ["trace.json", "trace.json.1", "trace.json.2"]
+                      and tracer.stats["rotations"] > 2, f"- {files}, {tracer.stats['rotations']} rotations")
+        self.log_test("Every File Loads", valid)
+
+    async def test_disabled(self):
+        """По умолчанию трассировка выключена: обычная очередь, без файла"""
+        print("\n⏸ Testing Tracing Disabled...")
+
+        factory = UpdateFactory()
+        queue, _, stats = await run_updates(None, [factory.message("привет", "private", user_id=9)])
+        self.log_test("Plain Queue", type(queue) is asyncio.Queue)
+        self.log_test("No Stats Line", "Трассировка" not in stats)
+        self.log_test("Config Default Off", Config.TRACE_SAMPLE_RATE == 0 or "TRACE_SAMPLE_RATE" in os.environ)
+
+    async def run_all_tests(self):
+        """Run all tracing tests"""
+        print("🚀 Starting Tracing Testing")
+        print("=" * 50)
+
+        logging.disable(logging.WARNING)
+        self.test_no_trace()
+        await self.test_spans()
+        await self.test_sampling()
+        await self.test_shed()
+        await self.test_rotation()
+        await self.test_disabled()
+        logging.disable(logging.NOTSET)
+
+        print("\n" + "=" * 50)
+        print(f"📊 Test Results: {self.tests_passed}/{self.tests_run} tests passed")
+
+        if self.tests_passed == self.tests_run:
+            print("🎉 All tracing tests passed!")
+            return 0
+        else:
+            failed_tests = self.tests_run - self.tests_passed
+            print(f"⚠️ {failed_tests} test(s) failed. Please review the issues above.")
+            return 1
+
+
+async def main():
+    """Main testing function"""
+    tester = TracingTester()
+    return await tester.run_all_tests()
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
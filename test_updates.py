@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+"""
+Тестирование allowed_updates: минимальный набор типов по обработчикам бота, типы
+сообщений фильтров и объявленные для составных, покрытие обработчиков, правки сообщений тем же матчером без повторного ответа и отсев лишних типов
+в getUpdates эмулятора
+"""
+
+import asyncio
+import logging
+import sys
+
+from telegram import Update
+from telegram.ext import (Application, CallbackQueryHandler, ChatMemberHandler, CommandHandler,
+                          MessageHandler, PollHandler, TypeHandler, filters)
+
+from bot import BuddahBaseBot
+from fake_api import FAKE_BOT_TOKEN, FakeTelegramAPI
+from persistence import StateStore
+from replay import ReplayHarness, UpdateFactory
+from runtime import NS_LEAD, BotRuntime
+from analytics import EVENT_DM, EVENT_JOIN, EVENT_START, FunnelAnalytics
+from update_types import MESSAGE_TYPES, allowed_updates, handler_types, message_types
+from verification import VERIFY_CALLBACK
+
+
+async def noop(update, context):
+    pass
+
+
+def bot_application(handle_edits):
+    """Application с обработчиками BuddahBaseBot без сети"""
+    application = Application.builder().token(FAKE_BOT_TOKEN).request(FakeTelegramAPI()).build()
+    application.bot_data["runtime"] = BotRuntime(handle_edits=handle_edits)
+    BuddahBaseBot.register_handlers(application)
+    return application
+
+
+def sample_updates():
+    """Апдейты всех типов: каждое сообщение - как message, edited_message и посты канала"""
+    factory = UpdateFactory()
+    messages = [factory.message("привет", "private"), factory.message("как вступить в группу", "supergroup"),
+                factory.message("/start", "private"), factory.message("/help", "supergroup"),
+                factory.new_members([1002]), factory.channel_post("новый урок")]
+    updates = []
+    for data in messages:
+        message = next(value for key, value in data.items() if key != "update_id")
+        updates += [{"update_id": len(updates) + 1, update_type: message} for update_type in sorted(MESSAGE_TYPES)]
+    for data in (factory.callback_query(VERIFY_CALLBACK), factory.inline_query("файл"), factory.my_chat_member()):
+        updates.append(dict(data, update_id=len(updates) + 1))
+    return updates
+
+
+async def uncovered(application):
+    """Типы апдейтов, которые принимает обработчик приложения, но нет в allowed_updates"""
+    allowed = set(allowed_updates(application))
+    missing = set()
+    # Команды сверяются с именем бота (getMe при инициализации)
+    async with application:
+        for data in sample_updates():
+            update_type = next(key for key in data if key != "update_id")
+            update = Update.de_json(data, application.bot)
+            for handlers in application.handlers.values():
+                for handler in handlers:
+                    # Наблюдатель TypeHandler(Update) видит все, что пришло, и типов не требует
+                    if isinstance(handler, TypeHandler) or update_type in allowed:
+                        continue
+                    if handler.check_update(update):
+                        missing.add(update_type)
+    return missing
+
+
+class UpdatesTester:
+    def __init__(self):
+        self.tests_run = 0
+        self.tests_passed = 0
+
+    def log_test(self, name, success, details=""):
+        """Log test results"""
+        self.tests_run += 1
+        if success:
+            self.tests_passed += 1
+            print(f"✅ {name} - PASSED {details}")
+        else:
+            print(f"❌ {name} - FAILED {details}")
+        return success
+
+    def test_filter_algebra(self):
+        """Типы сообщений из фильтра обработчика и объявленных типов"""
+        print("\n🧮 Testing Message Filter Types...")
+
+        U = filters.UpdateType
+        self.log_test("Plain Filter Allows All Messages", message_types(filters.TEXT) == {
+            "message", "edited_message", "channel_post", "edited_channel_post"})
+        self.log_test("Composite Uses Declared Types", message_types(U.MESSAGES & filters.TEXT & ~filters.COMMAND,
+                                                                     declared={"message"}) == {"message"})
+        self.log_test("Undeclared Composite Allows All Messages",
+                      message_types(U.MESSAGE | U.CHANNEL_POST) == message_types(filters.ALL))
+        self.log_test("Chat Type Excludes Channels", message_types(filters.ChatType.GROUPS)
+                      == {"message", "edited_message"})
+        self.log_test("Negation Does Not Narrow", message_types(~U.EDITED) == message_types(filters.ALL))
+        self.log_test("Command Default Like PTB", handler_types(CommandHandler("start", noop))
+                      == {"message", "edited_message"})
+        self.log_test("Handler Classes", handler_types(CallbackQueryHandler(noop)) == {"callback_query"}
+                      and handler_types(PollHandler(noop)) == {"poll"}
+                      and handler_types(ChatMemberHandler(noop)) == {"my_chat_member"})
+        self.log_test("Observer Needs Nothing", handler_types(TypeHandler(Update, noop)) == set())
+        self.log_test("Unknown Handler Allows All", handler_types(TypeHandler(dict, noop)) == set(Update.ALL_TYPES))
+
+    def test_bot_handlers(self):
+        """Набор типов для обработчиков BuddahBaseBot"""
+        print("\n🤖 Testing Bot Allowed Updates...")
+
+        default = allowed_updates(bot_application(handle_edits=False))
+        edits = allowed_updates(bot_application(handle_edits=True))
+        application = bot_application(handle_edits=False)
+        application.add_handler(MessageHandler(filters.UpdateType.CHANNEL_POST, noop))
+        with_channel = allowed_updates(application)
+        self.log_test("Minimal Set", default == ["callback_query", "inline_query", "message"], f"- {default}")
+        self.log_test("Edits Opt-In", edits == ["callback_query", "edited_message", "inline_query", "message"],
+                      f"- {edits}")
+        self.log_test("New Handler Extends Set", "channel_post" in with_channel
+                      and "edited_channel_post" not in with_channel)
+
+    async def test_handler_coverage(self):
+        """Каждый тип, который принимает обработчик бота, есть в allowed_updates"""
+        print("\n🧾 Testing Declared Types Cover Handlers...")
+
+        default = await uncovered(bot_application(handle_edits=False))
+        edits = await uncovered(bot_application(handle_edits=True))
+        # Составной фильтр без declare_message_types: его посты каналов не запрошены бы
+        application = bot_application(handle_edits=False)
+        application.add_handler(MessageHandler(filters.UpdateType.CHANNEL_POST & filters.TEXT, noop))
+        undeclared = await uncovered(application)
+        self.log_test("Bot Handlers Covered", not default and not edits, f"- {default or edits or 'ok'}")
+        self.log_test("Undeclared Type Caught", undeclared == {"channel_post"}, f"- {undeclared}")
+
+    async def test_edits(self):
+        """Правка отвечает тем же матчером, только если положен другой ответ"""
+        print("\n✏️ Testing Edited Messages...")
+
+        factory = UpdateFactory()
+        api = FakeTelegramAPI()
+        runtime = BotRuntime(store=StateStore(), handle_edits=True, analytics=FunnelAnalytics())
+        async with ReplayHarness(api=api, runtime=runtime) as harness:
+            # Личка: стартовое сообщение, правка опечатки - без нового ответа
+            original = factory.message("привет", "private", user_id=2001)
+            await harness.process(original)
+            first = api.count("sendMessage")
+            await harness.process(factory.edited_message(original, "привет!"))
+            same_kind = api.count("sendMessage") - first
+            # Правка в вопрос о вступлении - другой ответ
+            await harness.process(factory.edited_message(original, "как вступить?"))
+            new_kind = api.count("sendMessage") - first
+            # Повторная правка с тем же вопросом - ответ уже дан
+            await harness.process(factory.edited_message(original, "как вступить в группу?"))
+            repeated = api.count("sendMessage") - first
+            # Группа: болтовня без ответа, правка добавила ключевые слова
+            chatter = factory.message("всем привет", "supergroup", user_id=2002)
+            await harness.process(chatter)
+            ignored = api.count("sendMessage") - first
+            await harness.process(factory.edited_message(chatter, "всем привет, есть промпты?"))
+            group_reply = api.calls_to("sendMessage")[-1]
+            group_sent = api.count("sendMessage") - first
+            # Правка сообщения, которого процесс не видел
+            unseen = factory.message("как вступить?", "private", user_id=2003)
+            await harness.process(factory.edited_message(unseen, "как вступить в группу?"))
+            unseen_sent = api.count("sendMessage") - first
+
+        self.log_test("Original Answered", first == 1)
+        self.log_test("Same Reply Not Repeated", same_kind == 0)
+        self.log_test("Different Reply Sent", new_kind == 1 and repeated == 1, f"- {new_kind}, {repeated}")
+        self.log_test("Group Edit Gains Trigger", ignored == 1 and group_sent == 2
+                      and int(group_reply["chat_id"]) < 0)
+        self.log_test("Unseen Message Ignored", unseen_sent == 2)
+        self.log_test("Reply Memory Bounded By Messages", len(runtime.replies) == 2)
+        # Воронка и лиды считают исходное сообщение, но не его правки
+        summary = runtime.analytics.query(hours=1)
+        self.log_test("Edits Not Counted", summary.get(EVENT_START, (0, 0))[0] == 1
+                      and summary.get(EVENT_DM, (0, 0))[0] == 1 and EVENT_JOIN not in summary
+                      and runtime.store.get(NS_LEAD, "2002") is None, f"- {summary}")
+
+    async def test_polling(self):
+        """Эмулятор отбрасывает типы вне allowed_updates, бот получает только нужное"""
+        print("\n📡 Testing Update-Type-Aware Polling...")
+
+        factory = UpdateFactory()
+        original = factory.message("привет", "private", user_id=3001)
+        updates = [original, factory.edited_message(original, "как вступить?"),
+                   factory.channel_post("новый урок"), factory.my_chat_member(),
+                   factory.inline_query("файл", user_id=3001)]
+        api = FakeTelegramAPI()
+        api.add_updates(updates)
+        application = Application.builder().token(FAKE_BOT_TOKEN).request(api).get_updates_request(api).build()
+        application.bot_data["runtime"] = BotRuntime(store=StateStore())
+        BuddahBaseBot.register_handlers(application)
+        seen = []
+
+        async def record(update, context):
+            seen.append(update.update_id)
+
+        application.add_handler(TypeHandler(Update, record), group=-10)
+        allowed = allowed_updates(application)
+        async with application:
+            await application.start()
+            await application.updater.start_polling(allowed_updates=allowed)
+            for _ in range(100):
+                if len(seen) >= 2 and not api.updates:
+                    break
+                await asyncio.sleep(0.02)
+            await application.updater.stop()
+            await application.stop()
+
+        self.log_test("Only Allowed Types Delivered", seen == [updates[0]["update_id"], updates[4]["update_id"]],
+                      f"- {seen}")
+        self.log_test("Rest Filtered At Source", api.filtered == 3, f"- {api.filtered}")
+        self.log_test("Allowed Updates Sent", api.calls_to("getUpdates")[0].get("allowed_updates") == allowed)
+
+    async def run_all_tests(self):
+        """Run all allowed updates tests"""
+        print("🚀 Starting Allowed Updates Testing")
+        print("=" * 50)
+
+        logging.disable(logging.WARNING)
+        self.test_filter_algebra()
+        self.test_bot_handlers()
+        await self.test_handler_coverage()
+        await self.test_edits()
+        await self.test_polling()
+        logging.disable(logging.NOTSET)
+
+        print("\n" + "=" * 50)
+        print(f"📊 Test Results: {self.tests_passed}/{self.tests_run} tests passed")
+
+        if self.tests_passed == self.tests_run:
+            print("🎉 All allowed updates tests passed!")
+            return 0
+        else:
+            failed_tests = self.tests_run - self.tests_passed
+            print(f"⚠️ {failed_tests} test(s) failed. Please review the issues above.")
+            return 1
+
+
+async def main():
+    """Main testing function"""
+    tester = UpdatesTester()
+    return await tester.run_all_tests()
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
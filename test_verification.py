@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+"""
+Тестирование проверки новых участников: кнопка "Я не бот", исключение по таймауту,
+ограниченная память и очередь действий при наплыве аккаунтов (join raid), ожидающие
+после перезапуска
+"""
+
+import asyncio
+import logging
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from telegram import Update
+from telegram.error import TelegramError
+
+from backpressure import TIER_CRITICAL, TIER_NORMAL, LoadShedder
+from metrics import format_stats
+from persistence import StateStore
+from replay import GROUP_CHAT_ID, ReplayHarness, UpdateFactory
+from runtime import BotRuntime
+from verification import NS_VERIFY, VERIFY_CALLBACK, JoinVerifier
+
+
+class FakeClock:
+    def __init__(self, now=1_700_000_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class VerificationTester:
+    def __init__(self):
+        self.tests_run = 0
+        self.tests_passed = 0
+
+    def log_test(self, name, success, details=""):
+        """Log test results"""
+        self.tests_run += 1
+        if success:
+            self.tests_passed += 1
+            print(f"✅ {name} - PASSED {details}")
+        else:
+            print(f"❌ {name} - FAILED {details}")
+        return success
+
+    def test_lifecycle(self):
+        """Ожидание, прохождение и исключение по таймауту на фальшивых часах"""
+        print("\n🔐 Testing Challenge Lifecycle...")
+
+        clock = FakeClock()
+        verifier = JoinVerifier(timeout=120, challenge_interval=30, clock=clock)
+        first = verifier.challenge(None, -1, 1)
+        second = verifier.challenge(None, -1, 2)
+        other_chat = verifier.challenge(None, -2, 3)
+        self.log_test("One Challenge Message Per Interval", first and not second and other_chat)
+        self.log_test("Members Pending", verifier.pending == 3 and verifier.is_pending(-1, 2))
+
+        self.log_test("Verify Pending Member", verifier.verify(None, -1, 1))
+        self.log_test("Verify Twice Ignored", not verifier.verify(None, -1, 1)
+                      and not verifier.verify(None, -1, 99))
+
+        clock.now += 60
+        self.log_test("Rejoin Gets New Challenge Message", verifier.challenge(None, -1, 4))
+        clock.now += 60
+        kicked_at_timeout = verifier.expire()
+        self.log_test("Timed Out Members Kicked", kicked_at_timeout == 2
+                      and not verifier.is_pending(-1, 2) and verifier.is_pending(-1, 4),
+                      f"- {kicked_at_timeout} kicked")
+        clock.now += 60
+        self.log_test("Later Joiner Kicked On Its Own Deadline", verifier.expire() == 1
+                      and verifier.pending == 0)
+
+        actions = []
+        while not verifier.actions.empty():
+            _, method, kwargs = verifier.actions.get_nowait()
+            actions.append((method, kwargs.get("user_id")))
+        kicks = [user_id for method, user_id in actions if method == "ban_chat_member"]
+        restricts = [user_id for method, user_id in actions if method == "restrict_chat_member"]
+        self.log_test("Actions Queued", sorted(kicks) == [2, 3, 4] and restricts.count(1) == 2,
+                      f"- {actions}")
+
+    def test_bounded_memory(self):
+        """Ожидающие проверки занимают ограниченную память при любом наплыве"""
+        print("\n🧠 Testing Bounded Memory...")
+
+        clock = FakeClock()
+        count = 20000
+        tracemalloc.start()
+        verifier = JoinVerifier(max_pending=count, max_actions=1, clock=clock)
+        before = tracemalloc.get_traced_memory()[0]
+        for user_id in range(count):
+            verifier.challenge(None, GROUP_CHAT_ID, 100000 + user_id)
+        per_member = (tracemalloc.get_traced_memory()[0] - before) / count
+        tracemalloc.stop()
+        self.log_test("Compact Pending Entry", per_member < 400, f"- {per_member:.0f} bytes per member")
+
+        for user_id in range(5000):
+            verifier.challenge(None, GROUP_CHAT_ID, 500000 + user_id)
+        self.log_test("Pending Capped", verifier.pending == count and verifier.stats["overflow"] == 5000,
+                      f"- {verifier.pending} pending, {verifier.stats['overflow']} overflow")
+
+        small = JoinVerifier(max_pending=1, clock=clock)
+        small.challenge(None, GROUP_CHAT_ID, 1)
+        small.challenge(None, GROUP_CHAT_ID, 2)
+        restricted = [small.actions.get_nowait()[2]["user_id"] for _ in range(small.actions.qsize())]
+        self.log_test("Overflow Not Restricted", restricted == [1] and not small.is_pending(GROUP_CHAT_ID, 2),
+                      f"- {restricted}")
+
+        clock.now += verifier.timeout + 1
+        started = time.perf_counter()
+        kicked = verifier.expire()
+        elapsed = time.perf_counter() - started
+        self.log_test("Raid Expired In One Pass", kicked == count and verifier.pending == 0,
+                      f"- {kicked} kicked in {elapsed * 1000:.0f} ms")
+
+    async def test_join_flow(self):
+        """Вход, удаление сообщений до проверки, нажатие кнопки и приветствие"""
+        print("\n🚪 Testing Join Flow...")
+
+        verifier = JoinVerifier(actions_per_second=0)
+        runtime = BotRuntime(store=StateStore(), verifier=verifier)
+        factory = UpdateFactory()
+        async with ReplayHarness(runtime=runtime) as harness:
+            api = harness.api
+            # Администраторы группы запретили опросы всем участникам
+            api.chat_permissions = dict(api.chat_permissions, can_send_polls=False)
+            bot_member = factory.new_members([555])
+            bot_member["message"]["new_chat_members"][0]["is_bot"] = True
+            await harness.process(bot_member)
+            await harness.process(factory.new_members([501]))
+            await verifier.actions.join()
+            restricted = api.calls_to("restrictChatMember")
+            challenge = api.calls_to("sendMessage")
+
+            spam = factory.message("🔥 Заработок без вложений, пиши в лс", "supergroup", user_id=501)
+            await harness.process(spam)
+            await verifier.actions.join()
+            deleted = [call["message_id"] for call in api.calls_to("deleteMessage")]
+            replies_before_verify = api.count("sendMessage")
+
+            challenge_id = api.sent[-1][1]
+            await harness.process(factory.callback_query(VERIFY_CALLBACK, user_id=501, message_id=challenge_id))
+            await harness.process(factory.callback_query(VERIFY_CALLBACK, user_id=502, message_id=challenge_id))
+            await verifier.actions.join()
+            answers = [call.get("text") for call in api.calls_to("answerCallbackQuery")]
+            lifted = api.calls_to("restrictChatMember")[1:]
+            welcome = api.calls_to("sendMessage")[-1]
+            stats = format_stats(runtime)
+
+        self.log_test("Bots Not Challenged", len(restricted) == 1 and restricted[0]["user_id"] == 501)
+        self.log_test("New Member Restricted", restricted[0]["permissions"]["can_send_messages"] is False)
+        self.log_test("Challenge Has Button", len(challenge) == 1 and VERIFY_CALLBACK in str(challenge[0]["reply_markup"]))
+        self.log_test("Unverified Messages Deleted", deleted == [spam["message"]["message_id"]]
+                      and replies_before_verify == 1, f"- {deleted}")
+        self.log_test("Button Lifts Restriction", len(lifted) == 1 and lifted[0]["user_id"] == 501
+                      and lifted[0]["permissions"]["can_send_messages"] is True)
+        self.log_test("Chat Default Permissions", api.count("getChat") == 1
+                      and lifted[0]["permissions"]["can_send_polls"] is False
+                      and "can_change_info" not in lifted[0]["permissions"], f"- {lifted[0]['permissions']}")
+        self.log_test("Welcome After Verification", "Добро пожаловать" in welcome["text"]
+                      and welcome.get("reply_to_message_id") == challenge_id)
+        self.log_test("Strangers Get Polite Answer", len(answers) == 2 and answers[0] != answers[1], f"- {answers}")
+        self.log_test("Stats Line", "🔐 Проверка входа: ждут 0, прошли 1" in stats)
+
+    async def test_raid(self):
+        """Наплыв тысяч аккаунтов: одно сообщение с кнопкой, все ограничены и исключены"""
+        print("\n🌊 Testing Join Raid...")
+
+        clock = FakeClock()
+        raiders = 3000
+        verifier = JoinVerifier(timeout=120, challenge_interval=30, actions_per_second=0, clock=clock)
+        runtime = BotRuntime(store=StateStore(), verifier=verifier)
+        factory = UpdateFactory()
+        legit = list(range(10, 20))
+        async with ReplayHarness(runtime=runtime) as harness:
+            api = harness.api
+            for i in range(raiders):
+                await harness.process(factory.new_members([200000 + i]))
+                if i % 10 == 0:
+                    await harness.process(factory.message("💰 Пиши в лс, заработок от 500$ в день",
+                                                          "supergroup", user_id=200000 + i))
+                if i % 300 == 0:
+                    user_id = legit[i // 300]
+                    await harness.process(factory.new_members([user_id]))
+            challenge_id = next(message_id for chat_id, message_id in api.sent if chat_id == GROUP_CHAT_ID)
+            for user_id in legit:
+                await harness.process(factory.callback_query(VERIFY_CALLBACK, user_id=user_id,
+                                                             message_id=challenge_id))
+            clock.now += 121
+            kicked = verifier.expire()
+            await verifier.actions.join()
+            bans = {call["user_id"] for call in api.calls_to("banChatMember")}
+            challenges = api.count("sendMessage") - len(legit)
+
+            shedder = LoadShedder(runtime)
+            tier = shedder.classify(Update.de_json(factory.new_members([1]), harness.application.bot))
+        plain = LoadShedder(BotRuntime(store=StateStore()))
+
+        self.log_test("Single Challenge Message", challenges == 1, f"- {challenges} for {raiders} joins")
+        self.log_test("All Raiders Kicked", kicked == raiders and bans == set(range(200000, 200000 + raiders)),
+                      f"- {len(bans)} banned")
+        self.log_test("Legit Members Kept", not bans & set(legit) and verifier.stats["passed"] == len(legit))
+        self.log_test("Raider Messages Deleted", api.count("deleteMessage") == raiders // 10)
+        self.log_test("Joins Never Shed While Verifying", tier == TIER_CRITICAL
+                      and plain.classify(Update.de_json(factory.new_members([1]), None)) == TIER_NORMAL)
+
+    async def test_rate_limit(self):
+        """Действия Bot API идут не быстрее actions_per_second"""
+        print("\n⏱ Testing Action Rate Limit...")
+
+        verifier = JoinVerifier(actions_per_second=50)
+        runtime = BotRuntime(store=StateStore(), verifier=verifier)
+        factory = UpdateFactory()
+        async with ReplayHarness(runtime=runtime) as harness:
+            started = time.perf_counter()
+            for user_id in range(300, 306):
+                await harness.process(factory.new_members([user_id]))
+            await verifier.actions.join()
+            elapsed = time.perf_counter() - started
+        self.log_test("Actions Paced", elapsed >= 5 / 50, f"- 6 actions in {elapsed:.2f} s")
+
+    async def test_disabled(self):
+        """Без проверки участники приветствуются сразу, как раньше"""
+        print("\n👋 Testing Verification Disabled...")
+
+        async with ReplayHarness() as harness:
+            await harness.process(UpdateFactory().new_members([700]))
+            sent = harness.api.calls_to("sendMessage")
+            restricted = harness.api.count("restrictChatMember")
+        self.log_test("Immediate Welcome", len(sent) == 1 and "Добро пожаловать" in sent[0]["text"]
+                      and restricted == 0)
+
+    async def test_restart(self):
+        """Ожидающие переживают перезапуск: проверка продолжается, истекшие исключаются"""
+        print("\n💾 Testing Pending Across Restart...")
+
+        class FakeBot:
+            def __init__(self):
+                self.calls = []
+
+            async def ban_chat_member(self, chat_id, user_id, until_date):
+                self.calls.append(("ban", user_id))
+
+            async def restrict_chat_member(self, chat_id, user_id, permissions):
+                self.calls.append(("restrict", user_id))
+
+            async def get_chat(self, chat_id):
+                raise TelegramError("Bad Gateway")
+
+        clock = FakeClock()
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "state.db")
+            store = await StateStore(path).open()
+            verifier = JoinVerifier(timeout=120, actions_per_second=0, store=store, clock=clock)
+            for user_id in range(1, 5):
+                verifier.challenge(None, GROUP_CHAT_ID, user_id)
+                clock.now += 50
+            verifier.verify(None, GROUP_CHAT_ID, 4)
+            await store.close()
+
+            # Простой: сроки первых двух истекли
+            store = await StateStore(path).open()
+            verifier = JoinVerifier(timeout=120, actions_per_second=0, store=store, clock=clock)
+            verifier.bot = bot = FakeBot()
+            await verifier.start()
+            restored = verifier.stats["restored"]
+            kicked = verifier.expire()
+            passed = verifier.verify(bot, GROUP_CHAT_ID, 3)
+            await verifier.actions.join()
+            await verifier.stop()
+            remaining = store.count(NS_VERIFY)
+            await store.close()
+
+        self.log_test("Pending Restored", restored == 3, f"- {restored}")
+        self.log_test("Overdue Kicked After Restart", kicked == 2 and bot.calls[:2] == [("ban", 1), ("ban", 2)])
+        self.log_test("Restored Member Can Verify", passed and bot.calls[2:] == [("restrict", 3)]
+                      and remaining == 0, f"- {bot.calls}, {remaining} left")
+
+    async def run_all_tests(self):
+        """Run all join verification tests"""
+        print("🚀 Starting Join Verification Testing")
+        print("=" * 50)
+
+        logging.disable(logging.WARNING)
+        self.test_lifecycle()
+        self.test_bounded_memory()
+        await self.test_join_flow()
+        await self.test_raid()
+        await self.test_rate_limit()
+        await self.test_disabled()
+        await self.test_restart()
+        logging.disable(logging.NOTSET)
+
+        print("\n" + "=" * 50)
+        print(f"📊 Test Results: {self.tests_passed}/{self.tests_run} tests passed")
+
+        if self.tests_passed == self.tests_run:
+            print("🎉 All join verification tests passed!")
+            return 0
+        else:
+            failed_tests = self.tests_run - self.tests_passed
+            print(f"⚠️ {failed_tests} test(s) failed. Please review the issues above.")
+            return 1
+
+
+async def main():
+    """Main testing function"""
+    tester = VerificationTester()
+    return await tester.run_all_tests()
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
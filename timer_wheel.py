@@ -0,0 +1,93 @@
+"""
+Иерархическое колесо таймеров (как таймеры ядра Linux).
+
+Время делится на тики по tick секунд. Уровень 0 - levels[0] слотов по одному тику,
+каждый слот следующего уровня покрывает целый оборот предыдущего. Таймер кладется в
+слот по номеру тика истечения - вставка O(1). Продвижение на тик забирает один слот
+уровня 0; когда уровень 0 проходит оборот, очередной слот следующего уровня
+раскладывается (каскад) по нижним уровням. Каждый таймер каскадируется не больше
+числа уровней раз, поэтому истечение тоже O(1) в пересчете на таймер.
+
+Таймеры дальше горизонта колеса (при tick=1 и уровнях по умолчанию - больше двух лет)
+лежат в последнем слоте верхнего уровня и перекладываются при каждом его каскаде.
+"""
+
+import math
+
+
+class TimerWheel:
+    """Таймеры с вставкой и истечением за O(1); время задается извне через advance()"""
+
+    def __init__(self, tick=1.0, levels=(256, 64, 64, 64), now=0.0):
+        if any(size & (size - 1) for size in levels):
+            raise ValueError("Размеры уровней колеса должны быть степенями двойки")
+        self.tick = tick
+        self._wheels = [[[] for _ in range(size)] for size in levels]
+        self._masks = [size - 1 for size in levels]
+        self._shifts = []
+        shift = 0
+        for size in levels:
+            self._shifts.append(shift)
+            shift += size.bit_length() - 1
+        # Тиков до истечения, которые помещаются в уровни 0..k
+        self._spans = [1 << (s + m.bit_length()) for s, m in zip(self._shifts, self._masks)]
+        self.current = math.floor(now / tick)
+        self._due = []
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def insert(self, deadline, item):
+        """Ставит item на момент deadline (в тех же единицах, что и now)"""
+        expires = math.ceil(deadline / self.tick)
+        self._size += 1
+        if expires <= self.current:
+            self._due.append(item)
+        else:
+            self._place(expires, item)
+
+    def _place(self, expires, item):
+        delta = expires - self.current
+        for level, span in enumerate(self._spans):
+            if delta < span:
+                slot = (expires >> self._shifts[level]) & self._masks[level]
+                self._wheels[level][slot].append((expires, item))
+                return
+        # За горизонтом: слот верхнего уровня, который каскадируется последним в обороте
+        top = len(self._wheels) - 1
+        slot = ((self.current >> self._shifts[top]) - 1) & self._masks[top]
+        self._wheels[top][slot].append((expires, item))
+
+    def _cascade(self, level):
+        slot = (self.current >> self._shifts[level]) & self._masks[level]
+        timers = self._wheels[level][slot]
+        self._wheels[level][slot] = []
+        for expires, item in timers:
+            self._place(expires, item)
+
+    def advance(self, now):
+        """Продвигает колесо до момента now и возвращает истекшие элементы"""
+        target = math.floor(now / self.tick)
+        expired = self._due
+        self._due = []
+        if self._size == len(expired):
+            # Кроме уже истекших таймеров нет - можно перескочить сразу к цели
+            self.current = max(self.current, target)
+        wheel0 = self._wheels[0]
+        mask0 = self._masks[0]
+        while self.current < target:
+            self.current += 1
+            index = self.current & mask0
+            level = 1
+            # Уровень 0 прошел оборот - каскад следующих уровней, пока их индекс тоже 0
+            while index == 0 and level < len(self._wheels):
+                self._cascade(level)
+                index = (self.current >> self._shifts[level]) & self._masks[level]
+                level += 1
+            slot = wheel0[self.current & mask0]
+            if slot:
+                wheel0[self.current & mask0] = []
+                expired.extend(item for _, item in slot)
+        self._size -= len(expired)
+        return expired
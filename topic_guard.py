@@ -0,0 +1,138 @@
+"""
+Модерация тем форума: писать можно только в разрешенных темах (💬 ЧАТ), сообщения
+в остальных темах удаляются.
+
+Удаления копятся по чатам и уходят пачками через deleteMessages (до 100 сообщений
+за вызов): пачка отправляется, как только набралась, или раз в flush_interval секунд.
+С python-telegram-bot до 20.8 сообщения пачки удаляются по одному (delete_message).
+"""
+
+import asyncio
+import logging
+
+from telegram.error import BadRequest, TelegramError
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+VERDICT_OFF_TOPIC = "off_topic"
+
+# Тема "General": ее сообщения приходят без message_thread_id
+GENERAL_TOPIC_ID = 1
+# Ограничение Bot API на число сообщений в одном deleteMessages
+MAX_DELETE_BATCH = 100
+
+
+async def delete_messages(bot, chat_id, message_ids):
+    """Удаляет до MAX_DELETE_BATCH сообщений чата; возвращает число запросов к Bot API
+
+    deleteMessages (Bot API 7.0) есть в python-telegram-bot с 20.8; в более ранних
+    версиях сообщения удаляются по одному через delete_message. Как и deleteMessages,
+    уже удаленные сообщения пропускаются.
+    """
+    if hasattr(bot, "delete_messages"):
+        await bot.delete_messages(chat_id=chat_id, message_ids=message_ids)
+        return 1
+    results = await asyncio.gather(*(bot.delete_message(chat_id=chat_id, message_id=message_id)
+                                     for message_id in message_ids), return_exceptions=True)
+    for result in results:
+        if isinstance(result, BadRequest) and "message to delete not found" in result.message.lower():
+            continue
+        if isinstance(result, BaseException):
+            raise result
+    return len(message_ids)
+
+
+class TopicGuard:
+    """Удаляет сообщения вне разрешенных тем форума пачками deleteMessages"""
+
+    def __init__(self, allowed_threads, chat_ids=(), flush_interval=1.0, exempt_ids=()):
+        self.allowed_threads = set(allowed_threads)
+        self.chat_ids = set(chat_ids)
+        self.flush_interval = flush_interval
+        self.exempt_ids = set(exempt_ids)
+        self._pending = {}
+        self._bot = None
+        self._flush_task = None
+        self.stats = {"violations": 0, "deleted": 0, "api_calls": 0, "failed": 0}
+
+    @classmethod
+    def from_config(cls):
+        return cls(Config.TOPIC_ALLOWED_THREADS, chat_ids=Config.TOPIC_CHAT_IDS,
+                   flush_interval=Config.TOPIC_FLUSH_INTERVAL, exempt_ids=Config.ADMIN_IDS)
+
+    # --- жизненный цикл -------------------------------------------------------------
+
+    async def start(self):
+        self._flush_task = asyncio.create_task(self._flush_loop())
+
+    async def stop(self):
+        if self._flush_task:
+            self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except asyncio.CancelledError:
+                pass
+            self._flush_task = None
+        await self.flush()
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    # --- проверка -------------------------------------------------------------------
+
+    @property
+    def pending(self):
+        return sum(len(message_ids) for message_ids in self._pending.values())
+
+    @staticmethod
+    def thread_id(message):
+        return message.message_thread_id if message.is_topic_message else GENERAL_TOPIC_ID
+
+    def is_violation(self, message):
+        chat = message.chat
+        if not chat or not chat.is_forum or (self.chat_ids and chat.id not in self.chat_ids):
+            return False
+        # Анонимные администраторы пишут от имени чата
+        if message.sender_chat and message.sender_chat.id == chat.id:
+            return False
+        user = message.from_user
+        if user is None or user.is_bot or user.id in self.exempt_ids:
+            return False
+        return self.thread_id(message) not in self.allowed_threads
+
+    def inspect(self, bot, message):
+        """Ставит сообщение вне разрешенных тем в очередь на удаление"""
+        if message is None or not self.is_violation(message):
+            return None
+        self.stats["violations"] += 1
+        self._bot = bot
+        chat_id = message.chat.id
+        message_ids = self._pending.setdefault(chat_id, [])
+        message_ids.append(message.message_id)
+        if len(message_ids) >= MAX_DELETE_BATCH:
+            # Полная пачка уходит сразу, не дожидаясь периодического сброса
+            del self._pending[chat_id]
+            asyncio.get_running_loop().create_task(self._delete(chat_id, message_ids))
+        return VERDICT_OFF_TOPIC
+
+    # --- удаление -------------------------------------------------------------------
+
+    async def flush(self, chat_id=None):
+        """Удаляет накопленные сообщения (одного чата или всех), по вызову на чат"""
+        chat_ids = [chat_id] if chat_id is not None else list(self._pending)
+        for chat in chat_ids:
+            message_ids = self._pending.pop(chat, None)
+            if message_ids:
+                await self._delete(chat, message_ids)
+
+    async def _delete(self, chat_id, message_ids):
+        try:
+            self.stats["api_calls"] += await delete_messages(self._bot, chat_id, message_ids)
+            self.stats["deleted"] += len(message_ids)
+        except TelegramError as e:
+            self.stats["failed"] += len(message_ids)
+            logger.warning(f"⚠️ Не удалось удалить {len(message_ids)} сообщений вне темы в {chat_id}: {e}")
@@ -0,0 +1,246 @@
+"""
+Трассировка обработки апдейтов: куда ушло время медленного ответа.
+
+Для доли апдейтов TRACE_SAMPLE_RATE записываются спаны:
+
+- receive - весь путь апдейта от постановки в update_queue до конца обработчиков
+  (в args - тип апдейта, чат, уровень LoadShedder и отброшен ли апдейт);
+- enqueue - ожидание в update_queue и в очереди LoadShedder;
+- filter - подбор обработчиков PTB до первого обработчика;
+- handle_message, guard_group_message... - обработчики (через runtime.timed);
+- match и render - классификация текста матчером и шаблон ответа;
+- send - запрос к Bot API (method в args), включая сеть.
+
+Текущая трасса хранится в contextvars: задача обработки апдейта и созданные из нее
+задачи видят ее без передачи параметров. Без трассы span() возвращает общий
+пустой контекст-менеджер, поэтому с выключенной выборкой накладные расходы - одно
+чтение ContextVar на спан.
+
+Спаны выгружаются в формате Chrome Trace Event (JSON Array: открывающая скобка и
+события через запятую, закрывающая скобка необязательна) - файл открывается в
+chrome://tracing и ui.perfetto.dev. Каждый апдейт - отдельная строка (tid = update_id).
+Файл ротируется по размеру, как RotatingFileHandler: trace.json -> trace.json.1 ...
+"""
+
+import asyncio
+import contextvars
+import json
+import logging
+import os
+import random
+import time
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+_current = contextvars.ContextVar("trace", default=None)
+
+
+class _NoSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NO_SPAN = _NoSpan()
+
+
+def current_trace():
+    return _current.get()
+
+
+def span(name, args=None):
+    """Спан текущей трассы; без трассы - пустой контекст-менеджер"""
+    trace = _current.get()
+    if trace is None:
+        return _NO_SPAN
+    return Span(trace, name, args)
+
+
+class Span:
+    __slots__ = ("trace", "name", "args", "started")
+
+    def __init__(self, trace, name, args):
+        self.trace = trace
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        args = self.args
+        if exc_type is not None:
+            args = dict(args or {}, error=exc_type.__name__)
+        self.trace.add(self.name, self.started, time.perf_counter(), args)
+        return False
+
+
+class Trace:
+    """Спаны одного апдейта"""
+
+    __slots__ = ("tracer", "update_id", "arrived", "dispatched", "handler_started", "args", "_token")
+
+    def __init__(self, tracer, update_id, arrived, args):
+        self.tracer = tracer
+        self.update_id = update_id
+        self.arrived = arrived
+        self.dispatched = None
+        self.handler_started = None
+        self.args = args
+        self._token = None
+
+    def add(self, name, started, finished, args=None):
+        self.tracer.emit(self.update_id, name, started, finished, args)
+
+    def span(self, name, args=None):
+        return Span(self, name, args)
+
+
+class ArrivalQueue(asyncio.Queue):
+    """update_queue, запоминающая время постановки апдейта (начало спанов receive и enqueue)"""
+
+    def _init(self, maxsize):
+        super()._init(maxsize)
+        self.arrivals = {}
+
+    def _put(self, item):
+        self.arrivals[id(item)] = time.perf_counter()
+        super()._put(item)
+
+    def arrival(self, item):
+        return self.arrivals.pop(id(item), None)
+
+
+def describe(update):
+    """args корневого спана: тип апдейта и чат"""
+    kind = next((name for name in ("message", "edited_message", "callback_query", "inline_query",
+                                   "chat_member", "my_chat_member") if getattr(update, name, None)), "other")
+    chat = getattr(update, "effective_chat", None)
+    return {"update": kind, "chat_id": chat.id if chat else None}
+
+
+class Tracer:
+    """Выборка апдейтов для трассировки и выгрузка спанов в ротируемый файл"""
+
+    def __init__(self, sample_rate=0.0, path="traces/trace.json", max_bytes=10 * 1024 * 1024,
+                 backups=3, flush_every=256, flush_interval=1.0, sample=random.random):
+        self.sample_rate = sample_rate
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+        self.sample = sample
+        self.stats = {"sampled": 0, "spans": 0, "rotations": 0}
+        self._events = []
+        self._file = None
+        self._size = 0
+        self._last_flush = time.perf_counter()
+        self._pid = os.getpid()
+        # perf_counter -> микросекунды Unix-времени, чтобы сверять трассы с логами
+        self._offset = time.time() - time.perf_counter()
+
+    @classmethod
+    def from_config(cls, path=None):
+        return cls(sample_rate=Config.TRACE_SAMPLE_RATE, path=path or Config.TRACE_PATH,
+                   max_bytes=Config.TRACE_MAX_BYTES, backups=Config.TRACE_BACKUPS)
+
+    # --- трассы ---------------------------------------------------------------------
+
+    def begin(self, update, arrived=None):
+        """Начинает трассу апдейта, если он попал в выборку; иначе None"""
+        if self.sample_rate <= 0 or self.sample() >= self.sample_rate:
+            return None
+        trace = Trace(self, update.update_id, arrived or time.perf_counter(), describe(update))
+        trace._token = _current.set(trace)
+        self.stats["sampled"] += 1
+        return trace
+
+    def end(self, trace, **args):
+        """Закрывает трассу: корневой спан receive и спаны очереди и подбора обработчиков"""
+        now = time.perf_counter()
+        trace.add("enqueue", trace.arrived, trace.dispatched or now)
+        if trace.dispatched is not None:
+            trace.add("filter", trace.dispatched, trace.handler_started or now)
+        trace.args.update(args)
+        trace.add("receive", trace.arrived, now, trace.args)
+        _current.reset(trace._token)
+        if len(self._events) >= self.flush_every or now - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def emit(self, update_id, name, started, finished, args=None):
+        event = {"name": name, "cat": "update", "ph": "X",
+                 "ts": round((started + self._offset) * 1e6, 1),
+                 "dur": round((finished - started) * 1e6, 1),
+                 "pid": self._pid, "tid": update_id}
+        if args:
+            event["args"] = args
+        self._events.append(event)
+        self.stats["spans"] += 1
+
+    # --- файл -----------------------------------------------------------------------
+
+    def flush(self):
+        """Дописывает накопленные спаны в файл"""
+        events, self._events = self._events, []
+        self._last_flush = time.perf_counter()
+        if not events:
+            return
+        try:
+            for event in events:
+                if self._file is None:
+                    self._open()
+                line = json.dumps(event, ensure_ascii=False) + ",\n"
+                self._file.write(line)
+                self._size += len(line.encode("utf-8"))
+                if self._size >= self.max_bytes:
+                    self._rotate()
+            if self._file is not None:
+                self._file.flush()
+        except OSError as e:
+            logger.warning(f"⚠️ Не удалось записать трассы в {self.path}: {e}")
+
+    def _open(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file = open(self.path, "a", encoding="utf-8")
+        self._size = self._file.tell()
+        if self._size == 0:
+            self._file.write("[\n")
+            self._size = 2
+
+    def _rotate(self):
+        self._file.close()
+        self._file = None
+        if self.backups > 0:
+            for index in range(self.backups - 1, 0, -1):
+                source = f"{self.path}.{index}"
+                if os.path.exists(source):
+                    os.replace(source, f"{self.path}.{index + 1}")
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+        self.stats["rotations"] += 1
+
+    def close(self):
+        self.flush()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def load_trace(path):
+    """События файла трасс (JSON Array Format без закрывающей скобки)"""
+    with open(path, "r", encoding="utf-8") as f:
+        text = f.read().rstrip().rstrip(",")
+    if not text.endswith("]"):
+        text += "]"
+    return json.loads(text)
@@ -0,0 +1,100 @@
+"""
+Минимальный allowed_updates для getUpdates и setWebhook по зарегистрированным обработчикам.
+
+Без allowed_updates Telegram присылает все типы апдейтов (правки сообщений, посты
+каналов, смены статуса бота в чатах...), а PTB разбирает каждый и отбрасывает без
+обработчика. allowed_updates(application) обходит обработчики Application:
+
+- у MessageHandler и CommandHandler типы сообщений задает фильтр: filters.UpdateType.*
+  - явно, filters.ChatType.* (кроме CHANNEL) исключает посты каналов. Составные
+  фильтры ("и", "или") не разбираются - их устройство во внутреннем API PTB: типы
+  сообщений таких обработчиков объявляет регистрирующий их код (declare_message_types
+  в BuddahBaseBot.register_handlers, рядом с фильтрами), без объявления - все типы
+  сообщений. Объявления ведутся вручную; test_updates проверяет, что каждый тип,
+  который принимает обработчик бота, попадает в allowed_updates. CommandHandler без
+  фильтров слушает message и edited_message, как в PTB;
+- у остальных обработчиков тип известен по классу (CallbackQueryHandler -
+  callback_query и т.д.), неизвестный обработчик разрешает все типы;
+- TypeHandler(Update) - наблюдатель (учет update_id): видит все, что пришло, но сам
+  типов не требует.
+"""
+
+from telegram import Update
+from telegram.ext import (CallbackQueryHandler, ChatJoinRequestHandler, ChatMemberHandler,
+                          ChosenInlineResultHandler, CommandHandler, InlineQueryHandler, MessageHandler,
+                          PollAnswerHandler, PollHandler, PreCheckoutQueryHandler, ShippingQueryHandler,
+                          TypeHandler, filters)
+
+MESSAGE_TYPES = frozenset({Update.MESSAGE, Update.EDITED_MESSAGE, Update.CHANNEL_POST, Update.EDITED_CHANNEL_POST})
+
+UPDATE_TYPE_FILTERS = {
+    filters.UpdateType.MESSAGE: {Update.MESSAGE},
+    filters.UpdateType.EDITED_MESSAGE: {Update.EDITED_MESSAGE},
+    filters.UpdateType.MESSAGES: {Update.MESSAGE, Update.EDITED_MESSAGE},
+    filters.UpdateType.CHANNEL_POST: {Update.CHANNEL_POST},
+    filters.UpdateType.EDITED_CHANNEL_POST: {Update.EDITED_CHANNEL_POST},
+    filters.UpdateType.CHANNEL_POSTS: {Update.CHANNEL_POST, Update.EDITED_CHANNEL_POST},
+    filters.UpdateType.EDITED: {Update.EDITED_MESSAGE, Update.EDITED_CHANNEL_POST},
+}
+
+# Сообщения из личек и групп: посты каналов сюда не попадают
+CHAT_TYPE_FILTERS = (filters.ChatType.PRIVATE, filters.ChatType.GROUP, filters.ChatType.SUPERGROUP,
+                     filters.ChatType.GROUPS)
+
+# Ключ application.bot_data с объявленными типами сообщений составных фильтров
+DECLARED_MESSAGE_TYPES = "message_update_types"
+
+HANDLER_TYPES = {
+    CallbackQueryHandler: {Update.CALLBACK_QUERY},
+    InlineQueryHandler: {Update.INLINE_QUERY},
+    ChosenInlineResultHandler: {Update.CHOSEN_INLINE_RESULT},
+    ShippingQueryHandler: {Update.SHIPPING_QUERY},
+    PreCheckoutQueryHandler: {Update.PRE_CHECKOUT_QUERY},
+    PollHandler: {Update.POLL},
+    PollAnswerHandler: {Update.POLL_ANSWER},
+    ChatJoinRequestHandler: {Update.CHAT_JOIN_REQUEST},
+}
+
+
+def declare_message_types(application, *update_filters):
+    """Объявляет типы сообщений, которые пропускают составные фильтры обработчиков
+    приложения: filters.UpdateType.* из тех же фильтров"""
+    declared = application.bot_data.setdefault(DECLARED_MESSAGE_TYPES, set())
+    for update_filter in update_filters:
+        declared |= UPDATE_TYPE_FILTERS[update_filter]
+
+
+def message_types(message_filter, declared=None):
+    """Типы сообщений, которые может пропустить фильтр (declared - для составных)"""
+    if message_filter in UPDATE_TYPE_FILTERS:
+        return set(UPDATE_TYPE_FILTERS[message_filter])
+    if message_filter in CHAT_TYPE_FILTERS:
+        return {Update.MESSAGE, Update.EDITED_MESSAGE}
+    # Составные и прочие фильтры: объявленные типы, иначе все типы сообщений
+    return set(MESSAGE_TYPES if declared is None else declared)
+
+
+def handler_types(handler, declared=None):
+    """Типы апдейтов, нужные обработчику"""
+    if isinstance(handler, (MessageHandler, CommandHandler)):
+        return message_types(handler.filters, declared)
+    if isinstance(handler, ChatMemberHandler):
+        return {ChatMemberHandler.MY_CHAT_MEMBER: {Update.MY_CHAT_MEMBER},
+                ChatMemberHandler.CHAT_MEMBER: {Update.CHAT_MEMBER}}.get(
+                    handler.chat_member_types, {Update.MY_CHAT_MEMBER, Update.CHAT_MEMBER})
+    if isinstance(handler, TypeHandler) and handler.type is Update:
+        return set()
+    for handler_class, types in HANDLER_TYPES.items():
+        if isinstance(handler, handler_class):
+            return set(types)
+    return set(Update.ALL_TYPES)
+
+
+def allowed_updates(application):
+    """Отсортированный список типов апдейтов, которые обрабатывает приложение"""
+    declared = application.bot_data.get(DECLARED_MESSAGE_TYPES)
+    types = set()
+    for handlers in application.handlers.values():
+        for handler in handlers:
+            types |= handler_types(handler, declared)
+    return sorted(str(update_type) for update_type in types)
@@ -0,0 +1,242 @@
+"""
+Проверка новых участников группы кнопкой "Я не бот".
+
+Вошедший участник сразу ограничивается (не может писать) и попадает в ожидающие
+проверки: словарь (чат, пользователь) -> срок и колесо таймеров для истечения сроков.
+Нажал кнопку до срока - участник получает права по умолчанию чата (permissions из
+getChat) и бот приветствует его; не нажал - участник исключается (бан на
+KICK_BAN_SECONDS, после которого можно войти снова).
+
+Ожидающие хранятся в StateStore (пространство имен verify: "чат:пользователь" -> срок)
+и после перезапуска возвращаются в колесо: ограниченный участник не остается без
+проверки навсегда, истекшие за время простоя исключаются на первом тике.
+
+При наплыве (join raid) тысяч аккаунтов память и число запросов ограничены:
+- ожидающих не больше max_pending, сверх лимита участник не ограничивается: снять
+  ограничение без записи в ожидающих было бы некому;
+- сообщение с кнопкой одно на чат за challenge_interval секунд, а не на каждого
+  вошедшего: кнопка общая, нажавшего видно по callback_query.from_user;
+- ограничения, снятия и исключения идут через очередь с ограничением скорости;
+- сообщения ожидающих проверки удаляются модерацией до остальных обработчиков.
+"""
+
+import asyncio
+import logging
+import time
+
+from telegram import ChatPermissions
+from telegram.error import TelegramError
+
+from config import Config
+from timer_wheel import TimerWheel
+
+logger = logging.getLogger(__name__)
+
+VERDICT_UNVERIFIED = "unverified"
+VERIFY_CALLBACK = "verify"
+
+# Бан с until_date меньше 30 секунд Telegram считает вечным
+KICK_BAN_SECONDS = 60
+
+NS_VERIFY = "verify"
+
+# Сколько секунд права чата из getChat считаются актуальными
+CHAT_PERMISSIONS_TTL = 600
+
+# Права прошедшего проверку, если getChat не вернул прав чата: все виды сообщений,
+# без управления чатом
+MEMBER_PERMISSIONS = ChatPermissions(
+    can_send_messages=True, can_send_audios=True, can_send_documents=True,
+    can_send_photos=True, can_send_videos=True, can_send_video_notes=True,
+    can_send_voice_notes=True, can_send_polls=True, can_send_other_messages=True,
+    can_add_web_page_previews=True,
+)
+
+
+class JoinVerifier:
+    """Ожидающие проверки участники с истечением по колесу таймеров и очередь действий"""
+
+    def __init__(self, timeout=120.0, challenge_interval=30.0, max_pending=50000,
+                 actions_per_second=20.0, max_actions=5000, store=None, tick=1.0, clock=time.time):
+        self.timeout = timeout
+        self.challenge_interval = challenge_interval
+        self.max_pending = max_pending
+        self.actions_per_second = actions_per_second
+        self.tick = tick
+        self.store = store
+        self.clock = clock
+        self.actions = asyncio.Queue(maxsize=max_actions)
+        self._pending = {}
+        self._wheel = TimerWheel(tick, now=clock())
+        self._last_challenge = {}
+        # chat_id -> (права чата, когда получены)
+        self._chat_permissions = {}
+        # Bot приложения; BuddahBaseBot задает его при сборке Application
+        self.bot = None
+        self._worker = None
+        self._ticker = None
+        self.stats = {"challenged": 0, "passed": 0, "kicked": 0, "overflow": 0, "restored": 0,
+                      "dropped_actions": 0, "failed_actions": 0}
+
+    @classmethod
+    def from_config(cls, store=None):
+        return cls(timeout=Config.JOIN_VERIFY_TIMEOUT,
+                   challenge_interval=Config.JOIN_CHALLENGE_INTERVAL,
+                   max_pending=Config.JOIN_VERIFY_MAX_PENDING,
+                   actions_per_second=Config.JOIN_ACTIONS_PER_SECOND,
+                   store=store)
+
+    # --- жизненный цикл -------------------------------------------------------------
+
+    async def start(self):
+        """Возвращает в колесо ожидающих, сохраненных до перезапуска, и запускает очередь"""
+        self.restore()
+        self._worker = asyncio.create_task(self._action_loop())
+        self._ticker = asyncio.create_task(self._tick_loop())
+
+    async def stop(self):
+        # Ожидающие остаются в хранилище до следующего запуска
+        for task in (self._ticker, self._worker):
+            if task:
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        self._worker = self._ticker = None
+
+    async def _tick_loop(self):
+        while True:
+            await asyncio.sleep(self.tick)
+            self.expire()
+
+    def restore(self):
+        if not self.store:
+            return 0
+        restored = 0
+        for key, deadline in list(self.store.items(NS_VERIFY)):
+            chat_id, user_id = key.rsplit(":", 1)
+            member = (int(chat_id), int(user_id))
+            self._pending[member] = deadline
+            self._wheel.insert(deadline, member)
+            restored += 1
+        self.stats["restored"] += restored
+        if restored:
+            logger.info(f"🔐 Восстановлено ожидающих проверки: {restored}")
+        return restored
+
+    # --- проверка -------------------------------------------------------------------
+
+    @property
+    def pending(self):
+        return len(self._pending)
+
+    def is_pending(self, chat_id, user_id):
+        return (chat_id, user_id) in self._pending
+
+    def challenge(self, bot, chat_id, user_id, now=None):
+        """Ограничивает вошедшего и ставит его в ожидание проверки.
+
+        Возвращает True, если в чат нужно отправить сообщение с кнопкой (не чаще
+        challenge_interval секунд на чат).
+        """
+        now = self.clock() if now is None else now
+        self.bot = bot
+        if len(self._pending) >= self.max_pending:
+            # Наплыв больше лимита: без записи в ожидающих ограничение никто не снимет
+            self.stats["overflow"] += 1
+            return False
+        self._enqueue("restrict_chat_member", chat_id=chat_id, user_id=user_id,
+                      permissions=ChatPermissions.no_permissions())
+        key = (chat_id, user_id)
+        deadline = now + self.timeout
+        self._pending[key] = deadline
+        self._wheel.insert(deadline, key)
+        if self.store:
+            self.store.set(NS_VERIFY, f"{chat_id}:{user_id}", deadline)
+        self.stats["challenged"] += 1
+        last = self._last_challenge.get(chat_id)
+        if last is not None and now - last < self.challenge_interval:
+            return False
+        self._last_challenge[chat_id] = now
+        return True
+
+    def verify(self, bot, chat_id, user_id):
+        """Участник нажал кнопку: снимает ограничение; False, если проверка не ждала"""
+        if self._pending.pop((chat_id, user_id), None) is None:
+            return False
+        if self.store:
+            self.store.delete(NS_VERIFY, f"{chat_id}:{user_id}")
+        self.bot = bot
+        self.stats["passed"] += 1
+        # Права чата запрашиваются при выполнении действия
+        self._enqueue("restrict_chat_member", chat_id=chat_id, user_id=user_id, permissions=None)
+        return True
+
+    def expire(self, now=None):
+        """Исключает участников, не прошедших проверку до срока"""
+        now = self.clock() if now is None else now
+        kicked = 0
+        for key in self._wheel.advance(now):
+            deadline = self._pending.get(key)
+            # Прошедшие проверку остаются в колесе до срока и здесь пропускаются
+            if deadline is None or deadline > now:
+                continue
+            del self._pending[key]
+            chat_id, user_id = key
+            if self.store:
+                self.store.delete(NS_VERIFY, f"{chat_id}:{user_id}")
+            self._enqueue("ban_chat_member", chat_id=chat_id, user_id=user_id,
+                          until_date=int(time.time()) + KICK_BAN_SECONDS)
+            kicked += 1
+        self.stats["kicked"] += kicked
+        return kicked
+
+    def inspect(self, bot, message):
+        """Удаляет сообщения участников, еще не прошедших проверку"""
+        if message is None or message.chat is None or message.from_user is None:
+            return None
+        if not self.is_pending(message.chat.id, message.from_user.id):
+            return None
+        self.bot = bot
+        self._enqueue("delete_message", chat_id=message.chat.id, message_id=message.message_id)
+        return VERDICT_UNVERIFIED
+
+    # --- очередь действий -----------------------------------------------------------
+
+    def _enqueue(self, method, **kwargs):
+        try:
+            self.actions.put_nowait((self.bot, method, kwargs))
+        except asyncio.QueueFull:
+            self.stats["dropped_actions"] += 1
+
+    async def _action_loop(self):
+        interval = 1 / self.actions_per_second if self.actions_per_second > 0 else 0
+        while True:
+            bot, method, kwargs = await self.actions.get()
+            try:
+                if method == "restrict_chat_member" and kwargs["permissions"] is None:
+                    kwargs["permissions"] = await self.chat_permissions(bot, kwargs["chat_id"])
+                await getattr(bot, method)(**kwargs)
+            except TelegramError as e:
+                self.stats["failed_actions"] += 1
+                logger.warning(f"⚠️ Проверка входа: {method} не выполнен: {e}")
+            finally:
+                self.actions.task_done()
+            if interval:
+                await asyncio.sleep(interval)
+
+    async def chat_permissions(self, bot, chat_id):
+        """Права участника по умолчанию в чате (getChat, кэш на CHAT_PERMISSIONS_TTL)"""
+        now = self.clock()
+        cached = self._chat_permissions.get(chat_id)
+        if cached and now - cached[1] < CHAT_PERMISSIONS_TTL:
+            return cached[0]
+        try:
+            chat = await bot.get_chat(chat_id)
+            permissions = chat.permissions or MEMBER_PERMISSIONS
+        except TelegramError as e:
+            logger.warning(f"⚠️ Проверка входа: права чата {chat_id} не получены: {e}")
+            return MEMBER_PERMISSIONS
+        self._chat_permissions[chat_id] = (permissions, now)
+        return permissions